@@ -1,5 +1,8 @@
 #!/usr/bin/env python3
 # For Stack
+import time
+_STARTUP_T0 = time.perf_counter()  # Reference point for --startup-profile
+
 import os
 import sys
 import math
@@ -8,13 +11,14 @@ import warnings
 import argparse
 import ipaddress
 import random
-import subprocess
 import concurrent.futures
+import multiprocessing
+import threading
 
 import json
-from PIL import Image, ImageDraw, ImageFont
-import pandas as pd
-import requests
+from contextlib import contextmanager
+from dataclasses import dataclass
+from PIL import Image
 
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QTabWidget, QVBoxLayout, QHBoxLayout,
@@ -33,9 +37,29 @@ from PyQt6.QtCore import (
 from datetime import datetime
 from typing import Optional, Tuple, List, Union
 
+# Planning primitives live in the Qt-free engine so they can be reused headless.
+from portmapper_engine import (
+    SWITCH_LAYOUTS, RackSpec, PortMap, FreePortIndex, PlanCache, PortPlanner, resource_path, get_unique_filename,
+    safe_int, _parse_port_string, _format_port_ranges, get_port_base_type, parse_port_label,
+    get_mellanox_port_order, get_left_right_ports_mellanox, get_dnode_groups_by_dbox_type,
+    generate_cisco_balanced_node_ports, generate_cisco_balanced_uplink_ports, breakout_factor_choices,
+    PLACEMENT_MODES, SOLVER_TIME_BUDGET, bandwidth_report
+)
+from portmapper_render import (
+    get_base_image, load_base_image, render_overlay_cached, render_preview_overlay, render_rack_images, write_port_tables,
+    RENDER_BACKENDS
+)
+from portmapper_switchconf import build_command_parts, build_rack_env_vars, prepare_switch_conf, run_switch_conf
+
+_IMPORT_SECONDS = time.perf_counter() - _STARTUP_T0
+
 # SSL warnings suppression removed; not applicable
 SCRIPT_VERSION = '6.0'
 
+# Top-level keys of a multi_rack_config entry that feed port assignment (see RackSpec).
+# Edits to any other field (hostnames, IPs, bandwidth goals) leave the port map valid.
+RACK_PLANNING_FIELDS = ('nodes', 'uplinks', 'switch_id', 'mapping_mode', 'advanced_config')
+
 # A curated list of plausible excuses for when things go wrong.
 # Sourced from the collective genius and despair of developers everywhere.
 PLAUSIBLE_EXCUSES = [
@@ -641,510 +665,57 @@ STYLESHEET = '''
 
 '''
 
-def resource_path(rel: str) -> str:
-    """
-    Get the absolute path to a resource file.
-    Works whether script is run directly or packaged with PyInstaller.
-    Paths are resolved relative to the script's directory location.
-    """
-    try:
-        # If bundled with PyInstaller
-        base = sys._MEIPASS
-    except Exception:
-        # If running as a script, use the directory containing this script
-        base = os.path.dirname(os.path.abspath(__file__))
-    return os.path.join(base, rel)
-
-def safe_int(text: str, default: int = 0) -> int:
-    try:
-        return int(text.strip()) if text.strip() else default
-    except Exception:
-        return default
-
-def get_unique_filename(filepath: str) -> str:
-    if not os.path.exists(filepath):
-        return filepath
-    (directory, filename) = os.path.split(filepath)
-    (name, ext) = os.path.splitext(filename)
-    match = re.search(r'-(\d+)$', name)
-    if match:
-        counter = int(match.group(1))
-        base_name = name[:match.start()]
-    else:
-        counter = 1
-        base_name = name
-    while True:
-        counter += 1
-        new_name = f'{base_name}-{counter:02d}{ext}'
-        new_filepath = os.path.join(directory, new_name)
-        if not os.path.exists(new_filepath):
-            return new_filepath
-
-
-def _parse_port_string(port_str: str) -> Optional[list[int]]:
-    if not port_str.strip():
-        return []
-    ports = set()
-    parts = port_str.split(',')
-    for part in parts:
-        part = part.strip()
-        if not part:
-            continue
-        if '-' in part:
-            try:
-                (start_str, end_str) = part.split('-')
-                start = int(start_str.strip())
-                end = int(end_str.strip())
-                if start > end:
-                    return None
-                ports.update(range(start, end + 1))
-            except ValueError:
-                return None
-        else:
-            try:
-                ports.add(int(part))
-            except ValueError:
-                return None
-    return sorted(list(ports))
-
-
-def _format_port_ranges(ports: list[int], split_factor: int = 1) -> str:
-    """Formats a list of port numbers into a compact string like '1-4,6,8-10' or '1-4/2,6/2'."""
-    if not ports:
-        return ''
-    ports = sorted(list(set(ports)))
-    ranges = []
-    start_of_range = ports[0]
-
-    def format_single_range(start, end):
-        port_str = str(start) if start == end else f'{start}-{end}'
-        if split_factor > 1:
-            port_str += f'/{split_factor}'
-        return port_str
-
-    for i in range(1, len(ports)):
-        if ports[i] != ports[i - 1] + 1:
-            end_of_range = ports[i - 1]
-            ranges.append(format_single_range(start_of_range, end_of_range))
-            start_of_range = ports[i]
-    # Handle the last range
-    ranges.append(format_single_range(start_of_range, ports[-1]))
-    return ','.join(ranges)
-
-
-try:
-    RESAMPLE = Image.Resampling.LANCZOS
-except AttributeError:
-    RESAMPLE = Image.ANTIALIAS
-FONT_PATH = resource_path('ArialBold.ttf')
-ISL_COLORS = ['green', 'yellow', 'orange', 'pink', 'lightgreen', 'gold', 'tomato', 'hotpink']
-EXT_COLORS = ['lime', 'yellow', 'orange', 'pink', 'lightblue', 'lavender', 'coral', 'turquoise']
-colors_fabric = {'A': '#FC9D74', 'B': '#4a90e2'}
-HIGH_PORT_UPLINK_TYPES = ['IPL', 'ISL', 'EXT', 'MLAG/BGP', 'NB']  # Uplink types that assign from high ports down
-SWITCH_LAYOUTS = {}
-
-SWITCH_LAYOUTS['1'] = {
-    'NAME': 'Mellanox SN4600 200G',
-    'IMAGE': 'base_sn4600hr.png',
-    'PORT_COUNT': 64,
-    'NATIVE_SPEED': '200G',
-    'SHEET_TAB': 'SN4600',
-    'GRID': (4, 16),
-    'FONT_SIZE': 24,
-    'PORT_WIDTH': 113,
-    'PORT_HEIGHT': 48,
-    'H_SPACING': 148.6,
-    'V_SPACING': 86,
-    'START_X': 107,
-    'START_Y': 123,
-    'ROW_OFFSETS': {
-        1: 1,
-        3: 1
-    }
-}
-SWITCH_LAYOUTS['2'] = {
-    'NAME': 'Mellanox SN3700 200G',
-    'IMAGE': 'base_sn3700.png',
-    'PORT_COUNT': 32,
-    'NATIVE_SPEED': '200G',
-    'SHEET_TAB': 'SN3700',
-    'GRID': (2, 16),
-    'FONT_SIZE': 24,
-    'PORT_WIDTH': 103,
-    'PORT_HEIGHT': 48,
-    'H_SPACING': 109.3,
-    'V_SPACING': 78,
-    'START_X': 199,
-    'START_Y': 66,
-    'ROW_OFFSETS': {},
-    'CUMULATIVE_GAPS': {
-        5: 41,
-        7: 40,
-        9: 39,
-        11: 38
-    },
-    'COLUMN_X_COORDS': [
-        199,
-        308,
-        418,
-        527,
-        636,
-        784,
-        893,
-        1042,
-        1151,
-        1300,
-        1409,
-        1558,
-        1667,
-        1777,
-        1886,
-        1995
-    ]
-}
-SWITCH_LAYOUTS['3'] = {
-    'NAME': 'Mellanox SN5400 400G',
-    'IMAGE': 'base-SN5400.png',
-    'PORT_COUNT': 64,
-    'NATIVE_SPEED': '400G',
-    'SHEET_TAB': 'SN5400',
-    'GRID': (4, 16),
-    'FONT_SIZE': 24,
-    'PORT_WIDTH': 113,
-    'PORT_HEIGHT': 52,
-    'H_SPACING': 146.5,
-    'V_SPACING': 109,
-    'START_X': 144,
-    'START_Y': 111,
-    'ROW_OFFSETS': {2: -24},
-    'HORIZONTAL_LAYOUT': False,
-    'BALANCED_NODE_ASSIGNMENT': False,
-    'BALANCED_UPLINK_ASSIGNMENT': False
-}
-SWITCH_LAYOUTS['4'] = {
-    'NAME': 'Mellanox SN5600 800G',
-    'IMAGE': 'base-SN5600.png',
-    'PORT_COUNT': 64,
-    'NATIVE_SPEED': '800G',
-    'SHEET_TAB': 'SN5600',
-    'GRID': (4, 16),
-    'FONT_SIZE': 24,
-    'PORT_WIDTH': 113,
-    'PORT_HEIGHT': 54,
-    'H_SPACING': 143.4,
-    'V_SPACING': 73,
-    'START_X': 163,
-    'START_Y': 111,
-    'ROW_OFFSETS': {
-        1: 3,
-        2: 60,
-        3: 3
-    },
-    'HORIZONTAL_LAYOUT': False,
-    'BALANCED_NODE_ASSIGNMENT': False,
-    'BALANCED_UPLINK_ASSIGNMENT': False
-}
-SWITCH_LAYOUTS['5'] = {
-    'NAME': 'Arista 7060-DX5 400G',
-    'IMAGE': 'base-arista7060DX5.png',
-    'PORT_COUNT': 64,
-    'NATIVE_SPEED': '400G',
-    'SHEET_TAB': 'Arista7060DX5',
-    'GRID': (4, 16),
-    'FONT_SIZE': 24,
-    'PORT_WIDTH': 113,
-    'PORT_HEIGHT': 52,
-    'H_SPACING': 152.5,
-    'V_SPACING': 109,
-    'START_X': 77,
-    'START_Y': 145,
-    'ROW_OFFSETS': {
-        2: -22,
-        3: 3
-    },
-    'PORT_MAPPING_LOGIC': 'cisco_4x16',
-    'BALANCED_NODE_ASSIGNMENT': False,
-    'BALANCED_UPLINK_ASSIGNMENT': False
-}
-SWITCH_LAYOUTS['6'] = {
-    'NAME': 'Arista 7050DX4-32S 200G',
-    'IMAGE': 'base-arista7050DX4.png',
-    'PORT_COUNT': 32,
-    'NATIVE_SPEED': '200G',
-    'SHEET_TAB': 'Arista7050DX4',
-    'GRID': (2, 16),
-    'FONT_SIZE': 24,
-    'PORT_WIDTH': 121,
-    'PORT_HEIGHT': 61,
-    'H_SPACING': 151.1,
-    'V_SPACING': 80,
-    'START_X': 70,
-    'START_Y': 82,
-    'ROW_OFFSETS': {},
-    'HORIZONTAL_LAYOUT': False,
-    'BALANCED_NODE_ASSIGNMENT': False,
-    'BALANCED_UPLINK_ASSIGNMENT': False
-}
-SWITCH_LAYOUTS['9'] = {
-    'NAME': 'Arista 7060X6-64PE-F 800G',
-    'IMAGE': 'base-arista7060X664pef.png',
-    'PORT_COUNT': 64,
-    'NATIVE_SPEED': '800G',
-    'SHEET_TAB': 'Arista7060X6',
-    'GRID': (4, 16),
-    'FONT_SIZE': 24,
-    'PORT_WIDTH': 139,
-    'PORT_HEIGHT': 78,
-    'H_SPACING': 154,
-    'V_SPACING': 90,
-    'START_X': 157,
-    'START_Y': 78,
-    'ROW_OFFSETS': {
-        2: 35, # Offset to start Row 3 at y=293
-        3: -1   # Additional offset to start Row 4 at y=382
-    },
-    'HORIZONTAL_LAYOUT': False,
-    'PORT_MAPPING_LOGIC': 'cisco_4x16',
-    'BALANCED_NODE_ASSIGNMENT': False,
-    'BALANCED_UPLINK_ASSIGNMENT': False
-}
-SWITCH_LAYOUTS['7'] = {
-    'NAME': 'Cisco 9332D-GX2B 400G',
-    'IMAGE': 'base_cisco_9332d.png',
-    'PORT_COUNT': 32,
-    'NATIVE_SPEED': '400G',
-    'SHEET_TAB': 'C9332D',
-    'GRID': (2, 16),
-    'FONT_SIZE': 24,
-    'PORT_WIDTH': 88,
-    'PORT_HEIGHT': 33,
-    'H_SPACING': 129,
-    'V_SPACING': 71,
-    'START_X': 190,
-    'START_Y': 58,
-    'ROW_OFFSETS': {},
-    'HORIZONTAL_LAYOUT': False,
-    'CUMULATIVE_GAPS': {
-        2: -17,
-        4: -17,
-        6: -17,
-        8: -17,
-        10: -17,
-        12: -17,
-        14: -17
-    },
-    'COLUMN_X_COORDS': [
-        190,
-        319,
-        430,
-        559,
-        671,
-        800,
-        913,
-        1042,
-        1154,
-        1283,
-        1395,
-        1524,
-        1637,
-        1766,
-        1878,
-        2007
-    ],
-    'BALANCED_NODE_ASSIGNMENT': True,
-    'BALANCED_UPLINK_ASSIGNMENT': True
-}
-SWITCH_LAYOUTS['8'] = {
-    'NAME': 'Cisco C9364D-GX2A 400G',
-    'IMAGE': 'base_cisco_9364d.png',
-    'PORT_COUNT': 64,
-    'NATIVE_SPEED': '400G',
-    'SHEET_TAB': 'C9634D-GX2A',
-    'GRID': (4, 16),
-    'FONT_SIZE': 24,
-    'PORT_WIDTH': 87,
-    'PORT_HEIGHT': 35,
-    'H_SPACING': 121,
-    'V_SPACING': 84,
-    'START_X': 277,
-    'START_Y': 38,
-    'ROW_OFFSETS': { # Offsets are applied cumulatively.
-        2: 47, # Add a 47px gap before row 3 (index 2) starts.
-        3: 0   # Row 4 (index 3) has no *additional* offset relative to row 3.
-    },
-    'PORT_MAPPING_LOGIC': 'cisco_4x16',
-    'BALANCED_NODE_ASSIGNMENT': True,
-    'BALANCED_UPLINK_ASSIGNMENT': True
-}
-def get_port_base_type(label: str) -> str:
-    """Determines the fundamental type of a port from its label."""
-    if label == 'RSVD-EXT':
-        return 'EXT'
-    if label == 'RSVD-NB':  # Handle legacy/buggy label for compatibility
-        return 'NB'
-    if label.startswith('RSVD-'):  # e.g., "RSVD-CN" -> "CN"
-        return label.split('-', 1)[1]
-
-    # Check for known uplink prefixes
-    for prefix in ['ISL', 'EXT', 'NB', 'IPL']:
-        if label.startswith(prefix):
-            # Handle MLAG/BGP prefix as EXT
-            if prefix == 'MLAG/BGP':
-                return 'EXT'
-            return prefix
-    
-    # Check for CN-NB and EB-NB labels
-    if label.startswith('CN-NB') or label.startswith('EB-NB'):
-        return 'NB'
-
-    # Fallback for node types like "CN-1", "DN-5", etc.
-    match = re.match(r'([A-Z]+)', label)
-    return match.group(1) if match else 'UNKNOWN'
-
-class PortPlanner:
-    """Handles the logic for calculating port assignments."""
-
-    def generate_node_ports(self, node_type: str,
-        count: int,
-        split: bool,
-        factor: int,
-        start_port: int,
-        reserved: int,
-        node_start: int) -> tuple[list[tuple[int,
-        str]],
-         int]:
-        ports = []
-        if split and factor > 1:
-            physical_ports_needed = math.ceil(count / factor)
-        else:
-            physical_ports_needed = count
-            factor = 1
-        current_port = start_port
-        for i in range(physical_ports_needed):
-            port_num = current_port + i
-            first_node = node_start + i * factor
-            if first_node <= node_start + count - 1:
-                last_node = min(first_node + factor - 1, node_start + count - 1)
-                if first_node == last_node:
-                    label = f'{node_type}-{first_node}'
-                else:
-                    label = f'{node_type}-{first_node}/{last_node}'
-            else:
-                label = f'RSVD-{node_type}'
-            ports.append((port_num, label))
-        for i in range(reserved):
-            port_num = start_port + physical_ports_needed + i
-            label = f'RSVD-{node_type}'
-            ports.append((port_num, label))
-        return (ports, node_start + count)
-
-    def generate_grouped_ports(self, uplink_type: str,
-        groups: int,
-        ports_per_group: int,
-        split: bool,
-        factor: int,
-        # The starting port for the assignment. For high-port types, this is the
-        # highest port number in the range. For others, it's the lowest.
-        start_port: int, 
-        reserved: int,
-        locked: bool,
-        cn_count: int = 0,
-        eb_count: int = 0) -> list[tuple[int, str]]:
-        ports = []
-        is_high_port_assignment = uplink_type in HIGH_PORT_UPLINK_TYPES
-        increment = -1 if is_high_port_assignment else 1
-        current_port = start_port
-        phys_ports_per_group = math.ceil(ports_per_group / factor) if split and factor > 1 else ports_per_group
-
-        # Special handling for NB ports
-        if uplink_type == 'NB':
-            cn_nb_count = 0
-            eb_nb_count = 0
-            
-            for group_num in range(groups):
-                group_port_nums = []
-                for _ in range(phys_ports_per_group):
-                    group_port_nums.append(current_port)
-                    current_port += increment
-
-                sorted_ports = sorted(group_port_nums)
-
-                for port_index, port_num in enumerate(sorted_ports):
-                    if split and factor > 1:
-                        first_logical = port_index * factor + 1
-                        last_logical = min((port_index + 1) * factor, ports_per_group)
-                        label_suffix = f'{first_logical}/{last_logical}' if first_logical != last_logical else str(first_logical)
-                    else:
-                        label_suffix = str(port_index + 1)
-
-                    # Determine if this port corresponds to CN or EB
-                    if port_index < cn_count:
-                        cn_nb_count += 1
-                        label = f'CN-NB-{cn_nb_count}' if not split or factor == 1 else f'CN-NB-{cn_nb_count}/{label_suffix}'
-                    else:
-                        eb_nb_count += 1
-                        label = f'EB-NB-{eb_nb_count}' if not split or factor == 1 else f'EB-NB-{eb_nb_count}/{label_suffix}'
-
-                    ports.append((port_num, label))
-        else:
-            # Original logic for non-NB ports
-            for group_num in range(groups):
-                group_port_nums = []
-                for _ in range(phys_ports_per_group):
-                    group_port_nums.append(current_port)
-                    current_port += increment
-
-                sorted_ports = sorted(group_port_nums)
-
-                for port_index, port_num in enumerate(sorted_ports):
-                    if split and factor > 1:
-                        first_logical = port_index * factor + 1
-                        last_logical = min((port_index + 1) * factor, ports_per_group)
-                        label_suffix = f'{first_logical}/{last_logical}' if first_logical != last_logical else str(first_logical)
-                    else:
-                        label_suffix = str(port_index + 1)
-
-                    # *** CRITICAL: DO NOT CHANGE THIS LABEL MAPPING ***
-                    # Ports are stored internally as 'MLAG/BGP' in uplink_types but MUST be displayed as 'EXT' in the UI
-                    # DO NOT display 'MLAG/BGP' - ALWAYS convert to 'EXT' for port labels
-                    # This is intentional: 'MLAG/BGP' is the internal type name, 'EXT' is the display name
-                    # Use EXT instead of MLAG/BGP for port labels
-                    display_type = 'EXT' if uplink_type == 'MLAG/BGP' else uplink_type
-                    if uplink_type in ['ISL', 'MLAG/BGP'] and groups > 1:
-                        label = f'{display_type}{group_num + 1}-{label_suffix}'
-                    else:
-                        label = f'{display_type}-{label_suffix}'
-
-                    ports.append((port_num, label))
+class StartupProfile:
+    """Collects named phase timings during window construction for --startup-profile."""
+    def __init__(self):
+        self.phases: list[tuple[str, float]] = []
+        self.enabled = False  # Set by --startup-profile; also reports tabs built after startup
+
+    @contextmanager
+    def phase(self, name: str):
+        index = len(self.phases)  # Reserve the slot so nested phases list after their parent
+        self.phases.append((name, 0.0))
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[index] = (name, time.perf_counter() - start)
 
-        # Handle reserved ports for all uplink types
-        # *** CRITICAL: DO NOT CHANGE THIS LABEL MAPPING ***
-        # Ports are stored internally as 'MLAG/BGP' in uplink_types but MUST be displayed as 'EXT' in the UI
-        # DO NOT display 'MLAG/BGP' - ALWAYS convert to 'EXT' for port labels
-        for _ in range(reserved):
-            port_num = current_port
-            current_port += increment
-            if uplink_type == 'MLAG/BGP':
-                label = 'RSVD-EXT'  # EXT is the display name, never use 'RSVD-MLAG/BGP'
-            elif uplink_type == 'NB':
-                label = 'RSVD-NB'
-            else:
-                label = f'RSVD-{uplink_type}'
-            ports.append((port_num, label))
-        return ports
+    def report(self, before: Optional[list[tuple[str, float]]] = None,
+               after: Optional[list[tuple[str, float]]] = None) -> str:
+        """Formats the recorded phases, framed by phases measured outside the window, in milliseconds."""
+        rows = [('imports', _IMPORT_SECONDS)] + (before or []) + self.phases + (after or [])
+        width = max(len(name) for name, _ in rows)
+        lines = ['Startup profile:']
+        lines += [f"  {name:<{width}}  {seconds * 1000:8.1f} ms" for name, seconds in rows]
+        return '\n'.join(lines)
 
 
-def pil_to_qpixmap(pil_img: Image.Image) -> QPixmap:
-    """Convert a PIL Image to a QPixmap."""
+def pil_to_qimage(pil_img: Image.Image) -> QImage:
+    """
+    Wraps a PIL Image in a QImage with a single copy: the raw RGBA (or RGBX) bytes.
+    The QImage reads straight from that buffer, so the buffer is kept on the image.
+    """
     # The manual channel swapping (r,g,b -> b,g,r) is a common source of color
     # issues between libraries. Removing it and relying on the format flags
     # is more robust.
-    if pil_img.mode != "RGBA":
-        pil_img = pil_img.convert("RGBA")
+    if pil_img.mode == "RGB":
+        im_data = pil_img.tobytes("raw", "RGBX")
+        image_format = QImage.Format.Format_RGBX8888
+    else:
+        if pil_img.mode != "RGBA":
+            pil_img = pil_img.convert("RGBA")
+        im_data = pil_img.tobytes("raw", "RGBA")
+        image_format = QImage.Format.Format_RGBA8888
+    width, height = pil_img.size
+    qim = QImage(im_data, width, height, width * 4, image_format)
+    qim._pil_buffer = im_data  # Must outlive the QImage, which does not copy it
+    return qim
 
-    im_data = pil_img.tobytes("raw", "RGBA")
-    qim = QImage(im_data, pil_img.size[0], pil_img.size[1], QImage.Format.Format_RGBA8888)
-    return QPixmap.fromImage(qim)
+
+def pil_to_qpixmap(pil_img: Image.Image) -> QPixmap:
+    """Convert a PIL Image to a QPixmap (a second, full-size copy; canvases take pil_to_qimage)."""
+    return QPixmap.fromImage(pil_to_qimage(pil_img))
 
 
 def convert_help_to_html(text: str) -> str:
@@ -1566,150 +1137,6 @@ sudo vi /etc/clustershell/groups.d/local.cfg
 
         return ' '.join(base_cmd)
 
-class PortDrawer:
-    """
-    A helper class to encapsulate the logic for drawing a single port on the switch overlay.
-    This refactoring cleans up the main _draw_overlay method by separating concerns.
-    """
-    def __init__(self, draw: ImageDraw.ImageDraw, config: dict, display_scale: float, cn_count: int = 0, eb_count: int = 0):
-        self.draw = draw
-        self.config = config
-        self.display_scale = display_scale
-        self.rows_per_col = config['GRID'][0]
-        self.cols_per_row = config['GRID'][1]
-        self.mapping_logic = config.get('PORT_MAPPING_LOGIC')
-        self.cn_count = cn_count
-        self.eb_count = eb_count
-
-        # Pre-calculate cumulative row offsets
-        self.cumulative_offsets = {}
-        current_offset = 0
-        for r in range(self.rows_per_col):
-            current_offset += self.config.get('ROW_OFFSETS', {}).get(r, 0)
-            self.cumulative_offsets[r] = current_offset
-
-    def _get_port_coordinates(self, port_id: int) -> tuple[int, int]:
-        """Calculates the top-left (x, y) coordinates for a given port ID."""
-        if self.mapping_logic == 'cisco_4x16':
-            # For ports 1-32, they are in rows 0 and 1.
-            # For ports 33-64, they are in rows 2 and 3.
-            if port_id <= 32:
-                col, row = (port_id - 1) // 2, (port_id - 1) % 2
-            else:
-                # Adjust port_id to be 1-based for the second block of 32 ports
-                base_pid = port_id - 32
-                col, row = (base_pid - 1) // 2, 2 + ((base_pid - 1) % 2)
-        elif self.config.get('HORIZONTAL_LAYOUT', False):
-            row, col = divmod(port_id - 1, self.cols_per_row)
-        else:
-            col, row = divmod(port_id - 1, self.rows_per_col)
-
-        if 'COLUMN_X_COORDS' in self.config and col < len(self.config['COLUMN_X_COORDS']):
-            x = self.config['COLUMN_X_COORDS'][col]
-        else:
-            x = int(self.config['START_X'] + col * self.config['H_SPACING'])
-
-        y = int(self.config['START_Y'] + row * self.config['V_SPACING'] + self.cumulative_offsets.get(row, 0))
-        return x, y
-
-    def _get_port_fill_color(self, label: str, fabric: str) -> str:
-        """Determines the fill color for a port based on its label and fabric."""
-        if label.startswith('RSVD'):
-            return '#606060'
-        if 'ISL' in label:
-            m = re.search(r'ISL(\d+)', label)
-            idx = (int(m.group(1)) - 1) % len(ISL_COLORS) if m else 0
-            return ISL_COLORS[idx]
-        if 'MLAG/BGP' in label or 'EXT' in label:
-            m = re.search(r'(?:MLAG/BGP|EXT)(\d+)', label)
-            idx = (int(m.group(1)) - 1) % len(EXT_COLORS) if m else 0
-            return EXT_COLORS[idx]
-        if 'IPL' in label:
-            return 'cyan'
-        if 'NB' in label or 'NB-' in label:
-            # For NB ports, use the same fabric colors as CN/EB nodes based on port type
-            cn_nb_match = re.search(r'CN-NB-(\d+)', label)
-            eb_nb_match = re.search(r'EB-NB-(\d+)', label)
-            
-            if cn_nb_match:
-                # This is a CN-NB port - use CN fabric color
-                return colors_fabric.get(fabric, '#FC9D74')  # Same as CN nodes
-            elif eb_nb_match:
-                # This is an EB-NB port - use EB fabric color  
-                return colors_fabric.get(fabric, '#FC9D74')  # Same as EB nodes
-            return 'tan'  # Default NB color
-        # For node types (CN, DN, EB, etc.), use fabric-specific colors
-        return colors_fabric.get(fabric, '#FC9D74')
-
-    def _get_port_outline(self, label: str, fabric: str) -> tuple[str, int]:
-        """Determines the outline color and width for a port."""
-        outline_config = {
-            'DN': ('yellow', 2), 'CN': ('green', 2), 'EB': ('black', 1),
-            'IE': ('pink', 2), 'GN': ('cyan', 2),
-        }
-        node_type_prefix = get_port_base_type(label)
-
-        if node_type_prefix == 'NB':
-            # For NB ports, use the same border colors as CN/EB nodes based on port type
-            cn_nb_match = re.search(r'CN-NB-(\d+)', label)
-            eb_nb_match = re.search(r'EB-NB-(\d+)', label)
-            
-            if cn_nb_match:
-                # This is a CN-NB port - use CN border color
-                return ('green', 2)  # Same as CN nodes
-            elif eb_nb_match:
-                # This is an EB-NB port - use EB border color  
-                return ('black', 1)  # Same as EB nodes
-            return colors_fabric.get(fabric, 'black'), 2
-        if node_type_prefix in outline_config:
-            return outline_config[node_type_prefix]
-
-        return 'black', 1 # Default outline
-
-    def _get_adaptive_font(self, label: str, max_width: int, max_height: int) -> ImageFont.FreeTypeFont:
-        """Finds the largest font size that fits the label within the given dimensions."""
-        try:
-            initial_font_size = int(max_height * 0.70) if '/' not in label else int(max_height * 0.60)
-            font_size = initial_font_size
-            while font_size > 5:
-                font = ImageFont.truetype(FONT_PATH, font_size)
-                bbox = self.draw.textbbox((0, 0), label, font=font)
-                text_width = bbox[2] - bbox[0]
-                if text_width < (max_width * 0.95): # Leave 5% padding
-                    break
-                font_size -= 1
-            if font_size > 1: font_size -= 1 # Shrink by one more size
-            return ImageFont.truetype(FONT_PATH, font_size)
-        except IOError:
-            return ImageFont.load_default()
-
-    def draw_port(self, port_id: int, label: str, fabric: str):
-        """Draws a single port with its label and styling."""
-        x, y = self._get_port_coordinates(port_id)
-        w, h = self.config['PORT_WIDTH'] + 2, self.config['PORT_HEIGHT'] + 2
-        x, y = x - 1, y - 1 # Adjust for increased size
-
-        fill_color = self._get_port_fill_color(label, fabric)
-        outline_color, final_outline_width = self._get_port_outline(label, fabric)
-
-        # Scale outline width for display previews
-        outline_width = int(final_outline_width / self.display_scale) if 0 < self.display_scale < 1 else final_outline_width
-
-        # Adjust rectangle coordinates for centered outline
-        ow_half = outline_width / 2
-        rect_coords = [x - ow_half, y - ow_half, x + w + ow_half, y + h + ow_half]
-        self.draw.rectangle(rect_coords, fill=fill_color, outline=outline_color, width=outline_width)
-
-        # Prepare text
-        font = self._get_adaptive_font(label, w, h)
-        text_color = 'white' if label.startswith('RSVD') else 'black'
-        bbox = self.draw.textbbox((0, 0), label, font=font)
-
-        # Center text in the original box area
-        tx = x + (w - (bbox[2] - bbox[0])) / 2.0
-        ty = y + (h - (bbox[3] - bbox[1])) / 2.0 - 1
-        self.draw.text((tx, ty), label, fill=text_color, font=font)
-
 class CustomRegexValidator(QValidator):
     """
     A custom QValidator that uses a QRegularExpression.
@@ -1742,13 +1169,14 @@ class CustomRegexValidator(QValidator):
             return (QValidator.State.Invalid, input_str, pos)
 
 class SwitchConfigWorker(QObject):
-    """Worker thread for downloading and running the switch_conf.py script."""
+    """Worker thread for fetching (from the local cache) and running the switch_conf.py script."""
     finished: pyqtSignal = pyqtSignal(str)
 
-    def __init__(self, params: dict, skip_download: bool = False):
+    def __init__(self, params: dict, skip_download: bool = False, offline: bool = False):
         super().__init__()
         self.params = params
         self.skip_download = skip_download
+        self.offline = offline
 
     def run(self):
         """The entry point for the worker when run in a QThread."""
@@ -1760,159 +1188,128 @@ class SwitchConfigWorker(QObject):
         return self._execute()
 
     def _execute(self) -> str:
-        """The core logic of the worker, refactored to be callable by both sync and async methods."""
+        """The core logic of the worker, shared with the batch CLI via run_switch_conf."""
+        return run_switch_conf(self.params, self.skip_download, self.offline)
+
+class MultiRackOutputWorker(QObject):
+    """
+    Worker for multi-rack exports, run in a QThread so the UI stays responsive.
+    Image jobs go through render_rack_images. Then switch_conf.py is fetched once and
+    each rack's config runs on a pool of at most `config_workers` threads. Every result
+    is emitted as soon as its rack finishes. cancel() drops the queued racks and kills the
+    switch_conf.py runs that are still in flight.
+    """
+    progress: pyqtSignal = pyqtSignal(str, int, int)  # stage ('Images' / 'Configs'), done, total
+    result: pyqtSignal = pyqtSignal(str)
+    finished: pyqtSignal = pyqtSignal(bool)  # True if cancelled
+
+    def __init__(self, image_jobs: list[dict], config_tasks: list[tuple[str, dict]], *, config_dir: str,
+                 offline: bool = False, render_backend: str = 'process', render_workers: int = 0,
+                 config_workers: int = 8):
+        super().__init__()
+        self.image_jobs = image_jobs
+        self.config_tasks = config_tasks
+        self.config_dir = config_dir
+        self.offline = offline
+        self.render_backend = render_backend
+        self.render_workers = render_workers
+        self.config_workers = max(1, config_workers)
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        """Requests cancellation; safe to call from the GUI thread."""
+        self._cancel.set()
+
+    def run(self):
+        """The entry point for the worker when run in a QThread."""
         try:
-            config_dir = self.params['config_dir']
-            os.makedirs(config_dir, exist_ok=True)
-            url = 'https://artifactory.vastdata.com/artifactory/vast-custom/switch_conf/switch_conf-latest/switch_conf.py'
-            script_filename = self.params.get('script_filename', 'switch_conf.py')
-            script_path = os.path.join(config_dir, script_filename)
-            script_downloaded = self.skip_download and os.path.exists(script_path)
-            
-            if not self.skip_download:
-                # Ensure we are not overwriting an existing script (should already be unique)
-                if os.path.exists(script_path):
-                    script_path = get_unique_filename(script_path)
-                    script_filename = os.path.basename(script_path)
-                    self.params['script_filename'] = script_filename
-                try:
-                    response = requests.get(url, timeout=5, stream=True)
-                    response.raise_for_status()
-                    with open(script_path, 'wb') as f:
-                        for chunk in response.iter_content(chunk_size=8192):
-                            f.write(chunk)
-                    script_downloaded = True
-                except requests.exceptions.RequestException:
-                    # This is handled in the result message
-                    pass
-            else:
-                # Skip download - script already downloaded by first worker
-                script_downloaded = os.path.exists(script_path)
-
-            # Ensure command parts reference the actual script filename
-            if self.params.get('cmd_parts_for_file'):
-                cmd_parts_file = self.params['cmd_parts_for_file'][:]
-                if len(cmd_parts_file) >= 2:
-                    cmd_parts_file[1] = script_filename
-                self.params['cmd_parts_for_file'] = cmd_parts_file
-            if self.params.get('cmd_parts_exec'):
-                cmd_parts_exec = self.params['cmd_parts_exec'][:]
-                if len(cmd_parts_exec) >= 2:
-                    cmd_parts_exec[1] = script_filename
-                self.params['cmd_parts_exec'] = cmd_parts_exec
-
-            env_vars = self.params['env_vars']
-            # Build export statements with special handling for ASNS
-            export_lines = []
-            for key, value in env_vars.items():
-                if key == 'autonomous_systems':
-                    export_lines.append(f'export ASNS={value}')
-                else:
-                    export_lines.append(f'export {key.upper()}={value}')
-            output_content = '\n'.join(export_lines)
-            cmd_parts_for_file = self.params['cmd_parts_for_file']
-            command_line = ' '.join(cmd_parts_for_file)
-            output_content += f'\n\n{command_line}\n'
-            
-            # Extract version from switch_conf.py execution for CFG file header
-            version_info = ""
-            if script_downloaded:
-                try:
-                    # Run switch_conf.py with --version to get version info
-                    version_cmd = ['python3', script_filename, '--version']
-                    version_result = subprocess.run(version_cmd, cwd=config_dir, capture_output=True, text=True, timeout=10)
-                    if version_result.returncode == 0 and version_result.stdout.strip():
-                        version_info = version_result.stdout.strip()
-                except:
-                    pass
+            if self.image_jobs:
+                render_rack_images(
+                    self.image_jobs, backend=self.render_backend, workers=self.render_workers,
+                    progress=lambda done, total: self.progress.emit('Images', done, total),
+                    on_result=lambda messages: [self.result.emit(m) for m in messages],
+                    cancel=self._cancel)
+            if self.config_tasks and not self._cancel.is_set():
+                self._run_configs()
+        except Exception as e:
+            self.result.emit(f"An unexpected error occurred: {e}")
+        finally:
+            self.finished.emit(self._cancel.is_set())
+
+    def _run_configs(self):
+        self.result.emit("Fetching switch_conf.py ...")
+        _, script_note = prepare_switch_conf(self.config_dir, offline=self.offline)
+        if script_note:
+            self.result.emit(script_note)
+        total = len(self.config_tasks)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.config_workers) as executor:
+            # The script was placed above, so every rack skips the fetch
+            futures = [executor.submit(run_switch_conf, params, True, self.offline, None, self._cancel)
+                       for _, params in self.config_tasks]
+            for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                self.result.emit(future.result())
+                self.progress.emit('Configs', done, total)
+
+@dataclass(frozen=True)
+class PreviewJob:
+    """One live preview frame to render: everything the worker needs, captured on the GUI thread."""
+    canvas: QLabel          # Target canvas; only touched back on the GUI thread
+    generation: int         # Canvas frame ticket (ScalableLabel.next_frame); stale frames are dropped
+    port_map: PortMap
+    switch_id: str
+    fabric: str
+    width: int              # Canvas width in pixels; 0 (or wider than the base) renders at full resolution
+    cn_count: int = 0
+    eb_count: int = 0
+
+
+class PreviewRenderWorker(QObject):
+    """
+    Renders live preview overlays off the GUI thread, so typing never waits on a render.
+    Only the newest job per canvas is kept: a job still queued when a newer one arrives
+    for the same canvas is dropped. Finished frames are posted back with frame_ready, and
+    the canvas only shows one if no newer frame or text was set on it in the meantime.
+    """
+    frame_ready: pyqtSignal = pyqtSignal(object, int, object)  # canvas, generation, QImage or error text
 
-            # Create descriptive filename with cluster, switch, leaf/spine names
-            cluster_name = env_vars.get('clustername', 'VastData-0001')
-            hostnames = env_vars.get('hostnames', 'FabricA,FabricB')
-            hostname_a, hostname_b = hostnames.split(',') if ',' in hostnames else (hostnames, hostnames)
-            switch_type = env_vars.get('lors', 'leaf')
-            
-            rack_name = env_vars.get("rack_name", "Rack1")
-            cfg_filename_base = f"{cluster_name}_{rack_name}_{hostname_a}_{hostname_b}_{switch_type}"
-            cfg_filename = get_unique_filename(os.path.join(config_dir, f'{cfg_filename_base}_switch.cfg'))
-
-            with open(cfg_filename, 'w') as f:
-                # Write version info as first line if available
-                if version_info:
-                    f.write(f'# Switch_conf.py Version: {version_info}\n')
-                f.write(output_content)
-
-            result_message = f"--- Results for {cfg_filename_base} ---\n"
-            result_message += f'Switch config saved to: {os.path.basename(cfg_filename)}\n\n'
-
-            def format_output_for_display(text: str, max_rows: int = 25) -> str:
-                """Format output text to limit rows to max_rows and split into columns if needed."""
-                if not text:
-                    return text
-                
-                lines = text.strip().split('\n')
-                if len(lines) <= max_rows:
-                    return text
-                
-                # Split into columns if too many rows
-                num_columns = (len(lines) + max_rows - 1) // max_rows
-                lines_per_col = (len(lines) + num_columns - 1) // num_columns
-                
-                # Pad lines list to make it evenly divisible
-                padded_lines = lines + [''] * (num_columns * lines_per_col - len(lines))
-                
-                # Create column groups
-                cols = []
-                for i in range(num_columns):
-                    start_idx = i * lines_per_col
-                    end_idx = min(start_idx + lines_per_col, len(padded_lines))
-                    cols.append(padded_lines[start_idx:end_idx])
-                
-                # Find max length in each column for padding
-                max_lengths = [max(len(line) for line in col) for col in cols]
-                
-                # Format as columns (find the longest column first)
-                formatted_lines = []
-                for i in range(lines_per_col):
-                    row = []
-                    for col_idx, col in enumerate(cols):
-                        if i < len(col):
-                            line = col[i]
-                            padded_line = line.ljust(max_lengths[col_idx])
-                            row.append(padded_line)
-                    if row:
-                        formatted_lines.append('   |   '.join(row))
-                
-                return '\n'.join(formatted_lines)
+    def __init__(self, parent: Optional[QObject] = None):
+        super().__init__(parent)
+        self._pending: dict[QLabel, PreviewJob] = {}
+        self._lock = threading.Lock()
+        self._draining = False
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='preview')
+
+    def submit(self, job: PreviewJob):
+        """Queues a job, replacing any job for the same canvas that has not started yet."""
+        with self._lock:
+            self._pending[job.canvas] = job
+            if self._draining:
+                return
+            self._draining = True
+        self._executor.submit(self._drain)
 
-            if script_downloaded:
-                try:
-                    cmd_parts_exec = self.params['cmd_parts_exec']
-                    env = os.environ.copy()
-                    result = subprocess.run(cmd_parts_exec, cwd=config_dir, env=env, capture_output=True, text=True, timeout=30)
-                    if result.returncode == 0:
-                        formatted_stdout = format_output_for_display(result.stdout)
-                        result_message += f'✅ Switch configuration executed successfully!\n\nOutput:\n{formatted_stdout}'
-                        if result.stderr:
-                            formatted_stderr = format_output_for_display(result.stderr)
-                            result_message += f'\n\nWarnings/Info:\n{formatted_stderr}'
-                    else:
-                        formatted_stderr = format_output_for_display(result.stderr)
-                        result_message += f'❌ Switch configuration failed with return code {result.returncode}\n\nError:\n{formatted_stderr}'
-                        if result.stdout:
-                            formatted_stdout = format_output_for_display(result.stdout)
-                            result_message += f'\n\nOutput:\n{formatted_stdout}'
-                except subprocess.TimeoutExpired:
-                    result_message += '❌ Switch configuration execution timed out (>30 seconds)'
-                except Exception as e:
-                    result_message += f'❌ Error executing switch configuration: {e}'
-            else:
-                result_message += '⚠️ Could not download switch_conf.py (VPN/Network Error).\nOnly the local config file was created.'
+    def shutdown(self):
+        """Drops the queued jobs and lets the worker thread exit once its current render is done."""
+        with self._lock:
+            self._pending.clear()
+        self._executor.shutdown(wait=False)
 
-            return result_message
+    def _drain(self):
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._draining = False
+                    return
+                _, job = self._pending.popitem()
+            try:
+                cfg = SWITCH_LAYOUTS[job.switch_id]
+                img = render_preview_overlay(job.port_map, job.fabric, cfg, job.width,
+                                             cn_count=job.cn_count, eb_count=job.eb_count)
+                frame = pil_to_qimage(img)
+            except Exception as e:
+                frame = f'Preview error: {e}'
+            self.frame_ready.emit(job.canvas, job.generation, frame)
 
-        except Exception as e:
-            return f'An unexpected error occurred: {e}'
 
 class TransparentWidget(QWidget):
     """
@@ -1925,19 +1322,60 @@ class TransparentWidget(QWidget):
         pass
 
 class ScalableLabel(QLabel):
-    """A QLabel that scales its pixmap while maintaining aspect ratio."""
+    """
+    A QLabel that scales its pixmap (or image) while maintaining aspect ratio.
+    The scaled pixmap is kept until the source or the label size changes, so
+    repaints do not rescale the full-size frame.
+    """
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._pixmap = QPixmap()
+        self._image: Optional[QImage] = None
+        self._scaled: Optional[QPixmap] = None
+        self._scaled_size = None
+        self._frame_generation = 0
         self.setMinimumSize(1, 1)
 
+    def next_frame(self) -> int:
+        """Returns a ticket for a frame rendered elsewhere; any later frame or text voids it."""
+        self._frame_generation += 1
+        return self._frame_generation
+
+    def is_current_frame(self, generation: int) -> bool:
+        return generation == self._frame_generation
+
+    def setText(self, text: str):
+        self._frame_generation += 1
+        super().setText(text)
+
     def setPixmap(self, pixmap: QPixmap):
+        self._frame_generation += 1
         self._pixmap = pixmap
+        self._image = None
+        self._scaled = None
+        self.update()
+
+    def setImage(self, image: QImage):
+        """Shows a QImage (see pil_to_qimage); only the scaled-down copy is turned into a pixmap."""
+        self._frame_generation += 1
+        self._pixmap = QPixmap()
+        self._image = image
+        self._scaled = None
         self.update()
 
+    def _scaled_pixmap(self) -> Optional[QPixmap]:
+        source = self._image if self._image is not None else self._pixmap
+        if source.isNull():
+            return None
+        if self._scaled is None or self._scaled_size != self.size():
+            scaled = source.scaled(self.size(), Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+            self._scaled = QPixmap.fromImage(scaled) if isinstance(scaled, QImage) else scaled
+            self._scaled_size = self.size()
+        return self._scaled
+
     def paintEvent(self, event):
-        if not self._pixmap.isNull():
-            scaled_pixmap = self._pixmap.scaled(self.size(), Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+        scaled_pixmap = self._scaled_pixmap()
+        if scaled_pixmap is not None:
             painter = QPainter(self)
             x = (self.width() - scaled_pixmap.width()) / 2
             y = (self.height() - scaled_pixmap.height()) / 2
@@ -1950,10 +1388,36 @@ class ScalableLabel(QLabel):
         super().clear()
 
 
+class LazyTab(QWidget):
+    """
+    A notebook page whose content is only built the first time it is needed.
+    The builder runs on first activation (see _on_tab_changed) or when code that
+    reads the tab's widgets calls ensure_built().
+    """
+    def __init__(self, builder, parent=None):
+        super().__init__(parent)
+        self._builder = builder
+        self.content: Optional[QWidget] = None
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+    @property
+    def is_built(self) -> bool:
+        return self.content is not None
+
+    def ensure_built(self) -> QWidget:
+        if self.content is None:
+            self.content = self._builder()
+            self.layout().addWidget(self.content)
+        return self.content
+
+
 class PortMapperPyQt(QMainWindow):
 
     def __init__(self, legacy_mode=False):
         super().__init__()
+        self.startup_profile = StartupProfile()
+        self.tab_build_times: dict[str, float] = {}  # Seconds spent building each notebook page
         self.setWindowTitle(f'PortMapper v{SCRIPT_VERSION} - Network Design Studio')
         self.setGeometry(100, 100, 1400, 900)
         self.statusBar()
@@ -1962,6 +1426,27 @@ class PortMapperPyQt(QMainWindow):
         self.legacy_mode = legacy_mode
         self.switch_id = '3'  # Default to Mellanox SN5400 400G
         self.planner = PortPlanner()
+        self.plan_cache = PlanCache()  # Shared by racks with identical planning inputs (e.g. clones)
+        self._preview_revision = 0  # Bumped by every Node Types / Uplinks widget change; keys the preview memo
+        self._preview_port_map_memo = None  # (key, valid, port map) of the last live preview placement
+        # Multi-rack image export: 'process' or 'thread' pool; 0 workers means one per CPU core.
+        # Persisted in QSettings, overridable with --render-backend/--render-workers.
+        settings = QSettings('VastData', 'PortMapper')
+        self.render_backend = settings.value('render_backend', 'process')
+        if self.render_backend not in RENDER_BACKENDS:
+            self.render_backend = 'process'
+        self.render_workers = settings.value('render_workers', 0, type=int)
+        # Offline: use the cached switch_conf.py without contacting the server (--offline)
+        self.switch_conf_offline = settings.value('switch_conf_offline', False, type=bool)
+        # Concurrent switch_conf.py runs during multi-rack config generation
+        self.config_workers = settings.value('config_workers', 8, type=int)
+        # Multi-rack port placement: 'greedy' or 'solver' (--placement), and the solver's time budget in seconds
+        self.placement_mode = settings.value('placement_mode', 'greedy')
+        if self.placement_mode not in PLACEMENT_MODES:
+            self.placement_mode = 'greedy'
+        self.solver_time_budget = settings.value('solver_time_budget', SOLVER_TIME_BUDGET, type=float)
+        self._multi_rack_thread: Optional[QThread] = None
+        self._multi_rack_worker: Optional[MultiRackOutputWorker] = None
         self.layout_config = SWITCH_LAYOUTS[self.switch_id]
         self.base_image: Optional[Image.Image] = None
         self.port_map: list[tuple[int, str]] = []
@@ -2011,6 +1496,8 @@ class PortMapperPyQt(QMainWindow):
         # --- Multi-Rack Configuration Data ---
         # Main dictionary to hold all rack configurations
         self.multi_rack_config = {}
+        # rack name -> (RackSpec fingerprint, port_map list) for the map last stored in the rack's data
+        self._rack_port_map_state: dict[str, tuple[str, list]] = {}
         # Dictionary to hold references to the dynamically created widgets for each rack
         self.rack_widgets = {}
         # Keep track of the currently selected rack
@@ -2026,6 +1513,9 @@ class PortMapperPyQt(QMainWindow):
         self.preview_timer = QTimer(self)
         self.preview_timer.setSingleShot(True)
         self.preview_timer.timeout.connect(self._do_live_preview)
+        # Preview canvases are rendered off the GUI thread; only the newest frame per canvas is shown
+        self.preview_renderer = PreviewRenderWorker(self)
+        self.preview_renderer.frame_ready.connect(self._on_preview_frame)
 
         self.recalc_timer = QTimer(self)
         self.recalc_timer.setSingleShot(True)
@@ -2047,8 +1537,10 @@ class PortMapperPyQt(QMainWindow):
         self.excuses = PLAUSIBLE_EXCUSES
 
         self._init_validators()
-        self._build_ui()
-        self._load_default_switch_image()
+        with self.startup_profile.phase('_build_ui'):
+            self._build_ui()
+        with self.startup_profile.phase('_load_default_switch_image'):
+            self._load_default_switch_image()
 
     def _apply_vast_theme(self):
         """Apply VAST Data VMS-inspired theme with professional blue tones."""
@@ -2248,12 +1740,14 @@ class PortMapperPyQt(QMainWindow):
         self.notebook = QTabWidget()
         self.setCentralWidget(self.notebook)
 
-        self.setup_tab = self._build_setup_ui()
-        self.node_tab = self._build_node_ui()
-        self.output_tab = self._build_output_ui()
-        self.multi_rack_tab = self._build_multi_rack_ui()
-        self.help_tab = self._build_help_ui()
-        self.legacy_installs_tab = self._build_legacy_installs_ui()
+        self.setup_tab = self._build_tab('Setup', self._build_setup_ui)
+        self.node_tab = self._build_tab('Cell Planning', self._build_node_ui)
+        self.output_tab = self._build_tab('Output', self._build_output_ui)
+        self.multi_rack_tab = self._build_tab('Multi-Rack', self._build_multi_rack_ui)
+        # The Guide and Legacy Installs pages are not touched by other tabs, so they
+        # are only built when first opened (or when config import/export needs them).
+        self.help_tab = LazyTab(lambda: self._build_tab('Guide', self._build_help_ui))
+        self.legacy_installs_tab = LazyTab(lambda: self._build_tab('Legacy Installs', self._build_legacy_installs_ui))
  
         self.notebook.addTab(self.setup_tab, 'Setup')
         self.notebook.addTab(self.node_tab, 'Cell Planning')
@@ -2281,9 +1775,23 @@ class PortMapperPyQt(QMainWindow):
         if hasattr(self, 'cell_planning_advanced_switch_label'):
             self.cell_planning_advanced_switch_label.setText(f"Switch Model: {current_switch}" if current_switch else "Switch Model: Not loaded - configure on Setup tab")
         
+        self._ui_built = True  # Pages built from here on are reported as deferred
+
         # Show welcome dialog after UI is fully initialized
         QTimer.singleShot(100, self._show_welcome_dialog)
         
+    def _build_tab(self, name: str, builder) -> QWidget:
+        """Builds one notebook page and records how long it took in tab_build_times."""
+        deferred = getattr(self, '_ui_built', False)
+        label = f'  {name} tab' + (' (deferred)' if deferred else '')
+        with self.startup_profile.phase(label):
+            start = time.perf_counter()
+            widget = builder()
+            self.tab_build_times[name] = time.perf_counter() - start
+        if deferred and self.startup_profile.enabled:
+            print(f"Built {name} tab on first use in {self.tab_build_times[name] * 1000:.1f} ms", flush=True)
+        return widget
+
     def _update_excuse_label(self):
         """Selects a new random excuse and updates the label text."""
         if hasattr(self, 'excuse_label'):
@@ -2618,9 +2126,11 @@ class PortMapperPyQt(QMainWindow):
            self.leaf_spine_combo.currentText() == 'leaf':
             self._update_multi_rack_ipl_isl_exclusion(rack_name)
 
-        # Recalculate and redraw
-        self._calculate_and_store_rack_port_map(rack_name)
-        self._sched_multi_rack_preview()
+        # Only fields that feed port assignment invalidate the port map (hostnames,
+        # IPs and bandwidth goals do not change the layout, so there is nothing to redraw).
+        if data_path[0] in RACK_PLANNING_FIELDS:
+            self._calculate_and_store_rack_port_map(rack_name)
+            self._sched_multi_rack_preview()
 
     def _update_multi_rack_ipl_isl_exclusion(self, rack_name: str):
         """Update IPL/ISL mutual exclusion logic for multi-rack leaf switches."""
@@ -2797,7 +2307,7 @@ class PortMapperPyQt(QMainWindow):
     def _load_default_switch_image(self):
         path = resource_path(self.layout_config['IMAGE'])
         try:
-            self.base_image = Image.open(path).convert('RGBA')
+            self.base_image = get_base_image(self.layout_config['IMAGE'])
         except FileNotFoundError:
             self.base_image = None
             print(f"Warning: Could not load base image at {path}")
@@ -2839,6 +2349,8 @@ class PortMapperPyQt(QMainWindow):
                     widget.blockSignals(False)
 
         self.port_map.clear()
+        # The widgets above were reset with their signals blocked
+        self._bump_preview_revision()
         
         # Reset CN, EB, and NB based on cnode entries if 2nd NIC is enabled
         if hasattr(self, 'use_2nd_nic_checkbox') and hasattr(self, 'use_converged_networking_checkbox'):
@@ -2857,6 +2369,7 @@ class PortMapperPyQt(QMainWindow):
         """Clears all data and UI elements related to the multi-rack tab."""
         # Clear the underlying data model
         self.multi_rack_config.clear()
+        self._rack_port_map_state.clear()
 
         # Remove all dynamically created rack detail widgets from the stacked layout
         for rack_name, rack_widget_info in self.rack_widgets.items():
@@ -3833,91 +3346,10 @@ class PortMapperPyQt(QMainWindow):
         # Collect current node and uplink data based on mode
         if mode == 'advanced':
             # Advanced mode: collect from advanced UI widgets
-            nodes_data = {}
-            # DN
-            dn_count = safe_int(self.cell_planning_advanced_dn_count.text(), 0)
-            if dn_count > 0:
-                # Read starting node value from Cell Planning (default to 100 for DN)
-                # Advanced mode may not have starting_node widgets yet, so use default
-                dn_starting_node = 100  # Default for DN
-                # Try to read from widget if it exists
-                if hasattr(self, 'cell_planning_advanced_node_widgets') and 'DN' in self.cell_planning_advanced_node_widgets:
-                    widget = self.cell_planning_advanced_node_widgets['DN'].get('starting_node')
-                    if widget:
-                        dn_starting_node = safe_int(widget.text(), 100)
-                nodes_data['DN'] = {
-                    'count': dn_count,
-                    'split': self.cell_planning_advanced_dn_split_cb.isChecked(),
-                    'factor': safe_int(self.cell_planning_advanced_dn_factor.currentText(), 2),
-                    'reserved': 0,
-                    'start_port': '',
-                    'manual_ports': '',
-                    'locked': False,
-                    'starting_node': dn_starting_node
-                }
-            
-            # Other node types
-            for nt in ['CN', 'EB', 'IE', 'GN']:
-                if nt in self.cell_planning_advanced_node_counts:
-                    count_val = safe_int(self.cell_planning_advanced_node_counts[nt].text(), 0)
-                    if count_val > 0:
-                        split_cb = self.cell_planning_advanced_node_splits[nt]['split_cb']
-                        factor_combo = self.cell_planning_advanced_node_splits[nt]['factor']
-                        # Read starting node value from Cell Planning (default to 1)
-                        nt_starting_node = 1  # Default
-                        # Try to read from widget if it exists
-                        if hasattr(self, 'cell_planning_advanced_node_widgets') and nt in self.cell_planning_advanced_node_widgets:
-                            widget = self.cell_planning_advanced_node_widgets[nt].get('starting_node')
-                            if widget:
-                                nt_starting_node = safe_int(widget.text(), 1)
-                        nodes_data[nt] = {
-                            'count': count_val,
-                            'split': split_cb.isChecked(),
-                            'factor': safe_int(factor_combo.currentText(), 2),
-                            'reserved': 0,
-                            'start_port': '',
-                            'manual_ports': '',
-                            'locked': False,
-                            'starting_node': nt_starting_node
-                        }
-            
-            # Collect routing preferences
-            node_routing = {}
-            for nt in ['CN', 'EB', 'IE', 'GN']:
-                if nt in self.cell_planning_advanced_routing_widgets:
-                    nt_widgets = self.cell_planning_advanced_routing_widgets[nt]
-                    if nt_widgets.get('left', QRadioButton()).isChecked():
-                        node_routing[nt] = 'LEFT'
-                    else:
-                        node_routing[nt] = 'RIGHT'
-            
-            # Collect uplink data
-            uplinks_data = {}
-            for ut in ['IPL', 'ISL', 'EXT']:
-                if ut in self.cell_planning_advanced_uplink_widgets:
-                    groups_widget = self.cell_planning_advanced_uplink_widgets[ut]['groups']
-                    ppg_widget = self.cell_planning_advanced_uplink_widgets[ut]['ppg']
-                    groups = safe_int(groups_widget.text(), 0)
-                    ppg = safe_int(ppg_widget.text(), 0)
-                    # Map EXT to MLAG/BGP for consistency with default mode
-                    uplink_key = 'MLAG/BGP' if ut == 'EXT' else ut
-                    uplinks_data[uplink_key] = {
-                        'groups': groups,
-                        'ports_per_group': ppg,
-                        'split': False,
-                        'factor': 2,
-                        'reserved': 0,
-                        'start': '',
-                        'manual_ports': '',
-                        'locked': False
-                    }
-            
-            # Store advanced config
-            advanced_config = {
-                'dbox_type': self.cell_planning_advanced_config['dbox_type'],
-                'node_routing': node_routing,
-                'uplinks': self.cell_planning_advanced_config['uplinks'].copy()
-            }
+            advanced_rack_data = self._cell_planning_advanced_rack_data()
+            nodes_data = advanced_rack_data['nodes']
+            uplinks_data = advanced_rack_data['uplinks']
+            advanced_config = advanced_rack_data['advanced_config']
         else:
             # Default mode: collect from default UI widgets
             nodes_data = {}
@@ -4182,9 +3614,13 @@ class PortMapperPyQt(QMainWindow):
             log.setMinimumHeight(400)
             # Button row fixed at the bottom so it's always visible
             button_row = QHBoxLayout()
+            cancel_btn = QPushButton("Cancel")
+            cancel_btn.setVisible(False)
+            cancel_btn.clicked.connect(self._status_cancel_clicked)
             ok_btn = QPushButton("OK")
             ok_btn.clicked.connect(dlg.close)
             button_row.addStretch(1)
+            button_row.addWidget(cancel_btn)
             button_row.addWidget(ok_btn)
             layout.addWidget(title_label)
             layout.addWidget(log, 1)
@@ -4192,6 +3628,7 @@ class PortMapperPyQt(QMainWindow):
             self._status_dialog = dlg
             self._status_log_widget = log
             self._status_title_label = title_label
+            self._status_cancel_button = cancel_btn
         else:
             self._status_dialog.setWindowTitle(title)
             self._status_title_label.setText(title)
@@ -4204,6 +3641,20 @@ class PortMapperPyQt(QMainWindow):
             self._ensure_status_dialog("Status")
         self._status_log_widget.append(text)
 
+    def _status_set_cancel_handler(self, handler):
+        """Shows the status dialog's Cancel button wired to handler, or hides it (None)."""
+        self._status_cancel_handler = handler
+        if getattr(self, '_status_dialog', None) is not None:
+            self._status_cancel_button.setEnabled(True)
+            self._status_cancel_button.setVisible(handler is not None)
+
+    def _status_cancel_clicked(self):
+        handler = getattr(self, '_status_cancel_handler', None)
+        if handler is not None:
+            self._status_cancel_button.setEnabled(False)
+            self._status_append("Cancelling ...")
+            handler()
+
     def _status_close(self):
         if hasattr(self, '_status_dialog') and self._status_dialog is not None:
             self._status_dialog.close()
@@ -4215,6 +3666,7 @@ class PortMapperPyQt(QMainWindow):
                 self._load_default_switch_image()
                 self._update_vendor_options()
                 self._update_switch_preview_image()
+                self._update_breakout_factor_options()
                 
                 # Update switch type labels in Node and Uplink tabs
                 if hasattr(self, 'node_switch_label'):
@@ -4228,7 +3680,7 @@ class PortMapperPyQt(QMainWindow):
                 if self.config_started:
                     path = resource_path(self.layout_config['IMAGE'])
                     try:
-                        self.base_image = Image.open(path).convert('RGBA')
+                        self.base_image = get_base_image(self.layout_config['IMAGE'])
                         # Force update both Node Types and Uplinks tabs regardless of which tab is currently visible
                         QTimer.singleShot(100, lambda: self._draw_preview(self.node_canvas_a, 'A', include_uplinks=True))
                         QTimer.singleShot(100, lambda: self._draw_preview(self.node_canvas_b, 'B', include_uplinks=True))
@@ -4236,6 +3688,29 @@ class PortMapperPyQt(QMainWindow):
                         QMessageBox.critical(self, 'Error', f'Base image "{path}" not found')
                 break
 
+    def _update_breakout_factor_options(self):
+        """Offers the selected switch's breakout lanes (BREAKOUT_LANES) in every Split factor combo."""
+        choices = breakout_factor_choices(self.layout_config)
+        combos = [ent['fac'] for ent in (*self.node_entries.values(), *self.uplink_entries.values()) if 'fac' in ent]
+        for name in ('cell_planning_advanced_dn_factor', 'advanced_layout_dn_factor'):
+            if hasattr(self, name):
+                combos.append(getattr(self, name))
+        for name in ('cell_planning_advanced_node_splits', 'advanced_layout_node_splits'):
+            combos.extend(split['factor'] for split in getattr(self, name, {}).values() if split.get('factor') is not None)
+        for combo in combos:
+            if [combo.itemText(i) for i in range(combo.count())] == choices:
+                continue
+            current = combo.currentText()
+            combo.blockSignals(True)
+            combo.clear()
+            combo.addItems(choices)
+            if current in choices:
+                combo.setCurrentText(current)
+            combo.blockSignals(False)
+            if combo.currentText() != current:
+                # The old factor is not offered by this switch: let listeners recalculate
+                combo.currentTextChanged.emit(combo.currentText())
+
     def _create_port_config_row(self, grid: QGridLayout, row: int, type_name: str, description: str, is_node_tab: bool):
         """Creates and places all widgets for a single port configuration row in the given grid. The description is used for tooltips."""
         entries_dict = self.node_entries if is_node_tab else self.uplink_entries
@@ -4290,7 +3765,7 @@ class PortMapperPyQt(QMainWindow):
 
         if row == 1: grid.itemAtPosition(0, col).widget().setToolTip("If splitting, select how many ways the port is split (e.g., 2 for 1:2, 4 for 1:4).")
         fac = QComboBox()
-        fac.addItems(['2', '4'])
+        fac.addItems(breakout_factor_choices(self.layout_config))
         fac.setToolTip("If splitting, select how many ways the port is split (e.g., 2 for 1:2, 4 for 1:4).")
         fac.setFixedWidth(50)
         grid.addWidget(fac, row, col, Qt.AlignmentFlag.AlignCenter); col += 1
@@ -4372,6 +3847,14 @@ class PortMapperPyQt(QMainWindow):
         # Only connect signals if these are new widgets (not already connected)
         if new_widgets:
             for w_key, w in widgets.items():
+                # Every input of the live preview placement invalidates its memo first
+                if isinstance(w, QLineEdit):
+                    w.textChanged.connect(self._bump_preview_revision)
+                elif isinstance(w, QCheckBox):
+                    w.toggled.connect(self._bump_preview_revision)
+                elif isinstance(w, QComboBox):
+                    w.currentTextChanged.connect(self._bump_preview_revision)
+
                 if isinstance(w, QLineEdit):
                     w.textChanged.connect(lambda *_,
                                           func=update_scheduler: func())
@@ -4894,7 +4377,7 @@ class PortMapperPyQt(QMainWindow):
         node_counts_layout.addWidget(self.cell_planning_advanced_dn_split_cb, 1, 2)
         
         self.cell_planning_advanced_dn_factor = QComboBox()
-        self.cell_planning_advanced_dn_factor.addItems(['2', '4'])
+        self.cell_planning_advanced_dn_factor.addItems(breakout_factor_choices(self.layout_config))
         self.cell_planning_advanced_dn_factor.setToolTip('Split factor: 2 for 1:2, 4 for 1:4')
         self.cell_planning_advanced_dn_factor.setFixedWidth(50)
         self.cell_planning_advanced_dn_factor.currentTextChanged.connect(self._on_cell_planning_advanced_recalculate)
@@ -4954,7 +4437,7 @@ class PortMapperPyQt(QMainWindow):
             
             # Factor combo
             factor_combo = QComboBox()
-            factor_combo.addItems(['2', '4'])
+            factor_combo.addItems(breakout_factor_choices(self.layout_config))
             factor_combo.setToolTip('Split factor: 2 for 1:2, 4 for 1:4')
             factor_combo.setFixedWidth(50)
             self.cell_planning_advanced_node_splits[nt]['factor'] = factor_combo
@@ -5183,570 +4666,109 @@ class PortMapperPyQt(QMainWindow):
         self._draw_cell_planning_advanced_preview()
 
     def _get_dnode_groups_by_dbox_type(self, dn_count: int, dbox_type: str) -> tuple[list[int], list[int]]:
-        """
-        Returns lists of DNode numbers for LEFT and RIGHT sides based on DBox type.
-        
-        CeresV1: ODD → RIGHT, EVEN → LEFT
-          RIGHT: DNodes 1,3,5,7,9,11,...
-          LEFT: DNodes 2,4,6,8,10,12,...
-        
-        CeresV2/Mav: Groups of 2 DNodes, alternating RIGHT/LEFT
-          RIGHT: DNodes 1,2, 5,6, 9,10, ...
-          LEFT: DNodes 3,4, 7,8, 11,12, ...
-        """
-        right_dns = []
-        left_dns = []
-        
-        if dbox_type == 'CeresV1':
-            # CeresV1: ODD → RIGHT, EVEN → LEFT
-            for dn_num in range(1, dn_count + 1):
-                if dn_num % 2 == 1:  # ODD → RIGHT
-                    right_dns.append(dn_num)
-                else:  # EVEN → LEFT
-                    left_dns.append(dn_num)
-        else:
-            # CeresV2 or Mav: Groups of 2, alternating RIGHT/LEFT
-            # Group 1 (1,2) → RIGHT, Group 2 (3,4) → LEFT, Group 3 (5,6) → RIGHT, etc.
-            for dn_num in range(1, dn_count + 1):
-                # Group number (1-based): (dn_num - 1) // 2 + 1
-                group_num = (dn_num - 1) // 2 + 1
-                if group_num % 2 == 1:  # Odd groups (1,3,5...) → RIGHT
-                    right_dns.append(dn_num)
-                else:  # Even groups (2,4,6...) → LEFT
-                    left_dns.append(dn_num)
-        
-        return left_dns, right_dns
+        """Returns lists of DNode numbers for LEFT and RIGHT sides based on DBox type."""
+        return get_dnode_groups_by_dbox_type(dn_count, dbox_type)
 
-    def _calculate_cell_planning_advanced_ports(self) -> list[tuple[int, str]]:
-        """
-        Calculate port assignments for Cell Planning Advanced mode.
-        """
-        # Get port count from current switch
-        port_count = self.layout_config.get('PORT_COUNT', 64)
-        left_ports, right_ports = self._get_left_right_ports_mellanox(port_count)
-        
-        port_map = []
-        assigned = set()
-        
-        # Get node counts
+    def _cell_planning_advanced_rack_data(self) -> dict:
+        """Collects the Cell Planning Advanced widgets as rack data ('nodes', 'uplinks', 'advanced_config')."""
+        nodes_data = {}
+        # DN
         dn_count = safe_int(self.cell_planning_advanced_dn_count.text(), 0)
-        node_counts = {}
-        for nt, widget in self.cell_planning_advanced_node_counts.items():
-            node_counts[nt] = safe_int(widget.text(), 0)
-        
-        # Get starting node values
-        dn_starting_node = 100  # Default
-        if hasattr(self, 'cell_planning_advanced_node_widgets') and 'DN' in self.cell_planning_advanced_node_widgets:
-            dn_starting_widget = self.cell_planning_advanced_node_widgets['DN'].get('starting_node')
-            if dn_starting_widget:
-                dn_starting_node = safe_int(dn_starting_widget.text(), 100)
-        
-        node_starting_nodes = {}
-        for nt in ['CN', 'EB', 'IE', 'GN']:
-            node_starting_nodes[nt] = 1  # Default
-            if hasattr(self, 'cell_planning_advanced_node_widgets') and nt in self.cell_planning_advanced_node_widgets:
-                nt_starting_widget = self.cell_planning_advanced_node_widgets[nt].get('starting_node')
-                if nt_starting_widget:
-                    node_starting_nodes[nt] = safe_int(nt_starting_widget.text(), 1)
-        
-        # Track current indices for left and right sides
-        left_current_index = 0
-        right_current_index = 0
-        
-        # DN assignment: Based on DBox type
-        dbox_type = self.cell_planning_advanced_config['dbox_type']
         if dn_count > 0:
-            dn_split = self.cell_planning_advanced_dn_split_cb.isChecked()
-            dn_factor = safe_int(self.cell_planning_advanced_dn_factor.currentText(), 2)
-            
-            # Get DNode groups based on DBox type
-            left_dns, right_dns = self._get_dnode_groups_by_dbox_type(dn_count, dbox_type)
-            
-            # Assign DNs to LEFT side
-            if dn_split and dn_factor > 1:
-                # Port splitting: take first N DNs from left_dns list for each port
-                left_idx = 0
-                while left_idx < len(left_dns) and left_current_index < len(left_ports):
-                    # Take next dn_factor DNs from the left_dns list
-                    dns_for_port = left_dns[left_idx:left_idx + dn_factor]
-                    if len(dns_for_port) == 1:
-                        # Calculate actual node number: starting_node + dn_num - 1 (since dn_num is 1-based)
-                        actual_node = dn_starting_node + dns_for_port[0] - 1
-                        label = f'DN-{actual_node}'
-                    else:
-                        # Calculate actual node numbers for range
-                        start_actual = dn_starting_node + dns_for_port[0] - 1
-                        end_actual = dn_starting_node + dns_for_port[-1] - 1
-                        label = f'DN-{start_actual}/{end_actual}'
-                    
-                    port = left_ports[left_current_index]
-                    port_map.append((port, label))
-                    assigned.add(port)
-                    left_current_index += 1
-                    left_idx += len(dns_for_port)
-            else:
-                # No splitting: one DN per port
-                for dn_num in left_dns:
-                    if left_current_index < len(left_ports):
-                        # Calculate actual node number: starting_node + dn_num - 1 (since dn_num is 1-based)
-                        actual_node = dn_starting_node + dn_num - 1
-                        port = left_ports[left_current_index]
-                        port_map.append((port, f'DN-{actual_node}'))
-                        assigned.add(port)
-                        left_current_index += 1
-            
-            # Assign DNs to RIGHT side
-            if dn_split and dn_factor > 1:
-                # Port splitting: take first N DNs from right_dns list for each port
-                right_idx = 0
-                while right_idx < len(right_dns) and right_current_index < len(right_ports):
-                    # Take next dn_factor DNs from the right_dns list
-                    dns_for_port = right_dns[right_idx:right_idx + dn_factor]
-                    if len(dns_for_port) == 1:
-                        # Calculate actual node number: starting_node + dn_num - 1 (since dn_num is 1-based)
-                        actual_node = dn_starting_node + dns_for_port[0] - 1
-                        label = f'DN-{actual_node}'
-                    else:
-                        # Calculate actual node numbers for range
-                        start_actual = dn_starting_node + dns_for_port[0] - 1
-                        end_actual = dn_starting_node + dns_for_port[-1] - 1
-                        label = f'DN-{start_actual}/{end_actual}'
-                    
-                    port = right_ports[right_current_index]
-                    port_map.append((port, label))
-                    assigned.add(port)
-                    right_current_index += 1
-                    right_idx += len(dns_for_port)
-            else:
-                # No splitting: one DN per port
-                for dn_num in right_dns:
-                    if right_current_index < len(right_ports):
-                        # Calculate actual node number: starting_node + dn_num - 1 (since dn_num is 1-based)
-                        actual_node = dn_starting_node + dn_num - 1
-                        port = right_ports[right_current_index]
-                        port_map.append((port, f'DN-{actual_node}'))
-                        assigned.add(port)
-                        right_current_index += 1
-        
-        # Assign other node types based on routing preferences
+            # Read starting node value from Cell Planning (default to 100 for DN)
+            # Advanced mode may not have starting_node widgets yet, so use default
+            dn_starting_node = 100  # Default for DN
+            # Try to read from widget if it exists
+            if hasattr(self, 'cell_planning_advanced_node_widgets') and 'DN' in self.cell_planning_advanced_node_widgets:
+                widget = self.cell_planning_advanced_node_widgets['DN'].get('starting_node')
+                if widget:
+                    dn_starting_node = safe_int(widget.text(), 100)
+            nodes_data['DN'] = {
+                'count': dn_count,
+                'split': self.cell_planning_advanced_dn_split_cb.isChecked(),
+                'factor': safe_int(self.cell_planning_advanced_dn_factor.currentText(), 2),
+                'reserved': 0,
+                'start_port': '',
+                'manual_ports': '',
+                'locked': False,
+                'starting_node': dn_starting_node
+            }
+
+        # Other node types
+        for nt in ['CN', 'EB', 'IE', 'GN']:
+            if nt in self.cell_planning_advanced_node_counts:
+                count_val = safe_int(self.cell_planning_advanced_node_counts[nt].text(), 0)
+                if count_val > 0:
+                    split_cb = self.cell_planning_advanced_node_splits[nt]['split_cb']
+                    factor_combo = self.cell_planning_advanced_node_splits[nt]['factor']
+                    # Read starting node value from Cell Planning (default to 1)
+                    nt_starting_node = 1  # Default
+                    # Try to read from widget if it exists
+                    if hasattr(self, 'cell_planning_advanced_node_widgets') and nt in self.cell_planning_advanced_node_widgets:
+                        widget = self.cell_planning_advanced_node_widgets[nt].get('starting_node')
+                        if widget:
+                            nt_starting_node = safe_int(widget.text(), 1)
+                    nodes_data[nt] = {
+                        'count': count_val,
+                        'split': split_cb.isChecked(),
+                        'factor': safe_int(factor_combo.currentText(), 2),
+                        'reserved': 0,
+                        'start_port': '',
+                        'manual_ports': '',
+                        'locked': False,
+                        'starting_node': nt_starting_node
+                    }
+
+        # Collect routing preferences
+        node_routing = {}
         for nt in ['CN', 'EB', 'IE', 'GN']:
-            count = node_counts.get(nt, 0)
-            if count == 0:
-                continue
-            
-            # Get routing preference
-            routing_pref = 'RIGHT'  # Default
             if nt in self.cell_planning_advanced_routing_widgets:
                 nt_widgets = self.cell_planning_advanced_routing_widgets[nt]
                 if nt_widgets.get('left', QRadioButton()).isChecked():
-                    routing_pref = 'LEFT'
-            
-            # Get split settings
-            split_cb = self.cell_planning_advanced_node_splits[nt]['split_cb']
-            split = split_cb.isChecked()
-            factor = safe_int(self.cell_planning_advanced_node_splits[nt]['factor'].currentText(), 2)
-            
-            # Choose port list based on routing preference
-            if routing_pref == 'LEFT':
-                current_index = left_current_index
-                port_list = left_ports
-                index_ref = 'left_current_index'
-            else:
-                current_index = right_current_index
-                port_list = right_ports
-                index_ref = 'right_current_index'
-            
-            # Assign ports
-            nt_starting = node_starting_nodes.get(nt, 1)
-            for i in range(count):
-                if split:
-                    # Port splitting
-                    if i % factor == 0:
-                        end_idx = min(i + factor - 1, count - 1)
-                        # Calculate actual node numbers: starting_node + i (since i is 0-based)
-                        start_actual = nt_starting + i
-                        end_actual = nt_starting + end_idx
-                        label = f'{nt}-{start_actual}/{end_actual}'
-                    else:
-                        continue  # Skip intermediate nodes in split groups
+                    node_routing[nt] = 'LEFT'
                 else:
-                    # Calculate actual node number: starting_node + i (since i is 0-based)
-                    actual_node = nt_starting + i
-                    label = f'{nt}-{actual_node}'
-                
-                if current_index < len(port_list):
-                    port = port_list[current_index]
-                    port_map.append((port, label))
-                    assigned.add(port)
-                    current_index += 1
-            
-            # Update the appropriate index
-            if routing_pref == 'LEFT':
-                left_current_index = current_index
-            else:
-                right_current_index = current_index
-        
-        # Assign uplinks (from right side, remaining ports)
-        # Preferred starting ports: 56, 52, 48, 44, 40, 36, 32, 28, 24, 18, 14, or 10
-        # But only if the LOW end doesn't conflict with LEFT-side CN/DN ports
-        # Try to balance open ports on BOTH sides of the uplink ports for better layout
-        uplink_labels = []
-        
-        # Collect all left-side assigned ports (CN/DN on LEFT)
-        left_assigned_ports = set()
-        for port, label in port_map:
-            if port in left_ports:
-                left_assigned_ports.add(port)
-        
-        # Find the highest and lowest node ports (DN, CN, NB, etc.) on BOTH sides
-        # This helps us balance spacing on both sides of the uplink GROUP
-        all_node_ports = []
-        for port, label in port_map:
-            # Check if it's a node port (DN, CN, NB, etc.) on either side
-            if any(label.startswith(f'{nt}-') for nt in ['DN', 'CN', 'NB', 'EB', 'IE', 'GN']):
-                all_node_ports.append(port)
-        
-        highest_node_port = max(all_node_ports) if all_node_ports else None
-        lowest_node_port = min(all_node_ports) if all_node_ports else None
-        
-        # Calculate total uplink ports needed
-        total_uplink_ports = 0
-        uplink_configs = []
+                    node_routing[nt] = 'RIGHT'
+
+        # Collect uplink data
+        uplinks_data = {}
         for ut in ['IPL', 'ISL', 'EXT']:
-            groups_widget = self.cell_planning_advanced_uplink_widgets[ut]['groups']
-            ppg_widget = self.cell_planning_advanced_uplink_widgets[ut]['ppg']
-            
-            groups = safe_int(groups_widget.text(), 0)
-            ppg = safe_int(ppg_widget.text(), 0)
-            
-            if groups == 0 or ppg == 0:
-                continue
-            
-            # IPL is always 1 group
-            if ut == 'IPL':
-                groups = 1
-            
-            total_ports_for_type = groups * ppg
-            total_uplink_ports += total_ports_for_type
-            uplink_configs.append((ut, groups, ppg))
-        
-        # Preferred starting ports (high to low)
-        preferred_start_ports = [56, 52, 48, 44, 40, 36, 32, 28, 24, 18, 14, 10]
-        
-        # Strategy: Try to balance spacing on both sides of uplinks
-        # If we have node ports on both sides, try to center the uplinks between them
-        if total_uplink_ports > 0:
-            balanced_start_port = None
-            
-            # Calculate balanced placement if we have node ports on both sides
-            if highest_node_port is not None and lowest_node_port is not None:
-                # Calculate the center point between highest and lowest node ports
-                center_between_nodes = (highest_node_port + lowest_node_port) / 2.0
-                
-                # Calculate where uplinks should start to be centered around this point
-                # The center of the uplink block should be at center_between_nodes
-                # If we have N uplink ports, the center port is at start_port - (N-1)/2
-                # So: start_port - (N-1)/2 = center_between_nodes
-                # Therefore: start_port = center_between_nodes + (N-1)/2
-                ideal_start_port = int(round(center_between_nodes + (total_uplink_ports - 1) / 2.0))
-                
-                # First, try to find the best balanced position (not just from preferred ports)
-                # Search around the ideal position to find the best balance
-                best_balance_score = None
-                best_start_port = None
-                best_gap_high = None
-                best_gap_low = None
-                
-                # Get port count to know max port number
-                port_count = self.layout_config.get('PORT_COUNT', 64)
-                max_port = port_count
-                
-                # Search in a reasonable range around ideal position
-                search_range = max(30, total_uplink_ports * 5)  # Search very wide range
-                for candidate_start in range(max(1, ideal_start_port - search_range), min(max_port + 1, ideal_start_port + search_range + 1)):
-                    candidate_lowest = candidate_start - total_uplink_ports + 1
-                    if candidate_lowest < 1:
-                        continue
-                    
-                    # Check if all ports in range are available and don't conflict with left-side
-                    all_available = True
-                    conflicts_with_left = False
-                    for i in range(total_uplink_ports):
-                        port = candidate_start - i
-                        if port in assigned:
-                            all_available = False
-                            break
-                        if port in left_assigned_ports:
-                            conflicts_with_left = True
-                            break
-                    
-                    if all_available and not conflicts_with_left:
-                        # Calculate gaps on both sides of the uplink GROUP
-                        # Gap above: count unassigned ports between highest node port and highest uplink port
-                        gap_high_side = 0
-                        if candidate_start < highest_node_port:
-                            # Uplink GROUP is below highest node port - count unassigned ports between them
-                            for p in range(candidate_start + 1, highest_node_port):
-                                if p not in assigned and p not in left_assigned_ports:
-                                    gap_high_side += 1
-                        elif candidate_start > highest_node_port:
-                            # Uplink GROUP is above highest node port - count unassigned ports in between
-                            for p in range(highest_node_port + 1, candidate_start):
-                                if p not in assigned and p not in left_assigned_ports:
-                                    gap_high_side += 1
-                        
-                        # Gap below: count unassigned ports between lowest uplink port and lowest node port
-                        gap_low_side = 0
-                        if candidate_lowest > lowest_node_port:
-                            # Uplink GROUP is above lowest node port - count unassigned ports between them
-                            for p in range(lowest_node_port + 1, candidate_lowest):
-                                if p not in assigned and p not in left_assigned_ports:
-                                    gap_low_side += 1
-                        elif candidate_lowest < lowest_node_port:
-                            # Uplink GROUP is below lowest node port - count unassigned ports in between
-                            for p in range(candidate_lowest + 1, lowest_node_port):
-                                if p not in assigned and p not in left_assigned_ports:
-                                    gap_low_side += 1
-                        
-                        # Calculate balance score: lower difference = more balanced
-                        # This balances unassigned ports between the uplink GROUP and node ports on both sides
-                        balance_score = abs(gap_high_side - gap_low_side)
-                        
-                        # Also factor in distance from ideal (but balance is more important)
-                        distance_from_ideal = abs(candidate_start - ideal_start_port)
-                        
-                        # Combined score: balance is MUCH more important (weight it heavily)
-                        combined_score = balance_score * 1000 + distance_from_ideal
-                        
-                        if best_balance_score is None or combined_score < best_balance_score:
-                            best_balance_score = combined_score
-                            best_start_port = candidate_start
-                            best_gap_high = gap_high_side
-                            best_gap_low = gap_low_side
-                
-                # ALWAYS use the best balanced position if found (don't filter it out)
-                if best_start_port is not None:
-                    balanced_start_port = best_start_port
-                    # Debug: We found the best balanced position
-                    # It will be used regardless of gap ratios
-            
-            # If we found a balanced placement, use it
-            if balanced_start_port is not None:
-                uplink_port_list = []
-                for i in range(total_uplink_ports):
-                    uplink_port_list.append(balanced_start_port - i)
-                
-                port_idx = 0
-                for ut, groups, ppg in uplink_configs:
-                    for group_num in range(1, groups + 1):
-                        for port_num in range(1, ppg + 1):
-                            if port_idx < len(uplink_port_list):
-                                port = uplink_port_list[port_idx]
-                                label = f'{ut}{group_num}-{port_num}'
-                                uplink_labels.append((port, label))
-                                assigned.add(port)
-                                port_idx += 1
-            
-            # If balanced placement didn't work, try preferred ports (but still check balance)
-            if len(uplink_labels) == 0:
-                # Try preferred ports, but prioritize balance
-                best_preferred_score = None
-                best_preferred_port = None
-                
-                for preferred_port in preferred_start_ports:
-                    if preferred_port in assigned:
-                        continue
-                    
-                    # Calculate the lowest port we'll use
-                    lowest_uplink_port = preferred_port - total_uplink_ports + 1
-                    # Check if lowest port conflicts with left-side CN/DN ports
-                    conflicts_with_left = False
-                    if lowest_uplink_port in left_assigned_ports:
-                        conflicts_with_left = True
-                    else:
-                        # Check all ports in the range for conflicts with left-side ports
-                        for i in range(total_uplink_ports):
-                            port = preferred_port - i
-                            if port in left_assigned_ports:
-                                conflicts_with_left = True
-                                break
-                    
-                    if not conflicts_with_left:
-                        # Check if all ports in the range are available (not already assigned)
-                        all_available = True
-                        uplink_port_list = []
-                        for i in range(total_uplink_ports):
-                            port = preferred_port - i
-                            if port in assigned:
-                                all_available = False
-                                break
-                            uplink_port_list.append(port)
-                        
-                        if all_available:
-                            # Calculate balance score for this preferred port
-                            if highest_node_port is not None and lowest_node_port is not None:
-                                # Count unassigned ports in gaps
-                                gap_high = 0
-                                if preferred_port < highest_node_port:
-                                    for p in range(preferred_port + 1, highest_node_port):
-                                        if p not in assigned and p not in left_assigned_ports:
-                                            gap_high += 1
-                                elif preferred_port > highest_node_port:
-                                    for p in range(highest_node_port + 1, preferred_port):
-                                        if p not in assigned and p not in left_assigned_ports:
-                                            gap_high += 1
-                                
-                                gap_low = 0
-                                if lowest_uplink_port > lowest_node_port:
-                                    for p in range(lowest_node_port + 1, lowest_uplink_port):
-                                        if p not in assigned and p not in left_assigned_ports:
-                                            gap_low += 1
-                                elif lowest_uplink_port < lowest_node_port:
-                                    for p in range(lowest_uplink_port + 1, lowest_node_port):
-                                        if p not in assigned and p not in left_assigned_ports:
-                                            gap_low += 1
-                                
-                                balance_score = abs(gap_high - gap_low)
-                            else:
-                                balance_score = 0
-                            
-                            if best_preferred_score is None or balance_score < best_preferred_score:
-                                best_preferred_score = balance_score
-                                best_preferred_port = preferred_port
-                
-                # Use the best balanced preferred port if found
-                if best_preferred_port is not None:
-                    port_idx = 0
-                    for ut, groups, ppg in uplink_configs:
-                        for group_num in range(1, groups + 1):
-                            for port_num in range(1, ppg + 1):
-                                if port_idx < total_uplink_ports:
-                                    port = best_preferred_port - port_idx
-                                    label = f'{ut}{group_num}-{port_num}'
-                                    uplink_labels.append((port, label))
-                                    assigned.add(port)
-                                    port_idx += 1
-        
-        # If preferred ports couldn't be used, fall back to sequential assignment
-        # Try to balance spacing when possible, but assign anyway if can't
-        if len(uplink_labels) == 0:
-            # Try to find a balanced placement in available ports
-            if highest_node_port is not None and lowest_node_port is not None:
-                # Calculate ideal balanced position - center the uplink GROUP between node ports
-                center_between_nodes = (highest_node_port + lowest_node_port) / 2.0
-                ideal_start_port = int(round(center_between_nodes + (total_uplink_ports - 1) / 2.0))
-                
-                # Try ideal position first
-                ideal_lowest = ideal_start_port - total_uplink_ports + 1
-                ideal_available = True
-                
-                # Check if ideal position is available
-                if ideal_start_port in assigned or ideal_lowest in assigned:
-                    ideal_available = False
-                else:
-                    for i in range(total_uplink_ports):
-                        port = ideal_start_port - i
-                        if port in assigned or port in left_assigned_ports:
-                            ideal_available = False
-                            break
-                
-                if ideal_available:
-                    # Use balanced placement at ideal position
-                    port_idx = 0
-                    for ut, groups, ppg in uplink_configs:
-                        for group_num in range(1, groups + 1):
-                            for port_num in range(1, ppg + 1):
-                                if port_idx < total_uplink_ports:
-                                    port = ideal_start_port - port_idx
-                                    label = f'{ut}{group_num}-{port_num}'
-                                    uplink_labels.append((port, label))
-                                    assigned.add(port)
-                                    port_idx += 1
-                else:
-                    # Try ports near ideal position for balanced placement
-                    best_balance_score = None
-                    best_port = None
-                    
-                    # Search in a range around ideal position
-                    search_range = max(10, total_uplink_ports * 2)  # Search reasonable range
-                    for candidate_start in range(ideal_start_port - search_range, ideal_start_port + search_range + 1):
-                        if candidate_start in assigned:
-                            continue
-                        
-                        candidate_lowest = candidate_start - total_uplink_ports + 1
-                        if candidate_lowest < 1:
-                            continue
-                        
-                        # Check if all ports in range are available
-                        all_available = True
-                        for i in range(total_uplink_ports):
-                            port = candidate_start - i
-                            if port in assigned or port in left_assigned_ports:
-                                all_available = False
-                                break
-                        
-                        if all_available:
-                            # Calculate balance score - count unassigned ports in gaps
-                            gap_high = 0
-                            if candidate_start < highest_node_port:
-                                for p in range(candidate_start + 1, highest_node_port):
-                                    if p not in assigned and p not in left_assigned_ports:
-                                        gap_high += 1
-                            elif candidate_start > highest_node_port:
-                                for p in range(highest_node_port + 1, candidate_start):
-                                    if p not in assigned and p not in left_assigned_ports:
-                                        gap_high += 1
-                            
-                            gap_low = 0
-                            if candidate_lowest > lowest_node_port:
-                                for p in range(lowest_node_port + 1, candidate_lowest):
-                                    if p not in assigned and p not in left_assigned_ports:
-                                        gap_low += 1
-                            elif candidate_lowest < lowest_node_port:
-                                for p in range(candidate_lowest + 1, lowest_node_port):
-                                    if p not in assigned and p not in left_assigned_ports:
-                                        gap_low += 1
-                            
-                            balance_score = abs(gap_high - gap_low)
-                            distance_from_ideal = abs(candidate_start - ideal_start_port)
-                            combined_score = balance_score * 1000 + distance_from_ideal
-                            
-                            if best_balance_score is None or combined_score < best_balance_score:
-                                best_balance_score = combined_score
-                                best_port = candidate_start
-                    
-                    if best_port is not None:
-                        # Use best balanced position found
-                        port_idx = 0
-                        for ut, groups, ppg in uplink_configs:
-                            for group_num in range(1, groups + 1):
-                                for port_num in range(1, ppg + 1):
-                                    if port_idx < total_uplink_ports:
-                                        port = best_port - port_idx
-                                        label = f'{ut}{group_num}-{port_num}'
-                                        uplink_labels.append((port, label))
-                                        assigned.add(port)
-                                        port_idx += 1
-            
-            # If balanced placement didn't work, assign sequentially
-            if len(uplink_labels) == 0:
-                for ut, groups, ppg in uplink_configs:
-                    for group_num in range(1, groups + 1):
-                        for port_num in range(1, ppg + 1):
-                            # Find next available port from right side
-                            while right_current_index < len(right_ports) and right_ports[right_current_index] in assigned:
-                                right_current_index += 1
-                            
-                            if right_current_index < len(right_ports):
-                                port = right_ports[right_current_index]
-                                label = f'{ut}{group_num}-{port_num}'
-                                uplink_labels.append((port, label))
-                                assigned.add(port)
-                                right_current_index += 1
-        
-        port_map.extend(uplink_labels)
-        
-        return sorted(port_map, key=lambda x: x[0])
+            if ut in self.cell_planning_advanced_uplink_widgets:
+                groups_widget = self.cell_planning_advanced_uplink_widgets[ut]['groups']
+                ppg_widget = self.cell_planning_advanced_uplink_widgets[ut]['ppg']
+                groups = safe_int(groups_widget.text(), 0)
+                ppg = safe_int(ppg_widget.text(), 0)
+                # Map EXT to MLAG/BGP for consistency with default mode
+                uplink_key = 'MLAG/BGP' if ut == 'EXT' else ut
+                uplinks_data[uplink_key] = {
+                    'groups': groups,
+                    'ports_per_group': ppg,
+                    'split': False,
+                    'factor': 2,
+                    'reserved': 0,
+                    'start': '',
+                    'manual_ports': '',
+                    'locked': False
+                }
+
+        # Uplinks go in one block centred between the node ports, as the live preview shows them
+        advanced_config = {
+            'dbox_type': self.cell_planning_advanced_config['dbox_type'],
+            'node_routing': node_routing,
+            'uplinks': self.cell_planning_advanced_config['uplinks'].copy(),
+            'uplink_placement': 'centered'
+        }
+        return {'nodes': nodes_data, 'uplinks': uplinks_data, 'advanced_config': advanced_config}
+
+    def _calculate_cell_planning_advanced_ports(self) -> list[tuple[int, str]]:
+        """
+        Calculate port assignments for Cell Planning Advanced mode.
+        """
+        rack_data = self._cell_planning_advanced_rack_data()
+        # The preview labels nodes from their starting node numbers
+        for node_data in rack_data['nodes'].values():
+            node_data['start'] = node_data['starting_node']
+        port_map, _ = self._calculate_advanced_rack_port_map(dict(rack_data, switch_id=self.switch_id))
+        return port_map
 
     def _draw_cell_planning_advanced_preview(self):
         """Draw live preview for Cell Planning Advanced mode."""
@@ -5757,22 +4779,10 @@ class PortMapperPyQt(QMainWindow):
             return
         
         try:
-            df_raw = pd.DataFrame(self.cell_planning_advanced_port_map, columns=['Port ID', 'Port Name'])
-            df_agg = df_raw.groupby('Port ID')['Port Name'].apply(lambda s: s.iloc[0]).reset_index()
-            
-            scale_a = self.cell_planning_advanced_canvas_a.width() / self.base_image.width if self.base_image and self.base_image.width > 0 and self.cell_planning_advanced_canvas_a.width() > 0 else 1.0
-            dfA = df_agg.copy()
-            dfA['Fabric ID'] = 'A'
-            dfA['Hostname'] = 'SwitchA'
-            imgA = self._draw_overlay(dfA, self.base_image, self.layout_config, display_scale=scale_a)
-            self.cell_planning_advanced_canvas_a.setPixmap(pil_to_qpixmap(imgA))
+            port_map = PortMap.from_pairs(self.cell_planning_advanced_port_map, self.layout_config['PORT_COUNT'])
             
-            scale_b = self.cell_planning_advanced_canvas_b.width() / self.base_image.width if self.base_image and self.base_image.width > 0 and self.cell_planning_advanced_canvas_b.width() > 0 else 1.0
-            dfB = df_agg.copy()
-            dfB['Fabric ID'] = 'B'
-            dfB['Hostname'] = 'SwitchB'
-            imgB = self._draw_overlay(dfB, self.base_image, self.layout_config, display_scale=scale_b)
-            self.cell_planning_advanced_canvas_b.setPixmap(pil_to_qpixmap(imgB))
+            self._show_overlay(self.cell_planning_advanced_canvas_a, port_map, 'A', self.switch_id)
+            self._show_overlay(self.cell_planning_advanced_canvas_b, port_map, 'B', self.switch_id)
         except Exception as e:
             if hasattr(self, 'cell_planning_advanced_canvas_a'):
                 self.cell_planning_advanced_canvas_a.setText(f'Error: {str(e)}')
@@ -6124,6 +5134,8 @@ class PortMapperPyQt(QMainWindow):
         # --- Update Data Structures ---
         # Update the main configuration dictionary
         self.multi_rack_config[new_name] = self.multi_rack_config.pop(old_name)
+        if old_name in self._rack_port_map_state:
+            self._rack_port_map_state[new_name] = self._rack_port_map_state.pop(old_name)
 
         # Remove the old widget from the cache and stacked layout
         if old_name in self.rack_widgets:
@@ -6232,66 +5244,8 @@ class PortMapperPyQt(QMainWindow):
             else:
                 widget_group.blockSignals(False)
 
-    def _initialize_first_rack_from_main_config(self, force_update=False):
-        """Creates the first rack by copying settings from the Setup and Node tabs."""
-        # Check if any racks exist
-        if self.rack_list_widget.count() > 0:
-            if not force_update:
-                return # Already initialized
-            else:
-                # Force update: update the first rack instead of creating a new one
-                first_rack_name = self.rack_list_widget.item(0).text()
-                if first_rack_name in self.multi_rack_config:
-                    # Just update the nodes and uplinks data, keep the rest of the rack config
-                    first_rack_data = self.multi_rack_config[first_rack_name]
-                    
-                    # Gather updated data from the main UI tabs
-                    nodes_data = {}
-                    for nt, ent in self.node_entries.items():
-                        is_locked = ent['lock_cb'].isChecked()
-                        manual_ports_str = ent['st'].text().strip() if is_locked else ''
-                        nodes_data[nt] = {
-                            'count': safe_int(ent['cnt'].text()),
-                            'split': ent['split_cb'].isChecked(),
-                            'factor': safe_int(ent['fac'].currentText(), 2),
-                            'reserved': safe_int(ent['rsv'].text()),
-                            'start': 1,
-                            'start_port': manual_ports_str if is_locked else '',
-                            'manual_ports': manual_ports_str if is_locked else '',
-                            'locked': is_locked
-                        }
-
-                    uplinks_data = {}
-                    for ut, ent in self.uplink_entries.items():
-                        is_locked = ent['lock_cb'].isChecked()
-                        manual_ports_str = ent['st'].text().strip() if is_locked else ''
-                        uplinks_data[ut] = {
-                            'groups': safe_int(ent.get('gcnt', QLineEdit('1')).text()),
-                            'ports_per_group': safe_int(ent['ppg'].text()),
-                            'split': ent['split_cb'].isChecked(),
-                            'factor': safe_int(ent['fac'].currentText(), 2),
-                            'reserved': safe_int(ent['rsv'].text()),
-                            'start': manual_ports_str if is_locked else '',
-                            'manual_ports': manual_ports_str if is_locked else '',
-                            'locked': is_locked
-                        }
-                    
-                    # Update only nodes and uplinks data
-                    first_rack_data['nodes'] = nodes_data
-                    first_rack_data['uplinks'] = uplinks_data
-                    first_rack_data['fabric_topology'] = self.fabric_topology
-                    first_rack_data['use_vxlan_overlay'] = self.use_vxlan_overlay
-                    
-                    # Recalculate port map for the rack
-                    self._calculate_and_store_rack_port_map(first_rack_name)
-                    
-                    # Refresh the preview if this rack is currently selected
-                    if self.current_rack_name == first_rack_name:
-                        self._draw_multi_rack_preview()
-                    return
-        
-        # No racks exist, create the first one
-        # Gather data from the main UI tabs
+    def _cell_planning_rack_data(self) -> dict:
+        """Collects the Node Types and Uplinks widgets as rack data ('nodes', 'uplinks') for the first rack."""
         nodes_data = {}
         for nt, ent in self.node_entries.items():
             is_locked = ent['lock_cb'].isChecked()
@@ -6323,6 +5277,41 @@ class PortMapperPyQt(QMainWindow):
                 'manual_ports': manual_ports_str if is_locked else '',
                 'locked': is_locked
             }
+        return {'nodes': nodes_data, 'uplinks': uplinks_data}
+
+    def _initialize_first_rack_from_main_config(self, force_update=False):
+        """Creates the first rack by copying settings from the Setup and Node tabs."""
+        # Check if any racks exist
+        if self.rack_list_widget.count() > 0:
+            if not force_update:
+                return # Already initialized
+            else:
+                # Force update: update the first rack instead of creating a new one
+                first_rack_name = self.rack_list_widget.item(0).text()
+                if first_rack_name in self.multi_rack_config:
+                    # Just update the nodes and uplinks data, keep the rest of the rack config
+                    first_rack_data = self.multi_rack_config[first_rack_name]
+                    
+                    # Gather updated data from the main UI tabs
+                    rack_data = self._cell_planning_rack_data()
+                    
+                    # Update only nodes and uplinks data
+                    first_rack_data['nodes'] = rack_data['nodes']
+                    first_rack_data['uplinks'] = rack_data['uplinks']
+                    first_rack_data['fabric_topology'] = self.fabric_topology
+                    first_rack_data['use_vxlan_overlay'] = self.use_vxlan_overlay
+                    
+                    # Recalculate port map for the rack
+                    self._calculate_and_store_rack_port_map(first_rack_name)
+                    
+                    # Refresh the preview if this rack is currently selected
+                    if self.current_rack_name == first_rack_name:
+                        self._draw_multi_rack_preview()
+                    return
+        
+        # No racks exist, create the first one
+        # Gather data from the main UI tabs
+        rack_data = self._cell_planning_rack_data()
 
         first_rack_data = {
             'hostname_a': self._generate_rack_hostname(self.ha_entry.text(), 1),
@@ -6334,8 +5323,8 @@ class PortMapperPyQt(QMainWindow):
             'peak_bw_units': self.peak_bw_units_combo.currentText(),
             'fabric_topology': self.fabric_topology,
             'use_vxlan_overlay': self.use_vxlan_overlay,
-            'nodes': nodes_data,
-            'uplinks': uplinks_data
+            'nodes': rack_data['nodes'],
+            'uplinks': rack_data['uplinks']
         }
 
         first_rack_name = self._get_next_rack_name()
@@ -6380,6 +5369,7 @@ class PortMapperPyQt(QMainWindow):
             # Remove from data model
             if rack_name in self.multi_rack_config:
                 del self.multi_rack_config[rack_name]
+            self._rack_port_map_state.pop(rack_name, None)
             # Remove from widget cache
             if rack_name in self.rack_widgets:
                 widget_to_remove = self.rack_widgets[rack_name]['widget']
@@ -6533,7 +5523,7 @@ class PortMapperPyQt(QMainWindow):
             node_grid.addWidget(split_cb, i, 2, Qt.AlignmentFlag.AlignCenter)
 
             factor_combo = QComboBox()
-            factor_combo.addItems(['2', '4'])
+            factor_combo.addItems(breakout_factor_choices(SWITCH_LAYOUTS[rack_switch_id]))
             factor_combo.setCurrentText(str(node_data.get('factor', 2)))
             factor_combo.setFixedWidth(50)
             factor_combo.currentTextChanged.connect(lambda text, rn=rack_name, nt=node_type, w=factor_combo: self._on_rack_data_changed(rn, ['nodes', nt, 'factor'], w))
@@ -6635,7 +5625,7 @@ class PortMapperPyQt(QMainWindow):
             uplink_grid.addWidget(split_cb, i, 3, Qt.AlignmentFlag.AlignCenter)
 
             factor_combo = QComboBox()
-            factor_combo.addItems(['2', '4'])
+            factor_combo.addItems(breakout_factor_choices(SWITCH_LAYOUTS[rack_switch_id]))
             factor_combo.setCurrentText(str(uplink_data.get('factor', 2)))
             factor_combo.setToolTip("If splitting, select how many ways the port is split (e.g., 2 for 1:2, 4 for 1:4).")
             factor_combo.setFixedWidth(50)
@@ -7214,7 +6204,7 @@ class PortMapperPyQt(QMainWindow):
         node_counts_layout.addWidget(self.advanced_layout_dn_split_cb, 1, 2)
         
         self.advanced_layout_dn_factor = QComboBox()
-        self.advanced_layout_dn_factor.addItems(['2', '4'])
+        self.advanced_layout_dn_factor.addItems(breakout_factor_choices(self.layout_config))
         self.advanced_layout_dn_factor.setToolTip('Split factor: 2 for 1:2, 4 for 1:4')
         self.advanced_layout_dn_factor.setFixedWidth(50)
         self.advanced_layout_dn_factor.currentTextChanged.connect(self._on_advanced_layout_recalculate)
@@ -7246,7 +6236,7 @@ class PortMapperPyQt(QMainWindow):
             
             # Factor combo
             factor_combo = QComboBox()
-            factor_combo.addItems(['2', '4'])
+            factor_combo.addItems(breakout_factor_choices(self.layout_config))
             factor_combo.setToolTip('Split factor: 2 for 1:2, 4 for 1:4')
             factor_combo.setFixedWidth(50)
             self.advanced_layout_node_splits[nt]['factor'] = factor_combo
@@ -7482,75 +6472,12 @@ class PortMapperPyQt(QMainWindow):
             self.advanced_layout_dn_count.setText(str(even_count))
 
     def _get_mellanox_port_order(self, port_count: int) -> list[int]:
-        """
-        Returns ports in unified column order for Advanced Layout tab (applies to all switch types).
-        For 64-port: 16 columns, 4 ports per column (Column 1: 1-4, Column 16: 61-64)
-        For 32-port: 16 columns, 2 ports per column (Column 1: 1-2, Column 16: 31-32)
-        
-        Order: Read down each column (sequential), then next column.
-        Column 1: ports 1, 2, 3, 4 (top to bottom)
-        Column 2: ports 5, 6, 7, 8
-        ...
-        Column 16: ports 61, 62, 63, 64 (for 64-port)
-        """
-        if port_count == 64:
-            # 16 columns, 4 ports per column
-            # Column 1: 1, 2, 3, 4
-            # Column 2: 5, 6, 7, 8
-            # ...
-            # Column 16: 61, 62, 63, 64
-            ports = []
-            for col in range(16):  # Columns 1-16
-                for row in range(4):  # 4 ports per column
-                    port = col * 4 + row + 1
-                    ports.append(port)
-            return ports
-        elif port_count == 32:
-            # 16 columns, 2 ports per column
-            # Column 1: 1, 2
-            # Column 2: 3, 4
-            # ...
-            # Column 16: 31, 32
-            ports = []
-            for col in range(16):  # Columns 1-16
-                for row in range(2):  # 2 ports per column
-                    port = col * 2 + row + 1
-                    ports.append(port)
-            return ports
-        else:
-            # Fallback to sequential
-            return list(range(1, port_count + 1))
+        """Returns ports in unified column order for the Advanced Layout tab."""
+        return get_mellanox_port_order(port_count)
 
     def _get_left_right_ports_mellanox(self, port_count: int) -> tuple[list[int], list[int]]:
-        """
-        Returns LEFT and RIGHT port lists for Advanced Layout tab.
-        Uses unified column ordering: 16 columns total
-        LEFT ports: Columns 1-8 (first half)
-        RIGHT ports: Columns 9-16 (second half), reversed so highest ports come first
-        """
-        all_ports = self._get_mellanox_port_order(port_count)
-        if port_count == 64:
-            # 16 columns, 4 ports per column = 64 ports total
-            # LEFT: Columns 1-8 (ports 1-32 in column order)
-            # RIGHT: Columns 9-16 (ports 33-64 in column order), reversed for high-to-low
-            left = all_ports[:32]
-            right_columns = all_ports[32:]
-            right = list(reversed(right_columns))  # Reverse so highest ports come first
-            return left, right
-        elif port_count == 32:
-            # 16 columns, 2 ports per column = 32 ports total
-            # LEFT: Columns 1-8 (ports 1-16 in column order)
-            # RIGHT: Columns 9-16 (ports 17-32 in column order), reversed for high-to-low
-            left = all_ports[:16]
-            right_columns = all_ports[16:]
-            right = list(reversed(right_columns))  # Reverse so highest ports come first
-            return left, right
-        else:
-            # Fallback: split in half
-            mid = len(all_ports) // 2
-            left = all_ports[:mid]
-            right = list(reversed(all_ports[mid:]))  # Reverse so highest ports come first
-            return left, right
+        """Returns LEFT and RIGHT port lists for the Advanced Layout tab."""
+        return get_left_right_ports_mellanox(port_count)
 
     def _on_advanced_layout_recalculate(self):
         """Recalculate port assignments and update live preview."""
@@ -7773,22 +6700,10 @@ class PortMapperPyQt(QMainWindow):
             return
         
         try:
-            df_raw = pd.DataFrame(self.advanced_layout_port_map, columns=['Port ID', 'Port Name'])
-            df_agg = df_raw.groupby('Port ID')['Port Name'].apply(lambda s: s.iloc[0]).reset_index()
-            
-            scale_a = self.advanced_layout_canvas_a.width() / self.base_image.width if self.base_image and self.base_image.width > 0 and self.advanced_layout_canvas_a.width() > 0 else 1.0
-            dfA = df_agg.copy()
-            dfA['Fabric ID'] = 'A'
-            dfA['Hostname'] = 'SwitchA'
-            imgA = self._draw_overlay(dfA, self.base_image, self.layout_config, display_scale=scale_a)
-            self.advanced_layout_canvas_a.setPixmap(pil_to_qpixmap(imgA))
+            port_map = PortMap.from_pairs(self.advanced_layout_port_map, self.layout_config['PORT_COUNT'])
             
-            scale_b = self.advanced_layout_canvas_b.width() / self.base_image.width if self.base_image and self.base_image.width > 0 and self.advanced_layout_canvas_b.width() > 0 else 1.0
-            dfB = df_agg.copy()
-            dfB['Fabric ID'] = 'B'
-            dfB['Hostname'] = 'SwitchB'
-            imgB = self._draw_overlay(dfB, self.base_image, self.layout_config, display_scale=scale_b)
-            self.advanced_layout_canvas_b.setPixmap(pil_to_qpixmap(imgB))
+            self._show_overlay(self.advanced_layout_canvas_a, port_map, 'A', self.switch_id)
+            self._show_overlay(self.advanced_layout_canvas_b, port_map, 'B', self.switch_id)
         except Exception as e:
             self.advanced_layout_canvas_a.setText(f'Preview error: {e}')
             self.advanced_layout_canvas_b.setText(f'Preview error: {e}')
@@ -7916,7 +6831,15 @@ class PortMapperPyQt(QMainWindow):
         bw_layout.addWidget(self.bw_ext_b_label, 6, 1)
         bw_layout.addWidget(self.bw_ext_b_audit, 6, 2)
         bw_layout.addWidget(self.bw_ext_b_ha_audit, 6, 3)
-        bw_layout.setRowStretch(7, 1)
+        # Multi-rack only: NB (Aggr) summed over every rack, with a per-rack breakdown tooltip
+        self.bw_cluster_title = QLabel("Cluster NB:")
+        self.bw_cluster_label = QLabel("0 GB/s")
+        bw_value_labels.append(self.bw_cluster_label)
+        bw_layout.addWidget(self.bw_cluster_title, 7, 0)
+        bw_layout.addWidget(self.bw_cluster_label, 7, 1)
+        self.bw_cluster_title.hide()
+        self.bw_cluster_label.hide()
+        bw_layout.setRowStretch(8, 1)
 
         # Apply the smaller font to all the bandwidth value labels
         for label in bw_value_labels:
@@ -7956,19 +6879,6 @@ class PortMapperPyQt(QMainWindow):
             QMessageBox.critical(self, 'Error', 'No port data to export')
             return
         try:
-            df_raw = pd.DataFrame(port_map_to_export, columns=['Port ID', 'Port Name'])
-            df_export_a = df_raw.copy()
-            df_export_a['Hostname'] = hostname_a
-            df_export_a['Fabric ID'] = 'A'
-            df_export_a = df_export_a.rename(columns={'Port ID': 'Port ID (A)', 'Port Name': 'Port Name (A)', 'Fabric ID': 'Fabric ID (A)', 'Hostname': 'Hostname (A)'})
-
-            df_export_b = df_raw.copy()
-            df_export_b['Hostname'] = hostname_b
-            df_export_b['Fabric ID'] = 'B'
-            df_export_b = df_export_b.rename(columns={'Port ID': 'Port ID (B)', 'Port Name': 'Port Name (B)', 'Fabric ID': 'Fabric ID (B)', 'Hostname': 'Hostname (B)'})
-
-            df_combined = pd.concat([df_export_a.reset_index(drop=True), df_export_b.reset_index(drop=True)], axis=1)
-            df_combined.insert(0, 'Switch Model', self.layout_config['NAME'])
             ls_type = self.leaf_spine_combo.currentText()
             cluster_name = self.cluster_name_entry.text().strip() or 'UnnamedCluster'
             host_part = f'{hostname_a}-{hostname_b}' if hostname_b and hostname_b != 'FabricB' else hostname_a
@@ -7980,13 +6890,43 @@ class PortMapperPyQt(QMainWindow):
             os.makedirs(self._cluster_output_dir, exist_ok=True)
             csv_filename = get_unique_filename(os.path.join(self._cluster_output_dir, f'{base_filename}.csv'))
             xlsx_filename = get_unique_filename(os.path.join(self._cluster_output_dir, f'{base_filename}.xlsx'))
-            df_combined.to_csv(csv_filename, index=False)
-            df_combined.to_excel(xlsx_filename, index=False)
+            write_port_tables(port_map_to_export, self.layout_config['NAME'], hostname_a, hostname_b, csv_filename, xlsx_filename)
 
             self._show_timed_messagebox('Success', f'Data exported to:\n{os.path.relpath(csv_filename)}\n{os.path.relpath(xlsx_filename)}')
         except Exception as e:
             QMessageBox.critical(self, 'Error', f'Failed to export data: {e}')
 
+    def _collect_setup_values(self) -> dict:
+        """Returns the Setup tab values, keyed as in the exported JSON 'setup_values'."""
+        return {
+            'customer_name': self.customer_name_entry.text(),
+            'site_name': self.site_name_entry.text(),
+            'hostname_a': self.ha_entry.text(),
+            'hostname_b': self.hb_entry.text(),
+            'switch_os': self.vendor_combo.currentText(),
+            'mgmt_default_route': self.net_def_route_entry.text(),
+            'network_cidr': self.net_cidr_combo.currentText(),
+            'fabric_a_mgmt_ip': self.switch_a_mgmt_ip_entry.text(),
+            'fabric_b_mgmt_ip': self.switch_b_mgmt_ip_entry.text(),
+            'cluster_name': self.cluster_name_entry.text(),
+            'ntp_server_ip': self.ntp_server_entry.text(),
+            'leafs_or_spines': self.leaf_spine_combo.currentText(),
+            'uplink_speed': self.uplink_speed_combo.currentText(),
+            'customer_vlans': self.customer_vlans_entry.text(),
+            'bgp_asn': self.bgp_asn_entry.text(),
+            'data_vlan': self.data_vlan_entry.text(),
+            'vxlan': self.vxlan_checkbox.isChecked(), 'pfc': self.pfc_checkbox.isChecked(),
+            'use_2nd_nic': 'Yes' if self.use_2nd_nic_checkbox.isChecked() else 'No',
+            'use_converged_networking': self.use_converged_networking_checkbox.isChecked(),
+            'fabric_topology': self.fabric_topology,
+            'use_vxlan_overlay': self.use_vxlan_overlay,
+            'peak_bw_goal': self.peak_bw_goal_entry.text(),
+            'peak_bw_units': self.peak_bw_units_combo.currentText(),
+            'multi_rack_enabled': self.multi_rack_checkbox.isChecked(),
+            'legacy_mode_enabled': self.legacy_mode_checkbox.isChecked(),
+            'mapping_mode': self.cell_planning_mode,  # NEW: Export current mode
+        }
+
     def _export_config_to_json(self, filepath: Union[str, bool] = False):
         """Gathers the current UI state and exports it to a JSON file."""
         if not isinstance(filepath, str):
@@ -8020,34 +6960,7 @@ class PortMapperPyQt(QMainWindow):
                     'config_name': os.path.basename(filepath).replace('.json', ''),
                     'description': f'Exported configuration from Port-Mapper v{SCRIPT_VERSION}'
                 },
-                'setup_values': {
-                    'customer_name': self.customer_name_entry.text(),
-                    'site_name': self.site_name_entry.text(),
-                    'hostname_a': self.ha_entry.text(),
-                    'hostname_b': self.hb_entry.text(),
-                    'switch_os': self.vendor_combo.currentText(),
-                    'mgmt_default_route': self.net_def_route_entry.text(),
-                    'network_cidr': self.net_cidr_combo.currentText(),
-                    'fabric_a_mgmt_ip': self.switch_a_mgmt_ip_entry.text(),
-                    'fabric_b_mgmt_ip': self.switch_b_mgmt_ip_entry.text(),
-                    'cluster_name': self.cluster_name_entry.text(),
-                    'ntp_server_ip': self.ntp_server_entry.text(),
-                    'leafs_or_spines': self.leaf_spine_combo.currentText(),
-                    'uplink_speed': self.uplink_speed_combo.currentText(),
-                    'customer_vlans': self.customer_vlans_entry.text(),
-                    'bgp_asn': self.bgp_asn_entry.text(),
-                    'data_vlan': self.data_vlan_entry.text(),
-                    'vxlan': self.vxlan_checkbox.isChecked(), 'pfc': self.pfc_checkbox.isChecked(),
-                    'use_2nd_nic': 'Yes' if self.use_2nd_nic_checkbox.isChecked() else 'No',
-                    'use_converged_networking': self.use_converged_networking_checkbox.isChecked(),
-                    'fabric_topology': self.fabric_topology,
-                    'use_vxlan_overlay': self.use_vxlan_overlay,
-                    'peak_bw_goal': self.peak_bw_goal_entry.text(),
-                    'peak_bw_units': self.peak_bw_units_combo.currentText(),
-                    'multi_rack_enabled': self.multi_rack_checkbox.isChecked(),
-                    'legacy_mode_enabled': self.legacy_mode_checkbox.isChecked(),
-                    'mapping_mode': self.cell_planning_mode,  # NEW: Export current mode
-                },
+                'setup_values': self._collect_setup_values(),
                 'node_types': {},
                 'uplink_types': {}
             }
@@ -8098,6 +7011,7 @@ class PortMapperPyQt(QMainWindow):
                             config['advanced_config']['node_routing'][nt] = 'RIGHT'
             
             # --- Add Legacy Install Values ---
+            self.legacy_installs_tab.ensure_built()
             config['legacy_install_values'] = {
                 'customer': self.legacy_customer.text(),
                 'cluster_name': self.legacy_cluster_name.text(),
@@ -8456,6 +7370,7 @@ class PortMapperPyQt(QMainWindow):
 
         # Apply legacy install values
         if 'legacy_install_values' in config:
+            self.legacy_installs_tab.ensure_built()
             lv = config['legacy_install_values']
             self.legacy_customer.setText(lv.get('customer', ''))
             self.legacy_cluster_name.setText(lv.get('cluster_name', ''))
@@ -8520,7 +7435,7 @@ class PortMapperPyQt(QMainWindow):
                 parsed = _parse_port_string(ent_check['st'].text())
                 if parsed: node_base_assigned.update(parsed)
 
-        temp_assigned_for_nodes = node_base_assigned.copy()
+        temp_assigned_for_nodes = FreePortIndex(node_base_assigned)
         cur_low = 1
         for nt in self.node_types:
             ent = self.node_entries[nt]
@@ -8531,13 +7446,11 @@ class PortMapperPyQt(QMainWindow):
                 reserved = safe_int(ent['rsv'].text())
                 phys_needed = (math.ceil(count / factor) if split else count) + reserved
                 if phys_needed > 0:
-                    start_pos = cur_low
-                    while any(p in temp_assigned_for_nodes for p in range(start_pos, start_pos + phys_needed)):
-                        start_pos += 1
+                    start_pos = temp_assigned_for_nodes.first_free_run(phys_needed, cur_low)
                     # Do not pre-populate the text box. The placeholder text will guide the user.
                     # ent['st'].setText(str(start_pos))
                     ent['st'].setPlaceholderText(str(start_pos))
-                    temp_assigned_for_nodes.update(range(start_pos, start_pos + phys_needed))
+                    temp_assigned_for_nodes.add_run(start_pos, phys_needed)
                     cur_low = start_pos + phys_needed
                 else:
                     ent['st'].clear()
@@ -8554,7 +7467,7 @@ class PortMapperPyQt(QMainWindow):
                     parsed = _parse_port_string(ent_check['st'].text())
                     if parsed: uplink_base_assigned.update(parsed)
 
-        temp_assigned_for_uplinks = uplink_base_assigned.copy()
+        temp_assigned_for_uplinks = FreePortIndex(uplink_base_assigned)
         for ut in self.uplink_types:  # Assign from high ports down, IPL first
             ent = self.uplink_entries[ut]
             if not ent['lock_cb'].isChecked():
@@ -8569,21 +7482,14 @@ class PortMapperPyQt(QMainWindow):
 
                 if total_span > 0:
                     # Always search from the absolute top for each uplink type
-                    start_pos = self.layout_config['PORT_COUNT']
-                    while start_pos >= total_span:
-                        port_range = range(start_pos - total_span + 1, start_pos + 1)
-                        if not any(p in temp_assigned_for_uplinks for p in port_range):
-                            break
-                        start_pos -= 1
-                    else: # Loop finished without break
-                        start_pos = -1 # Indicate no space found
-
-                    if start_pos != -1:
+                    start_pos = temp_assigned_for_uplinks.last_free_run(total_span, self.layout_config['PORT_COUNT'])
+
+                    if start_pos is not None:
                         # Do not pre-populate the text box. The placeholder text will guide the user.
                         # ent['st'].setText(str(start_pos))
                         ent['st'].setPlaceholderText(str(start_pos))
                         # Add the found ports to the temporary set for the next iteration
-                        temp_assigned_for_uplinks.update(range(start_pos - total_span + 1, start_pos + 1))
+                        temp_assigned_for_uplinks.add_run(start_pos - total_span + 1, total_span)
                     else:
                         ent['st'].setText("N/A")
                 else:
@@ -8594,69 +7500,9 @@ class PortMapperPyQt(QMainWindow):
         Calculates a slice-balanced, round-robin port assignment for Cisco C9364.
         Returns (list_of_tuples, error_string, next_slice_to_use)
         """
-        phys_for_nodes = math.ceil(cnt / fac) if split and fac > 1 else cnt
-        total_phys = phys_for_nodes + rsv
-
-        if total_phys == 0:
-            return ([], None, start_slice)
-
-        num_slices = self.layout_config['PORT_COUNT'] // 8
-        base_ports_per_slice = total_phys // num_slices
-        extra_ports = total_phys % num_slices
-        slice_counts = [base_ports_per_slice] * num_slices
-        for i in range(extra_ports):
-            slice_to_get_extra = (start_slice + i) % num_slices
-            slice_counts[slice_to_get_extra] += 1
-
-        available_by_slice = [[] for _ in range(num_slices)]
-        for p in range(1, self.layout_config['PORT_COUNT'] + 1):
-            if p not in existing_ports:
-                slice_idx = (p - 1) // 8
-                if 0 <= slice_idx < num_slices:
-                    available_by_slice[slice_idx].append(p)
-
-        for i in range(num_slices):
-            if len(available_by_slice[i]) < slice_counts[i]:
-                err_msg = (f"Cannot assign ports for {nt}.\n"
-                           f"Slice {i+1} (Ports {i*8+1}-{i*8+8}) needs {slice_counts[i]} ports, "
-                           f"but only {len(available_by_slice[i])} are available.")
-                return (None, err_msg, start_slice)
-
-        ports_to_use = []
-        slice_pointers = [0] * num_slices
-        last_slice_assigned = -1
-
-        while len(ports_to_use) < total_phys:
-            ports_at_start_of_pass = len(ports_to_use)
-            for i in range(num_slices):
-                slice_idx = (start_slice + i) % num_slices
-                if slice_pointers[slice_idx] < slice_counts[slice_idx]:
-                    port_to_add = available_by_slice[slice_idx][slice_pointers[slice_idx]]
-                    ports_to_use.append(port_to_add)
-                    slice_pointers[slice_idx] += 1
-                    last_slice_assigned = slice_idx
-
-            if len(ports_to_use) == ports_at_start_of_pass:
-                break
-
-        port_labels = []
-        for i in range(phys_for_nodes):
-            port_num = ports_to_use[i]
-            if split and fac > 1:
-                first_node = node_start + i * fac
-                last_node = min(first_node + fac - 1, node_start + cnt - 1)
-                label = f'{nt}-{first_node}' if first_node == last_node else f'{nt}-{first_node}/{last_node}'
-            else:
-                label = f'{nt}-{node_start + i}'
-            port_labels.append((port_num, label))
-
-        for i in range(rsv):
-            port_num = ports_to_use[phys_for_nodes + i]
-            label = f'RSVD-{nt}'
-            port_labels.append((port_num, label))
-
-        next_slice = (last_slice_assigned + 1) % num_slices if last_slice_assigned != -1 else start_slice
-        return (port_labels, None, next_slice)
+        return generate_cisco_balanced_node_ports(nt, cnt, split, fac, rsv, node_start, existing_ports,
+                                                  self.layout_config['PORT_COUNT'], start_slice=start_slice,
+                                                  slice_size=self.layout_config['SLICE_SIZE'])
 
     def _generate_cisco_balanced_uplink_ports(self, ut, groups, ppg, split, fac, rsv, existing_ports, start_slice):
         """
@@ -8664,118 +7510,19 @@ class PortMapperPyQt(QMainWindow):
         assigning from high ports to low ports.
         Returns (list_of_tuples, error_string, next_slice_to_use)
         """
-        if ut == 'NB':
-            phys_for_data = math.ceil(ppg / fac) if split and fac > 1 else ppg
-            total_phys = phys_for_data + rsv
-        else:
-            total_phys = (ppg + rsv) * groups
-
-        if total_phys == 0:
-            return ([], None, start_slice)
-
-        num_slices = self.layout_config['PORT_COUNT'] // 8
-        base_ports_per_slice = total_phys // num_slices
-        extra_ports = total_phys % num_slices
-        slice_counts = [base_ports_per_slice] * num_slices
-        for i in range(extra_ports):
-            slice_to_get_extra = (start_slice - i + num_slices) % num_slices
-            slice_counts[slice_to_get_extra] += 1
-
-        available_by_slice = [[] for _ in range(num_slices)]
-        for p in range(self.layout_config['PORT_COUNT'], 0, -1):
-            if p not in existing_ports:
-                slice_idx = (p - 1) // 8
-                if 0 <= slice_idx < num_slices:
-                    available_by_slice[slice_idx].append(p)
-
-        for i in range(num_slices):
-            if len(available_by_slice[i]) < slice_counts[i]:
-                err_msg = (f"Cannot assign uplink ports for {ut}.\n"
-                           f"Slice {i+1} (Ports {i*8+1}-{i*8+8}) needs {slice_counts[i]} ports, "
-                           f"but only {len(available_by_slice[i])} are available from the top down.")
-                return (None, err_msg, start_slice)
-
-        ports_to_use = []
-        slice_pointers = [0] * num_slices
-        last_slice_assigned = -1
-        while len(ports_to_use) < total_phys:
-            ports_at_start_of_pass = len(ports_to_use)
-            for i in range(num_slices):
-                slice_idx = (start_slice - i + num_slices) % num_slices
-                if slice_pointers[slice_idx] < slice_counts[slice_idx]:
-                    port_to_add = available_by_slice[slice_idx][slice_pointers[slice_idx]]
-                    ports_to_use.append(port_to_add)
-                    slice_pointers[slice_idx] += 1
-                    last_slice_assigned = slice_idx
-                    if len(ports_to_use) == total_phys:
-                        break
-            if len(ports_to_use) == ports_at_start_of_pass:
-                break
-
-        ports_to_use.sort(reverse=True)
-        port_iterator = iter(ports_to_use)
-        port_labels = []
-
-        try:
-            if ut == 'NB':
-                # Get CN and EB counts for proper labeling
-                cn_count = safe_int(self.node_entries.get('CN', {}).get('cnt', QLineEdit()).text(), 0) if hasattr(self, 'node_entries') else 0
-                eb_count = safe_int(self.node_entries.get('EB', {}).get('cnt', QLineEdit()).text(), 0) if hasattr(self, 'node_entries') else 0
-                
-                cn_nb_count = 0
-                eb_nb_count = 0
-                
-                for i in range(phys_for_data):
-                    port_num = next(port_iterator)
-                    if split and fac > 1:
-                        first = i * fac + 1
-                        last = min(first + fac - 1, ppg)
-                        # Determine if this port corresponds to CN or EB
-                        if i < cn_count:
-                            cn_nb_count += 1
-                            label = f'CN-NB-{cn_nb_count}' if first == last else f'CN-NB-{cn_nb_count}/{last}'
-                        else:
-                            eb_nb_count += 1
-                            label = f'EB-NB-{eb_nb_count}' if first == last else f'EB-NB-{eb_nb_count}/{last}'
-                    else:
-                        # Determine if this port corresponds to CN or EB
-                        if i < cn_count:
-                            cn_nb_count += 1
-                            label = f'CN-NB-{cn_nb_count}'
-                        else:
-                            eb_nb_count += 1
-                            label = f'EB-NB-{eb_nb_count}'
-                    port_labels.append((port_num, label))
-                for _ in range(rsv):
-                    port_num = next(port_iterator)
-                    label = f'RSVD-NB'
-                    port_labels.append((port_num, label))
-            else:
-                # *** CRITICAL: DO NOT CHANGE THIS LABEL MAPPING ***
-                # Display 'EXT' instead of 'MLAG/BGP' for port labels
-                display_ut = 'EXT' if ut == 'MLAG/BGP' else ut
-                for group_num in range(groups):
-                    for port_index in range(ppg):
-                        port_num = next(port_iterator)
-                        if display_ut == 'IPL':
-                            label = f'IPL-{port_index + 1}'
-                        elif groups > 1:
-                            label = f'{display_ut}{group_num + 1}-{port_index + 1}'
-                        else:
-                            label = f'{display_ut}-{port_index + 1}'
-                        if split and fac > 1 and (display_ut != 'IPL'):
-                            label += f'/{fac}'
-                        port_labels.append((port_num, label))
-
-                    for _ in range(rsv):
-                        port_num = next(port_iterator)
-                        label = 'RSVD-EXT' if display_ut == 'EXT' else f'RSVD-{display_ut}'
-                        port_labels.append((port_num, label))
-        except StopIteration:
-            return (None, f"Internal error during labeling for {ut}: not enough ports collected.", start_slice)
-
-        next_slice = (last_slice_assigned - 1 + num_slices) % num_slices if last_slice_assigned != -1 else start_slice
-        return (port_labels, None, next_slice)
+        cn_count, eb_count = self._get_nb_cn_eb_counts() if ut == 'NB' else (0, 0)
+        return generate_cisco_balanced_uplink_ports(ut, groups, ppg, split, fac, rsv, existing_ports,
+                                                    self.layout_config['PORT_COUNT'], start_slice,
+                                                    cn_count=cn_count, eb_count=eb_count,
+                                                    slice_size=self.layout_config['SLICE_SIZE'])
+
+    def _get_nb_cn_eb_counts(self) -> tuple[int, int]:
+        """Returns the CN and EB counts from the Cell Planning tab, used to label NB ports."""
+        if not hasattr(self, 'node_entries'):
+            return 0, 0
+        cn_count = safe_int(self.node_entries.get('CN', {}).get('cnt', QLineEdit()).text(), 0)
+        eb_count = safe_int(self.node_entries.get('EB', {}).get('cnt', QLineEdit()).text(), 0)
+        return cn_count, eb_count
 
     def generate_node_ports(self, silent=False):
         # Validation loop for manual entries
@@ -8816,7 +7563,7 @@ class PortMapperPyQt(QMainWindow):
             self._do_live_preview()
             return
 
-        existing_ports = {p for p, _ in self.port_map}
+        existing_ports = FreePortIndex(p for p, _ in self.port_map)
         starts = {nt: 1 for nt in self.node_types}
         next_balanced_slice = 0
 
@@ -8870,9 +7617,7 @@ class PortMapperPyQt(QMainWindow):
                         port_labels.append((parsed_ports[reserved_start_index + i], f'RSVD-{nt}'))
             else: # Automatic assignment
                 phys_needed = (math.ceil(cnt / fac) if split else cnt) + rsv
-                spt = 1
-                while any(p in existing_ports for p in range(spt, spt + phys_needed)):
-                    spt += 1
+                spt = existing_ports.first_free_run(phys_needed)
                 port_labels, _ = self.planner.generate_node_ports(nt, cnt, split, fac, spt, rsv, starts[nt])
 
             self.port_map.extend(port_labels)
@@ -8926,7 +7671,7 @@ class PortMapperPyQt(QMainWindow):
         self.port_map = [p for p in self.port_map if get_port_base_type(p[1]) not in bases]
 
         # Start with ports assigned to nodes.
-        existing_ports = {p for p, _ in self.port_map}
+        existing_ports = FreePortIndex(p for p, _ in self.port_map)
         # Pre-populate existing_ports with any manually locked uplink ports to avoid conflicts.
         for ut_check in self.uplink_types:
             ent_check = self.uplink_entries[ut_check]
@@ -8940,7 +7685,7 @@ class PortMapperPyQt(QMainWindow):
                         existing_ports.update(parsed)
 
         ports_generated_this_run = 0
-        next_balanced_uplink_slice = self.layout_config['PORT_COUNT'] // 8 - 1
+        next_balanced_uplink_slice = self.layout_config['PORT_COUNT'] // self.layout_config['SLICE_SIZE'] - 1
 
         for ut in self.uplink_types:
             ent = self.uplink_entries[ut]
@@ -9045,14 +7790,9 @@ class PortMapperPyQt(QMainWindow):
             else:
                 # Automatic, non-balanced assignment. Search from the top every time.
                 if total_span > 0:
-                    spt_high = self.layout_config['PORT_COUNT']
                     # Find a block of available ports from the top down
-                    while spt_high >= total_span:
-                        port_range_to_check = range(spt_high - total_span + 1, spt_high + 1)
-                        if not any(p in existing_ports for p in port_range_to_check):
-                            break  # Found a free block
-                        spt_high -= 1
-                    else:  # This else belongs to the while loop
+                    spt_high = existing_ports.last_free_run(total_span, self.layout_config['PORT_COUNT'])
+                    if spt_high is None:
                         if not silent:
                             QMessageBox.critical(self, 'Port Assignment Error', f"Not enough available ports for uplink type '{ut}'.")
                         return
@@ -9103,7 +7843,7 @@ class PortMapperPyQt(QMainWindow):
         rack_layout_config = SWITCH_LAYOUTS[rack_switch_id]
         
         try:
-            rack_base_image = Image.open(resource_path(rack_layout_config['IMAGE'])).convert('RGBA')
+            rack_base_image = load_base_image(rack_switch_id)
         except (FileNotFoundError, KeyError):
             rack_base_image = None
 
@@ -9113,21 +7853,10 @@ class PortMapperPyQt(QMainWindow):
             return
         
         # Remove duplicate port IDs, keeping the last occurrence
-        seen_ports = {}
-        for port_id, port_name in reversed(port_map):
-            if port_id not in seen_ports:
-                seen_ports[port_id] = port_name
-        port_map_deduplicated = [(port_id, seen_ports[port_id]) for port_id in sorted(seen_ports.keys())]
-        
-        df = pd.DataFrame(port_map_deduplicated, columns=['Port ID', 'Port Name'])
-        
-        # For the UI canvases, calculate their specific scale and redraw the overlay
-        # with adjusted border thickness so it looks correct when scaled down.
-        scale = self.multi_rack_canvas_a.width() / rack_base_image.width if rack_base_image and rack_base_image.width > 0 and self.multi_rack_canvas_a.width() > 0 else 1.0
-        img_a = self._draw_overlay(df.assign(**{'Fabric ID': 'A'}), rack_base_image, rack_layout_config, display_scale=scale)
-        img_b = self._draw_overlay(df.assign(**{'Fabric ID': 'B'}), rack_base_image, rack_layout_config, display_scale=scale)
-        self.multi_rack_canvas_a.setPixmap(pil_to_qpixmap(img_a))
-        self.multi_rack_canvas_b.setPixmap(pil_to_qpixmap(img_b))
+        port_map_deduplicated = PortMap.from_pairs(port_map, rack_layout_config['PORT_COUNT'], keep='last')
+        
+        self._show_overlay(self.multi_rack_canvas_a, port_map_deduplicated, 'A', rack_switch_id)
+        self._show_overlay(self.multi_rack_canvas_b, port_map_deduplicated, 'B', rack_switch_id)
 
     def _do_live_preview(self):
         current_tab_index = self.notebook.currentIndex()
@@ -9139,223 +7868,47 @@ class PortMapperPyQt(QMainWindow):
         elif current_tab_index == self.notebook.indexOf(self.multi_rack_tab):
             self._draw_multi_rack_preview()
 
+    def _bump_preview_revision(self, *_):
+        """Marks the live preview inputs as changed; the next preview runs the placement again."""
+        self._preview_revision += 1
+
     def _calculate_full_preview_port_map(self) -> list[tuple[int, str]]:
+        """
+        Returns the live preview port map for the current UI inputs, running the placement
+        only once per input revision: preview canvases A and B, the Output tab and the
+        bandwidth panel all read the same result. The list is shared; do not mutate it.
+        """
+        key = (self._preview_revision, self.switch_id, self.leaf_spine_combo.currentText(),
+               self.placement_mode, self.solver_time_budget)
+        memo = self._preview_port_map_memo
+        if memo is None or memo[0] != key:
+            # Also refreshes the capacity warning labels, which only change with the inputs
+            valid = self._validate_total_port_count()
+            memo = self._preview_port_map_memo = (key, valid, self._compute_full_preview_port_map() if valid else None)
+        if not memo[1]:
+            # Over capacity: show the committed assignments, which change without touching the inputs
+            return self._committed_preview_port_map()
+        return memo[2]
+
+    def _committed_preview_port_map(self) -> list[tuple[int, str]]:
+        """The committed self.port_map, without node ports in spine mode."""
+        if self.leaf_spine_combo.currentText() == 'spine':
+            return [(port_id, port_name) for port_id, port_name in (self.port_map or [])
+                    if get_port_base_type(port_name) not in self.node_types]
+        return self.port_map.copy() if self.port_map else []
+
+    def _compute_full_preview_port_map(self) -> list[tuple[int, str]]:
         """
         Calculates a complete port map based on the current UI inputs from both
         the Node Types and Uplinks tabs. This is for generating live previews
         and does not commit to self.port_map. It respects locked ports and performs
         a full, combined auto-assignment for unlocked ports.
-        
-        If the total ports needed exceeds switch capacity, returns the currently
-        committed self.port_map instead of calculating a speculative preview.
         """
-        # Check if we're in spine mode - if so, only process uplink ports
-        is_spine_mode = self.leaf_spine_combo.currentText() == 'spine'
-        
-        # First check if the current configuration would exceed capacity
-        # If it does, return the actual committed port_map instead of a speculative preview
-        if not self._validate_total_port_count():
-            # Validation failed - return only the committed assignments
-            # Filter out node ports if in spine mode
-            if is_spine_mode:
-                return [(port_id, port_name) for port_id, port_name in (self.port_map.copy() if self.port_map else []) 
-                       if get_port_base_type(port_name) not in self.node_types]
-            return self.port_map.copy() if self.port_map else []
-        
-        preview_port_map = []
-        assigned_ports = set()
-        node_starts = {nt: 1 for nt in self.node_types}
-
-        # --- 1. Handle locked ports first ---
-        # Handle locked NODE ports (skip in spine mode)
-        if not is_spine_mode:
-            for nt, ent in self.node_entries.items():
-                if ent['lock_cb'].isChecked():
-                    manual_ports_str = ent['st'].text().strip()
-                    parsed_ports = _parse_port_string(manual_ports_str)
-                    cnt = safe_int(ent['cnt'].text())
-                    split = ent['split_cb'].isChecked()
-                    fac = safe_int(ent['fac'].currentText(), 1) if split else 1
-                    rsv = safe_int(ent['rsv'].text())
-                    
-                    if parsed_ports:
-                        # Check if it's a single start port or a full list
-                        is_start_port_mode = '-' not in manual_ports_str and ',' not in manual_ports_str and manual_ports_str.isdigit()
-                        
-                        if is_start_port_mode:
-                            # User entered a single number, treat it as the starting port
-                            start_port = int(manual_ports_str)
-                            port_labels, _ = self.planner.generate_node_ports(nt, cnt, split, fac, start_port, rsv, node_starts[nt])
-                            preview_port_map.extend(port_labels)
-                            assigned_ports.update(p for p, _ in port_labels)
-                        else:
-                            # User entered a full list/range - generate labels for each port
-                            phys_needed_for_nodes = math.ceil(cnt / fac) if split else cnt
-                            for i in range(phys_needed_for_nodes):
-                                if i >= len(parsed_ports): break
-                                port_num = parsed_ports[i]
-                                if split:
-                                    first_node = node_starts[nt] + i * fac
-                                    last_node = min(first_node + fac - 1, node_starts[nt] + cnt - 1)
-                                    label = f'{nt}-{first_node}' if first_node == last_node else f'{nt}-{first_node}/{last_node}'
-                                else:
-                                    label = f'{nt}-{node_starts[nt] + i}'
-                                preview_port_map.append((port_num, label))
-                            
-                            # Add reserved ports
-                            reserved_start_index = phys_needed_for_nodes
-                            for i in range(rsv):
-                                if reserved_start_index + i >= len(parsed_ports): break
-                                preview_port_map.append((parsed_ports[reserved_start_index + i], f'RSVD-{nt}'))
-                            
-                            assigned_ports.update(parsed_ports)
-                        
-                        node_starts[nt] += cnt
-
-        # --- 0. Auto-assign unlocked Uplinks FIRST (from high ports down) ---
-        next_balanced_uplink_slice = self.layout_config['PORT_COUNT'] // 8 - 1
-        # Use priority order to ensure correct assignment: IPL, ISL, EXT, NB from highest port down
-        for ut in ['IPL', 'ISL', 'MLAG/BGP', 'NB']:
-            ent = self.uplink_entries[ut]
-            if ent['lock_cb'].isChecked(): 
-                continue
-
-            # For IPL and NB, groups is always 1 (widget is disabled)
-            if ut in ['IPL', 'NB']:
-                groups = 1
-            else:
-                gcnt_widget = ent.get('gcnt')
-                if gcnt_widget and hasattr(gcnt_widget, 'text'):
-                    groups = safe_int(gcnt_widget.text())
-                else:
-                    groups = 1  # Default if widget doesn't exist
-            
-            ppg = safe_int(ent['ppg'].text())
-            split = ent['split_cb'].isChecked()
-            fac = safe_int(ent['fac'].currentText(), 1) if split else 1
-            rsv = safe_int(ent['rsv'].text())
-
-            ports = []
-            if self.layout_config.get('BALANCED_UPLINK_ASSIGNMENT'):
-                ports, _, next_balanced_uplink_slice = self._generate_cisco_balanced_uplink_ports(
-                    ut, groups, ppg, split, fac, rsv, assigned_ports, start_slice=next_balanced_uplink_slice)
-            else:
-                phys_per_group = math.ceil(ppg / fac) if split and fac > 1 else ppg
-                total_span = (phys_per_group + rsv) * groups
-                if total_span > 0:
-                    spt_high = self.layout_config['PORT_COUNT']
-                    # Check if the range [spt_high - total_span + 1, spt_high] conflicts with assigned_ports
-                    while spt_high >= total_span:
-                        start_port = spt_high - total_span + 1
-                        end_port = spt_high + 1
-                        # Check if ANY port in our desired range is already assigned
-                        if any(p in assigned_ports for p in range(start_port, end_port)):
-                            spt_high -= 1
-                        else:
-                            break
-                    if spt_high >= total_span:
-                        # Get CN and EB counts for NB port labeling
-                        cn_count = safe_int(self.node_entries.get('CN', {}).get('cnt', QLineEdit()).text(), 0) if ut == 'NB' and hasattr(self, 'node_entries') else 0
-                        eb_count = safe_int(self.node_entries.get('EB', {}).get('cnt', QLineEdit()).text(), 0) if ut == 'NB' and hasattr(self, 'node_entries') else 0
-                        ports = self.planner.generate_grouped_ports(ut, groups, ppg, split, fac, spt_high, rsv, locked=False, cn_count=cn_count, eb_count=eb_count)
-
-            if ports:
-                preview_port_map.extend(ports)
-                assigned_ports.update(p for p, _ in ports)
-
-        # --- 1. Handle locked UPLINK ports SECOND (use priority order to ensure correct assignment) ---
-        for ut in ['IPL', 'ISL', 'MLAG/BGP', 'NB']:
-            ent = self.uplink_entries[ut]
-            if ent['lock_cb'].isChecked():
-                manual_ports_str = ent['st'].text().strip()
-                parsed_ports = _parse_port_string(manual_ports_str)
-                
-                # Get groups for locked uplinks
-                if ut in ['IPL', 'NB']:
-                    groups = 1
-                else:
-                    gcnt_widget = ent.get('gcnt')
-                    if gcnt_widget and hasattr(gcnt_widget, 'text'):
-                        groups = safe_int(gcnt_widget.text())
-                    else:
-                        groups = 1  # Default if widget doesn't exist
-                ppg = safe_int(ent['ppg'].text())
-                split = ent['split_cb'].isChecked()
-                fac = safe_int(ent['fac'].currentText(), 1) if split else 1
-                rsv = safe_int(ent['rsv'].text())
-                
-                
-                
-                if parsed_ports:
-                    # For uplinks, we need to generate the full labels now so they draw correctly.
-                    # We can use the planner by treating the first parsed port as the "start".
-                    # Get CN and EB counts for NB port labeling
-                    cn_count = safe_int(self.node_entries.get('CN', {}).get('cnt', QLineEdit()).text(), 0) if ut == 'NB' and hasattr(self, 'node_entries') else 0
-                    eb_count = safe_int(self.node_entries.get('EB', {}).get('cnt', QLineEdit()).text(), 0) if ut == 'NB' and hasattr(self, 'node_entries') else 0
-                    ports = self.planner.generate_grouped_ports(ut, groups, ppg, split, fac, parsed_ports[0], rsv, locked=True, cn_count=cn_count, eb_count=eb_count)
-                    preview_port_map.extend(ports)
-                    assigned_ports.update(parsed_ports)
-                elif ppg > 0:
-                    # Handle locked ports without manual assignment (like auto-locked NB ports)
-                    # Use auto-assignment logic for these ports
-                    ports = []  # Initialize ports list
-                    if self.layout_config.get('BALANCED_UPLINK_ASSIGNMENT'):
-                        ports, _, _ = self._generate_cisco_balanced_uplink_ports(
-                            ut, groups, ppg, split, fac, rsv, assigned_ports, start_slice=0)
-                    else:
-                        phys_per_group = math.ceil(ppg / fac) if split and fac > 1 else ppg
-                        total_span = (phys_per_group + rsv) * groups
-                        if total_span > 0:
-                            spt_high = self.layout_config['PORT_COUNT']
-                            # Check if the range [spt_high - total_span + 1, spt_high] conflicts with assigned_ports
-                            while spt_high >= total_span:
-                                start_port = spt_high - total_span + 1
-                                end_port = spt_high + 1
-                                # Check if ANY port in our desired range is already assigned
-                                if any(p in assigned_ports for p in range(start_port, end_port)):
-                                    spt_high -= 1
-                                else:
-                                    break
-                            if spt_high >= total_span:
-                                # Get CN and EB counts for NB port labeling
-                                cn_count = safe_int(self.node_entries.get('CN', {}).get('cnt', QLineEdit()).text(), 0) if ut == 'NB' and hasattr(self, 'node_entries') else 0
-                                eb_count = safe_int(self.node_entries.get('EB', {}).get('cnt', QLineEdit()).text(), 0) if ut == 'NB' and hasattr(self, 'node_entries') else 0
-                                ports = self.planner.generate_grouped_ports(ut, groups, ppg, split, fac, spt_high, rsv, locked=True, cn_count=cn_count, eb_count=eb_count)
-                    
-                    if ports:
-                        preview_port_map.extend(ports)
-                        assigned_ports.update(p for p, _ in ports)
-
-        # --- 3. Auto-assign unlocked Nodes (from low ports up) ---
-        # Skip node auto-assignment in spine mode
-        if not is_spine_mode:
-            next_balanced_node_slice = 0
-            for nt in self.node_types:
-                ent = self.node_entries[nt]
-                if ent['lock_cb'].isChecked(): continue
-
-                count = safe_int(ent['cnt'].text())
-                split = ent['split_cb'].isChecked()
-                fac = safe_int(ent['fac'].currentText(), 1) if split else 1
-                rsv = safe_int(ent['rsv'].text())
-
-                ports = []
-                if self.layout_config.get('BALANCED_NODE_ASSIGNMENT'):
-                    ports, _, next_balanced_node_slice = self._generate_cisco9364_node_ports(
-                        nt, count, split, fac, rsv, node_starts[nt], assigned_ports, start_slice=next_balanced_node_slice)
-                else:
-                    phys_needed = (math.ceil(count / fac) if split else count) + rsv
-                    if phys_needed > 0:
-                        spt = 1
-                        while any(p in assigned_ports for p in range(spt, spt + phys_needed)):
-                            spt += 1
-                        ports, _ = self.planner.generate_node_ports(nt, count, split, fac, spt, rsv, node_starts[nt])
-
-                if ports:
-                    preview_port_map.extend(ports)
-                    assigned_ports.update(p for p, _ in ports)
-                node_starts[nt] += count
-
+        # Plan the widgets exactly as the first rack would be planned; spine switches carry no nodes
+        rack_data = dict(self._cell_planning_rack_data(), switch_id=self.switch_id)
+        if self.leaf_spine_combo.currentText() == 'spine':
+            rack_data['nodes'] = {}
+        preview_port_map, _ = self._calculate_rack_port_map(rack_data)
         return preview_port_map
 
     def _draw_preview(self, canvas: QLabel, fabric_id: str, *, include_uplinks: bool):
@@ -9376,53 +7929,36 @@ class PortMapperPyQt(QMainWindow):
                 canvas.setText('⬅ Configure and assign node ports above')
             return
 
-        df_raw = pd.DataFrame(rows, columns=['Port ID', 'Port Name'])
-        # Use .copy() to create a new DataFrame and avoid SettingWithCopyWarning.
-        # This ensures that we are modifying a copy, not a view, of the original data.
-        df = df_raw.drop_duplicates(subset=['Port ID'], keep='first').copy()
-        df['Fabric ID'] = fabric_id
-        df['Hostname'] = self.ha_entry.text().strip() or 'FabricA' if fabric_id == 'A' else self.hb_entry.text().strip() or 'FabricB'
+        port_map = PortMap.from_pairs(rows, self.layout_config['PORT_COUNT'])
+        self._show_overlay(canvas, port_map, fabric_id, self.switch_id)
 
-        # Calculate the display scale factor to adjust border thickness for the preview.
-        # We only care about width scaling, as the canvases are width-constrained.
-        display_scale = 1.0
-        if self.base_image and self.base_image.width > 0 and canvas.width() > 0:
-            display_scale = canvas.width() / self.base_image.width
+    def _show_overlay(self, canvas: 'ScalableLabel', port_map: PortMap, fabric: str, switch_id: str):
+        """
+        Shows the overlay for one fabric on a preview canvas. The render runs on the preview
+        worker at the canvas width; the canvas keeps its current frame until the new one arrives.
+        """
+        cn_count, eb_count = self._get_nb_cn_eb_counts()
+        self.preview_renderer.submit(PreviewJob(canvas, canvas.next_frame(), port_map, switch_id, fabric,
+                                                max(0, canvas.width()), cn_count, eb_count))
 
-        img = self._draw_overlay(df, self.base_image, self.layout_config, display_scale=display_scale)
-        canvas.setPixmap(pil_to_qpixmap(img))
+    def _on_preview_frame(self, canvas: 'ScalableLabel', generation: int, frame):
+        """Shows a finished preview frame unless the canvas has moved on since it was requested."""
+        if not canvas.is_current_frame(generation):
+            return
+        if isinstance(frame, str):
+            canvas.setText(frame)
+        else:
+            canvas.setImage(frame)
 
-    def _draw_overlay(self, df: pd.DataFrame, base: Image.Image, cfg: dict, *, display_scale: float = 1.0) -> Image.Image:
+    def _draw_overlay(self, port_map: PortMap, fabric: str, base: Image.Image, cfg: dict, *, display_scale: float = 1.0) -> Image.Image:
         """
-        Draws the port layout overlay on a copy of the base switch image.
-        This method now delegates the drawing of each port to the PortDrawer helper class.
+        Draws the port layout overlay for one fabric on a copy of the base switch image.
+        The drawing is done by portmapper_render; identical overlays are shared, so the result is read-only.
+        Canvases use _show_overlay instead, which renders at the canvas size off the GUI thread.
         """
-        img_with_overlay = base.copy()
-        overlay = Image.new('RGBA', img_with_overlay.size, (0, 0, 0, 0))
-        draw = ImageDraw.Draw(overlay)
-        
-        # Remove duplicate Port IDs before converting to dict
-        df_unique = df.drop_duplicates(subset='Port ID', keep='first')
-        info = df_unique.set_index('Port ID').to_dict('index')
-
         # Get CN and EB counts for NB port coloring
-        cn_count = safe_int(self.node_entries.get('CN', {}).get('cnt', QLineEdit()).text(), 0) if hasattr(self, 'node_entries') else 0
-        eb_count = safe_int(self.node_entries.get('EB', {}).get('cnt', QLineEdit()).text(), 0) if hasattr(self, 'node_entries') else 0
-
-        drawer = PortDrawer(draw, cfg, display_scale, cn_count, eb_count)
-
-        for pid in range(1, cfg['PORT_COUNT'] + 1):
-            if pid not in info:
-                x, y = drawer._get_port_coordinates(pid)
-                w, h = cfg['PORT_WIDTH'] + 2, cfg['PORT_HEIGHT'] + 2
-                draw.rectangle([x, y, x + w, y + h], fill='black', outline='black', width=1)
-                continue
-
-            port_info = info[pid]
-            label, fabric = port_info['Port Name'], port_info['Fabric ID']
-            drawer.draw_port(pid, label, fabric)
-
-        return Image.alpha_composite(img_with_overlay, overlay)
+        cn_count, eb_count = self._get_nb_cn_eb_counts()
+        return render_overlay_cached(port_map, fabric, base, cfg, display_scale=display_scale, cn_count=cn_count, eb_count=eb_count)
 
     def generate_overlays_and_export(self, *, export_files: bool=True):
         if not self.base_image:
@@ -9473,37 +8009,23 @@ class PortMapperPyQt(QMainWindow):
                 return
             
             # Use the Cell Planning port map for display/export
-            df_raw = pd.DataFrame(port_data, columns=['Port ID', 'Port Name'])
-            df_agg = df_raw.groupby('Port ID')['Port Name'].apply(lambda s: s.iloc[0]).reset_index()
-
-            dfA = df_agg.copy()
-            dfA['Fabric ID'] = 'A'
-            dfA['Hostname'] = self.ha_entry.text().strip() or 'FabricA'
-
-            dfB = df_agg.copy()
-            dfB['Fabric ID'] = 'B'
-            dfB['Hostname'] = self.hb_entry.text().strip() or 'FabricB'
-
-            # For the UI canvases, calculate their specific scale and redraw the overlay
-            scale_a = self.canvas_a.width() / self.base_image.width if self.base_image and self.base_image.width > 0 and self.canvas_a.width() > 0 else 1.0
-            imgA_display = self._draw_overlay(dfA, self.base_image, self.layout_config, display_scale=scale_a)
-            self.canvas_a.setPixmap(pil_to_qpixmap(imgA_display))
+            port_map = PortMap.from_pairs(port_data, self.layout_config['PORT_COUNT'])
+            hostname_a = self.ha_entry.text().strip() or 'FabricA'
+            hostname_b = self.hb_entry.text().strip() or 'FabricB'
 
-            scale_b = self.canvas_b.width() / self.base_image.width if self.base_image and self.base_image.width > 0 and self.canvas_b.width() > 0 else 1.0
-            imgB_display = self._draw_overlay(dfB, self.base_image, self.layout_config, display_scale=scale_b)
-            self.canvas_b.setPixmap(pil_to_qpixmap(imgB_display))
+            # The UI canvases are drawn at their own size off the GUI thread
+            self._show_overlay(self.canvas_a, port_map, 'A', self.switch_id)
+            self._show_overlay(self.canvas_b, port_map, 'B', self.switch_id)
 
             if export_files:
                 # For file export, re-render at full resolution
-                imgA_export = self._draw_overlay(dfA, self.base_image, self.layout_config, display_scale=1.0)
-                imgB_export = self._draw_overlay(dfB, self.base_image, self.layout_config, display_scale=1.0)
+                imgA_export = self._draw_overlay(port_map, 'A', self.base_image, self.layout_config, display_scale=1.0)
+                imgB_export = self._draw_overlay(port_map, 'B', self.base_image, self.layout_config, display_scale=1.0)
 
                 # Use the new cluster-specific output directory
                 os.makedirs(self._cluster_output_dir, exist_ok=True)
                 ls_type = self.leaf_spine_combo.currentText()
                 cluster_name = self.cluster_name_entry.text().strip() or 'UnnamedCluster'
-                hostname_a = dfA['Hostname'].iloc[0]
-                hostname_b = dfB['Hostname'].iloc[0]
                 
                 # Create descriptive filenames with cluster, switch, leaf/spine names
                 outA = get_unique_filename(os.path.join(self._cluster_output_dir, f"{cluster_name}_{hostname_a}_{ls_type}_A.png"))
@@ -9523,40 +8045,26 @@ class PortMapperPyQt(QMainWindow):
             else:
                 port_data = self._calculate_full_preview_port_map()
             
-            df_raw = pd.DataFrame(port_data, columns=['Port ID', 'Port Name'])
             # The rest of the original logic for single-rack mode
-            df_agg = df_raw.groupby('Port ID')['Port Name'].apply(lambda s: s.iloc[0]).reset_index()
-
-            dfA = df_agg.copy()
-            dfA['Fabric ID'] = 'A'
-            dfA['Hostname'] = self.ha_entry.text().strip() or 'FabricA'
-
-            dfB = df_agg.copy()
-            dfB['Fabric ID'] = 'B'
-            dfB['Hostname'] = self.hb_entry.text().strip() or 'FabricB'
+            port_map = PortMap.from_pairs(port_data, self.layout_config['PORT_COUNT'])
+            hostname_a = self.ha_entry.text().strip() or 'FabricA'
+            hostname_b = self.hb_entry.text().strip() or 'FabricB'
 
             # For the UI canvases, calculate their specific scale and redraw the overlay
             # with adjusted border thickness so it looks correct when scaled down.
-            scale_a = self.canvas_a.width() / self.base_image.width if self.base_image and self.base_image.width > 0 and self.canvas_a.width() > 0 else 1.0
-            imgA_display = self._draw_overlay(dfA, self.base_image, self.layout_config, display_scale=scale_a)
-            self.canvas_a.setPixmap(pil_to_qpixmap(imgA_display))
-
-            scale_b = self.canvas_b.width() / self.base_image.width if self.base_image and self.base_image.width > 0 and self.canvas_b.width() > 0 else 1.0
-            imgB_display = self._draw_overlay(dfB, self.base_image, self.layout_config, display_scale=scale_b)
-            self.canvas_b.setPixmap(pil_to_qpixmap(imgB_display))
+            self._show_overlay(self.canvas_a, port_map, 'A', self.switch_id)
+            self._show_overlay(self.canvas_b, port_map, 'B', self.switch_id)
 
             if export_files:
                 # For file export, we can just save the already-generated display images if we want,
                 # or re-render at full resolution. Re-rendering is better for quality.
-                imgA_export = self._draw_overlay(dfA, self.base_image, self.layout_config, display_scale=1.0)
-                imgB_export = self._draw_overlay(dfB, self.base_image, self.layout_config, display_scale=1.0)
+                imgA_export = self._draw_overlay(port_map, 'A', self.base_image, self.layout_config, display_scale=1.0)
+                imgB_export = self._draw_overlay(port_map, 'B', self.base_image, self.layout_config, display_scale=1.0)
 
                 # Use the new cluster-specific output directory
                 os.makedirs(self._cluster_output_dir, exist_ok=True)
                 ls_type = self.leaf_spine_combo.currentText()
                 cluster_name = self.cluster_name_entry.text().strip() or 'UnnamedCluster'
-                hostname_a = dfA['Hostname'].iloc[0]
-                hostname_b = dfB['Hostname'].iloc[0]
                 
                 # Create descriptive filenames with cluster, switch, leaf/spine names
                 outA = get_unique_filename(os.path.join(self._cluster_output_dir, f"{cluster_name}_{hostname_a}_{ls_type}_A.png"))
@@ -9578,51 +8086,8 @@ class PortMapperPyQt(QMainWindow):
 
     def _build_command_parts(self, env_vars: dict, use_shell_vars: bool = False, script_filename: str = 'switch_conf.py') -> list[str]:
         """Helper to build the command list for switch_conf.py."""
-        def get_val(key):
-            """Gets the command-line representation of a value (literal or shell variable)."""
-            if use_shell_vars:
-                if key == 'autonomous_systems':
-                    return '$ASNS'
-                return f'${key.upper()}'
-            return env_vars.get(key, '')
-
-        cmd_parts = ['python3', script_filename]
-        # Always check the actual value from env_vars before adding an argument.
-        if env_vars.get('swtype'):
-            cmd_parts.append(get_val('swtype'))
-
-        param_map = {'clustername': '--cluster-name', 'hostnames': '--hostname', 'mgmt_ips': '--mgmt-ips', 'mcidr': '--mgmt-subnet', 'mgw': '--mgmt-gateway', 'ntp1': '--ntp', 'lors': '--switch-type', 'external_vlans': '--external-vlans', 'autonomous_systems': '--autonomous-systems', 'extports': '--external-ports', 'iplports': '--ipl-ports', 'islports': '--isl-ports'}
-        for key, switch in param_map.items():
-            if env_vars.get(key):
-                cmd_parts.extend([switch, get_val(key)])
-
-        # Add --vxlan flag if requested
-        if env_vars.get('vxlan'):
-            cmd_parts.append('--vxlan')
-
-        # Conditionally add --external-speed only for non-Cisco switches
-        if env_vars.get('swtype') != 'cisco' and env_vars.get('uplinkspeed'):
-            cmd_parts.extend(['--external-speed', get_val('uplinkspeed')])
-
-        # Conditionally add --data-vlan only if it's not the default value.
-        if (data_vlan_val := env_vars.get('datavlan')) and data_vlan_val != '69':
-            cmd_parts.extend(['--data-vlan', get_val('datavlan')])
-
-        node_port_keys = ['cports', 'dports', 'eports', 'ieports', 'gports', 'nic2_nbports']
-        # Filter keys based on whether they have a non-empty value in env_vars.
-        active_node_port_keys = [k for k in node_port_keys if env_vars.get(k)]
-        if active_node_port_keys:
-            if use_shell_vars:
-                # Get the shell variable names for the active keys.
-                shell_vars = [f'${k.upper()}' for k in active_node_port_keys]
-                cmd_parts.extend(['--node-ports', ','.join(shell_vars)])
-            else:
-                # Get the actual values for the active keys.
-                node_port_values = [env_vars[k] for k in active_node_port_keys]
-                cmd_parts.extend(['--node-ports', ','.join(node_port_values)])
+        return build_command_parts(env_vars, use_shell_vars, script_filename)
 
-        return [part for part in cmd_parts if part] if not use_shell_vars else cmd_parts
-    
     def _get_switch_config_env_vars(self) -> dict[str, str]:
         """Collects UI data and assembles the environment variables for switch_conf.py."""
         ha = self.ha_entry.text().strip() or 'FabricA'
@@ -9653,7 +8118,8 @@ class PortMapperPyQt(QMainWindow):
         port_plan = {}
         current_group_key = None
         for port, label in self.port_map:
-            base_type = get_port_base_type(label)
+            parsed = parse_port_label(label)
+            base_type = parsed.base_type
             key = None
             if base_type in ['IPL', 'NB'] or base_type in self.node_types:
                 key = base_type
@@ -9661,10 +8127,8 @@ class PortMapperPyQt(QMainWindow):
             elif base_type in ['ISL', 'MLAG/BGP', 'EXT']:
                 # EXT is the display name for MLAG/BGP, map it back
                 internal_type = 'MLAG/BGP' if base_type == 'EXT' else base_type
-                match = re.match(rf'{base_type}(\d+)', label)
-                if match:
-                    group_num = int(match.group(1))
-                    key = f'{internal_type}-GROUP-{group_num}'
+                if parsed.group is not None:
+                    key = f'{internal_type}-GROUP-{parsed.group}'
                     current_group_key = key
                 elif label.startswith('RSVD-') and current_group_key and (current_group_key.startswith(base_type) or (base_type == 'EXT' and current_group_key.startswith('MLAG/BGP'))):
                     key = current_group_key
@@ -9788,7 +8252,7 @@ class PortMapperPyQt(QMainWindow):
             self._generate_multi_rack_outputs(generate_images=False, generate_configs=True)
         else:
             # --- Original Single-Rack Logic ---
-            script_filename = os.path.basename(get_unique_filename(os.path.join(self._switch_config_dir, 'switch_conf.py')))
+            script_filename = 'switch_conf.py'
             env_vars = self._get_switch_config_env_vars()
             # Use the new cluster-specific switch config directory
             params = {
@@ -9803,10 +8267,15 @@ class PortMapperPyQt(QMainWindow):
     def _generate_multi_rack_outputs(self, generate_images: bool, generate_configs: bool):
         """
         Iterates through all racks in multi_rack_config and generates the requested outputs.
-        For config generation, downloads switch_conf.py once and processes all racks in parallel.
+        Port maps and parameters are prepared here; the rendering and switch_conf.py runs
+        happen in a MultiRackOutputWorker thread that streams results to the status dialog.
         """
+        if self._multi_rack_worker is not None:
+            self._ensure_status_dialog("Export In Progress")
+            self._status_append("⚠️ A multi-rack export is already running; wait for it to finish or cancel it.")
+            return
+
         total_racks = len(self.multi_rack_config)
-        all_results = []
 
         # Initialize status dialog title
         status_title = (
@@ -9816,34 +8285,21 @@ class PortMapperPyQt(QMainWindow):
         )
         self._ensure_status_dialog(status_title)
 
-        # For config generation, download switch_conf.py once before processing racks
-        if generate_configs:
-            self._status_append("Downloading switch_conf.py ...")
-            os.makedirs(self._switch_config_dir, exist_ok=True)
-            script_filename = os.path.basename(get_unique_filename(os.path.join(self._switch_config_dir, 'switch_conf.py')))
-            # Download once using a dummy worker
-            dummy_params = {'config_dir': self._switch_config_dir, 'env_vars': {}, 
-                           'cmd_parts_for_file': [], 'cmd_parts_exec': [], 'script_filename': script_filename}
-            dummy_worker = SwitchConfigWorker(dummy_params, skip_download=False)
-            dummy_worker.run_sync()  # This will download the script once
-            script_filename = dummy_worker.params.get('script_filename', script_filename)
-        else:
-            script_filename = 'switch_conf.py'
-
-        # Store all tasks for parallel processing
+        script_filename = 'switch_conf.py'
         image_tasks = []
+        config_tasks = []
 
         for i, (rack_name, rack_data) in enumerate(self.multi_rack_config.items(), 1):
             if generate_configs:
                 self._status_append(f"Preparing configs... ({i}/{total_racks})")
 
-            port_map, _ = self._calculate_rack_port_map(rack_data)
+            # Unchanged racks reuse their stored port map
+            port_map = self._calculate_and_store_rack_port_map(rack_name)
             if not port_map:
-                all_results.append(f"Skipped {rack_name}: No ports assigned.")
+                self._status_append(f"Skipped {rack_name}: No ports assigned.")
                 continue
 
             if generate_images:
-                # Store task for parallel processing
                 image_tasks.append((rack_name, rack_data, port_map))
             
             if generate_configs:
@@ -9856,95 +8312,74 @@ class PortMapperPyQt(QMainWindow):
                     'cmd_parts_exec': self._build_command_parts(env_vars, use_shell_vars=False, script_filename=script_filename),
                     'script_filename': script_filename
                 }
-                # Store params for parallel processing later
-                all_results.append(('config_params', params, rack_name))
+                config_tasks.append((rack_name, params))
 
-        # Process images in parallel if requested
+        # Racks with the same switch and port map (e.g. clones) form one image job,
+        # so each distinct layout is drawn and encoded once.
+        image_jobs = {}
         if generate_images and image_tasks:
-            
-            def process_rack_images(task):
-                """Process a single rack's images."""
-                rack_name, rack_data, port_map = task
-                try:
-                    df_raw = pd.DataFrame(port_map, columns=['Port ID', 'Port Name'])
-                    df_agg = df_raw.groupby('Port ID')['Port Name'].apply(lambda s: s.iloc[0]).reset_index()
-                    rack_switch_id = rack_data.get('switch_id', self.switch_id)
-                    rack_layout_config = SWITCH_LAYOUTS[rack_switch_id]
-                    try:
-                        rack_base_image = Image.open(resource_path(rack_layout_config['IMAGE'])).convert('RGBA')
-                    except (FileNotFoundError, KeyError):
-                        return f"Skipped images for {rack_name}: Base image not found."
-
-                    dfA = df_agg.copy(); dfA['Fabric ID'] = 'A'; dfA['Hostname'] = rack_data.get('hostname_a', f'{rack_name}-A')
-                    dfB = df_agg.copy(); dfB['Fabric ID'] = 'B'; dfB['Hostname'] = rack_data.get('hostname_b', f'{rack_name}-B')
-
-                    imgA = self._draw_overlay(dfA, rack_base_image, rack_layout_config, display_scale=1.0)
-                    imgB = self._draw_overlay(dfB, rack_base_image, rack_layout_config, display_scale=1.0)
-
-                    # Use the new cluster-specific output directory
-                    os.makedirs(self._cluster_output_dir, exist_ok=True)
-                    ls_type = rack_data.get('lors', 'leaf')
-                    cluster_name = self.cluster_name_entry.text().strip() or 'UnnamedCluster'
-                    hostname_a = dfA['Hostname'].iloc[0]
-                    hostname_b = dfB['Hostname'].iloc[0]
-                    
-                    outA = get_unique_filename(os.path.join(self._cluster_output_dir, f"{cluster_name}_{rack_name}_{hostname_a}_{ls_type}_A.png"))
-                    outB = get_unique_filename(os.path.join(self._cluster_output_dir, f"{cluster_name}_{rack_name}_{hostname_b}_{ls_type}_B.png"))
-                    imgA.save(outA)
-                    imgB.save(outB)
-                    return f"Generated images for {rack_name}: {os.path.relpath(outA)}, {os.path.relpath(outB)}"
-                except Exception as e:
-                    return f"Failed to generate images for {rack_name}: {e}"
-            
-            with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
-                completed = 0
-                for future in concurrent.futures.as_completed(executor.submit(process_rack_images, task) for task in image_tasks):
-                    completed += 1
-                    self._status_append(f"Images: {completed}/{len(image_tasks)} completed")
-                    result = future.result()
-                    all_results.append(result)
-
-        # If generating configs, process all racks in parallel now
-        if generate_configs:
-            # Separate config tasks from other results
-            config_tasks = [r for r in all_results if isinstance(r, tuple) and r[0] == 'config_params']
-            other_results = [r for r in all_results if not (isinstance(r, tuple) and r[0] == 'config_params')]
-            all_results = other_results
-            
-            if config_tasks:
-                self._status_append("Generating switch configs in parallel ...")
-                
-                def process_rack_config(config_item):
-                    """Process a single rack config."""
-                    _, params, rack_name = config_item
-                    # Skip download for all racks (already downloaded)
-                    worker = SwitchConfigWorker(params, skip_download=True)
-                    return worker.run_sync()
-                
-                # Process all racks in parallel using ThreadPoolExecutor
-                with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
-                    future_to_rack = {executor.submit(process_rack_config, task): task[2] for task in config_tasks}
-                    
-                    completed = 0
-                    for future in concurrent.futures.as_completed(future_to_rack):
-                        completed += 1
-                        self._status_append(f"Configs: {completed}/{len(config_tasks)} completed")
-                        result = future.result()
-                        all_results.append(result)
-
-        # Display summary within the unified status dialog
-        summary_title = "Image Generation Complete" if generate_images and not generate_configs else "Switch Config Generation Complete" if generate_configs and not generate_images else "Overlay and Config Generation Complete"
-        self._ensure_status_dialog(summary_title)
-        
-        if all_results:
-            for result in all_results:
-                self._status_append(result)
-        else:
-            self._status_append("No results to display.")
-
-        if generate_configs:
+            os.makedirs(self._cluster_output_dir, exist_ok=True)
+            cluster_name = self.cluster_name_entry.text().strip() or 'UnnamedCluster'
+            cn_count, eb_count = self._get_nb_cn_eb_counts()
+            for rack_name, rack_data, port_map in image_tasks:
+                rack_switch_id = rack_data.get('switch_id', self.switch_id)
+                hostname_a = rack_data.get('hostname_a', f'{rack_name}-A')
+                hostname_b = rack_data.get('hostname_b', f'{rack_name}-B')
+                ls_type = rack_data.get('lors', 'leaf')
+                outA = get_unique_filename(os.path.join(self._cluster_output_dir, f"{cluster_name}_{rack_name}_{hostname_a}_{ls_type}_A.png"))
+                outB = get_unique_filename(os.path.join(self._cluster_output_dir, f"{cluster_name}_{rack_name}_{hostname_b}_{ls_type}_B.png"))
+                job = image_jobs.setdefault((rack_switch_id, tuple(port_map)), {
+                    'switch_id': rack_switch_id, 'port_map': list(port_map),
+                    'cn_count': cn_count, 'eb_count': eb_count, 'outputs': []})
+                job['outputs'].append((rack_name, outA, outB))
+
+        self._multi_rack_summary_title = (
+            "Image Generation Complete" if generate_images and not generate_configs
+            else "Switch Config Generation Complete" if generate_configs and not generate_images
+            else "Overlay and Config Generation Complete")
+        self._multi_rack_generates_configs = generate_configs
+
+        self._multi_rack_thread = QThread()
+        self._multi_rack_worker = MultiRackOutputWorker(
+            list(image_jobs.values()), config_tasks, config_dir=self._switch_config_dir,
+            offline=self.switch_conf_offline, render_backend=self.render_backend,
+            render_workers=self.render_workers, config_workers=self.config_workers)
+        self._multi_rack_worker.moveToThread(self._multi_rack_thread)
+        self._multi_rack_thread.started.connect(self._multi_rack_worker.run)
+        self._multi_rack_worker.progress.connect(
+            lambda stage, done, total: self._status_append(f"{stage}: {done}/{total} completed"))
+        self._multi_rack_worker.result.connect(self._status_append)
+        self._multi_rack_worker.finished.connect(self._on_multi_rack_outputs_finished)
+        self._multi_rack_worker.finished.connect(self._multi_rack_thread.quit)
+        # The references are dropped only once the thread has stopped (see _release_multi_rack_worker)
+        self._multi_rack_thread.finished.connect(self._release_multi_rack_worker)
+
+        self._status_set_cancel_handler(self._multi_rack_worker.cancel)
+        self._multi_rack_thread.start()
+
+    def _on_multi_rack_outputs_finished(self, cancelled: bool):
+        """Wraps up a multi-rack export once its worker is done."""
+        self._status_set_cancel_handler(None)
+        self._ensure_status_dialog("Export Cancelled" if cancelled else self._multi_rack_summary_title)
+        if self._multi_rack_generates_configs:
             self.create_config_button.setEnabled(True)
-        self._status_append("Done.")
+        self._status_append("Cancelled." if cancelled else "Done.")
+
+    def _release_multi_rack_worker(self):
+        """Drops the finished export thread and worker, allowing the next export to start."""
+        if self._multi_rack_thread is not None:
+            self._multi_rack_thread.wait()
+        self._multi_rack_thread = None
+        self._multi_rack_worker = None
+
+    def closeEvent(self, event):
+        """Stops a running multi-rack export so its thread is not destroyed while running."""
+        self.preview_renderer.shutdown()
+        if self._multi_rack_worker is not None:
+            self._multi_rack_worker.cancel()
+            self._multi_rack_thread.quit()
+            self._multi_rack_thread.wait()
+        super().closeEvent(event)
 
     def _run_config_worker(self, params: dict):
         """
@@ -9952,7 +8387,7 @@ class PortMapperPyQt(QMainWindow):
         This encapsulates the original single-rack worker logic.
         """
         self.thread = QThread()
-        self.worker = SwitchConfigWorker(params)
+        self.worker = SwitchConfigWorker(params, offline=self.switch_conf_offline)
         self.worker.moveToThread(self.thread)
         self.thread.started.connect(self.worker.run)
         self.worker.finished.connect(self.on_switch_config_finished)
@@ -9970,346 +8405,24 @@ class PortMapperPyQt(QMainWindow):
 
     def _get_rack_config_env_vars(self, rack_data: dict, port_map: list, rack_name: str) -> dict:
         """Gathers data for a specific rack and assembles environment variables."""
-        ha = rack_data.get('hostname_a', 'FabricA')
-        hb = rack_data.get('hostname_b', 'FabricB')
-        hostnames = f'{ha},{hb}' if ha and hb else ha or hb
-        mgmt_ips = f"{rack_data.get('mgmt_ip_a', '')},{rack_data.get('mgmt_ip_b', '')}"
-        
-        # Inherit global settings from the main Setup tab
-        # Use the rack's specific switch model for config generation
-        rack_switch_id = rack_data.get('switch_id', self.switch_id)
-        rack_layout_config = SWITCH_LAYOUTS[rack_switch_id]
-        cluster_name = self.cluster_name_entry.text().strip() or 'VastData-0001'        
-        vendor_map = {'Cisco-NXOS': 'cisco', 'MNLX-Onyx': 'mellanox', 'MNLX-Cumulus': 'cumulus', 'Arista-EOS': 'arista'}
-        swtype = vendor_map.get(self.vendor_combo.currentText(), '')
-        uplink_speed = self.uplink_speed_combo.currentText() or rack_layout_config.get('NATIVE_SPEED', '')
-
-        # Get port split settings from the rack's data
-        port_splits = {
-            nt: (d.get('factor', 1) if d.get('split') else 1)
-            for nt, d in rack_data.get('nodes', {}).items()
-        }
-        uplink_splits = {
-            ut: (d.get('factor', 1) if d.get('split') else 1)
-            for ut, d in rack_data.get('uplinks', {}).items()
-        }
-
-        # Group ports by type and group from the calculated port_map
-        port_plan = {}
-        for port, label in port_map:
-            base_type = get_port_base_type(label)
-            key = base_type
-            if base_type in ['ISL', 'MLAG/BGP', 'EXT']:
-                # EXT is the display name for MLAG/BGP, map it back
-                internal_type = 'MLAG/BGP' if base_type == 'EXT' else base_type
-                match = re.match(rf'{base_type}(\d+)', label)
-                if match:
-                    group_num = int(match.group(1))
-                    key = f'{internal_type}-GROUP-{group_num}'
-                elif not label.startswith('RSVD-'):
-                    # No group number in label (e.g., "EXT-1" or "ISL-1") - default to group 1
-                    key = f'{internal_type}-GROUP-1'
-            port_plan.setdefault(key, []).append(port)
-
-        # Format port ranges
-        isl_ranges = [_format_port_ranges(ports, uplink_splits.get('ISL', 1)) for key, ports in sorted(port_plan.items()) if key.startswith('ISL-GROUP')]
-        ext_ranges = [_format_port_ranges(ports, uplink_splits.get('MLAG/BGP', 1)) for key, ports in sorted(port_plan.items()) if key.startswith('MLAG/BGP-GROUP')]
-
-        customer_vlans_raw = self.customer_vlans_entry.text().strip()
-        cleaned_vlans = re.sub(r',+', ',', customer_vlans_raw.replace(' ', ',')).strip(',')
-        
-        bgp_asn_raw = self.bgp_asn_entry.text().strip()
-        cleaned_asns = re.sub(r',+', ',', bgp_asn_raw.replace(' ', ',')).strip(',')
-        
-        # VXLAN is only enabled if BGP ASNs are defined and the overlay option is selected for this rack
-        has_bgp_asns = bool(cleaned_asns)
-        rack_use_vxlan = rack_data.get('use_vxlan_overlay', self.use_vxlan_overlay)
-        should_use_vxlan = rack_use_vxlan and has_bgp_asns
-        vxlan_value = 'True' if should_use_vxlan else ''
-
-        env_vars = {
-            'mgmt_ips': mgmt_ips, 'mcidr': self.net_cidr_combo.currentText(), 'mgw': self.net_def_route_entry.text().strip(),
-            'clustername': cluster_name, 'uplinkspeed': uplink_speed, 'rack_name': rack_name,
-            'ntp1': self.ntp_server_entry.text().strip() or '0.0.0.123', 'hostnames': hostnames, 'swtype': swtype,
-            'lors': rack_data.get('lors', 'leaf'), 'vxlan': vxlan_value,
-            'external_vlans': cleaned_vlans, 'datavlan': self.data_vlan_entry.text().strip() or '69',
-            'autonomous_systems': cleaned_asns,
-            'cports': _format_port_ranges(port_plan.get('CN', []), port_splits.get('CN', 1)),
-            'dports': _format_port_ranges(port_plan.get('DN', []), port_splits.get('DN', 1)),
-            'eports': _format_port_ranges(port_plan.get('EB', []), port_splits.get('EB', 1)),
-            'ieports': _format_port_ranges(port_plan.get('IE', []), port_splits.get('IE', 1)),
-            'gports': _format_port_ranges(port_plan.get('GN', []), port_splits.get('GN', 1)),
-            'extports': ','.join(sorted(ext_ranges)),
-            'iplports': _format_port_ranges(port_plan.get('IPL', []), uplink_splits.get('IPL', 1)),
-            'islports': ','.join(sorted(isl_ranges)),
-            'nic2_nbports': _format_port_ranges(port_plan.get('NB', []), uplink_splits.get('NB', 1)),
-        }
-
-        # Removed debug print of multi-rack env_vars extports
-
-        if self.use_2nd_nic_checkbox.isChecked():
-            env_vars['2ND_NIC'] = 'Yes'
-        if self.pfc_checkbox.isChecked():
-            env_vars['pfc'] = 'True'
-
-        filtered = {k: v for k, v in env_vars.items() if v}
-        return filtered
+        return build_rack_env_vars(self._collect_setup_values(), rack_data, port_map, rack_name, self.switch_id)
 
     def _calculate_advanced_rack_port_map(self, rack_data: dict) -> tuple[list, set]:
         """Calculates port map for advanced mode racks using stored advanced config."""
-        port_map = []
-        assigned = set()
-        
-        rack_switch_id = rack_data.get('switch_id', self.switch_id)
-        rack_layout_config = SWITCH_LAYOUTS[rack_switch_id]
-        port_count = rack_layout_config.get('PORT_COUNT', 64)
-        left_ports, right_ports = self._get_left_right_ports_mellanox(port_count)
-        
-        advanced_config = rack_data.get('advanced_config', {})
-        node_routing = advanced_config.get('node_routing', {})
-        nodes_data = rack_data.get('nodes', {})
-        uplinks_data = rack_data.get('uplinks', {})
-        dbox_type = advanced_config.get('dbox_type', 'CeresV2')  # Default to CeresV2 for backward compatibility
-        
-        # Track current indices for left and right sides
-        left_current_index = 0
-        right_current_index = 0
-        
-        # DN assignment: Based on DBox type
-        if 'DN' in nodes_data:
-            dn_info = nodes_data['DN']
-            dn_count = dn_info.get('count', 0)
-            if dn_count > 0:
-                dn_split = dn_info.get('split', False)
-                dn_factor = dn_info.get('factor', 2)
-                
-                # Get DNode groups based on DBox type
-                left_dns, right_dns = self._get_dnode_groups_by_dbox_type(dn_count, dbox_type)
-                
-                # Assign DNs to LEFT side
-                if dn_split and dn_factor > 1:
-                    # Port splitting: take first N DNs from left_dns list for each port
-                    left_idx = 0
-                    while left_idx < len(left_dns) and left_current_index < len(left_ports):
-                        # Take next dn_factor DNs from the left_dns list
-                        dns_for_port = left_dns[left_idx:left_idx + dn_factor]
-                        if len(dns_for_port) == 1:
-                            label = f'DN-{dns_for_port[0]}'
-                        else:
-                            label = f'DN-{dns_for_port[0]}/{dns_for_port[-1]}'
-                        
-                        port = left_ports[left_current_index]
-                        port_map.append((port, label))
-                        assigned.add(port)
-                        left_current_index += 1
-                        left_idx += len(dns_for_port)
-                else:
-                    # No splitting: one DN per port
-                    for dn_num in left_dns:
-                        if left_current_index < len(left_ports):
-                            port = left_ports[left_current_index]
-                            port_map.append((port, f'DN-{dn_num}'))
-                            assigned.add(port)
-                            left_current_index += 1
-                
-                # Assign DNs to RIGHT side
-                if dn_split and dn_factor > 1:
-                    # Port splitting: take first N DNs from right_dns list for each port
-                    right_idx = 0
-                    while right_idx < len(right_dns) and right_current_index < len(right_ports):
-                        # Take next dn_factor DNs from the right_dns list
-                        dns_for_port = right_dns[right_idx:right_idx + dn_factor]
-                        if len(dns_for_port) == 1:
-                            label = f'DN-{dns_for_port[0]}'
-                        else:
-                            label = f'DN-{dns_for_port[0]}/{dns_for_port[-1]}'
-                        
-                        port = right_ports[right_current_index]
-                        port_map.append((port, label))
-                        assigned.add(port)
-                        right_current_index += 1
-                        right_idx += len(dns_for_port)
-                else:
-                    # No splitting: one DN per port
-                    for dn_num in right_dns:
-                        if right_current_index < len(right_ports):
-                            port = right_ports[right_current_index]
-                            port_map.append((port, f'DN-{dn_num}'))
-                            assigned.add(port)
-                            right_current_index += 1
-        
-        # Assign other node types based on routing preferences
-        for nt in ['CN', 'EB', 'IE', 'GN']:
-            if nt not in nodes_data:
-                continue
-            
-            node_info = nodes_data[nt]
-            count = node_info.get('count', 0)
-            if count == 0:
-                continue
-            
-            # Get routing preference from advanced_config
-            routing_pref = node_routing.get(nt, 'RIGHT')
-            
-            # Get split settings
-            split = node_info.get('split', False)
-            factor = node_info.get('factor', 2)
-            
-            # Choose port list based on routing preference
-            if routing_pref == 'LEFT':
-                current_index = left_current_index
-                port_list = left_ports
-            else:
-                current_index = right_current_index
-                port_list = right_ports
-            
-            # Assign ports
-            for i in range(count):
-                if split:
-                    if i % factor == 0:
-                        end_idx = min(i + factor - 1, count - 1)
-                        label = f'{nt}-{i+1}/{end_idx+1}'
-                    else:
-                        continue
-                else:
-                    label = f'{nt}-{i+1}'
-                
-                if current_index < len(port_list):
-                    port = port_list[current_index]
-                    port_map.append((port, label))
-                    assigned.add(port)
-                    current_index += 1
-            
-            # Update the appropriate index
-            if routing_pref == 'LEFT':
-                left_current_index = current_index
-            else:
-                right_current_index = current_index
-        
-        # Assign uplinks (from right side, remaining ports)
-        uplink_labels = []
-        for ut in ['IPL', 'ISL', 'MLAG/BGP']:
-            # Map MLAG/BGP to EXT for lookup in advanced config
-            lookup_key = 'EXT' if ut == 'MLAG/BGP' else ut
-            if lookup_key not in uplinks_data:
-                continue
-            
-            uplink_info = uplinks_data[lookup_key]
-            groups = uplink_info.get('groups', 0)
-            ppg = uplink_info.get('ports_per_group', 0)
-            
-            if groups == 0 or ppg == 0:
-                continue
-            
-            # IPL is always 1 group
-            if ut == 'IPL':
-                groups = 1
-            
-            for group_num in range(1, groups + 1):
-                for port_num in range(1, ppg + 1):
-                    # Find next available port from right side
-                    while right_current_index < len(right_ports) and right_ports[right_current_index] in assigned:
-                        right_current_index += 1
-                    
-                    if right_current_index < len(right_ports):
-                        port = right_ports[right_current_index]
-                        label = f'{ut}{group_num}-{port_num}'
-                        uplink_labels.append((port, label))
-                        assigned.add(port)
-                        right_current_index += 1
-        
-        port_map.extend(uplink_labels)
-        
-        return sorted(port_map, key=lambda x: x[0]), assigned
+        spec = RackSpec.from_rack_data(dict(rack_data, mapping_mode='advanced'), default_switch_id=self.switch_id)
+        return self.plan_cache.plan(spec, self.planner)
+
+    def _get_rack_spec(self, rack_data: dict) -> RackSpec:
+        """Builds the planning spec for a rack's configuration data."""
+        # NB ports are labelled from the CN/EB counts on the Cell Planning tab
+        cn_count, eb_count = self._get_nb_cn_eb_counts()
+        return RackSpec.from_rack_data(rack_data, default_switch_id=self.switch_id,
+                                       nb_cn_count=cn_count, nb_eb_count=eb_count,
+                                       placement=self.placement_mode, solver_time_budget=self.solver_time_budget)
 
     def _calculate_rack_port_map(self, rack_data: dict) -> tuple[list, set]:
         """Calculates the full port map for a single rack's configuration data."""
-        # Check if this rack uses advanced mapping mode
-        mapping_mode = rack_data.get('mapping_mode', 'default')
-        if mapping_mode == 'advanced':
-            return self._calculate_advanced_rack_port_map(rack_data)
-        
-        # Default mode: continue with existing logic
-        port_map = []
-        assigned_ports = set()
-        
-        rack_switch_id = rack_data.get('switch_id', self.switch_id)
-        rack_layout_config = SWITCH_LAYOUTS[rack_switch_id]
-
-        # --- 1. Process Uplinks (High ports first) ---
-        next_balanced_uplink_slice = rack_layout_config['PORT_COUNT'] // 8 - 1
-        # Use priority order to ensure correct assignment: IPL, ISL, EXT, NB from highest port down
-        for uplink_type in ['IPL', 'ISL', 'MLAG/BGP', 'NB']:
-            uplink_info = rack_data.get('uplinks', {}).get(uplink_type, self._get_default_uplink_data(uplink_type))
-            # IPL and NB are always single groups
-            groups = 1 if uplink_type in ['IPL', 'NB'] else uplink_info.get('groups', 0)
-            ppg = uplink_info.get('ports_per_group', 0)
-            split = uplink_info.get('split', False)
-            fac = uplink_info.get('factor', 2)
-            reserved = uplink_info.get('reserved', 0)
-            start_port_str = str(uplink_info.get('start', '')).strip()
-
-            ports = []
-            # Check if a manual start port is provided
-            if start_port_str:
-                spt_high = safe_int(start_port_str)
-                # Get CN and EB counts for NB port labeling
-                cn_count = safe_int(self.node_entries.get('CN', {}).get('cnt', QLineEdit()).text(), 0) if uplink_type == 'NB' and hasattr(self, 'node_entries') else 0
-                eb_count = safe_int(self.node_entries.get('EB', {}).get('cnt', QLineEdit()).text(), 0) if uplink_type == 'NB' and hasattr(self, 'node_entries') else 0
-                ports = self.planner.generate_grouped_ports(uplink_type, groups, ppg, split, fac, spt_high, reserved, locked=True, cn_count=cn_count, eb_count=eb_count)
-            elif rack_layout_config.get('BALANCED_UPLINK_ASSIGNMENT'):
-                ports, _, next_balanced_uplink_slice = self._generate_cisco_balanced_uplink_ports(
-                    uplink_type, groups, ppg, split, fac, reserved, assigned_ports, start_slice=next_balanced_uplink_slice)
-            else:
-                phys_per_group = math.ceil(ppg / fac) if split and fac > 1 else ppg
-                total_span = (phys_per_group + reserved) * groups
-                if total_span > 0:
-                    spt_high = rack_layout_config.get('PORT_COUNT', 64)
-                    while spt_high >= total_span and any(p in assigned_ports for p in range(spt_high - total_span + 1, spt_high + 1)):
-                        spt_high -= 1
-                    if spt_high >= total_span:
-                        # Get CN and EB counts for NB port labeling
-                        cn_count = safe_int(self.node_entries.get('CN', {}).get('cnt', QLineEdit()).text(), 0) if uplink_type == 'NB' and hasattr(self, 'node_entries') else 0
-                        eb_count = safe_int(self.node_entries.get('EB', {}).get('cnt', QLineEdit()).text(), 0) if uplink_type == 'NB' and hasattr(self, 'node_entries') else 0
-                        ports = self.planner.generate_grouped_ports(uplink_type, groups, ppg, split, fac, spt_high, reserved, locked=False, cn_count=cn_count, eb_count=eb_count)
-
-            if ports:
-                port_map.extend(ports)
-                assigned_ports.update(p for p, _ in ports)
-
-        # --- 2. Process Nodes (Low ports first) ---
-        next_balanced_node_slice = 0
-        for node_type in self.node_types:
-            node_info = rack_data.get('nodes', {}).get(node_type, self._get_default_node_data())
-            count = node_info.get('count', 0)
-            split = node_info.get('split', False)
-            fac = node_info.get('factor', 2)
-            reserved = node_info.get('reserved', 0)
-            node_start = node_info.get('start', 1)
-            start_port_str = str(node_info.get('start_port', '')).strip()
-
-            ports = []
-            # Check if a manual start port is provided
-            if start_port_str:
-                spt = safe_int(start_port_str)
-                ports, _ = self.planner.generate_node_ports(node_type, count, split, fac, spt, reserved, node_start)
-            elif rack_layout_config.get('BALANCED_NODE_ASSIGNMENT'):
-                ports, _, next_balanced_node_slice = self._generate_cisco9364_node_ports(
-                    node_type, count, split, fac, reserved, node_start, assigned_ports, start_slice=next_balanced_node_slice)
-            else:
-                phys_needed = (math.ceil(count / fac) if split else count) + reserved
-                if phys_needed > 0:
-                    spt = 1
-                    while any(p in assigned_ports for p in range(spt, spt + phys_needed)):
-                        spt += 1
-                    if spt + phys_needed - 1 <= rack_layout_config.get('PORT_COUNT', 64):
-                        ports, _ = self.planner.generate_node_ports(node_type, count, split, fac, spt, reserved, node_start)
-
-            if ports:
-                port_map.extend(ports)
-                assigned_ports.update(p for p, _ in ports)
-
-        return port_map, assigned_ports
+        return self.plan_cache.plan(self._get_rack_spec(rack_data), self.planner)
 
     def select_output_directory(self):
         # This function is now informational, as the path is set by cluster name.
@@ -10324,7 +8437,7 @@ class PortMapperPyQt(QMainWindow):
     def load_switch_and_prepare(self):
         path = resource_path(self.layout_config['IMAGE'])
         try:
-            self.base_image = Image.open(path).convert('RGBA')
+            self.base_image = get_base_image(self.layout_config['IMAGE'])
             self.config_started = True
             self.setup_ready_to_load = False  # Reset indicator after loading
             self.reset_button.setEnabled(True)
@@ -10388,6 +8501,10 @@ class PortMapperPyQt(QMainWindow):
             self.current_tab_index = self.notebook.indexOf(self.setup_tab)
             return
         
+        page = self.notebook.widget(index)
+        if isinstance(page, LazyTab):
+            page.ensure_built()
+
         if tab_text == 'Multi-Rack' and is_multi_rack:
             self._draw_multi_rack_preview()
 
@@ -10422,14 +8539,26 @@ class PortMapperPyQt(QMainWindow):
         if tab_text == 'Legacy Installs':
             self._populate_legacy_from_setup()
 
-    def _calculate_and_store_rack_port_map(self, rack_name: str):
-        """Calculates the port map for a given rack and stores it in the data model."""
+    def _calculate_and_store_rack_port_map(self, rack_name: str) -> list:
+        """
+        Calculates the port map for a given rack and stores it in the data model.
+        The stored map is reused while the rack's planning inputs (its RackSpec
+        fingerprint) are unchanged and nothing else has replaced it.
+        """
         if rack_name not in self.multi_rack_config:
-            return
+            return []
 
         rack_data = self.multi_rack_config[rack_name]
-        port_map, _ = self._calculate_rack_port_map(rack_data)
-        self.multi_rack_config[rack_name]['port_map'] = port_map
+        spec = self._get_rack_spec(rack_data)
+        fingerprint = spec.fingerprint()
+        state = self._rack_port_map_state.get(rack_name)
+        if state and state[0] == fingerprint and rack_data.get('port_map') is state[1]:
+            return state[1]
+
+        port_map, _ = self.plan_cache.plan(spec, self.planner, fingerprint)
+        rack_data['port_map'] = port_map
+        self._rack_port_map_state[rack_name] = (fingerprint, port_map)
+        return port_map
 
     def _validate_setup_ips(self) -> bool:
         """Validates IPs and VLANs on the Setup tab. Returns True if valid, False otherwise."""
@@ -10577,25 +8706,9 @@ class PortMapperPyQt(QMainWindow):
             
             # Display the port map on the Output tab canvases
             if port_map and self.base_image:
-                df_raw = pd.DataFrame(port_map, columns=['Port ID', 'Port Name'])
-                df_agg = df_raw.groupby('Port ID')['Port Name'].apply(lambda s: s.iloc[0]).reset_index()
-                
-                dfA = df_agg.copy()
-                dfA['Fabric ID'] = 'A'
-                dfA['Hostname'] = self.ha_entry.text().strip() or 'FabricA'
-                
-                dfB = df_agg.copy()
-                dfB['Fabric ID'] = 'B'
-                dfB['Hostname'] = self.hb_entry.text().strip() or 'FabricB'
-                
-                # Calculate scales and draw overlays
-                scale_a = self.canvas_a.width() / self.base_image.width if self.base_image and self.base_image.width > 0 and self.canvas_a.width() > 0 else 1.0
-                imgA_display = self._draw_overlay(dfA, self.base_image, self.layout_config, display_scale=scale_a)
-                self.canvas_a.setPixmap(pil_to_qpixmap(imgA_display))
-                
-                scale_b = self.canvas_b.width() / self.base_image.width if self.base_image and self.base_image.width > 0 and self.canvas_b.width() > 0 else 1.0
-                imgB_display = self._draw_overlay(dfB, self.base_image, self.layout_config, display_scale=scale_b)
-                self.canvas_b.setPixmap(pil_to_qpixmap(imgB_display))
+                display_port_map = PortMap.from_pairs(port_map, self.layout_config['PORT_COUNT'])
+                self._show_overlay(self.canvas_a, display_port_map, 'A', self.switch_id)
+                self._show_overlay(self.canvas_b, display_port_map, 'B', self.switch_id)
             else:
                 self.canvas_a.setText('⬅ Configure Cell Planning tab first')
                 self.canvas_b.setText('⬅ Configure Cell Planning tab first')
@@ -10616,16 +8729,14 @@ class PortMapperPyQt(QMainWindow):
         port_map = self.multi_rack_config[rack_name].get('port_map', [])
         rack_switch_id = self.multi_rack_config[rack_name].get('switch_id', self.switch_id)
         rack_layout_config = SWITCH_LAYOUTS[rack_switch_id]
-        rack_base_image = Image.open(resource_path(rack_layout_config['IMAGE'])).convert('RGBA')
         if not port_map:
             self.canvas_a.clear()
             self.canvas_b.clear()
             return
 
-        df = pd.DataFrame(port_map, columns=['Port ID', 'Port Name'])
-        scale = self.canvas_a.width() / rack_base_image.width if rack_base_image.width > 0 and self.canvas_a.width() > 0 else 1.0
-        self.canvas_a.setPixmap(pil_to_qpixmap(self._draw_overlay(df.assign(**{'Fabric ID': 'A'}), rack_base_image, rack_layout_config, display_scale=scale)))
-        self.canvas_b.setPixmap(pil_to_qpixmap(self._draw_overlay(df.assign(**{'Fabric ID': 'B'}), rack_base_image, rack_layout_config, display_scale=scale)))
+        rack_port_map = PortMap.from_pairs(port_map, rack_layout_config['PORT_COUNT'])
+        self._show_overlay(self.canvas_a, rack_port_map, 'A', rack_switch_id)
+        self._show_overlay(self.canvas_b, rack_port_map, 'B', rack_switch_id)
 
     def _calculate_and_display_bandwidth(self):
         """Calculates and displays the bandwidth summary and audit on the Output tab."""
@@ -10669,6 +8780,8 @@ class PortMapperPyQt(QMainWindow):
         if not port_map_to_use:
             # Clear the labels if there's no data
             self.bw_target_label.setText("Not Set")
+            self.bw_cluster_title.hide()
+            self.bw_cluster_label.hide()
             # (You might want to clear other labels here too if needed)
             return
 
@@ -10676,33 +8789,16 @@ class PortMapperPyQt(QMainWindow):
         BITS_IN_BYTE = 8
         GIB_TO_GB_FACTOR = (2**30) / (10**9) # Gibibytes to Gigabytes
 
-        def parse_speed(speed_str):
-            if not speed_str: return 0
-            return safe_int(speed_str.upper().replace('G', ''), 0)
-
-        native_speed_val = parse_speed(rack_layout_config.get('NATIVE_SPEED', ''))
-        uplink_speed_str = self.uplink_speed_combo.currentText()
-        uplink_speed_val = parse_speed(uplink_speed_str) or native_speed_val
-        
-        # Calculate bandwidths directly in Gb/s.
-        bw = {'cn': 0, 'eb': 0, 'nb': 0, 'isl': 0, 'ext': 0}
-
-        df = pd.DataFrame(port_map_to_use, columns=['Port ID', 'Port Name']).drop_duplicates(subset=['Port ID'])
-        df['Base Type'] = df['Port Name'].apply(get_port_base_type)
-
-        for _, row in df.iterrows():
-            base_type = row['Base Type']
-
-            if base_type == 'CN':
-                bw['cn'] += native_speed_val
-            elif base_type == 'EB':
-                bw['eb'] += native_speed_val
-            elif base_type == 'NB':
-                bw['nb'] += native_speed_val
-            elif base_type == 'ISL':
-                bw['isl'] += native_speed_val
-            elif base_type in ('MLAG/BGP', 'EXT'):
-                bw['ext'] += uplink_speed_val
+        # One pass over every rack: the selected rack's row feeds the panel, the totals the cluster row
+        if is_multi_rack and has_multi_rack_data:
+            report = bandwidth_report({name: (rd.get('port_map', []), SWITCH_LAYOUTS[rd.get('switch_id', self.switch_id)])
+                                       for name, rd in self.multi_rack_config.items()},
+                                      uplink_speed=self.uplink_speed_combo.currentText())
+            bw = report.racks[rack_name]
+        else:
+            report = bandwidth_report({'': (port_map_to_use, rack_layout_config)},
+                                      uplink_speed=self.uplink_speed_combo.currentText())
+            bw = report.racks['']
 
         # Convert the goal to Gb/s for comparison. Port speeds are in Gb/s.
         # The UI shows GB/s (Gigabytes) or GiB/s (Gibibytes), so we multiply by 8 to get bits.
@@ -10742,8 +8838,8 @@ class PortMapperPyQt(QMainWindow):
         self.bw_target_audit.setText("🎯" if goal_gbps > 0 else "")
 
         # Northbound ports take precedence over CN/EB ports for customer bandwidth
-        nb_bw_per_switch = bw['nb'] if bw['nb'] > 0 else (bw['cn'] + bw['eb'])
-        nb_bw_aggregate_pair = nb_bw_per_switch * 2
+        nb_bw_per_switch = bw.nb_per_switch
+        nb_bw_aggregate_pair = bw.nb_aggregate
 
         # Display per-switch and aggregate values
         self.bw_nb_a_label.setText(format_bw(nb_bw_per_switch))
@@ -10754,30 +8850,40 @@ class PortMapperPyQt(QMainWindow):
         self.bw_nb_a_audit.setText(get_audit_label(nb_bw_per_switch, goal_gbps))
         self.bw_nb_b_audit.setText(get_audit_label(nb_bw_aggregate_pair, goal_gbps))
 
-        self.bw_isl_a_label.setText(format_bw(bw['isl']))
+        self.bw_isl_a_label.setText(format_bw(bw.isl))
         # To show the total capacity of the link between the switch pair, the aggregate
         # value is calculated by doubling the per-switch bandwidth.
-        isl_bw_per_switch = bw['isl']
-        isl_bw_aggregate_pair = isl_bw_per_switch * 2
+        isl_bw_per_switch = bw.isl
+        isl_bw_aggregate_pair = bw.isl_aggregate
         self.bw_isl_b_label.setText(format_bw(isl_bw_aggregate_pair))
 
-        self.bw_ext_a_label.setText(format_bw(bw['ext']))
-        self.bw_ext_b_label.setText(format_bw(bw['ext']))
+        self.bw_ext_a_label.setText(format_bw(bw.ext))
+        self.bw_ext_b_label.setText(format_bw(bw.ext))
 
         # HA check assumes 50% of bandwidth is lost in a single switch failure
         # For ISLs, a single switch failure means the link capacity is halved.
-        ha_isl_bw = isl_bw_aggregate_pair / 2
-        ha_ext_bw = bw['ext'] / 2
+        ha_isl_bw = bw.ha_isl
+        ha_ext_bw = bw.ha_ext
 
         self.bw_isl_per_switch_audit.setText(get_audit_label(isl_bw_per_switch, goal_gbps))
         self.bw_isl_aggregate_audit.setText(get_audit_label(isl_bw_aggregate_pair, goal_gbps))
         self.bw_isl_a_ha_audit.setText(get_audit_label(ha_isl_bw, goal_gbps))
         self.bw_isl_b_ha_audit.setText(get_audit_label(ha_isl_bw, goal_gbps))
-        self.bw_ext_a_audit.setText(get_audit_label(bw['ext'], goal_gbps, is_ext=True, isl_bw=bw['isl']))
-        self.bw_ext_b_audit.setText(get_audit_label(bw['ext'], goal_gbps, is_ext=True, isl_bw=bw['isl']))
+        self.bw_ext_a_audit.setText(get_audit_label(bw.ext, goal_gbps, is_ext=True, isl_bw=bw.isl))
+        self.bw_ext_b_audit.setText(get_audit_label(bw.ext, goal_gbps, is_ext=True, isl_bw=bw.isl))
         self.bw_ext_a_ha_audit.setText(get_audit_label(ha_ext_bw, goal_gbps, is_ext=True, isl_bw=ha_isl_bw))
         self.bw_ext_b_ha_audit.setText(get_audit_label(ha_ext_bw, goal_gbps, is_ext=True, isl_bw=ha_isl_bw))
 
+        show_cluster = is_multi_rack and has_multi_rack_data
+        self.bw_cluster_title.setVisible(show_cluster)
+        self.bw_cluster_label.setVisible(show_cluster)
+        if show_cluster:
+            self.bw_cluster_label.setText(format_bw(report.total.nb_aggregate))
+            self.bw_cluster_label.setToolTip("\n".join(
+                [f"{name}: NB {format_bw(rack_bw.nb_aggregate)}, ISL {format_bw(rack_bw.isl_aggregate)}, "
+                 f"Ext {format_bw(rack_bw.ext)}" for name, rack_bw in report.racks.items()]
+                + [f"Cluster: ISL {format_bw(report.total.isl_aggregate)}, Ext {format_bw(report.total.ext)}"]))
+
         # Align audit icons to the center
         for audit_label in [self.bw_nb_a_audit, self.bw_nb_b_audit, self.bw_isl_per_switch_audit, self.bw_isl_aggregate_audit,
                               self.bw_ext_a_audit, self.bw_ext_b_audit, self.bw_isl_a_ha_audit, self.bw_isl_b_ha_audit,
@@ -10931,13 +9037,33 @@ class PortMapperPyQt(QMainWindow):
             self.legacy_hostname_example_label.setText("Example: (default is cnode1, dnode100, eb1)")
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()  # Required for the batch worker processes in frozen builds
+
+    # Headless batch mode: `portmapper.py batch --in configs/ --out DesignOutput/`
+    if len(sys.argv) > 1 and sys.argv[1] == 'batch':
+        from portmapper_batch import main as batch_main
+        sys.exit(batch_main(sys.argv[2:]))
+
     parser = argparse.ArgumentParser(description='Port-Mapper GUI Application (PyQt6)')
     parser.add_argument('--legacy', action='store_true', help='Enable legacy installation variables')
+    parser.add_argument('--startup-profile', action='store_true',
+                        help='Print a breakdown of startup time (imports, per-tab UI build, base image load)')
+    parser.add_argument('--render-backend', choices=RENDER_BACKENDS,
+                        help='Pool used to render multi-rack images (default: process, or the saved setting)')
+    parser.add_argument('--render-workers', type=int,
+                        help='Number of image render workers (default: one per CPU core)')
+    parser.add_argument('--offline', action='store_true',
+                        help='Use the cached switch_conf.py without contacting the download server')
+    parser.add_argument('--placement', choices=PLACEMENT_MODES,
+                        help='Port placement for multi-rack default-mode racks: greedy, or solver (places all types '
+                             'together, falling back to greedy when it finds no layout in time)')
     args = parser.parse_args()
 
     # Directories will be created dynamically based on Customer/Site/Cluster names
     
+    app_start = time.perf_counter()
     app = QApplication(sys.argv)
+    app_seconds = time.perf_counter() - app_start
 
     # Dynamically add the background image to the main stylesheet. This avoids
     # using `widget.setStyleSheet()`, which would override all other app-wide styles
@@ -10957,6 +9083,21 @@ if __name__ == '__main__':
     app.setStyleSheet(final_stylesheet)
 
     main_window = PortMapperPyQt(legacy_mode=args.legacy)
+    if args.render_backend:
+        main_window.render_backend = args.render_backend
+    if args.render_workers is not None:
+        main_window.render_workers = args.render_workers
+    if args.offline:
+        main_window.switch_conf_offline = True
+    if args.placement:
+        main_window.placement_mode = args.placement
     main_window.show()
 
+    if args.startup_profile:
+        main_window.startup_profile.enabled = True
+        # Report once the event loop is running, i.e. when the window is actually usable
+        QTimer.singleShot(0, lambda: print(main_window.startup_profile.report(
+            before=[('QApplication', app_seconds)],
+            after=[('time to event loop', time.perf_counter() - _STARTUP_T0)]), flush=True))
+
     sys.exit(app.exec())
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Headless batch mode for PortMapper.
+
+Reads the JSON configs written by "Export Config" (one cluster per file) and,
+for every rack, plans the port map and writes the Fabric A/B PNG overlays, the
+CSV/XLSX port tables and the switch .cfg files. No Qt or display server is
+needed, and racks are processed in parallel across CPU cores.
+
+    python3 portmapper.py batch --in configs/ --out DesignOutput/
+    python3 portmapper_batch.py --in cluster_config.json --out out/ --jobs 8 --no-download
+"""
+import os
+import re
+import sys
+import json
+import argparse
+import concurrent.futures
+import multiprocessing
+from typing import Optional
+
+from portmapper_engine import (
+    RackSpec, PortMap, PlanCache, PLACEMENT_MODES, get_unique_filename, safe_int
+)
+from portmapper_render import load_base_image, render_overlay_cached, write_port_tables
+from portmapper_switchconf import (
+    build_rack_env_vars, build_switch_conf_params, prepare_switch_conf, run_switch_conf
+)
+
+
+def _safe_dir_name(text: str, default: str) -> str:
+    """Sanitizes a name for use as a directory, matching the GUI's output paths."""
+    return re.sub(r'[^\w\-. ]', '_', (text or '').strip()) or default
+
+
+def load_cluster_configs(in_path: str) -> list[tuple[str, dict]]:
+    """Returns (path, config) for a single JSON file or every *.json file in a directory."""
+    if os.path.isdir(in_path):
+        paths = sorted(os.path.join(in_path, name) for name in os.listdir(in_path) if name.lower().endswith('.json'))
+    else:
+        paths = [in_path]
+    configs = []
+    for path in paths:
+        with open(path, 'r') as f:
+            configs.append((path, json.load(f)))
+    return configs
+
+
+def _rack_from_main_config(config: dict) -> dict:
+    """Builds a single rack entry from the Cell Planning values of a non multi-rack export."""
+    setup = config.get('setup_values', {})
+    mapping_mode = setup.get('mapping_mode', 'default')
+
+    nodes = {}
+    for nt, nd in config.get('node_types', {}).items():
+        nodes[nt] = {
+            'count': nd.get('count', 0),
+            'split': nd.get('split', False),
+            'factor': nd.get('factor', 2),
+            'reserved': nd.get('reserved', 0),
+            'start': 1,
+            # A start port or a port list ('1-4,9'), as typed on the Node Types tab
+            'start_port': str(nd.get('manual_ports', '')).strip() if nd.get('locked') else '',
+        }
+
+    if mapping_mode == 'advanced':
+        # Advanced mode keeps its own uplink table keyed by IPL/ISL/EXT
+        uplinks = dict(config.get('advanced_config', {}).get('uplinks', {}))
+    else:
+        uplinks = {}
+        for ut, ud in config.get('uplink_types', {}).items():
+            uplinks[ut] = {
+                'groups': ud.get('groups', 0),
+                'ports_per_group': ud.get('ports_per_group', 0),
+                'split': ud.get('split', False),
+                'factor': ud.get('factor', 2),
+                'reserved': ud.get('reserved', 0),
+                # Locked uplinks start from the first listed port, as in the live preview
+                'start': str(ud.get('manual_ports', '')).strip() if ud.get('locked') else '',
+            }
+
+    rack = {
+        'hostname_a': setup.get('hostname_a', '') or 'FabricA',
+        'hostname_b': setup.get('hostname_b', '') or 'FabricB',
+        'mgmt_ip_a': setup.get('fabric_a_mgmt_ip', ''),
+        'mgmt_ip_b': setup.get('fabric_b_mgmt_ip', ''),
+        'switch_id': str(config.get('metadata', {}).get('switch_id', '3')),
+        'lors': setup.get('leafs_or_spines', 'leaf'),
+        'use_vxlan_overlay': setup.get('use_vxlan_overlay', False),
+        'mapping_mode': mapping_mode,
+        'nodes': nodes,
+        'uplinks': uplinks,
+    }
+    if mapping_mode == 'advanced':
+        # The Cell Planning tab centres the uplinks between the node ports
+        rack['advanced_config'] = dict({'uplink_placement': 'centered'}, **config.get('advanced_config', {}))
+    return rack
+
+
+def racks_from_config(config: dict) -> dict[str, dict]:
+    """Returns the racks of an exported config: the multi-rack table, or one rack from Cell Planning."""
+    if config.get('multi_rack_config'):
+        return config['multi_rack_config']
+    return {'Rack1': _rack_from_main_config(config)}
+
+
+def cluster_output_dirs(config: dict, out_dir: str) -> tuple[str, str]:
+    """Returns the (DesignOutput, SwitchOutput) directories for a cluster config."""
+    cluster_name = config.get('setup_values', {}).get('cluster_name', '')
+    cluster_dir = os.path.join(out_dir, _safe_dir_name(cluster_name, 'Unnamed_Cluster'))
+    return os.path.join(cluster_dir, 'DesignOutput'), os.path.join(cluster_dir, 'SwitchOutput')
+
+
+def build_rack_jobs(config: dict, out_dir: str, *, images: bool = True, tables: bool = True,
+                    configs: bool = True, script_filename: str = 'switch_conf.py',
+                    placement: str = 'greedy', offline: bool = False) -> list[dict]:
+    """Turns one cluster config into picklable per-rack jobs for process_rack."""
+    setup = config.get('setup_values', {})
+    design_dir, switch_dir = cluster_output_dirs(config, out_dir)
+    default_switch_id = str(config.get('metadata', {}).get('switch_id', '3'))
+    # NB ports are labelled from the Cell Planning CN/EB counts, as in the GUI
+    node_types = config.get('node_types', {})
+    nb_cn_count = safe_int(str(node_types.get('CN', {}).get('count', 0)))
+    nb_eb_count = safe_int(str(node_types.get('EB', {}).get('count', 0)))
+
+    return [{
+        'rack_name': rack_name,
+        'rack_data': rack_data,
+        'setup': setup,
+        'cluster_name': setup.get('cluster_name', '').strip(),
+        'switch_id': default_switch_id,
+        'nb_cn_count': nb_cn_count,
+        'nb_eb_count': nb_eb_count,
+        'placement': placement,
+        'design_dir': design_dir,
+        'switch_dir': switch_dir,
+        'script_filename': script_filename,
+        'images': images,
+        'tables': tables,
+        'configs': configs,
+        'offline': offline,
+    } for rack_name, rack_data in racks_from_config(config).items()]
+
+
+# Per worker process: cloned racks handled by the same worker are planned and rendered once.
+_PLAN_CACHE = PlanCache()
+
+
+def process_rack(job: dict) -> tuple[str, bool, list[str]]:
+    """
+    Plans one rack and writes its outputs. Runs in a worker process, so it only
+    touches the job dict. Returns (rack_name, ok, messages).
+    """
+    rack_name, rack_data = job['rack_name'], job['rack_data']
+    spec = RackSpec.from_rack_data(rack_data, default_switch_id=job['switch_id'],
+                                   nb_cn_count=job['nb_cn_count'], nb_eb_count=job['nb_eb_count'],
+                                   placement=job['placement'])
+    port_map, _ = _PLAN_CACHE.plan(spec)
+    if not port_map:
+        return rack_name, True, [f"Skipped {rack_name}: No ports assigned."]
+
+    messages = []
+    ok = True
+    cluster_name = job['cluster_name'] or 'UnnamedCluster'
+    ls_type = rack_data.get('lors', 'leaf')
+    hostname_a = rack_data.get('hostname_a', f'{rack_name}-A')
+    hostname_b = rack_data.get('hostname_b', f'{rack_name}-B')
+    design_dir = job['design_dir']
+
+    if job['images']:
+        try:
+            os.makedirs(design_dir, exist_ok=True)
+            base_image = load_base_image(spec.switch_id)
+            labels = PortMap.from_pairs(port_map, spec.layout['PORT_COUNT'])
+            outputs = []
+            for fabric, hostname in (('A', hostname_a), ('B', hostname_b)):
+                img = render_overlay_cached(labels, fabric, base_image, spec.layout,
+                                            cn_count=spec.nb_cn_count, eb_count=spec.nb_eb_count)
+                out_path = get_unique_filename(os.path.join(design_dir, f"{cluster_name}_{rack_name}_{hostname}_{ls_type}_{fabric}.png"))
+                img.save(out_path)
+                outputs.append(os.path.basename(out_path))
+            messages.append(f"Generated images for {rack_name}: {', '.join(outputs)}")
+        except Exception as e:
+            ok = False
+            messages.append(f"Failed to generate images for {rack_name}: {e}")
+
+    if job['tables']:
+        try:
+            os.makedirs(design_dir, exist_ok=True)
+            host_part = f'{hostname_a}-{hostname_b}' if hostname_b and hostname_b != 'FabricB' else hostname_a
+            base_filename = f'{cluster_name}_{rack_name}_{host_part}_{ls_type}'
+            csv_path = get_unique_filename(os.path.join(design_dir, f'{base_filename}.csv'))
+            xlsx_path = get_unique_filename(os.path.join(design_dir, f'{base_filename}.xlsx'))
+            write_port_tables(port_map, spec.layout['NAME'], hostname_a, hostname_b, csv_path, xlsx_path)
+            messages.append(f"Exported tables for {rack_name}: {os.path.basename(csv_path)}, {os.path.basename(xlsx_path)}")
+        except Exception as e:
+            ok = False
+            messages.append(f"Failed to export tables for {rack_name}: {e}")
+
+    if job['configs']:
+        env_vars = build_rack_env_vars(job['setup'], rack_data, port_map, rack_name, job['switch_id'])
+        params = build_switch_conf_params(job['switch_dir'], env_vars, job['script_filename'])
+        # The script is placed once per cluster before the racks are dispatched
+        result = run_switch_conf(params, skip_download=True, offline=job['offline'])
+        ok = ok and not result.startswith('An unexpected error occurred')
+        messages.append(result)
+
+    return rack_name, ok, messages
+
+
+def run_batch(in_path: str, out_dir: str, *, jobs: Optional[int] = None, images: bool = True, tables: bool = True,
+              configs: bool = True, download: bool = True, offline: bool = False, placement: str = 'greedy',
+              log=print) -> int:
+    """Runs the batch over every config under in_path. Returns the number of failed racks."""
+    all_jobs = []
+    failures = 0
+    for path, config in load_cluster_configs(in_path):
+        script_filename = 'switch_conf.py'
+        if configs and download:
+            _, switch_dir = cluster_output_dirs(config, out_dir)
+            os.makedirs(switch_dir, exist_ok=True)
+            log(f"Fetching switch_conf.py for {os.path.basename(path)} ...")
+            available, note = prepare_switch_conf(switch_dir, offline=offline, script_filename=script_filename)
+            if note:
+                log(f"    {note}")
+            if not available and offline:
+                log("    Working offline and no cached copy of switch_conf.py exists; only local .cfg files will be written.")
+            elif not available:
+                log("    Could not download switch_conf.py (VPN/Network Error); only local .cfg files will be written.")
+        cluster_jobs = build_rack_jobs(config, out_dir, images=images, tables=tables, configs=configs,
+                                       script_filename=script_filename, placement=placement, offline=offline)
+        log(f"{os.path.basename(path)}: {len(cluster_jobs)} rack(s)")
+        all_jobs.extend(cluster_jobs)
+
+    if not all_jobs:
+        log("No racks found.")
+        return 0
+
+    max_workers = jobs or os.cpu_count() or 1
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(process_rack, job): job['rack_name'] for job in all_jobs}
+        completed = 0
+        for future in concurrent.futures.as_completed(futures):
+            completed += 1
+            try:
+                rack_name, ok, messages = future.result()
+            except Exception as e:
+                rack_name, ok, messages = futures[future], False, [f"Failed to process {futures[future]}: {e}"]
+            if not ok:
+                failures += 1
+            log(f"[{completed}/{len(all_jobs)}] {rack_name}")
+            for message in messages:
+                log(f"    {message}")
+
+    log(f"Done: {len(all_jobs) - failures}/{len(all_jobs)} rack(s) succeeded.")
+    return failures
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='portmapper batch',
+                                     description='Plan and render every rack in a directory of exported PortMapper JSON configs.')
+    parser.add_argument('--in', dest='in_path', required=True, help='JSON config file or directory of config files')
+    parser.add_argument('--out', dest='out_dir', default='DesignOutput', help='Output directory (one sub-directory per cluster)')
+    parser.add_argument('--jobs', type=int, default=None, help='Worker processes (default: number of CPU cores)')
+    parser.add_argument('--no-images', action='store_true', help='Skip the PNG overlays')
+    parser.add_argument('--no-tables', action='store_true', help='Skip the CSV/XLSX port tables')
+    parser.add_argument('--no-configs', action='store_true', help='Skip the switch .cfg files')
+    parser.add_argument('--no-download', action='store_true',
+                        help='Do not download switch_conf.py; only the local .cfg files are written')
+    parser.add_argument('--offline', action='store_true',
+                        help='Use the cached switch_conf.py without contacting the download server')
+    parser.add_argument('--placement', choices=PLACEMENT_MODES, default='greedy',
+                        help='Port placement for default-mode racks: greedy (default) or solver, which places all '
+                             'types together and falls back to greedy when it finds no layout in time')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.in_path):
+        parser.error(f"input not found: {args.in_path}")
+
+    failures = run_batch(args.in_path, args.out_dir, jobs=args.jobs,
+                         images=not args.no_images, tables=not args.no_tables,
+                         configs=not args.no_configs, download=not args.no_download, offline=args.offline,
+                         placement=args.placement)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
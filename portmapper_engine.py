@@ -0,0 +1,1955 @@
+#!/usr/bin/env python3
+"""
+Headless port-planning engine for PortMapper.
+
+Everything in this module is pure Python with no Qt (and no PIL) imports, so
+rack port maps can be planned from scripts, CI boxes and worker processes
+without booting a QApplication. The GUI in portmapper.py builds on the same
+primitives (SWITCH_LAYOUTS, PortPlanner, the Cisco slice balancers). The
+bandwidth report loads numpy (a pandas dependency) on first use.
+
+Typical use:
+
+    spec = RackSpec(switch_id='3',
+                    nodes={'DN': NodeSpec(count=16), 'CN': NodeSpec(count=8)},
+                    uplinks={'IPL': UplinkSpec(groups=1, ports_per_group=2)})
+    port_map, assigned = plan_rack(spec)
+"""
+import hashlib
+import json
+import math
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Optional
+
+# Order in which node and uplink types are planned (matches the GUI tabs).
+NODE_TYPES = ['DN', 'CN', 'EB', 'IE', 'GN']
+UPLINK_TYPES = ['IPL', 'ISL', 'MLAG/BGP', 'NB']
+
+# Default-mode placement: 'greedy' assigns one type at a time; 'solver' places all
+# auto-assigned types together and falls back to greedy after SOLVER_TIME_BUDGET seconds.
+PLACEMENT_MODES = ('greedy', 'solver')
+SOLVER_TIME_BUDGET = 0.5
+
+# Advanced-mode uplinks: 'sequential' takes the next free right-side ports; 'centered'
+# places them as one block balanced between the node ports (the Cell Planning tab layout).
+ADVANCED_UPLINK_PLACEMENTS = ('sequential', 'centered')
+
+
+def resource_path(rel: str) -> str:
+    """
+    Get the absolute path to a resource file.
+    Works whether script is run directly or packaged with PyInstaller.
+    Paths are resolved relative to the script's directory location.
+    """
+    try:
+        # If bundled with PyInstaller
+        base = sys._MEIPASS
+    except Exception:
+        # If running as a script, use the directory containing this script
+        base = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base, rel)
+
+def get_unique_filename(filepath: str) -> str:
+    if not os.path.exists(filepath):
+        return filepath
+    (directory, filename) = os.path.split(filepath)
+    (name, ext) = os.path.splitext(filename)
+    match = re.search(r'-(\d+)$', name)
+    if match:
+        counter = int(match.group(1))
+        base_name = name[:match.start()]
+    else:
+        counter = 1
+        base_name = name
+    while True:
+        counter += 1
+        new_name = f'{base_name}-{counter:02d}{ext}'
+        new_filepath = os.path.join(directory, new_name)
+        if not os.path.exists(new_filepath):
+            return new_filepath
+
+def safe_int(text: str, default: int = 0) -> int:
+    try:
+        return int(text.strip()) if text.strip() else default
+    except Exception:
+        return default
+
+
+def _parse_port_string(port_str: str) -> Optional[list[int]]:
+    if not port_str.strip():
+        return []
+    ports = set()
+    parts = port_str.split(',')
+    for part in parts:
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            try:
+                (start_str, end_str) = part.split('-')
+                start = int(start_str.strip())
+                end = int(end_str.strip())
+                if start > end:
+                    return None
+                ports.update(range(start, end + 1))
+            except ValueError:
+                return None
+        else:
+            try:
+                ports.add(int(part))
+            except ValueError:
+                return None
+    return sorted(list(ports))
+
+
+def _format_port_ranges(ports: list[int], split_factor: int = 1) -> str:
+    """Formats a list of port numbers into a compact string like '1-4,6,8-10' or '1-4/2,6/2'."""
+    if not ports:
+        return ''
+    ports = sorted(list(set(ports)))
+    ranges = []
+    start_of_range = ports[0]
+
+    def format_single_range(start, end):
+        port_str = str(start) if start == end else f'{start}-{end}'
+        if split_factor > 1:
+            port_str += f'/{split_factor}'
+        return port_str
+
+    for i in range(1, len(ports)):
+        if ports[i] != ports[i - 1] + 1:
+            end_of_range = ports[i - 1]
+            ranges.append(format_single_range(start_of_range, end_of_range))
+            start_of_range = ports[i]
+    # Handle the last range
+    ranges.append(format_single_range(start_of_range, ports[-1]))
+    return ','.join(ranges)
+
+
+HIGH_PORT_UPLINK_TYPES = ['IPL', 'ISL', 'EXT', 'MLAG/BGP', 'NB']  # Uplink types that assign from high ports down
+
+# Switch layout schema. Required: NAME, IMAGE, PORT_COUNT, NATIVE_SPEED, SHEET_TAB, GRID,
+# FONT_SIZE, PORT_WIDTH/HEIGHT, H/V_SPACING, START_X/Y. Optional keys (normalize_layout
+# fills in the defaults, so every entry has them):
+#   GRID                (rows, columns) of the port cage; any size.
+#   PORT_MAPPING_LOGIC  None: ports numbered down each column (along each row with
+#                       HORIZONTAL_LAYOUT). 'banked': the rows form banks of BANK_ROWS
+#                       rows, each numbered down its columns ('cisco_4x16' = 2-row banks).
+#   BANK_ROWS           Rows per bank for 'banked' numbering (default 2).
+#   ROW_OFFSETS / CUMULATIVE_GAPS / COLUMN_X_COORDS   Per-row / per-column pixel tweaks.
+#   SLICE_SIZE          Ports per ASIC slice for BALANCED_*_ASSIGNMENT (default 8).
+#   BREAKOUT_LANES      Split factors a port supports, e.g. (2, 4, 8) for 800G cages;
+#                       offered as the Split factor choices (default (2, 4)). The port map
+#                       gives a broken-out port one label naming its lane range ('CN-1/4');
+#                       LaneMap / plan_rack_lanes address each lane as a (port, lane) slot.
+#   HALVES              ((first, last), (first, last)): LEFT and RIGHT port ranges used by
+#                       the advanced layout (default: the lower and upper half of the ports).
+LAYOUT_DEFAULTS = {
+    'ROW_OFFSETS': {},
+    'HORIZONTAL_LAYOUT': False,
+    'PORT_MAPPING_LOGIC': None,
+    'BANK_ROWS': 2,
+    'SLICE_SIZE': 8,
+    'BREAKOUT_LANES': (2, 4),
+    'BALANCED_NODE_ASSIGNMENT': False,
+    'BALANCED_UPLINK_ASSIGNMENT': False,
+}
+
+SWITCH_LAYOUTS = {}
+
+SWITCH_LAYOUTS['1'] = {
+    'NAME': 'Mellanox SN4600 200G',
+    'IMAGE': 'base_sn4600hr.png',
+    'PORT_COUNT': 64,
+    'NATIVE_SPEED': '200G',
+    'SHEET_TAB': 'SN4600',
+    'GRID': (4, 16),
+    'FONT_SIZE': 24,
+    'PORT_WIDTH': 113,
+    'PORT_HEIGHT': 48,
+    'H_SPACING': 148.6,
+    'V_SPACING': 86,
+    'START_X': 107,
+    'START_Y': 123,
+    'ROW_OFFSETS': {
+        1: 1,
+        3: 1
+    }
+}
+SWITCH_LAYOUTS['2'] = {
+    'NAME': 'Mellanox SN3700 200G',
+    'IMAGE': 'base_sn3700.png',
+    'PORT_COUNT': 32,
+    'NATIVE_SPEED': '200G',
+    'SHEET_TAB': 'SN3700',
+    'GRID': (2, 16),
+    'FONT_SIZE': 24,
+    'PORT_WIDTH': 103,
+    'PORT_HEIGHT': 48,
+    'H_SPACING': 109.3,
+    'V_SPACING': 78,
+    'START_X': 199,
+    'START_Y': 66,
+    'ROW_OFFSETS': {},
+    'CUMULATIVE_GAPS': {
+        5: 41,
+        7: 40,
+        9: 39,
+        11: 38
+    },
+    'COLUMN_X_COORDS': [
+        199,
+        308,
+        418,
+        527,
+        636,
+        784,
+        893,
+        1042,
+        1151,
+        1300,
+        1409,
+        1558,
+        1667,
+        1777,
+        1886,
+        1995
+    ]
+}
+SWITCH_LAYOUTS['3'] = {
+    'NAME': 'Mellanox SN5400 400G',
+    'IMAGE': 'base-SN5400.png',
+    'PORT_COUNT': 64,
+    'NATIVE_SPEED': '400G',
+    'SHEET_TAB': 'SN5400',
+    'GRID': (4, 16),
+    'FONT_SIZE': 24,
+    'PORT_WIDTH': 113,
+    'PORT_HEIGHT': 52,
+    'H_SPACING': 146.5,
+    'V_SPACING': 109,
+    'START_X': 144,
+    'START_Y': 111,
+    'ROW_OFFSETS': {2: -24},
+    'HORIZONTAL_LAYOUT': False,
+    'BALANCED_NODE_ASSIGNMENT': False,
+    'BALANCED_UPLINK_ASSIGNMENT': False
+}
+SWITCH_LAYOUTS['4'] = {
+    'NAME': 'Mellanox SN5600 800G',
+    'IMAGE': 'base-SN5600.png',
+    'PORT_COUNT': 64,
+    'NATIVE_SPEED': '800G',
+    'SHEET_TAB': 'SN5600',
+    'GRID': (4, 16),
+    'FONT_SIZE': 24,
+    'PORT_WIDTH': 113,
+    'PORT_HEIGHT': 54,
+    'H_SPACING': 143.4,
+    'V_SPACING': 73,
+    'START_X': 163,
+    'START_Y': 111,
+    'ROW_OFFSETS': {
+        1: 3,
+        2: 60,
+        3: 3
+    },
+    'HORIZONTAL_LAYOUT': False,
+    'BREAKOUT_LANES': (2, 4, 8),
+    'BALANCED_NODE_ASSIGNMENT': False,
+    'BALANCED_UPLINK_ASSIGNMENT': False
+}
+SWITCH_LAYOUTS['5'] = {
+    'NAME': 'Arista 7060-DX5 400G',
+    'IMAGE': 'base-arista7060DX5.png',
+    'PORT_COUNT': 64,
+    'NATIVE_SPEED': '400G',
+    'SHEET_TAB': 'Arista7060DX5',
+    'GRID': (4, 16),
+    'FONT_SIZE': 24,
+    'PORT_WIDTH': 113,
+    'PORT_HEIGHT': 52,
+    'H_SPACING': 152.5,
+    'V_SPACING': 109,
+    'START_X': 77,
+    'START_Y': 145,
+    'ROW_OFFSETS': {
+        2: -22,
+        3: 3
+    },
+    'PORT_MAPPING_LOGIC': 'cisco_4x16',
+    'BALANCED_NODE_ASSIGNMENT': False,
+    'BALANCED_UPLINK_ASSIGNMENT': False
+}
+SWITCH_LAYOUTS['6'] = {
+    'NAME': 'Arista 7050DX4-32S 200G',
+    'IMAGE': 'base-arista7050DX4.png',
+    'PORT_COUNT': 32,
+    'NATIVE_SPEED': '200G',
+    'SHEET_TAB': 'Arista7050DX4',
+    'GRID': (2, 16),
+    'FONT_SIZE': 24,
+    'PORT_WIDTH': 121,
+    'PORT_HEIGHT': 61,
+    'H_SPACING': 151.1,
+    'V_SPACING': 80,
+    'START_X': 70,
+    'START_Y': 82,
+    'ROW_OFFSETS': {},
+    'HORIZONTAL_LAYOUT': False,
+    'BALANCED_NODE_ASSIGNMENT': False,
+    'BALANCED_UPLINK_ASSIGNMENT': False
+}
+SWITCH_LAYOUTS['9'] = {
+    'NAME': 'Arista 7060X6-64PE-F 800G',
+    'IMAGE': 'base-arista7060X664pef.png',
+    'PORT_COUNT': 64,
+    'NATIVE_SPEED': '800G',
+    'SHEET_TAB': 'Arista7060X6',
+    'GRID': (4, 16),
+    'FONT_SIZE': 24,
+    'PORT_WIDTH': 139,
+    'PORT_HEIGHT': 78,
+    'H_SPACING': 154,
+    'V_SPACING': 90,
+    'START_X': 157,
+    'START_Y': 78,
+    'ROW_OFFSETS': {
+        2: 35, # Offset to start Row 3 at y=293
+        3: -1   # Additional offset to start Row 4 at y=382
+    },
+    'HORIZONTAL_LAYOUT': False,
+    'PORT_MAPPING_LOGIC': 'cisco_4x16',
+    'BREAKOUT_LANES': (2, 4, 8),
+    'BALANCED_NODE_ASSIGNMENT': False,
+    'BALANCED_UPLINK_ASSIGNMENT': False
+}
+SWITCH_LAYOUTS['7'] = {
+    'NAME': 'Cisco 9332D-GX2B 400G',
+    'IMAGE': 'base_cisco_9332d.png',
+    'PORT_COUNT': 32,
+    'NATIVE_SPEED': '400G',
+    'SHEET_TAB': 'C9332D',
+    'GRID': (2, 16),
+    'FONT_SIZE': 24,
+    'PORT_WIDTH': 88,
+    'PORT_HEIGHT': 33,
+    'H_SPACING': 129,
+    'V_SPACING': 71,
+    'START_X': 190,
+    'START_Y': 58,
+    'ROW_OFFSETS': {},
+    'HORIZONTAL_LAYOUT': False,
+    'CUMULATIVE_GAPS': {
+        2: -17,
+        4: -17,
+        6: -17,
+        8: -17,
+        10: -17,
+        12: -17,
+        14: -17
+    },
+    'COLUMN_X_COORDS': [
+        190,
+        319,
+        430,
+        559,
+        671,
+        800,
+        913,
+        1042,
+        1154,
+        1283,
+        1395,
+        1524,
+        1637,
+        1766,
+        1878,
+        2007
+    ],
+    'BALANCED_NODE_ASSIGNMENT': True,
+    'BALANCED_UPLINK_ASSIGNMENT': True
+}
+SWITCH_LAYOUTS['8'] = {
+    'NAME': 'Cisco C9364D-GX2A 400G',
+    'IMAGE': 'base_cisco_9364d.png',
+    'PORT_COUNT': 64,
+    'NATIVE_SPEED': '400G',
+    'SHEET_TAB': 'C9634D-GX2A',
+    'GRID': (4, 16),
+    'FONT_SIZE': 24,
+    'PORT_WIDTH': 87,
+    'PORT_HEIGHT': 35,
+    'H_SPACING': 121,
+    'V_SPACING': 84,
+    'START_X': 277,
+    'START_Y': 38,
+    'ROW_OFFSETS': { # Offsets are applied cumulatively.
+        2: 47, # Add a 47px gap before row 3 (index 2) starts.
+        3: 0   # Row 4 (index 3) has no *additional* offset relative to row 3.
+    },
+    'PORT_MAPPING_LOGIC': 'cisco_4x16',
+    'BALANCED_NODE_ASSIGNMENT': True,
+    'BALANCED_UPLINK_ASSIGNMENT': True
+}
+
+
+def normalize_layout(layout: dict) -> dict:
+    """Fills in the optional schema keys of a SWITCH_LAYOUTS entry (in place) and validates it."""
+    for key, value in LAYOUT_DEFAULTS.items():
+        layout.setdefault(key, dict(value) if isinstance(value, dict) else value)
+    name, port_count = layout['NAME'], layout['PORT_COUNT']
+    rows, cols = layout['GRID']
+    if rows * cols < port_count:
+        raise ValueError(f"{name}: GRID {rows}x{cols} has room for fewer than {port_count} ports")
+    if layout['PORT_MAPPING_LOGIC'] in ('banked', 'cisco_4x16') and rows % layout['BANK_ROWS']:
+        raise ValueError(f"{name}: {rows} rows do not divide into banks of {layout['BANK_ROWS']}")
+    if (layout['BALANCED_NODE_ASSIGNMENT'] or layout['BALANCED_UPLINK_ASSIGNMENT']) and port_count % layout['SLICE_SIZE']:
+        raise ValueError(f"{name}: {port_count} ports do not divide into slices of {layout['SLICE_SIZE']}")
+    half = port_count // 2
+    layout.setdefault('HALVES', ((1, half), (half + 1, port_count)))
+    layout['BREAKOUT_LANES'] = tuple(sorted(set(layout['BREAKOUT_LANES'])))
+    return layout
+
+
+for _layout in SWITCH_LAYOUTS.values():
+    normalize_layout(_layout)
+
+
+def port_grid_position(layout: dict, port_id: int) -> tuple[int, int]:
+    """Returns the (row, column) of a port in the layout's GRID."""
+    rows, cols = layout['GRID']
+    if layout.get('PORT_MAPPING_LOGIC') in ('banked', 'cisco_4x16'):
+        bank_rows = layout.get('BANK_ROWS', 2)
+        bank_size = bank_rows * cols
+        # Ports past the last bank stay in it (extra columns), as the 4x16 mapping always did
+        bank = min((port_id - 1) // bank_size, rows // bank_rows - 1)
+        col, row = divmod(port_id - 1 - bank * bank_size, bank_rows)
+        return bank * bank_rows + row, col
+    if layout.get('HORIZONTAL_LAYOUT', False):
+        return divmod(port_id - 1, cols)
+    col, row = divmod(port_id - 1, rows)
+    return row, col
+
+
+def breakout_factor_choices(layout: dict) -> list[str]:
+    """The Split factor choices for a layout, as combo box strings."""
+    return [str(lanes) for lanes in layout.get('BREAKOUT_LANES', LAYOUT_DEFAULTS['BREAKOUT_LANES']) if lanes > 1]
+
+
+def _label_base_type(label: str) -> str:
+    """Determines the fundamental type of a port from its label."""
+    if label == 'RSVD-EXT':
+        return 'EXT'
+    if label == 'RSVD-NB':  # Handle legacy/buggy label for compatibility
+        return 'NB'
+    if label.startswith('RSVD-'):  # e.g., "RSVD-CN" -> "CN"
+        return label.split('-', 1)[1]
+
+    # Check for known uplink prefixes
+    for prefix in ['ISL', 'EXT', 'NB', 'IPL']:
+        if label.startswith(prefix):
+            return prefix
+
+    # Check for CN-NB and EB-NB labels
+    if label.startswith('CN-NB') or label.startswith('EB-NB'):
+        return 'NB'
+
+    # Fallback for node types like "CN-1", "DN-5", etc.
+    match = _LABEL_TYPE_RE.match(label)
+    return match.group(1) if match else 'UNKNOWN'
+
+
+_LABEL_TYPE_RE = re.compile(r'([A-Z]+)')
+_LABEL_GROUP_RE = re.compile(r'(?:ISL|EXT|MLAG/BGP)(\d+)')     # 'ISL2-1', 'EXT3-4', 'MLAG/BGP1-2'
+_LABEL_NODE_RE = re.compile(r'[A-Z]+-(\d+)(?:/(\d+))?$')       # 'DN-5', 'CN-1/4'
+_LABEL_NB_SIDE_RE = re.compile(r'(CN|EB)-NB-\d')               # 'CN-NB-1', 'EB-NB-2/4'
+
+
+@dataclass(frozen=True)
+class PortLabel:
+    """What a port label says, parsed once per distinct label by parse_port_label."""
+    base_type: str                              # get_port_base_type(label)
+    group: Optional[int] = None                 # ISL/EXT group: 'ISL2-1' -> 2; None for 'ISL-1'
+    node_range: Optional[tuple[int, int]] = None  # Node labels: 'CN-1/4' -> (1, 4), 'DN-5' -> (5, 5)
+    reserved: bool = False                      # RSVD-* placeholder
+    nb_side: Optional[str] = None               # 'CN' or 'EB' for CN-NB-* / EB-NB-* ports
+
+
+_PORT_LABELS: dict[str, PortLabel] = {}
+
+
+def parse_port_label(label: str) -> PortLabel:
+    """Returns the parsed record for a port label, memoized per label (labels repeat on every redraw)."""
+    record = _PORT_LABELS.get(label)
+    if record is None:
+        base_type = _label_base_type(label)
+        group = _LABEL_GROUP_RE.match(label)
+        node = _LABEL_NODE_RE.match(label) if base_type in NODE_TYPES else None
+        nb_side = _LABEL_NB_SIDE_RE.match(label)
+        record = _PORT_LABELS[label] = PortLabel(
+            base_type=base_type,
+            group=int(group.group(1)) if group else None,
+            node_range=(int(node.group(1)), int(node.group(2) or node.group(1))) if node else None,
+            reserved=label.startswith('RSVD'),
+            nb_side=nb_side.group(1) if nb_side else None)
+    return record
+
+
+def get_port_base_type(label: str) -> str:
+    """Determines the fundamental type of a port from its label."""
+    return parse_port_label(label).base_type
+
+class PortPlanner:
+    """Handles the logic for calculating port assignments."""
+
+    def generate_node_ports(self, node_type: str,
+        count: int,
+        split: bool,
+        factor: int,
+        start_port: int,
+        reserved: int,
+        node_start: int) -> tuple[list[tuple[int,
+        str]],
+         int]:
+        ports = []
+        if split and factor > 1:
+            physical_ports_needed = math.ceil(count / factor)
+        else:
+            physical_ports_needed = count
+            factor = 1
+        current_port = start_port
+        for i in range(physical_ports_needed):
+            port_num = current_port + i
+            first_node = node_start + i * factor
+            if first_node <= node_start + count - 1:
+                last_node = min(first_node + factor - 1, node_start + count - 1)
+                if first_node == last_node:
+                    label = f'{node_type}-{first_node}'
+                else:
+                    label = f'{node_type}-{first_node}/{last_node}'
+            else:
+                label = f'RSVD-{node_type}'
+            ports.append((port_num, label))
+        for i in range(reserved):
+            port_num = start_port + physical_ports_needed + i
+            label = f'RSVD-{node_type}'
+            ports.append((port_num, label))
+        return (ports, node_start + count)
+
+    def generate_grouped_ports(self, uplink_type: str,
+        groups: int,
+        ports_per_group: int,
+        split: bool,
+        factor: int,
+        # The starting port for the assignment. For high-port types, this is the
+        # highest port number in the range. For others, it's the lowest.
+        start_port: int, 
+        reserved: int,
+        locked: bool,
+        cn_count: int = 0,
+        eb_count: int = 0) -> list[tuple[int, str]]:
+        ports = []
+        is_high_port_assignment = uplink_type in HIGH_PORT_UPLINK_TYPES
+        increment = -1 if is_high_port_assignment else 1
+        current_port = start_port
+        phys_ports_per_group = math.ceil(ports_per_group / factor) if split and factor > 1 else ports_per_group
+
+        # Special handling for NB ports
+        if uplink_type == 'NB':
+            cn_nb_count = 0
+            eb_nb_count = 0
+            
+            for group_num in range(groups):
+                group_port_nums = []
+                for _ in range(phys_ports_per_group):
+                    group_port_nums.append(current_port)
+                    current_port += increment
+
+                sorted_ports = sorted(group_port_nums)
+
+                for port_index, port_num in enumerate(sorted_ports):
+                    if split and factor > 1:
+                        first_logical = port_index * factor + 1
+                        last_logical = min((port_index + 1) * factor, ports_per_group)
+                        label_suffix = f'{first_logical}/{last_logical}' if first_logical != last_logical else str(first_logical)
+                    else:
+                        label_suffix = str(port_index + 1)
+
+                    # Determine if this port corresponds to CN or EB
+                    if port_index < cn_count:
+                        cn_nb_count += 1
+                        label = f'CN-NB-{cn_nb_count}' if not split or factor == 1 else f'CN-NB-{cn_nb_count}/{label_suffix}'
+                    else:
+                        eb_nb_count += 1
+                        label = f'EB-NB-{eb_nb_count}' if not split or factor == 1 else f'EB-NB-{eb_nb_count}/{label_suffix}'
+
+                    ports.append((port_num, label))
+        else:
+            # Original logic for non-NB ports
+            for group_num in range(groups):
+                group_port_nums = []
+                for _ in range(phys_ports_per_group):
+                    group_port_nums.append(current_port)
+                    current_port += increment
+
+                sorted_ports = sorted(group_port_nums)
+
+                for port_index, port_num in enumerate(sorted_ports):
+                    if split and factor > 1:
+                        first_logical = port_index * factor + 1
+                        last_logical = min((port_index + 1) * factor, ports_per_group)
+                        label_suffix = f'{first_logical}/{last_logical}' if first_logical != last_logical else str(first_logical)
+                    else:
+                        label_suffix = str(port_index + 1)
+
+                    # *** CRITICAL: DO NOT CHANGE THIS LABEL MAPPING ***
+                    # Ports are stored internally as 'MLAG/BGP' in uplink_types but MUST be displayed as 'EXT' in the UI
+                    # DO NOT display 'MLAG/BGP' - ALWAYS convert to 'EXT' for port labels
+                    # This is intentional: 'MLAG/BGP' is the internal type name, 'EXT' is the display name
+                    # Use EXT instead of MLAG/BGP for port labels
+                    display_type = 'EXT' if uplink_type == 'MLAG/BGP' else uplink_type
+                    if uplink_type in ['ISL', 'MLAG/BGP'] and groups > 1:
+                        label = f'{display_type}{group_num + 1}-{label_suffix}'
+                    else:
+                        label = f'{display_type}-{label_suffix}'
+
+                    ports.append((port_num, label))
+
+        # Handle reserved ports for all uplink types
+        # *** CRITICAL: DO NOT CHANGE THIS LABEL MAPPING ***
+        # Ports are stored internally as 'MLAG/BGP' in uplink_types but MUST be displayed as 'EXT' in the UI
+        # DO NOT display 'MLAG/BGP' - ALWAYS convert to 'EXT' for port labels
+        for _ in range(reserved):
+            port_num = current_port
+            current_port += increment
+            if uplink_type == 'MLAG/BGP':
+                label = 'RSVD-EXT'  # EXT is the display name, never use 'RSVD-MLAG/BGP'
+            elif uplink_type == 'NB':
+                label = 'RSVD-NB'
+            else:
+                label = f'RSVD-{uplink_type}'
+            ports.append((port_num, label))
+        return ports
+
+
+# --- Port Maps ---
+
+class PortMap:
+    """
+    One label per physical port, held in a fixed-size list indexed by port ID.
+    Built from the (port_id, label) pairs produced by planning. When a port
+    appears more than once the first label wins (keep='last' keeps the last one),
+    matching the de-duplication the overlay and bandwidth code has always used.
+    Iterating yields (port_id, label) pairs in port order.
+    """
+    __slots__ = ('_labels', '_count')
+
+    def __init__(self, port_count: int = 0):
+        self._labels: list[Optional[str]] = [None] * (port_count + 1)  # Slot 0 is unused
+        self._count = 0
+
+    @classmethod
+    def from_pairs(cls, pairs, port_count: int = 0, keep: str = 'first') -> 'PortMap':
+        """Builds a PortMap from (port_id, label) pairs; ports beyond port_count grow the table."""
+        port_map = cls(port_count)
+        for port, label in pairs:
+            port_map.set(port, label, overwrite=(keep == 'last'))
+        return port_map
+
+    def set(self, port: int, label: str, overwrite: bool = True):
+        """Assigns a label to a port. Port IDs below 1 are ignored."""
+        if port < 1:
+            return
+        labels = self._labels
+        if port >= len(labels):
+            labels.extend([None] * (port + 1 - len(labels)))
+        if labels[port] is None:
+            self._count += 1
+        elif not overwrite:
+            return
+        labels[port] = label
+
+    def get(self, port: int, default: Optional[str] = None) -> Optional[str]:
+        if 0 < port < len(self._labels):
+            label = self._labels[port]
+            if label is not None:
+                return label
+        return default
+
+    def __getitem__(self, port: int) -> str:
+        label = self.get(port)
+        if label is None:
+            raise KeyError(port)
+        return label
+
+    def __contains__(self, port: int) -> bool:
+        return self.get(port) is not None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self):
+        for port, label in enumerate(self._labels):
+            if label is not None:
+                yield port, label
+
+    def ports(self) -> list[int]:
+        return [port for port, _ in self]
+
+    def labels(self) -> list[str]:
+        return [label for _, label in self]
+
+    def to_pairs(self) -> list[tuple[int, str]]:
+        return list(self)
+
+
+class FreePortIndex:
+    """
+    The set of assigned port IDs kept as an int bitmask (bit p = port p), answering
+    "first contiguous free run of length k" queries from either end with a handful of
+    big-int operations instead of re-scanning a range per candidate start. Ports past
+    the highest assigned one count as free. Supports `in`, so it can stand in for the
+    assigned-port sets the slice-balanced generators take.
+    """
+    __slots__ = ('mask',)
+
+    def __init__(self, ports=()):
+        self.mask = 0
+        self.update(ports)
+
+    def add(self, port: int):
+        if port >= 1:
+            self.mask |= 1 << port
+
+    def update(self, ports):
+        for port in ports:
+            self.add(port)
+
+    def add_run(self, start: int, length: int):
+        """Marks ports start..start+length-1 as assigned."""
+        if length > 0:
+            end = start + length        # Ports below 1 are dropped, not shifted up
+            start = max(start, 1)
+            if end > start:
+                self.mask |= ((1 << (end - start)) - 1) << start
+
+    def __contains__(self, port: int) -> bool:
+        return port >= 1 and (self.mask >> port) & 1 == 1
+
+    def is_free(self, start: int, length: int) -> bool:
+        """True if ports start..start+length-1 are all unassigned."""
+        return length <= 0 or (self.mask >> max(start, 0)) & ((1 << length) - 1) == 0
+
+    def _run_starts(self, length: int) -> int:
+        """Bitmask (infinite above) with bit s set where ports s..s+length-1 are all free."""
+        result, covered = -1, 0
+        chunk, size = ~self.mask, 1
+        while length:
+            if length & 1:
+                result &= chunk >> covered
+                covered += size
+            length >>= 1
+            if length:
+                chunk &= chunk >> size
+                size *= 2
+        return result
+
+    def first_free_run(self, length: int, start: int = 1) -> int:
+        """Lowest s >= start where ports s..s+length-1 are free (may lie past the last port)."""
+        if length <= 0:
+            return start
+        start = max(start, 1)
+        starts = self._run_starts(length) >> start
+        return start + (starts & -starts).bit_length() - 1
+
+    def last_free_run(self, length: int, end: int) -> Optional[int]:
+        """
+        Highest e <= end (and e >= length) where ports e-length+1..e are free, i.e. the
+        high-end placement the uplink search uses. None if there is no such run.
+        """
+        if length <= 0:
+            return end if end >= length else None
+        highest_start = end - length + 1
+        if highest_start < 1:
+            return None
+        starts = self._run_starts(length) & (((1 << (highest_start + 1)) - 1) & ~1)
+        if not starts:
+            return None
+        return starts.bit_length() - 1 + length - 1
+
+    def free_runs(self, length: int, end: int, descending: bool = False):
+        """Yields every s where ports s..s+length-1 are free and s+length-1 <= end, lowest first."""
+        highest_start = end - length + 1
+        if length <= 0 or highest_start < 1:
+            return
+        starts = self._run_starts(length) & (((1 << (highest_start + 1)) - 1) & ~1)
+        while starts:
+            if descending:
+                s = starts.bit_length() - 1
+            else:
+                s = (starts & -starts).bit_length() - 1
+            yield s
+            starts &= ~(1 << s)
+
+    def free_segments(self, end: int) -> list[int]:
+        """Lengths of the maximal runs of unassigned ports in 1..end, lowest first."""
+        free = ~self.mask & (((1 << (end + 1)) - 1) & ~1)
+        lengths = []
+        while free:
+            start = (free & -free).bit_length() - 1
+            run = free >> start
+            length = ((run + 1) & ~run).bit_length() - 1
+            lengths.append(length)
+            free &= ~(((1 << length) - 1) << start)
+        return lengths
+
+    def free_count(self, end: int) -> int:
+        """Number of unassigned ports in 1..end."""
+        return end - bin(self.mask & (((1 << (end + 1)) - 1) & ~1)).count('1')
+
+
+# --- Breakout Lanes ---
+
+_LANE_RANGE_RE = re.compile(r'(.*?)(\d+)/(\d+)$')   # 'CN-1/4', 'ISL2-3/4', 'CN-NB-1/1/4'
+_LANE_LABELS: dict[str, tuple[str, ...]] = {}
+
+
+def lane_labels(label: str) -> tuple[str, ...]:
+    """
+    Splits the label of a broken-out port into one label per lane, memoized per label:
+    'CN-1/4' -> ('CN-1', 'CN-2', 'CN-3', 'CN-4'), 'ISL2-3/4' -> ('ISL2-3', 'ISL2-4').
+    Labels without a lane range ('DN-5', 'RSVD-CN') are a single lane.
+    """
+    labels = _LANE_LABELS.get(label)
+    if labels is None:
+        match = _LANE_RANGE_RE.match(label)
+        if match and int(match.group(2)) <= int(match.group(3)):
+            prefix, first, last = match.group(1), int(match.group(2)), int(match.group(3))
+            labels = tuple(f'{prefix}{n}' for n in range(first, last + 1))
+        else:
+            labels = (label,)
+        _LANE_LABELS[label] = labels
+    return labels
+
+
+class LaneMap:
+    """
+    One label per breakout lane, addressed as (port, lane) slots. Every assigned port has
+    a width: 1 for a port used whole, the split factor for a broken-out port, whose lanes
+    1..width each carry one node or logical uplink port (lanes past the last one stay free).
+    Slot (port, lane) is stored at index (port - 1) * max_lanes + lane of a flat table, so
+    a 128-port switch with 4-lane cages is 512 slots. Iterating yields ((port, lane), label)
+    pairs in port, then lane order.
+    """
+    __slots__ = ('max_lanes', '_widths', '_labels', '_count')
+
+    def __init__(self, port_count: int = 0, max_lanes: int = 1):
+        self.max_lanes = max(1, max_lanes)
+        self._widths: list[int] = [0] * (port_count + 1)  # Slot 0 is unused; 0 means unassigned
+        self._labels: list[Optional[str]] = [None] * (port_count * self.max_lanes + 1)
+        self._count = 0
+
+    @classmethod
+    def from_pairs(cls, pairs, port_count: int = 0, widths: Optional[dict[str, int]] = None,
+                   keep: str = 'first') -> 'LaneMap':
+        """
+        Builds a LaneMap from planned (port_id, label) pairs, de-duplicated like
+        PortMap.from_pairs. A label naming a lane range ('CN-1/4') is spread over its lanes;
+        widths gives the breakout width per label base type (see lane_widths), so the last
+        port of a type ('CN-5/6' at 4x) keeps its free lanes.
+        """
+        widths = widths or {}
+        ports = []
+        for port, label in PortMap.from_pairs(pairs, port_count, keep):
+            parsed = parse_port_label(label)
+            labels = lane_labels(label)
+            ports.append((port, labels, max(len(labels), 1 if parsed.reserved else widths.get(parsed.base_type, 1))))
+        lane_map = cls(port_count, max((width for _, _, width in ports), default=1))
+        for port, labels, width in ports:
+            lane_map.set_port(port, labels, width)
+        return lane_map
+
+    def slot(self, port: int, lane: int) -> int:
+        """Index of a (port, lane) slot in the flat table."""
+        return (port - 1) * self.max_lanes + lane
+
+    def set_port(self, port: int, labels, width: int = 1):
+        """Assigns a port: labels go on lanes 1, 2, ... of a port broken out into width lanes."""
+        width = max(width, len(labels), 1)
+        if port < 1:
+            return
+        if width > self.max_lanes:
+            raise ValueError(f"Port {port}: {width} lanes do not fit {self.max_lanes}-lane slots")
+        if port >= len(self._widths):
+            self._widths.extend([0] * (port + 1 - len(self._widths)))
+            self._labels.extend([None] * (port * self.max_lanes + 1 - len(self._labels)))
+        base = self.slot(port, 0)
+        for lane in range(1, self.max_lanes + 1):
+            if self._labels[base + lane] is not None:
+                self._labels[base + lane] = None
+                self._count -= 1
+        for lane, label in enumerate(labels, 1):
+            self._labels[base + lane] = label
+        self._count += len(labels)
+        self._widths[port] = width
+
+    def width(self, port: int) -> int:
+        """Lanes the port is broken out into: 1 for a whole port, 0 if it is unassigned."""
+        return self._widths[port] if 0 < port < len(self._widths) else 0
+
+    def get(self, port: int, lane: int = 1, default: Optional[str] = None) -> Optional[str]:
+        if 1 <= lane <= self.width(port):
+            label = self._labels[self.slot(port, lane)]
+            if label is not None:
+                return label
+        return default
+
+    def __getitem__(self, slot: tuple[int, int]) -> str:
+        label = self.get(*slot)
+        if label is None:
+            raise KeyError(slot)
+        return label
+
+    def __contains__(self, slot: tuple[int, int]) -> bool:
+        return self.get(*slot) is not None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self):
+        max_lanes, labels = self.max_lanes, self._labels
+        for port, width in enumerate(self._widths):
+            if width:
+                base = (port - 1) * max_lanes
+                for lane in range(1, width + 1):
+                    if labels[base + lane] is not None:
+                        yield (port, lane), labels[base + lane]
+
+    def port_lanes(self, port: int) -> list[tuple[int, str]]:
+        """The (lane, label) pairs of one port's labelled lanes."""
+        base = self.slot(port, 0)
+        return [(lane, self._labels[base + lane]) for lane in range(1, self.width(port) + 1)
+                if self._labels[base + lane] is not None]
+
+    def breakouts(self) -> list[tuple[int, int]]:
+        """(port, width) of every broken-out port."""
+        return [(port, width) for port, width in enumerate(self._widths) if width > 1]
+
+    def free_lanes(self) -> list[tuple[int, int]]:
+        """The (port, lane) slots of broken-out ports that carry no label."""
+        return [(port, lane) for port, width in self.breakouts() for lane in range(1, width + 1)
+                if self._labels[self.slot(port, lane)] is None]
+
+    def to_pairs(self) -> list[tuple[tuple[int, int], str]]:
+        return list(self)
+
+
+# --- Layout Helpers ---
+
+def get_mellanox_port_order(port_count: int) -> list[int]:
+    """
+    Returns ports in unified column order (read down each column, then the next one).
+    Ports are numbered down the columns (64-port: column 1 is 1-4 ... column 16 is
+    61-64), so for any port count this is plain sequential order.
+    """
+    return list(range(1, port_count + 1))
+
+
+def get_left_right_ports_mellanox(port_count: int, layout: Optional[dict] = None) -> tuple[list[int], list[int]]:
+    """
+    Returns LEFT and RIGHT port lists for the advanced layouts.
+    LEFT is the first half of the ports (or the layout's HALVES[0] range), RIGHT the
+    second half (HALVES[1]) reversed so the highest ports come first.
+    """
+    if layout and layout.get('HALVES'):
+        (left_first, left_last), (right_first, right_last) = layout['HALVES']
+        return list(range(left_first, left_last + 1)), list(range(right_last, right_first - 1, -1))
+    all_ports = get_mellanox_port_order(port_count)
+    mid = len(all_ports) // 2
+    return all_ports[:mid], list(reversed(all_ports[mid:]))
+
+
+def get_dnode_groups_by_dbox_type(dn_count: int, dbox_type: str) -> tuple[list[int], list[int]]:
+    """
+    Returns lists of DNode numbers for LEFT and RIGHT sides based on DBox type.
+
+    CeresV1: ODD → RIGHT, EVEN → LEFT
+    CeresV2/Mav: Groups of 2 DNodes, alternating RIGHT/LEFT (1,2 → RIGHT, 3,4 → LEFT, ...)
+    """
+    right_dns = []
+    left_dns = []
+    for dn_num in range(1, dn_count + 1):
+        if dbox_type == 'CeresV1':
+            goes_right = dn_num % 2 == 1
+        else:
+            goes_right = ((dn_num - 1) // 2) % 2 == 0
+        (right_dns if goes_right else left_dns).append(dn_num)
+    return left_dns, right_dns
+
+
+# --- Cisco Slice Balancing ---
+
+def generate_cisco_balanced_node_ports(nt, cnt, split, fac, rsv, node_start, existing_ports, port_count, start_slice=0,
+                                       slice_size=8):
+    """
+    Calculates a slice-balanced, round-robin port assignment for Cisco switches
+    (slice_size-port slices), assigning from low ports up.
+    Returns (list_of_tuples, error_string, next_slice_to_use)
+    """
+    phys_for_nodes = math.ceil(cnt / fac) if split and fac > 1 else cnt
+    total_phys = phys_for_nodes + rsv
+
+    if total_phys == 0:
+        return ([], None, start_slice)
+
+    num_slices = port_count // slice_size
+    base_ports_per_slice = total_phys // num_slices
+    extra_ports = total_phys % num_slices
+    slice_counts = [base_ports_per_slice] * num_slices
+    for i in range(extra_ports):
+        slice_to_get_extra = (start_slice + i) % num_slices
+        slice_counts[slice_to_get_extra] += 1
+
+    available_by_slice = [[] for _ in range(num_slices)]
+    for p in range(1, port_count + 1):
+        if p not in existing_ports:
+            slice_idx = (p - 1) // slice_size
+            if 0 <= slice_idx < num_slices:
+                available_by_slice[slice_idx].append(p)
+
+    for i in range(num_slices):
+        if len(available_by_slice[i]) < slice_counts[i]:
+            err_msg = (f"Cannot assign ports for {nt}.\n"
+                       f"Slice {i+1} (Ports {i*slice_size+1}-{i*slice_size+slice_size}) needs {slice_counts[i]} ports, "
+                       f"but only {len(available_by_slice[i])} are available.")
+            return (None, err_msg, start_slice)
+
+    ports_to_use = []
+    slice_pointers = [0] * num_slices
+    last_slice_assigned = -1
+
+    while len(ports_to_use) < total_phys:
+        ports_at_start_of_pass = len(ports_to_use)
+        for i in range(num_slices):
+            slice_idx = (start_slice + i) % num_slices
+            if slice_pointers[slice_idx] < slice_counts[slice_idx]:
+                port_to_add = available_by_slice[slice_idx][slice_pointers[slice_idx]]
+                ports_to_use.append(port_to_add)
+                slice_pointers[slice_idx] += 1
+                last_slice_assigned = slice_idx
+
+        if len(ports_to_use) == ports_at_start_of_pass:
+            break
+
+    port_labels = []
+    for i in range(phys_for_nodes):
+        port_num = ports_to_use[i]
+        if split and fac > 1:
+            first_node = node_start + i * fac
+            last_node = min(first_node + fac - 1, node_start + cnt - 1)
+            label = f'{nt}-{first_node}' if first_node == last_node else f'{nt}-{first_node}/{last_node}'
+        else:
+            label = f'{nt}-{node_start + i}'
+        port_labels.append((port_num, label))
+
+    for i in range(rsv):
+        port_num = ports_to_use[phys_for_nodes + i]
+        label = f'RSVD-{nt}'
+        port_labels.append((port_num, label))
+
+    next_slice = (last_slice_assigned + 1) % num_slices if last_slice_assigned != -1 else start_slice
+    return (port_labels, None, next_slice)
+
+
+def generate_cisco_balanced_uplink_ports(ut, groups, ppg, split, fac, rsv, existing_ports, port_count, start_slice,
+                                         cn_count=0, eb_count=0, slice_size=8):
+    """
+    Calculates a slice-balanced, round-robin port assignment for Cisco uplinks
+    (slice_size-port slices), assigning from high ports to low ports. cn_count/eb_count
+    drive the NB labels.
+    Returns (list_of_tuples, error_string, next_slice_to_use)
+    """
+    if ut == 'NB':
+        phys_for_data = math.ceil(ppg / fac) if split and fac > 1 else ppg
+        total_phys = phys_for_data + rsv
+    else:
+        total_phys = (ppg + rsv) * groups
+
+    if total_phys == 0:
+        return ([], None, start_slice)
+
+    num_slices = port_count // slice_size
+    base_ports_per_slice = total_phys // num_slices
+    extra_ports = total_phys % num_slices
+    slice_counts = [base_ports_per_slice] * num_slices
+    for i in range(extra_ports):
+        slice_to_get_extra = (start_slice - i + num_slices) % num_slices
+        slice_counts[slice_to_get_extra] += 1
+
+    available_by_slice = [[] for _ in range(num_slices)]
+    for p in range(port_count, 0, -1):
+        if p not in existing_ports:
+            slice_idx = (p - 1) // slice_size
+            if 0 <= slice_idx < num_slices:
+                available_by_slice[slice_idx].append(p)
+
+    for i in range(num_slices):
+        if len(available_by_slice[i]) < slice_counts[i]:
+            err_msg = (f"Cannot assign uplink ports for {ut}.\n"
+                       f"Slice {i+1} (Ports {i*slice_size+1}-{i*slice_size+slice_size}) needs {slice_counts[i]} ports, "
+                       f"but only {len(available_by_slice[i])} are available from the top down.")
+            return (None, err_msg, start_slice)
+
+    ports_to_use = []
+    slice_pointers = [0] * num_slices
+    last_slice_assigned = -1
+    while len(ports_to_use) < total_phys:
+        ports_at_start_of_pass = len(ports_to_use)
+        for i in range(num_slices):
+            slice_idx = (start_slice - i + num_slices) % num_slices
+            if slice_pointers[slice_idx] < slice_counts[slice_idx]:
+                port_to_add = available_by_slice[slice_idx][slice_pointers[slice_idx]]
+                ports_to_use.append(port_to_add)
+                slice_pointers[slice_idx] += 1
+                last_slice_assigned = slice_idx
+                if len(ports_to_use) == total_phys:
+                    break
+        if len(ports_to_use) == ports_at_start_of_pass:
+            break
+
+    ports_to_use.sort(reverse=True)
+    port_iterator = iter(ports_to_use)
+    port_labels = []
+
+    try:
+        if ut == 'NB':
+            cn_nb_count = 0
+            eb_nb_count = 0
+
+            for i in range(phys_for_data):
+                port_num = next(port_iterator)
+                if split and fac > 1:
+                    first = i * fac + 1
+                    last = min(first + fac - 1, ppg)
+                    # Determine if this port corresponds to CN or EB
+                    if i < cn_count:
+                        cn_nb_count += 1
+                        label = f'CN-NB-{cn_nb_count}' if first == last else f'CN-NB-{cn_nb_count}/{last}'
+                    else:
+                        eb_nb_count += 1
+                        label = f'EB-NB-{eb_nb_count}' if first == last else f'EB-NB-{eb_nb_count}/{last}'
+                else:
+                    # Determine if this port corresponds to CN or EB
+                    if i < cn_count:
+                        cn_nb_count += 1
+                        label = f'CN-NB-{cn_nb_count}'
+                    else:
+                        eb_nb_count += 1
+                        label = f'EB-NB-{eb_nb_count}'
+                port_labels.append((port_num, label))
+            for _ in range(rsv):
+                port_num = next(port_iterator)
+                port_labels.append((port_num, 'RSVD-NB'))
+        else:
+            # *** CRITICAL: DO NOT CHANGE THIS LABEL MAPPING ***
+            # Display 'EXT' instead of 'MLAG/BGP' for port labels
+            display_ut = 'EXT' if ut == 'MLAG/BGP' else ut
+            for group_num in range(groups):
+                for port_index in range(ppg):
+                    port_num = next(port_iterator)
+                    if display_ut == 'IPL':
+                        label = f'IPL-{port_index + 1}'
+                    elif groups > 1:
+                        label = f'{display_ut}{group_num + 1}-{port_index + 1}'
+                    else:
+                        label = f'{display_ut}-{port_index + 1}'
+                    if split and fac > 1 and (display_ut != 'IPL'):
+                        label += f'/{fac}'
+                    port_labels.append((port_num, label))
+
+                for _ in range(rsv):
+                    port_num = next(port_iterator)
+                    label = 'RSVD-EXT' if display_ut == 'EXT' else f'RSVD-{display_ut}'
+                    port_labels.append((port_num, label))
+    except StopIteration:
+        return (None, f"Internal error during labeling for {ut}: not enough ports collected.", start_slice)
+
+    next_slice = (last_slice_assigned - 1 + num_slices) % num_slices if last_slice_assigned != -1 else start_slice
+    return (port_labels, None, next_slice)
+
+
+# --- Rack Specs ---
+
+def _parse_locked_ports(text) -> tuple[Optional[int], tuple[int, ...]]:
+    """
+    Reads a lock field as (start_port, ports): a single number is a start port, a list or
+    range ('1-4,9') pins those ports and starts at the first one. Empty text is (None, ()).
+    """
+    text = str(text).strip()
+    if not text:
+        return None, ()
+    if '-' in text or ',' in text:
+        ports = _parse_port_string(text) or []
+        return (ports[0] if ports else None), tuple(ports)
+    return safe_int(text), ()
+
+
+@dataclass
+class NodeSpec:
+    """Assignment inputs for one node type in a rack."""
+    count: int = 0
+    split: bool = False
+    factor: int = 2
+    reserved: int = 0
+    start: int = 1                      # First node number used in labels
+    start_port: Optional[int] = None    # Locked starting port; None means auto-assign
+    ports: tuple[int, ...] = ()         # Locked port list ('1-4,9'); labels go onto these ports in order
+
+    @property
+    def locked(self) -> bool:
+        return self.start_port is not None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'NodeSpec':
+        start_port, ports = _parse_locked_ports(data.get('start_port', ''))
+        return cls(count=data.get('count', 0),
+                   split=data.get('split', False),
+                   factor=data.get('factor', 2),
+                   reserved=data.get('reserved', 0),
+                   start=data.get('start', 1),
+                   start_port=start_port,
+                   ports=ports)
+
+
+@dataclass
+class UplinkSpec:
+    """Assignment inputs for one uplink type in a rack."""
+    groups: int = 0
+    ports_per_group: int = 0
+    split: bool = False
+    factor: int = 2
+    reserved: int = 0
+    start_port: Optional[int] = None    # Locked highest port; None means auto-assign
+
+    @property
+    def locked(self) -> bool:
+        return self.start_port is not None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'UplinkSpec':
+        # A locked port list starts at its first port, as the live preview always did
+        start_port, _ = _parse_locked_ports(data.get('start', ''))
+        return cls(groups=data.get('groups', 0),
+                   ports_per_group=data.get('ports_per_group', 0),
+                   split=data.get('split', False),
+                   factor=data.get('factor', 2),
+                   reserved=data.get('reserved', 0),
+                   start_port=start_port)
+
+
+@dataclass
+class RackSpec:
+    """
+    Everything that determines a rack's port assignment.
+    Uplinks are keyed by uplink type ('IPL', 'ISL', 'MLAG/BGP', 'NB'); advanced mode
+    racks store external uplinks under 'EXT'.
+    """
+    switch_id: str = '3'
+    nodes: dict[str, NodeSpec] = field(default_factory=dict)
+    uplinks: dict[str, UplinkSpec] = field(default_factory=dict)
+    mapping_mode: str = 'default'       # 'default' or 'advanced'
+    dbox_type: str = 'CeresV2'          # Advanced mode only
+    node_routing: dict[str, str] = field(default_factory=dict)  # Advanced mode only: nt -> 'LEFT'/'RIGHT'
+    nb_cn_count: int = 0                # CN/EB split used for NB port labels
+    nb_eb_count: int = 0
+    placement: str = 'greedy'           # Default mode only: one of PLACEMENT_MODES
+    solver_time_budget: float = SOLVER_TIME_BUDGET
+    uplink_placement: str = 'sequential'  # Advanced mode only: one of ADVANCED_UPLINK_PLACEMENTS
+
+    @property
+    def layout(self) -> dict:
+        return SWITCH_LAYOUTS[self.switch_id]
+
+    def fingerprint(self) -> str:
+        """Content hash of every planning input. Racks with equal fingerprints get identical port maps."""
+        payload = json.dumps(asdict(self), sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def from_rack_data(cls, rack_data: dict, default_switch_id: str = '3',
+                       nb_cn_count: int = 0, nb_eb_count: int = 0, placement: str = 'greedy',
+                       solver_time_budget: float = SOLVER_TIME_BUDGET) -> 'RackSpec':
+        """Builds a spec from a multi_rack_config entry (as stored by the GUI and in exported JSON)."""
+        advanced_config = rack_data.get('advanced_config', {}) or {}
+        return cls(switch_id=str(rack_data.get('switch_id', default_switch_id)),
+                   nodes={nt: NodeSpec.from_dict(nd) for nt, nd in rack_data.get('nodes', {}).items()},
+                   uplinks={ut: UplinkSpec.from_dict(ud) for ut, ud in rack_data.get('uplinks', {}).items()},
+                   mapping_mode=rack_data.get('mapping_mode', 'default'),
+                   dbox_type=advanced_config.get('dbox_type', 'CeresV2'),
+                   node_routing=dict(advanced_config.get('node_routing', {})),
+                   nb_cn_count=nb_cn_count,
+                   nb_eb_count=nb_eb_count,
+                   placement=placement,
+                   solver_time_budget=solver_time_budget,
+                   uplink_placement=advanced_config.get('uplink_placement', 'sequential'))
+
+
+# --- Planning ---
+
+def _plan_advanced_rack(spec: RackSpec) -> tuple[list[tuple[int, str]], set[int]]:
+    """Advanced mode: DNs split across LEFT/RIGHT halves by DBox type, other nodes routed per side."""
+    port_map = []
+    assigned = set()
+    port_count = spec.layout.get('PORT_COUNT', 64)
+    left_ports, right_ports = get_left_right_ports_mellanox(port_count, spec.layout)
+    left_current_index = 0
+    right_current_index = 0
+
+    # DN assignment: Based on DBox type; DBox groups number DNs from 1, labels from dn.start
+    dn = spec.nodes.get('DN')
+    if dn and dn.count > 0:
+        left_dns, right_dns = get_dnode_groups_by_dbox_type(dn.count, spec.dbox_type)
+        step = dn.factor if dn.split and dn.factor > 1 else 1
+        for dns, port_list, side in ((left_dns, left_ports, 'LEFT'), (right_dns, right_ports, 'RIGHT')):
+            current_index = left_current_index if side == 'LEFT' else right_current_index
+            idx = 0
+            while idx < len(dns) and current_index < len(port_list):
+                dns_for_port = [dn.start + n - 1 for n in dns[idx:idx + step]]
+                label = f'DN-{dns_for_port[0]}' if len(dns_for_port) == 1 else f'DN-{dns_for_port[0]}/{dns_for_port[-1]}'
+                port = port_list[current_index]
+                port_map.append((port, label))
+                assigned.add(port)
+                current_index += 1
+                idx += len(dns_for_port)
+            if side == 'LEFT':
+                left_current_index = current_index
+            else:
+                right_current_index = current_index
+
+    # Assign other node types based on routing preferences
+    for nt in ['CN', 'EB', 'IE', 'GN']:
+        node = spec.nodes.get(nt)
+        if not node or node.count == 0:
+            continue
+        routing_pref = spec.node_routing.get(nt, 'RIGHT')
+        if routing_pref == 'LEFT':
+            current_index, port_list = left_current_index, left_ports
+        else:
+            current_index, port_list = right_current_index, right_ports
+
+        for i in range(node.count):
+            if node.split:
+                if i % node.factor != 0:
+                    continue
+                end_idx = min(i + node.factor - 1, node.count - 1)
+                label = f'{nt}-{node.start + i}/{node.start + end_idx}'
+            else:
+                label = f'{nt}-{node.start + i}'
+            if current_index < len(port_list):
+                port = port_list[current_index]
+                port_map.append((port, label))
+                assigned.add(port)
+                current_index += 1
+
+        if routing_pref == 'LEFT':
+            left_current_index = current_index
+        else:
+            right_current_index = current_index
+
+    if spec.uplink_placement == 'centered':
+        port_map.extend(_place_centered_uplinks(spec, assigned, port_count, right_ports, right_current_index))
+        return sorted(port_map, key=lambda x: x[0]), assigned
+
+    # Assign uplinks (from right side, remaining ports)
+    for ut in ['IPL', 'ISL', 'MLAG/BGP']:
+        # Advanced configs store external uplinks as EXT; racks cloned from the Cell Planning tab as MLAG/BGP
+        uplink = (spec.uplinks.get('EXT') or spec.uplinks.get('MLAG/BGP')) if ut == 'MLAG/BGP' else spec.uplinks.get(ut)
+        if not uplink or uplink.groups == 0 or uplink.ports_per_group == 0:
+            continue
+        groups = 1 if ut == 'IPL' else uplink.groups
+        for group_num in range(1, groups + 1):
+            for port_num in range(1, uplink.ports_per_group + 1):
+                # Find next available port from right side
+                while right_current_index < len(right_ports) and right_ports[right_current_index] in assigned:
+                    right_current_index += 1
+                if right_current_index < len(right_ports):
+                    port = right_ports[right_current_index]
+                    port_map.append((port, f'{ut}{group_num}-{port_num}'))
+                    assigned.add(port)
+                    right_current_index += 1
+
+    return sorted(port_map, key=lambda x: x[0]), assigned
+
+
+_CENTERED_UPLINK_PREFERRED_STARTS = [56, 52, 48, 44, 40, 36, 32, 28, 24, 18, 14, 10]
+
+
+def _place_centered_uplinks(spec: RackSpec, assigned: set[int], port_count: int, right_ports: list[int],
+                            right_current_index: int) -> list[tuple[int, str]]:
+    """
+    Advanced-mode uplinks as the Cell Planning tab lays them out: IPL, ISL and EXT groups
+    form one block, numbered down from its highest port and centred between the lowest
+    and highest node ports so the free ports on either side balance out. The block goes
+    to the best balanced free position near the centre, else to the best balanced of the
+    preferred start ports, else to the next free right-side ports. Adds its ports to assigned.
+    """
+    labels = []
+    for ut in ['IPL', 'ISL', 'EXT']:
+        uplink = (spec.uplinks.get('EXT') or spec.uplinks.get('MLAG/BGP')) if ut == 'EXT' else spec.uplinks.get(ut)
+        if not uplink or uplink.groups == 0 or uplink.ports_per_group == 0:
+            continue
+        groups = 1 if ut == 'IPL' else uplink.groups
+        labels.extend(f'{ut}{group_num}-{port_num}' for group_num in range(1, groups + 1)
+                      for port_num in range(1, uplink.ports_per_group + 1))
+    total = len(labels)
+    if total == 0:
+        return []
+
+    node_ports = list(assigned)
+    highest_node_port = max(node_ports) if node_ports else None
+    lowest_node_port = min(node_ports) if node_ports else None
+
+    def block_is_free(top: int) -> bool:
+        return all(top - i not in assigned for i in range(total))
+
+    def free_between(a: int, b: int) -> int:
+        return sum(1 for p in range(min(a, b) + 1, max(a, b)) if p not in assigned)
+
+    def balance(top: int) -> int:
+        # Free ports between the block and the highest node port vs. the lowest node port
+        return abs(free_between(top, highest_node_port) - free_between(top - total + 1, lowest_node_port))
+
+    def best_block(candidates, score) -> Optional[int]:
+        best, best_score = None, None
+        for top in candidates:
+            if top - total + 1 >= 1 and block_is_free(top):
+                candidate_score = score(top)
+                if best_score is None or candidate_score < best_score:
+                    best, best_score = top, candidate_score
+        return best
+
+    top = None
+    if highest_node_port is not None:
+        ideal_top = int(round((highest_node_port + lowest_node_port) / 2.0 + (total - 1) / 2.0))
+        search_range = max(30, total * 5)
+        top = best_block(range(max(1, ideal_top - search_range), min(port_count + 1, ideal_top + search_range + 1)),
+                         lambda t: balance(t) * 1000 + abs(t - ideal_top))
+    if top is None:
+        # The preferred starts are not checked against port 1, as the Cell Planning tab never did
+        best_score = None
+        for preferred in _CENTERED_UPLINK_PREFERRED_STARTS:
+            if block_is_free(preferred):
+                preferred_score = balance(preferred) if highest_node_port is not None else 0
+                if best_score is None or preferred_score < best_score:
+                    top, best_score = preferred, preferred_score
+    if top is None and highest_node_port is not None:
+        if block_is_free(ideal_top):
+            top = ideal_top
+        else:
+            search_range = max(10, total * 2)
+            top = best_block(range(ideal_top - search_range, ideal_top + search_range + 1),
+                             lambda t: balance(t) * 1000 + abs(t - ideal_top))
+
+    if top is not None:
+        placed = [(top - i, label) for i, label in enumerate(labels)]
+    else:
+        placed = []
+        for label in labels:
+            # Next available port from the right side
+            while right_current_index < len(right_ports) and right_ports[right_current_index] in assigned:
+                right_current_index += 1
+            if right_current_index < len(right_ports):
+                placed.append((right_ports[right_current_index], label))
+                assigned.add(right_ports[right_current_index])
+                right_current_index += 1
+    assigned.update(p for p, _ in placed)
+    return placed
+
+
+def _locked_node_ports(planner: PortPlanner, node_type: str, node: NodeSpec) -> list[tuple[int, str]]:
+    """Labels a locked node type: from its start port up, or onto its port list in order (as far as it reaches)."""
+    start_port = 1 if node.ports else node.start_port
+    ports, _ = planner.generate_node_ports(node_type, node.count, node.split, node.factor, start_port,
+                                           node.reserved, node.start)
+    if node.ports:
+        ports = [(port, label) for port, (_, label) in zip(node.ports, ports)]
+    return ports
+
+
+def _plan_default_rack(spec: RackSpec, planner: PortPlanner) -> tuple[list[tuple[int, str]], set[int]]:
+    """Default mode: uplinks from the highest ports down, then nodes from the lowest ports up."""
+    port_map = []
+    assigned_ports = set()
+    free_index = FreePortIndex()  # Mirrors assigned_ports for the first-fit searches
+    layout = spec.layout
+    port_count = layout.get('PORT_COUNT', 64)
+
+    # Locked node ports are fixed: reserve them (a whole locked list) before any auto-assignment
+    locked_node_ports = {}
+    for node_type in NODE_TYPES:
+        node = spec.nodes.get(node_type)
+        if node and node.locked:
+            locked_node_ports[node_type] = _locked_node_ports(planner, node_type, node)
+            reserved_ports = set(node.ports).union(p for p, _ in locked_node_ports[node_type])
+            assigned_ports.update(reserved_ports)
+            free_index.update(reserved_ports)
+
+    # --- 1. Process Uplinks (High ports first) ---
+    slice_size = layout.get('SLICE_SIZE', 8)
+    next_balanced_uplink_slice = port_count // slice_size - 1
+    # Use priority order to ensure correct assignment: IPL, ISL, EXT, NB from highest port down
+    for uplink_type in UPLINK_TYPES:
+        uplink = spec.uplinks.get(uplink_type) or UplinkSpec(groups=1 if uplink_type in ['IPL', 'NB'] else 0)
+        # IPL and NB are always single groups
+        groups = 1 if uplink_type in ['IPL', 'NB'] else uplink.groups
+        ppg, split, fac, reserved = uplink.ports_per_group, uplink.split, uplink.factor, uplink.reserved
+        cn_count = spec.nb_cn_count if uplink_type == 'NB' else 0
+        eb_count = spec.nb_eb_count if uplink_type == 'NB' else 0
+
+        ports = []
+        if uplink.locked:
+            ports = planner.generate_grouped_ports(uplink_type, groups, ppg, split, fac, uplink.start_port, reserved,
+                                                   locked=True, cn_count=cn_count, eb_count=eb_count)
+        elif layout.get('BALANCED_UPLINK_ASSIGNMENT'):
+            ports, _, next_balanced_uplink_slice = generate_cisco_balanced_uplink_ports(
+                uplink_type, groups, ppg, split, fac, reserved, assigned_ports, port_count,
+                next_balanced_uplink_slice, cn_count=cn_count, eb_count=eb_count, slice_size=slice_size)
+        else:
+            phys_per_group = math.ceil(ppg / fac) if split and fac > 1 else ppg
+            total_span = (phys_per_group + reserved) * groups
+            if total_span > 0:
+                spt_high = free_index.last_free_run(total_span, port_count)
+                if spt_high is not None:
+                    ports = planner.generate_grouped_ports(uplink_type, groups, ppg, split, fac, spt_high, reserved,
+                                                           locked=False, cn_count=cn_count, eb_count=eb_count)
+
+        if ports:
+            port_map.extend(ports)
+            assigned_ports.update(p for p, _ in ports)
+            free_index.update(p for p, _ in ports)
+
+    # --- 2. Process Nodes (Low ports first) ---
+    next_balanced_node_slice = 0
+    for node_type in NODE_TYPES:
+        node = spec.nodes.get(node_type) or NodeSpec()
+        count, split, fac, reserved, node_start = node.count, node.split, node.factor, node.reserved, node.start
+
+        ports = []
+        if node.locked:
+            ports = locked_node_ports[node_type]
+        elif layout.get('BALANCED_NODE_ASSIGNMENT'):
+            ports, _, next_balanced_node_slice = generate_cisco_balanced_node_ports(
+                node_type, count, split, fac, reserved, node_start, assigned_ports, port_count,
+                start_slice=next_balanced_node_slice, slice_size=slice_size)
+        else:
+            phys_needed = (math.ceil(count / fac) if split else count) + reserved
+            if phys_needed > 0:
+                spt = free_index.first_free_run(phys_needed)
+                if spt + phys_needed - 1 <= port_count:
+                    ports, _ = planner.generate_node_ports(node_type, count, split, fac, spt, reserved, node_start)
+
+        if ports:
+            port_map.extend(ports)
+            assigned_ports.update(p for p, _ in ports)
+            free_index.update(p for p, _ in ports)
+
+    return port_map, assigned_ports
+
+
+# --- Solver Placement ---
+
+class _SolverTimeout(Exception):
+    pass
+
+
+@dataclass
+class _PlacementItem:
+    """One auto-assigned node or uplink type as seen by the placement solver."""
+    type_name: str
+    is_uplink: bool
+    balanced: bool
+    phys: int                           # Physical ports the type occupies, reserved included
+    groups: int = 1
+    spec: object = None                 # The NodeSpec / UplinkSpec
+    cn_count: int = 0
+    eb_count: int = 0
+
+
+def _placement_items(spec: RackSpec, planner: PortPlanner) -> tuple[dict[str, list[tuple[int, str]]], list[_PlacementItem]]:
+    """
+    Splits a default-mode rack into the locked types (placed exactly as the greedy
+    planner places them) and the auto-assigned types the solver has to fit around them.
+    """
+    layout = spec.layout
+    locked = {}
+    items = []
+    for uplink_type in UPLINK_TYPES:
+        uplink = spec.uplinks.get(uplink_type) or UplinkSpec(groups=1 if uplink_type in ['IPL', 'NB'] else 0)
+        groups = 1 if uplink_type in ['IPL', 'NB'] else uplink.groups
+        ppg, split, fac, reserved = uplink.ports_per_group, uplink.split, uplink.factor, uplink.reserved
+        cn_count = spec.nb_cn_count if uplink_type == 'NB' else 0
+        eb_count = spec.nb_eb_count if uplink_type == 'NB' else 0
+        if uplink.locked:
+            locked[uplink_type] = planner.generate_grouped_ports(uplink_type, groups, ppg, split, fac, uplink.start_port,
+                                                                 reserved, locked=True, cn_count=cn_count, eb_count=eb_count)
+            continue
+        balanced = bool(layout.get('BALANCED_UPLINK_ASSIGNMENT'))
+        if balanced and uplink_type == 'NB':
+            phys = (math.ceil(ppg / fac) if split and fac > 1 else ppg) + reserved
+        elif balanced:
+            phys = (ppg + reserved) * groups
+        else:
+            # The ports actually labelled; the greedy planner searches for a run of
+            # (ppg + reserved) * groups but only fills ppg * groups + reserved of it
+            phys = (math.ceil(ppg / fac) if split and fac > 1 else ppg) * groups + reserved
+        if phys > 0:
+            items.append(_PlacementItem(uplink_type, True, balanced, phys, groups, uplink, cn_count, eb_count))
+    for node_type in NODE_TYPES:
+        node = spec.nodes.get(node_type) or NodeSpec()
+        if node.locked:
+            locked[node_type] = _locked_node_ports(planner, node_type, node)
+            continue
+        balanced = bool(layout.get('BALANCED_NODE_ASSIGNMENT'))
+        if balanced:
+            phys = (math.ceil(node.count / node.factor) if node.split and node.factor > 1 else node.count) + node.reserved
+        else:
+            phys = (math.ceil(node.count / node.factor) if node.split else node.count) + node.reserved
+        if phys > 0:
+            items.append(_PlacementItem(node_type, False, balanced, phys, 1, node))
+    return locked, items
+
+
+def _label_item(item: _PlacementItem, planner: PortPlanner, start_port: int) -> list[tuple[int, str]]:
+    """Labels a contiguous placement (start_port is the highest port for uplinks, the lowest for nodes)."""
+    s = item.spec
+    if item.is_uplink:
+        return planner.generate_grouped_ports(item.type_name, item.groups, s.ports_per_group, s.split, s.factor,
+                                              start_port, s.reserved, locked=False,
+                                              cn_count=item.cn_count, eb_count=item.eb_count)
+    ports, _ = planner.generate_node_ports(item.type_name, s.count, s.split, s.factor, start_port, s.reserved, s.start)
+    return ports
+
+
+def _placement_candidates(item: _PlacementItem, planner: PortPlanner, taken: FreePortIndex, port_count: int,
+                          slice_size: int, slices: tuple[int, int], allow_split: bool):
+    """
+    Yields (port_labels, slices) for every placement of item on the free ports, most
+    preferred first: the placement the greedy planner would pick comes first, then the
+    other contiguous runs (uplinks from the top down, nodes from the bottom up). Balanced
+    types try each starting slice instead. With allow_split, a non-contiguous placement
+    on the highest (uplinks) or lowest (nodes) free ports is offered last.
+    """
+    s = item.spec
+    uplink_slice, node_slice = slices
+    if item.balanced:
+        num_slices = port_count // slice_size
+        start = uplink_slice if item.is_uplink else node_slice
+        seen = set()
+        for k in range(num_slices):
+            start_slice = (start - k) % num_slices if item.is_uplink else (start + k) % num_slices
+            if item.is_uplink:
+                ports, err, next_slice = generate_cisco_balanced_uplink_ports(
+                    item.type_name, item.groups, s.ports_per_group, s.split, s.factor, s.reserved, taken, port_count,
+                    start_slice, cn_count=item.cn_count, eb_count=item.eb_count, slice_size=slice_size)
+                next_slices = (next_slice, node_slice)
+            else:
+                ports, err, next_slice = generate_cisco_balanced_node_ports(
+                    item.type_name, s.count, s.split, s.factor, s.reserved, s.start, taken, port_count,
+                    start_slice=start_slice, slice_size=slice_size)
+                next_slices = (uplink_slice, next_slice)
+            if err or not ports:
+                continue
+            key = frozenset(p for p, _ in ports)
+            if key not in seen:
+                seen.add(key)
+                yield ports, next_slices
+        return
+
+    for run_start in taken.free_runs(item.phys, port_count, descending=item.is_uplink):
+        yield _label_item(item, planner, run_start + item.phys - 1 if item.is_uplink else run_start), slices
+
+    if allow_split and taken.free_count(port_count) >= item.phys:
+        # Label as if the type sat on ports 1..phys, then move each label onto the n-th chosen free port
+        free = [p for p in range(1, port_count + 1) if p not in taken]
+        chosen = free[-item.phys:] if item.is_uplink else free[:item.phys]
+        virtual = _label_item(item, planner, item.phys if item.is_uplink else 1)
+        yield [(chosen[p - 1], label) for p, label in virtual], slices
+
+
+def solve_rack_placement(spec: RackSpec, planner: Optional[PortPlanner] = None,
+                         time_budget: Optional[float] = None) -> Optional[tuple[list[tuple[int, str]], set[int]]]:
+    """
+    Places every auto-assigned node and uplink type of a default-mode rack at once,
+    around the locked types, by depth-first search with pruning. The first pass only
+    accepts contiguous runs per type (and slice-balanced sets on balanced layouts);
+    if that cannot fit everything, a second pass lets types spill onto non-contiguous
+    ports. Candidates are tried in greedy order, so a rack the greedy planner can fit
+    gets the greedy result. Returns None when no full placement is found within
+    time_budget seconds (default spec.solver_time_budget).
+    """
+    planner = planner or PortPlanner()
+    layout = spec.layout
+    port_count = layout.get('PORT_COUNT', 64)
+    slice_size = layout.get('SLICE_SIZE', 8)
+    budget = spec.solver_time_budget if time_budget is None else time_budget
+
+    locked, items = _placement_items(spec, planner)
+    taken = FreePortIndex(p for ports in locked.values() for p, _ in ports)
+    # Demand still to place from item i on, the contiguous runs it needs, and the ports
+    # per slice the balanced types need at the least
+    num_slices = max(port_count // slice_size, 1)
+    remaining = [sum(item.phys for item in items[i:]) for i in range(len(items) + 1)]
+    run_lengths = [sorted({item.phys for item in items[i:] if not item.balanced}) for i in range(len(items) + 1)]
+    slice_floor = [sum(item.phys // num_slices for item in items[i:] if item.balanced) for i in range(len(items) + 1)]
+    # Bit n of subset_sums[i] is set when some of items[i:] add up to exactly n ports
+    subset_sums = [1] * (len(items) + 1)
+    for i in range(len(items) - 1, -1, -1):
+        subset_sums[i] = subset_sums[i + 1] | (subset_sums[i + 1] << items[i].phys)
+
+    def fits(i: int, taken: FreePortIndex, allow_split: bool) -> bool:
+        """Cheap necessary conditions for placing items[i:] on the free ports."""
+        if taken.free_count(port_count) < remaining[i]:
+            return False
+        if slice_floor[i] and any(taken.free_count(min((k + 1) * slice_size, port_count))
+                                  - taken.free_count(k * slice_size) < slice_floor[i] for k in range(num_slices)):
+            return False
+        if not allow_split and run_lengths[i]:
+            # Every contiguous type needs a free run of its own length, and with only
+            # contiguous types each run holds at most the best subset of them that fits
+            segments = taken.free_segments(port_count)
+            if max(segments, default=0) < run_lengths[i][-1]:
+                return False
+            if not slice_floor[i] and sum((subset_sums[i] & ((1 << (n + 1)) - 1)).bit_length() - 1
+                                          for n in segments) < remaining[i]:
+                return False
+        return True
+
+    def search(i: int, taken: FreePortIndex, slices: tuple[int, int], allow_split: bool, failed: set, placed: list,
+               deadline: float) -> bool:
+        if i == len(items):
+            return True
+        key = (i, taken.mask, slices)
+        if key in failed:
+            return False
+        if time.perf_counter() > deadline:
+            raise _SolverTimeout()
+        if not fits(i, taken, allow_split):
+            failed.add(key)
+            return False
+        for ports, next_slices in _placement_candidates(items[i], planner, taken, port_count, slice_size,
+                                                        slices, allow_split):
+            next_taken = FreePortIndex()
+            next_taken.mask = taken.mask
+            next_taken.update(p for p, _ in ports)
+            placed.append(ports)
+            if search(i + 1, next_taken, next_slices, allow_split, failed, placed, deadline):
+                return True
+            placed.pop()
+        failed.add(key)
+        return False
+
+    # The contiguous pass gets half the budget so the split pass always gets a turn
+    start_slices = (num_slices - 1, 0)
+    started = time.perf_counter()
+    placed = []
+    try:
+        found = search(0, taken, start_slices, False, set(), placed, started + budget / 2)
+    except _SolverTimeout:
+        found = False
+    if not found:
+        placed = []
+        try:
+            if not search(0, taken, start_slices, True, set(), placed, started + budget):
+                return None
+        except _SolverTimeout:
+            return None
+
+    # Same type order as the greedy planner: uplinks, then nodes
+    by_type = dict(locked)
+    by_type.update((item.type_name, ports) for item, ports in zip(items, placed))
+    port_map = [pair for t in UPLINK_TYPES + NODE_TYPES for pair in by_type.get(t, [])]
+    return port_map, {p for p, _ in port_map}
+
+
+def plan_rack(spec: RackSpec, planner: Optional[PortPlanner] = None) -> tuple[list[tuple[int, str]], set[int]]:
+    """
+    Calculates the full port map for a rack spec.
+    Returns (port_map, assigned_ports) where port_map is a list of (port, label) tuples.
+    Default-mode racks with placement='solver' fall back to greedy placement when the
+    solver finds nothing within the spec's time budget.
+    """
+    if spec.mapping_mode == 'advanced':
+        return _plan_advanced_rack(spec)
+    planner = planner or PortPlanner()
+    if spec.placement == 'solver':
+        solved = solve_rack_placement(spec, planner)
+        if solved is not None:
+            return solved
+    return _plan_default_rack(spec, planner)
+
+
+def lane_widths(spec: RackSpec) -> dict[str, int]:
+    """Breakout width per port label base type: the split factor of every split node and uplink type."""
+    widths = {}
+    for node_type, node in spec.nodes.items():
+        if node.split and node.factor > 1:
+            widths[node_type] = node.factor
+    for uplink_type, uplink in spec.uplinks.items():
+        if uplink.split and uplink.factor > 1:
+            # External uplinks are labelled EXT (default mode) or MLAG/BGP (advanced mode)
+            for base_type in (('EXT', 'MLAG') if uplink_type in ('MLAG/BGP', 'EXT') else (uplink_type,)):
+                widths[base_type] = uplink.factor
+    return widths
+
+
+def plan_rack_lanes(spec: RackSpec, planner: Optional[PortPlanner] = None) -> LaneMap:
+    """Plans a rack with plan_rack and addresses the result per breakout lane."""
+    port_map, _ = plan_rack(spec, planner)
+    return LaneMap.from_pairs(port_map, spec.layout.get('PORT_COUNT', 64), lane_widths(spec))
+
+
+class PlanCache:
+    """
+    Bounded LRU memo of plan_rack results keyed by RackSpec.fingerprint().
+    Racks with identical planning inputs (e.g. clones) share one result. The
+    returned port map and assigned-port set are shared and must not be mutated.
+    """
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._results: 'OrderedDict[str, tuple[list[tuple[int, str]], set[int]]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def plan(self, spec: RackSpec, planner: Optional[PortPlanner] = None,
+             fingerprint: Optional[str] = None) -> tuple[list[tuple[int, str]], set[int]]:
+        """Returns plan_rack(spec), computing it only for fingerprints not seen recently."""
+        key = fingerprint or spec.fingerprint()
+        with self._lock:
+            result = self._results.get(key)
+            if result is not None:
+                self._results.move_to_end(key)
+                self.hits += 1
+                return result
+        result = plan_rack(spec, planner)
+        with self._lock:
+            self.misses += 1
+            self._results[key] = result
+            while len(self._results) > self.maxsize:
+                self._results.popitem(last=False)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+
+# --- Bandwidth ---
+
+# Port classes that carry bandwidth, in the column order of the bandwidth arrays
+BANDWIDTH_CLASSES = ('cn', 'eb', 'nb', 'isl', 'ext')
+_BANDWIDTH_CLASS_OF_TYPE = {'CN': 0, 'EB': 1, 'NB': 2, 'ISL': 3, 'MLAG/BGP': 4, 'EXT': 4}
+
+
+def bandwidth_class_code(label: str) -> int:
+    """Index into BANDWIDTH_CLASSES for a port label, or -1 if it carries none."""
+    return _BANDWIDTH_CLASS_OF_TYPE.get(parse_port_label(label).base_type, -1)
+
+
+def parse_speed_gbps(speed: str) -> int:
+    """'400G' -> 400; 0 when the speed is not set."""
+    return safe_int(speed.upper().replace('G', ''), 0) if speed else 0
+
+
+@dataclass
+class RackBandwidth:
+    """Per-switch bandwidth of one rack (or a whole cluster) in Gb/s, by port class."""
+    cn: float = 0
+    eb: float = 0
+    nb: float = 0
+    isl: float = 0
+    ext: float = 0
+
+    @property
+    def nb_per_switch(self) -> float:
+        # Northbound ports take precedence over CN/EB ports for customer bandwidth
+        return self.nb if self.nb > 0 else self.cn + self.eb
+
+    @property
+    def nb_aggregate(self) -> float:
+        return self.nb_per_switch * 2
+
+    @property
+    def isl_aggregate(self) -> float:
+        return self.isl * 2
+
+    @property
+    def ha_isl(self) -> float:
+        # A single switch failure halves the ISL capacity of the pair
+        return self.isl_aggregate / 2
+
+    @property
+    def ha_ext(self) -> float:
+        return self.ext / 2
+
+
+@dataclass
+class BandwidthReport:
+    """bandwidth_report() result: every rack's bandwidth plus the cluster-wide sums."""
+    racks: dict[str, RackBandwidth] = field(default_factory=dict)
+    total: RackBandwidth = field(default_factory=RackBandwidth)
+
+
+def bandwidth_report(racks: dict, uplink_speed: str = '') -> BandwidthReport:
+    """
+    Bandwidth of many racks in one pass. racks maps a rack name to (port_map, layout);
+    each port counts once with its first label, as in PortMap. Ports run at the layout's
+    NATIVE_SPEED, EXT ports at uplink_speed when set. Each distinct label is classified
+    once (parse_port_label); the per-rack sums are numpy array operations.
+    """
+    import numpy as np  # Installed with pandas; only needed for the bandwidth sums
+
+    names = list(racks)
+    native = np.zeros(len(names))
+    uplink = np.zeros(len(names))
+    ports = []
+    codes = []
+    sizes = []
+    for i, name in enumerate(names):
+        port_map, layout = racks[name]
+        native[i] = parse_speed_gbps(layout.get('NATIVE_SPEED', ''))
+        uplink[i] = parse_speed_gbps(uplink_speed) or native[i]
+        ports.extend(port for port, _ in port_map)
+        codes.extend(bandwidth_class_code(label) for _, label in port_map)
+        sizes.append(len(port_map))
+
+    n_classes = len(BANDWIDTH_CLASSES)
+    ports = np.asarray(ports, dtype=np.int64)
+    codes = np.asarray(codes, dtype=np.int64)
+    owners = np.repeat(np.arange(len(names), dtype=np.int64), sizes)
+    # First label wins per (rack, port), as in PortMap; port IDs below 1 are ignored
+    valid = np.flatnonzero(ports >= 1)
+    _, first = np.unique(owners[valid] * (int(ports.max(initial=0)) + 1) + ports[valid], return_index=True)
+    keep = valid[first]
+    keep = keep[codes[keep] >= 0]
+    counts = np.bincount(owners[keep] * n_classes + codes[keep],
+                         minlength=len(names) * n_classes).reshape(len(names), n_classes)
+    speeds = np.repeat(native[:, None], n_classes, axis=1)
+    speeds[:, BANDWIDTH_CLASSES.index('ext')] = uplink
+    bw = counts * speeds
+
+    report = BandwidthReport(racks={name: RackBandwidth(*map(float, row)) for name, row in zip(names, bw)})
+    totals = bw.sum(axis=0)
+    nb_col = BANDWIDTH_CLASSES.index('nb')
+    # Sum each rack's effective NB so the cluster total keeps the per-rack NB-over-CN/EB precedence
+    nb_effective = np.where(bw[:, nb_col] > 0, bw[:, nb_col], bw[:, 0] + bw[:, 1])
+    totals[nb_col] = nb_effective.sum()
+    report.total = RackBandwidth(*map(float, totals))
+    return report
@@ -0,0 +1,682 @@
+#!/usr/bin/env python3
+"""
+Qt-free rendering of PortMapper design outputs: switch overlays (PNG) and
+port tables (CSV/XLSX). Depends on Pillow only; pandas is loaded when tables
+are written. Used by the GUI and by the batch CLI (portmapper_batch.py).
+"""
+import concurrent.futures
+import io
+import math
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Union
+
+from PIL import Image, ImageDraw, ImageFont
+
+from portmapper_engine import SWITCH_LAYOUTS, LaneMap, PortMap, resource_path, parse_port_label, port_grid_position
+
+try:
+    RESAMPLE = Image.Resampling.LANCZOS
+except AttributeError:
+    RESAMPLE = Image.ANTIALIAS
+FONT_PATH = resource_path('ArialBold.ttf')
+ISL_COLORS = ['green', 'yellow', 'orange', 'pink', 'lightgreen', 'gold', 'tomato', 'hotpink']
+EXT_COLORS = ['lime', 'yellow', 'orange', 'pink', 'lightblue', 'lavender', 'coral', 'turquoise']
+colors_fabric = {'A': '#FC9D74', 'B': '#4a90e2'}
+
+# Process-wide font caches. Loading a TrueType face from disk is by far the most
+# expensive step of drawing a port, and the fitted size only depends on the label
+# and the box it must fit in, so both are memoized across redraws and threads.
+# Preview boxes follow the canvas size, so fitted sizes are kept in a bounded LRU.
+FITTED_FONT_CACHE_SIZE = 4096
+_FONT_CACHE: dict[int, ImageFont.FreeTypeFont] = {}
+_FITTED_FONT_SIZES: 'OrderedDict[tuple[str, int, int], int]' = OrderedDict()
+_FONT_LOCK = threading.Lock()
+
+
+def get_font(size: int) -> ImageFont.FreeTypeFont:
+    """Returns the label font at the given size, loading it from disk only once per size."""
+    font = _FONT_CACHE.get(size)
+    if font is None:
+        with _FONT_LOCK:
+            font = _FONT_CACHE.get(size)
+            if font is None:
+                font = ImageFont.truetype(FONT_PATH, size)
+                _FONT_CACHE[size] = font
+    return font
+
+
+def clear_font_cache():
+    """Drops all cached fonts and fitted sizes (e.g. after FONT_PATH changes)."""
+    with _FONT_LOCK:
+        _FONT_CACHE.clear()
+        _FITTED_FONT_SIZES.clear()
+    PORT_SPRITES.clear()
+
+
+class PortSpriteCache:
+    """
+    Bounded LRU of pre-rendered port tiles. A drawn port only depends on its label, fabric,
+    box size, outline width and sub-pixel offset, so each distinct appearance is drawn once
+    as an RGBA sprite and composited at the port's position on later redraws. Sprites are
+    shared and must be treated as read-only.
+    """
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._sprites: 'OrderedDict[tuple, tuple[Image.Image, int, int]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[tuple[Image.Image, int, int]]:
+        """Returns (sprite, dx, dy) for a key, or None; dx/dy place the sprite relative to the port."""
+        with self._lock:
+            entry = self._sprites.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._sprites.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: tuple, entry: tuple[Image.Image, int, int]):
+        with self._lock:
+            self._sprites[key] = entry
+            while len(self._sprites) > self.maxsize:
+                self._sprites.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._sprites), 'maxsize': self.maxsize}
+
+    def clear(self):
+        with self._lock:
+            self._sprites.clear()
+            self.hits = self.misses = 0
+
+
+# Labels x fabrics x box sizes in use; a sprite is a few KB at preview size, ~30 KB at full size
+PORT_SPRITES = PortSpriteCache()
+
+
+class PortDrawer:
+    """
+    A helper class to encapsulate the logic for drawing a single port on the switch overlay.
+    This refactoring cleans up the main _draw_overlay method by separating concerns.
+    """
+    def __init__(self, draw: ImageDraw.ImageDraw, config: dict, display_scale: float, cn_count: int = 0, eb_count: int = 0,
+                 image: Optional[Image.Image] = None):
+        self.draw = draw
+        self.image = image  # The RGBA image behind draw; enables the port sprite cache
+        self.config = config
+        self.display_scale = display_scale
+        self.rows_per_col = config['GRID'][0]
+        self.cols_per_row = config['GRID'][1]
+        self.cn_count = cn_count
+        self.eb_count = eb_count
+
+        # Pre-calculate cumulative row offsets
+        self.cumulative_offsets = {}
+        current_offset = 0
+        for r in range(self.rows_per_col):
+            current_offset += self.config.get('ROW_OFFSETS', {}).get(r, 0)
+            self.cumulative_offsets[r] = current_offset
+
+    def _get_port_coordinates(self, port_id: int) -> tuple[int, int]:
+        """Calculates the top-left (x, y) coordinates for a given port ID."""
+        row, col = port_grid_position(self.config, port_id)
+
+        if 'COLUMN_X_COORDS' in self.config and col < len(self.config['COLUMN_X_COORDS']):
+            x = self.config['COLUMN_X_COORDS'][col]
+        else:
+            x = int(self.config['START_X'] + col * self.config['H_SPACING'])
+
+        y = int(self.config['START_Y'] + row * self.config['V_SPACING'] + self.cumulative_offsets.get(row, 0))
+        return x, y
+
+    def _get_port_fill_color(self, label: str, fabric: str) -> str:
+        """Determines the fill color for a port based on its label and fabric."""
+        parsed = parse_port_label(label)
+        if parsed.reserved:
+            return '#606060'
+        if parsed.base_type == 'ISL':
+            idx = (parsed.group - 1) % len(ISL_COLORS) if parsed.group is not None else 0
+            return ISL_COLORS[idx]
+        if parsed.base_type in ('EXT', 'MLAG'):  # 'MLAG/BGP1-1' labels from the advanced layout
+            idx = (parsed.group - 1) % len(EXT_COLORS) if parsed.group is not None else 0
+            return EXT_COLORS[idx]
+        if parsed.base_type == 'IPL':
+            return 'cyan'
+        if parsed.base_type == 'NB':
+            # CN-NB / EB-NB ports use the same fabric colors as the CN/EB nodes
+            if parsed.nb_side:
+                return colors_fabric.get(fabric, '#FC9D74')
+            return 'tan'  # Default NB color
+        # For node types (CN, DN, EB, etc.), use fabric-specific colors
+        return colors_fabric.get(fabric, '#FC9D74')
+
+    def is_fabric_invariant(self, label: str) -> bool:
+        """True if the port is drawn the same on every fabric (e.g. uplinks and reserved ports)."""
+        fabrics = list(colors_fabric)
+        first = (self._get_port_fill_color(label, fabrics[0]), self._get_port_outline(label, fabrics[0]))
+        return all((self._get_port_fill_color(label, f), self._get_port_outline(label, f)) == first for f in fabrics[1:])
+
+    def _get_port_outline(self, label: str, fabric: str) -> tuple[str, int]:
+        """Determines the outline color and width for a port."""
+        outline_config = {
+            'DN': ('yellow', 2), 'CN': ('green', 2), 'EB': ('black', 1),
+            'IE': ('pink', 2), 'GN': ('cyan', 2),
+        }
+        parsed = parse_port_label(label)
+
+        if parsed.base_type == 'NB':
+            # CN-NB / EB-NB ports use the same border colors as the CN/EB nodes
+            if parsed.nb_side == 'CN':
+                return ('green', 2)
+            if parsed.nb_side == 'EB':
+                return ('black', 1)
+            return colors_fabric.get(fabric, 'black'), 2
+        if parsed.base_type in outline_config:
+            return outline_config[parsed.base_type]
+
+        return 'black', 1 # Default outline
+
+    def _get_adaptive_font(self, label: str, max_width: int, max_height: int) -> ImageFont.FreeTypeFont:
+        """Finds the largest font size that fits the label within the given dimensions (memoized)."""
+        try:
+            key = (label, max_width, max_height)
+            with _FONT_LOCK:
+                font_size = _FITTED_FONT_SIZES.get(key)
+                if font_size is not None:
+                    _FITTED_FONT_SIZES.move_to_end(key)
+            if font_size is None:
+                font_size = self._fit_font_size(label, max_width, max_height)
+                with _FONT_LOCK:
+                    _FITTED_FONT_SIZES[key] = font_size
+                    while len(_FITTED_FONT_SIZES) > FITTED_FONT_CACHE_SIZE:
+                        _FITTED_FONT_SIZES.popitem(last=False)
+            return get_font(font_size)
+        except IOError:
+            return ImageFont.load_default()
+
+    def _fit_font_size(self, label: str, max_width: int, max_height: int) -> int:
+        """
+        Shrinks the font from ~70% of the box height until the label fits the box width.
+        Text width grows with the font size, so rather than stepping down from the top (a
+        dozen or more text measurements for a narrow lane box) the search steps from a
+        proportional estimate, which lands on the same size.
+        """
+        initial_font_size = int(max_height * 0.70) if '/' not in label else int(max_height * 0.60)
+        max_text_width = max_width * 0.95 # Leave 5% padding
+
+        def text_width(size: int) -> int:
+            bbox = self.draw.textbbox((0, 0), label, font=get_font(size))
+            return bbox[2] - bbox[0]
+
+        font_size = initial_font_size
+        if font_size > 5:
+            width = text_width(font_size)
+            if width >= max_text_width:
+                font_size = min(max(int(font_size * max_text_width / width), 5), font_size - 1)
+                if font_size == 5 or text_width(font_size) < max_text_width:  # Nothing below 6 is tried
+                    while font_size + 1 < initial_font_size and text_width(font_size + 1) < max_text_width:
+                        font_size += 1
+                else:
+                    while font_size > 5 and text_width(font_size) >= max_text_width:
+                        font_size -= 1
+        if font_size > 1: font_size -= 1 # Shrink by one more size
+        return max(1, font_size)  # Tiny preview boxes can start below one point
+
+    def draw_port(self, port_id: int, label: str, fabric: str, lane: int = 1, lanes: int = 1):
+        """
+        Draws a single port with its label and styling, from the sprite cache when possible.
+        A port broken out into lanes > 1 is drawn one lane at a time, side by side in its box.
+        """
+        x, y = self._get_port_coordinates(port_id)
+        w, h = self.config['PORT_WIDTH'] + 2, self.config['PORT_HEIGHT'] + 2
+        x, y = x - 1, y - 1 # Adjust for increased size
+        if lanes > 1:
+            left, right = round((lane - 1) * w / lanes), round(lane * w / lanes)
+            x, w = x + left, right - left
+
+        _, final_outline_width = self._get_port_outline(label, fabric)
+        # Scale outline width for display previews
+        outline_width = int(final_outline_width / self.display_scale) if 0 < self.display_scale < 1 else final_outline_width
+
+        if self.image is None:
+            self._paint(self.draw, label, fabric, x, y, w, h, outline_width)
+            return
+
+        ix, iy = math.floor(x), math.floor(y)
+        key = (label, fabric, w, h, outline_width, x - ix, y - iy)
+        entry = PORT_SPRITES.get(key)
+        if entry is None:
+            entry = self._render_sprite(label, fabric, x - ix, y - iy, w, h, outline_width)
+            PORT_SPRITES.put(key, entry)
+        sprite, dx, dy = entry
+        self.image.alpha_composite(sprite, (ix + dx, iy + dy))
+
+    def _layout_port(self, label: str, x: float, y: float, w: int, h: int, outline_width: int):
+        """Returns the font, text bbox, text position and outline rectangle of a port box at (x, y)."""
+        font = self._get_adaptive_font(label, w, h)
+        bbox = self.draw.textbbox((0, 0), label, font=font)
+        # Center text in the original box area
+        tx = x + (w - (bbox[2] - bbox[0])) / 2.0
+        ty = y + (h - (bbox[3] - bbox[1])) / 2.0 - 1
+        # Adjust rectangle coordinates for centered outline
+        ow_half = outline_width / 2
+        rect = (x - ow_half, y - ow_half, x + w + ow_half, y + h + ow_half)
+        return font, bbox, (tx, ty), rect
+
+    def _paint(self, draw: ImageDraw.ImageDraw, label: str, fabric: str, x: float, y: float, w: int, h: int,
+               outline_width: int):
+        """Draws the port box and its label with the box's top-left corner at (x, y)."""
+        font, _, text_pos, rect = self._layout_port(label, x, y, w, h, outline_width)
+        outline_color, _ = self._get_port_outline(label, fabric)
+        draw.rectangle(rect, fill=self._get_port_fill_color(label, fabric), outline=outline_color, width=outline_width)
+        text_color = 'white' if parse_port_label(label).reserved else 'black'
+        draw.text(text_pos, label, fill=text_color, font=font)
+
+    def _render_sprite(self, label: str, fabric: str, fx: float, fy: float, w: int, h: int,
+                       outline_width: int) -> tuple[Image.Image, int, int]:
+        """
+        Draws one port on its own transparent tile, exactly as _paint would draw it at
+        (ix + fx, iy + fy). Returns the tile and its offset from (ix, iy).
+        """
+        _, bbox, (tx, ty), rect = self._layout_port(label, fx, fy, w, h, outline_width)
+        # The tile covers the box and the text, with a pixel of slack so every coordinate
+        # on it stays positive (Pillow truncates coordinates, which is only shift-invariant there)
+        dx = math.floor(min(rect[0], tx, tx + bbox[0])) - 1
+        dy = math.floor(min(rect[1], ty, ty + bbox[1])) - 1
+        right = math.ceil(max(rect[2], tx + bbox[2])) + 2
+        bottom = math.ceil(max(rect[3], ty + bbox[3])) + 2
+
+        sprite = Image.new('RGBA', (right - dx, bottom - dy), (0, 0, 0, 0))
+        self._paint(ImageDraw.Draw(sprite), label, fabric, fx - dx, fy - dy, w, h, outline_width)
+        return sprite, dx, dy
+
+
+# Decoded base switch images, shared by every redraw, rack and worker thread.
+# Images handed out by the cache are shared and must be treated as read-only
+# (render_overlay draws on a copy). Full-size images are kept per switch image
+# (models sharing a faceplate share an entry); scaled variants for canvas widths
+# are kept in a small LRU.
+SCALED_BASE_CACHE_SIZE = 32
+_BASE_IMAGES: dict[str, Image.Image] = {}
+_SCALED_BASE_IMAGES: 'OrderedDict[tuple[str, int], Image.Image]' = OrderedDict()
+_BASE_IMAGE_LOCK = threading.Lock()
+
+
+def get_base_image(image: str, width: int = None) -> Image.Image:
+    """
+    Returns the decoded RGBA image for a SWITCH_LAYOUTS 'IMAGE' entry, decoding the PNG only once.
+    If width is given, returns a cached copy scaled to that width (aspect ratio kept).
+    Raises FileNotFoundError if the image does not exist.
+    """
+    with _BASE_IMAGE_LOCK:
+        base = _BASE_IMAGES.get(image)
+        if base is None:
+            base = Image.open(resource_path(image)).convert('RGBA')
+            _BASE_IMAGES[image] = base
+        if not width or width <= 0 or width == base.width:
+            return base
+
+        key = (image, int(width))
+        scaled = _SCALED_BASE_IMAGES.get(key)
+        if scaled is not None:
+            _SCALED_BASE_IMAGES.move_to_end(key)
+            return scaled
+        height = max(1, round(base.height * width / base.width))
+        scaled = base.resize((int(width), height), RESAMPLE)
+        _SCALED_BASE_IMAGES[key] = scaled
+        while len(_SCALED_BASE_IMAGES) > SCALED_BASE_CACHE_SIZE:
+            _SCALED_BASE_IMAGES.popitem(last=False)
+        return scaled
+
+
+def clear_base_image_cache():
+    """Drops all cached base images and scaled variants."""
+    with _BASE_IMAGE_LOCK:
+        _BASE_IMAGES.clear()
+        _SCALED_BASE_IMAGES.clear()
+
+
+def load_base_image(switch_id: str, width: int = None) -> Image.Image:
+    """Returns the shared (read-only) RGBA base image for a switch model. Raises KeyError for unknown ids."""
+    return get_base_image(SWITCH_LAYOUTS[switch_id]['IMAGE'], width)
+
+
+# Layout keys measured in base-image pixels, split by axis (see SWITCH_LAYOUTS)
+_LAYOUT_X_KEYS = ('START_X', 'H_SPACING')
+_LAYOUT_Y_KEYS = ('START_Y', 'V_SPACING')
+
+
+def scale_layout(cfg: dict, scale_x: float, scale_y: float = None) -> dict:
+    """
+    Returns a copy of a SWITCH_LAYOUTS entry with its pixel geometry scaled, for drawing
+    straight onto a base image resized by (scale_x, scale_y). Port boxes are sized so the
+    drawn box (PORT_WIDTH/HEIGHT + 2) matches the scaled full-size box.
+    """
+    if scale_y is None:
+        scale_y = scale_x
+    scaled = dict(cfg)
+    for key in _LAYOUT_X_KEYS:
+        scaled[key] = cfg[key] * scale_x
+    for key in _LAYOUT_Y_KEYS:
+        scaled[key] = cfg[key] * scale_y
+    scaled['PORT_WIDTH'] = max(1, round((cfg['PORT_WIDTH'] + 2) * scale_x) - 2)
+    scaled['PORT_HEIGHT'] = max(1, round((cfg['PORT_HEIGHT'] + 2) * scale_y) - 2)
+    scaled['FONT_SIZE'] = max(1, round(cfg['FONT_SIZE'] * scale_y))
+    if 'COLUMN_X_COORDS' in cfg:
+        scaled['COLUMN_X_COORDS'] = [round(x * scale_x) for x in cfg['COLUMN_X_COORDS']]
+    scaled['ROW_OFFSETS'] = {row: offset * scale_y for row, offset in cfg.get('ROW_OFFSETS', {}).items()}
+    if 'CUMULATIVE_GAPS' in cfg:
+        scaled['CUMULATIVE_GAPS'] = {col: gap * scale_x for col, gap in cfg['CUMULATIVE_GAPS'].items()}
+    return scaled
+
+
+# Base images with every port blanked out, per model and image size (full size or a
+# canvas width). Shared and read-only; render_overlay draws on a copy.
+BLANK_BASE_CACHE_SIZE = 16
+_BLANK_BASES: 'OrderedDict[tuple, Image.Image]' = OrderedDict()
+_BLANK_BASE_LOCK = threading.Lock()
+
+
+def _port_box(drawer: 'PortDrawer', cfg: dict, port_id: int) -> tuple[int, int, int, int]:
+    """The (inclusive) box an unassigned port is blanked over."""
+    x, y = drawer._get_port_coordinates(port_id)
+    return x, y, x + cfg['PORT_WIDTH'] + 2, y + cfg['PORT_HEIGHT'] + 2
+
+
+def get_blank_base(base: Image.Image, cfg: dict) -> Image.Image:
+    """
+    Returns the base image with every port blanked out, as unassigned ports are drawn,
+    computing it once per model and image size. The result is shared and read-only.
+    """
+    key = (cfg['NAME'], cfg['IMAGE'], base.size)
+    with _BLANK_BASE_LOCK:
+        blank = _BLANK_BASES.get(key)
+        if blank is not None:
+            _BLANK_BASES.move_to_end(key)
+            return blank
+
+    blank = base.copy()
+    draw = ImageDraw.Draw(blank)
+    drawer = PortDrawer(draw, cfg, 1.0)
+    for pid in range(1, cfg['PORT_COUNT'] + 1):
+        draw.rectangle(_port_box(drawer, cfg, pid), fill='black', outline='black', width=1)
+    with _BLANK_BASE_LOCK:
+        _BLANK_BASES[key] = blank
+        while len(_BLANK_BASES) > BLANK_BASE_CACHE_SIZE:
+            _BLANK_BASES.popitem(last=False)
+    return blank
+
+
+def render_fabric_overlays(port_map: Union[PortMap, LaneMap], base: Image.Image, cfg: dict, fabrics=('A', 'B'), *,
+                           display_scale: float = 1.0, cn_count: int = 0, eb_count: int = 0) -> dict[str, Image.Image]:
+    """
+    Draws the overlays of several fabrics in one pass. The fabrics only differ in the ports
+    whose colors come from colors_fabric (node ports and NB ports), so the blanked background
+    and every other port are drawn once on a shared layer, and each fabric copies that layer
+    and adds its own ports. Returns {fabric: image}.
+    Given a LaneMap, broken-out ports are drawn per lane; their free lanes stay blanked.
+    """
+    shared = get_blank_base(base, cfg).copy()
+    drawer = PortDrawer(ImageDraw.Draw(shared), cfg, display_scale, cn_count, eb_count, image=shared)
+    lane_map = port_map if isinstance(port_map, LaneMap) else None
+
+    fabric_ports = []
+    for pid in range(1, cfg['PORT_COUNT'] + 1):
+        lanes = lane_map.width(pid) if lane_map is not None else 1
+        if lanes > 1:
+            port_lanes = lane_map.port_lanes(pid)
+        else:
+            label = port_map.get(pid)
+            if label is None:
+                continue
+            x0, y0, x1, y1 = _port_box(drawer, cfg, pid)
+            shared.paste(base.crop((x0, y0, x1 + 1, y1 + 1)), (x0, y0))
+            port_lanes = [(1, label)]
+        for lane, label in port_lanes:
+            if len(fabrics) > 1 and not drawer.is_fabric_invariant(label):
+                fabric_ports.append((pid, label, lane, lanes))
+            else:
+                drawer.draw_port(pid, label, fabrics[0], lane, lanes)
+
+    if len(fabrics) == 1:
+        return {fabrics[0]: shared}
+    overlays = {}
+    for fabric in fabrics:
+        img = shared.copy()
+        fabric_drawer = PortDrawer(ImageDraw.Draw(img), cfg, display_scale, cn_count, eb_count, image=img)
+        for pid, label, lane, lanes in fabric_ports:
+            fabric_drawer.draw_port(pid, label, fabric, lane, lanes)
+        overlays[fabric] = img
+    return overlays
+
+
+def render_overlay(port_map: Union[PortMap, LaneMap], fabric: str, base: Image.Image, cfg: dict, *,
+                   display_scale: float = 1.0, cn_count: int = 0, eb_count: int = 0) -> Image.Image:
+    """
+    Draws the port layout overlay for one fabric on a copy of the base switch image.
+    Ports without a label are blanked out (see get_blank_base); labelled ports get their
+    base pixels back and are then drawn by PortDrawer.
+    """
+    return render_fabric_overlays(port_map, base, cfg, (fabric,), display_scale=display_scale,
+                                  cn_count=cn_count, eb_count=eb_count)[fabric]
+
+
+# Rendered overlays, keyed by everything that affects the drawing, so racks with
+# the same port map (e.g. clones) share one image. Full-size overlays are ~6 MB
+# each, hence the small bound. Cached images are shared and must be treated as read-only.
+OVERLAY_CACHE_SIZE = 12
+_OVERLAYS: 'OrderedDict[tuple, Image.Image]' = OrderedDict()
+_OVERLAYS_IN_FLIGHT: dict[tuple, threading.Event] = {}  # Renders other threads can wait on
+_OVERLAY_LOCK = threading.Lock()
+
+
+def render_overlay_cached(port_map: Union[PortMap, LaneMap], fabric: str, base: Image.Image, cfg: dict, *,
+                          display_scale: float = 1.0, cn_count: int = 0, eb_count: int = 0) -> Image.Image:
+    """
+    Same as render_overlay, but returns a shared image when the same overlay was drawn recently.
+    A miss also draws the other fabrics of colors_fabric in the same pass (render_fabric_overlays),
+    so the A/B pair every caller asks for costs little more than one overlay.
+    """
+    # A LaneMap's lane boxes also depend on how far each port is broken out
+    breakouts = tuple(port_map.breakouts()) if isinstance(port_map, LaneMap) else ()
+    key = (cfg['NAME'], cfg['IMAGE'], base.size, fabric, display_scale, cn_count, eb_count, tuple(port_map), breakouts)
+    with _OVERLAY_LOCK:
+        img = _OVERLAYS.get(key)
+        if img is not None:
+            _OVERLAYS.move_to_end(key)
+            return img
+        pending = _OVERLAYS_IN_FLIGHT.get(key)
+        if pending is None:
+            # Draw the sibling fabrics too, unless they are cached or being drawn already
+            keys = {fabric: key}
+            for other in colors_fabric:
+                other_key = key[:3] + (other,) + key[4:]
+                if other != fabric and other_key not in _OVERLAYS and other_key not in _OVERLAYS_IN_FLIGHT:
+                    keys[other] = other_key
+            for k in keys.values():
+                _OVERLAYS_IN_FLIGHT[k] = threading.Event()
+
+    if pending is not None:
+        # Another thread is drawing this overlay (e.g. a cloned rack); wait for its result
+        pending.wait()
+        with _OVERLAY_LOCK:
+            img = _OVERLAYS.get(key)
+        if img is not None:
+            return img
+        return render_overlay(port_map, fabric, base, cfg, display_scale=display_scale,
+                              cn_count=cn_count, eb_count=eb_count)
+
+    try:
+        overlays = render_fabric_overlays(port_map, base, cfg, tuple(keys), display_scale=display_scale,
+                                          cn_count=cn_count, eb_count=eb_count)
+        with _OVERLAY_LOCK:
+            for f, k in keys.items():
+                _OVERLAYS[k] = overlays[f]
+            _OVERLAYS.move_to_end(key)
+            while len(_OVERLAYS) > OVERLAY_CACHE_SIZE:
+                _OVERLAYS.popitem(last=False)
+        return overlays[fabric]
+    finally:
+        with _OVERLAY_LOCK:
+            for k in keys.values():
+                _OVERLAYS_IN_FLIGHT.pop(k).set()
+
+
+def render_preview_overlay(port_map: Union[PortMap, LaneMap], fabric: str, cfg: dict, width: int, *,
+                           cn_count: int = 0, eb_count: int = 0) -> Image.Image:
+    """
+    Draws the overlay for one fabric directly at a canvas width: the base image comes
+    from the scaled base cache and the layout geometry is scaled to match, so a preview
+    only touches the pixels it shows. Outlines keep their nominal width in screen pixels.
+    File exports keep using render_overlay at full resolution. The result is read-only.
+    """
+    full = get_base_image(cfg['IMAGE'])
+    if width <= 0 or width >= full.width:  # Never upscale; draw at full resolution
+        return render_overlay_cached(port_map, fabric, full, cfg, cn_count=cn_count, eb_count=eb_count)
+    base = get_base_image(cfg['IMAGE'], width)
+    scaled_cfg = scale_layout(cfg, base.width / full.width, base.height / full.height)
+    return render_overlay_cached(port_map, fabric, base, scaled_cfg, cn_count=cn_count, eb_count=eb_count)
+
+
+def clear_overlay_cache():
+    """Drops all cached overlays and blanked base images."""
+    with _OVERLAY_LOCK:
+        _OVERLAYS.clear()
+    with _BLANK_BASE_LOCK:
+        _BLANK_BASES.clear()
+
+
+# --- Multi-Rack Image Export ---
+
+RENDER_BACKENDS = ('process', 'thread')
+
+
+def default_render_workers() -> int:
+    """Default worker count for image export: one per CPU core."""
+    return os.cpu_count() or 1
+
+
+def save_rack_overlays(job: dict) -> list[str]:
+    """
+    Renders the Fabric A/B overlays for one port layout and writes them for every rack
+    that shares it, encoding each PNG once. Takes and returns plain data only (no Qt,
+    no window state) so it can run in a worker process.
+
+    job keys: switch_id, port_map [(port, label)], cn_count, eb_count and
+    outputs [(rack_name, path_a, path_b)].
+    """
+    outputs = job['outputs']
+    try:
+        cfg = SWITCH_LAYOUTS[job['switch_id']]
+        base = load_base_image(job['switch_id'])
+    except (FileNotFoundError, KeyError):
+        return [f"Skipped images for {rack_name}: Base image not found." for rack_name, _, _ in outputs]
+
+    try:
+        port_map = PortMap.from_pairs(job['port_map'], cfg['PORT_COUNT'])
+        encoded = {}
+        for fabric in ('A', 'B'):
+            img = render_overlay_cached(port_map, fabric, base, cfg, display_scale=1.0,
+                                        cn_count=job.get('cn_count', 0), eb_count=job.get('eb_count', 0))
+            buffer = io.BytesIO()
+            img.save(buffer, format='PNG')
+            encoded[fabric] = buffer.getvalue()
+    except Exception as e:
+        return [f"Failed to generate images for {rack_name}: {e}" for rack_name, _, _ in outputs]
+
+    messages = []
+    for rack_name, path_a, path_b in outputs:
+        try:
+            for path, fabric in ((path_a, 'A'), (path_b, 'B')):
+                with open(path, 'wb') as f:
+                    f.write(encoded[fabric])
+            messages.append(f"Generated images for {rack_name}: {os.path.relpath(path_a)}, {os.path.relpath(path_b)}")
+        except Exception as e:
+            messages.append(f"Failed to generate images for {rack_name}: {e}")
+    return messages
+
+
+def render_rack_images(jobs: list[dict], *, backend: str = 'process', workers: int = 0, progress=None,
+                       on_result=None, cancel: Optional[threading.Event] = None) -> list[str]:
+    """
+    Runs save_rack_overlays for every job and returns all result messages.
+    backend is 'process' (a spawn-based process pool, so drawing is not serialized by
+    the GIL) or 'thread'; workers <= 0 means one per CPU core. progress, if given, is
+    called as progress(racks_done, racks_total) and on_result(messages) once per finished
+    job, both from the calling thread. Once `cancel` is set, jobs that have not started
+    are dropped (jobs already drawing run to completion).
+    """
+    total = sum(len(job['outputs']) for job in jobs)
+    workers = min(workers if workers > 0 else default_render_workers(), len(jobs))
+    results, done = [], 0
+
+    def job_finished(job, messages):
+        nonlocal done
+        results.extend(messages)
+        done += len(job['outputs'])
+        if on_result:
+            on_result(messages)
+        if progress:
+            progress(done, total)
+
+    if workers <= 1:
+        # Not worth a pool: render in the calling thread
+        for job in jobs:
+            if cancel is not None and cancel.is_set():
+                break
+            job_finished(job, save_rack_overlays(job))
+        return results
+
+    if backend == 'thread':
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+    else:
+        # spawn: never fork a process that is running a Qt event loop
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+    with executor:
+        futures = {executor.submit(save_rack_overlays, job): job for job in jobs}
+        pending = set(futures)
+        while pending:
+            finished, pending = concurrent.futures.wait(pending, timeout=0.2,
+                                                        return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in finished:
+                job = futures[future]
+                if future.cancelled():
+                    continue
+                try:
+                    messages = future.result()
+                except Exception as e:  # e.g. a worker process died
+                    messages = [f"Failed to generate images for {rack_name}: {e}" for rack_name, _, _ in job['outputs']]
+                job_finished(job, messages)
+            if cancel is not None and cancel.is_set():
+                for future in pending:
+                    future.cancel()
+    return results
+
+
+def write_port_tables(port_map: list[tuple[int, str]], switch_name: str, hostname_a: str, hostname_b: str,
+                      csv_path: str, xlsx_path: str):
+    """Writes the side-by-side Fabric A/B port table used for cabling sheets as CSV and XLSX."""
+    import pandas as pd  # Only needed for table export
+
+    df_raw = pd.DataFrame(port_map, columns=['Port ID', 'Port Name'])
+    df_export_a = df_raw.copy()
+    df_export_a['Hostname'] = hostname_a
+    df_export_a['Fabric ID'] = 'A'
+    df_export_a = df_export_a.rename(columns={'Port ID': 'Port ID (A)', 'Port Name': 'Port Name (A)', 'Fabric ID': 'Fabric ID (A)', 'Hostname': 'Hostname (A)'})
+
+    df_export_b = df_raw.copy()
+    df_export_b['Hostname'] = hostname_b
+    df_export_b['Fabric ID'] = 'B'
+    df_export_b = df_export_b.rename(columns={'Port ID': 'Port ID (B)', 'Port Name': 'Port Name (B)', 'Fabric ID': 'Fabric ID (B)', 'Hostname': 'Hostname (B)'})
+
+    df_combined = pd.concat([df_export_a.reset_index(drop=True), df_export_b.reset_index(drop=True)], axis=1)
+    df_combined.insert(0, 'Switch Model', switch_name)
+    df_combined.to_csv(csv_path, index=False)
+    df_combined.to_excel(xlsx_path, index=False)
@@ -0,0 +1,740 @@
+#!/usr/bin/env python3
+"""
+Qt-free switch_conf.py support: builds the environment variables and command
+line for a rack, keeps a local cache of the script and writes/runs the per-rack
+.cfg file.
+SwitchConfigWorker in portmapper.py and the batch CLI both run through here.
+"""
+import atexit
+import hashlib
+import json
+import locale
+import os
+import queue
+import re
+import subprocess
+import sys
+import threading
+import time
+from typing import Optional
+
+from portmapper_engine import SWITCH_LAYOUTS, get_unique_filename, parse_port_label, _format_port_ranges
+
+SWITCH_CONF_URL = os.environ.get(
+    'PORTMAPPER_SWITCH_CONF_URL',
+    'https://artifactory.vastdata.com/artifactory/vast-custom/switch_conf/switch_conf-latest/switch_conf.py')
+SWITCH_CONF_MAX_AGE = 15 * 60  # Seconds a cached switch_conf.py is trusted before revalidation
+_SWITCH_CONF_LOCK = threading.Lock()
+_CANCEL_POLL_SECONDS = 0.1  # How often a running script checks its cancel event
+VENDOR_MAP = {'Cisco-NXOS': 'cisco', 'MNLX-Onyx': 'mellanox', 'MNLX-Cumulus': 'cumulus', 'Arista-EOS': 'arista'}
+
+
+def build_command_parts(env_vars: dict, use_shell_vars: bool = False, script_filename: str = 'switch_conf.py') -> list[str]:
+    """Builds the command list for switch_conf.py."""
+    def get_val(key):
+        """Gets the command-line representation of a value (literal or shell variable)."""
+        if use_shell_vars:
+            if key == 'autonomous_systems':
+                return '$ASNS'
+            return f'${key.upper()}'
+        return env_vars.get(key, '')
+
+    cmd_parts = ['python3', script_filename]
+    # Always check the actual value from env_vars before adding an argument.
+    if env_vars.get('swtype'):
+        cmd_parts.append(get_val('swtype'))
+
+    param_map = {'clustername': '--cluster-name', 'hostnames': '--hostname', 'mgmt_ips': '--mgmt-ips', 'mcidr': '--mgmt-subnet', 'mgw': '--mgmt-gateway', 'ntp1': '--ntp', 'lors': '--switch-type', 'external_vlans': '--external-vlans', 'autonomous_systems': '--autonomous-systems', 'extports': '--external-ports', 'iplports': '--ipl-ports', 'islports': '--isl-ports'}
+    for key, switch in param_map.items():
+        if env_vars.get(key):
+            cmd_parts.extend([switch, get_val(key)])
+
+    # Add --vxlan flag if requested
+    if env_vars.get('vxlan'):
+        cmd_parts.append('--vxlan')
+
+    # Conditionally add --external-speed only for non-Cisco switches
+    if env_vars.get('swtype') != 'cisco' and env_vars.get('uplinkspeed'):
+        cmd_parts.extend(['--external-speed', get_val('uplinkspeed')])
+
+    # Conditionally add --data-vlan only if it's not the default value.
+    if (data_vlan_val := env_vars.get('datavlan')) and data_vlan_val != '69':
+        cmd_parts.extend(['--data-vlan', get_val('datavlan')])
+
+    node_port_keys = ['cports', 'dports', 'eports', 'ieports', 'gports', 'nic2_nbports']
+    # Filter keys based on whether they have a non-empty value in env_vars.
+    active_node_port_keys = [k for k in node_port_keys if env_vars.get(k)]
+    if active_node_port_keys:
+        if use_shell_vars:
+            # Get the shell variable names for the active keys.
+            shell_vars = [f'${k.upper()}' for k in active_node_port_keys]
+            cmd_parts.extend(['--node-ports', ','.join(shell_vars)])
+        else:
+            # Get the actual values for the active keys.
+            node_port_values = [env_vars[k] for k in active_node_port_keys]
+            cmd_parts.extend(['--node-ports', ','.join(node_port_values)])
+
+    return [part for part in cmd_parts if part] if not use_shell_vars else cmd_parts
+
+
+def build_rack_env_vars(setup: dict, rack_data: dict, port_map: list, rack_name: str, default_switch_id: str = '3') -> dict:
+    """
+    Assembles the switch_conf.py environment variables for one rack.
+    `setup` holds the Setup tab values, keyed as in the exported JSON 'setup_values'.
+    """
+    ha = rack_data.get('hostname_a', 'FabricA')
+    hb = rack_data.get('hostname_b', 'FabricB')
+    hostnames = f'{ha},{hb}' if ha and hb else ha or hb
+    mgmt_ips = f"{rack_data.get('mgmt_ip_a', '')},{rack_data.get('mgmt_ip_b', '')}"
+
+    # Inherit global settings from the Setup values
+    # Use the rack's specific switch model for config generation
+    rack_switch_id = rack_data.get('switch_id', default_switch_id)
+    rack_layout_config = SWITCH_LAYOUTS[rack_switch_id]
+    cluster_name = setup.get('cluster_name', '').strip() or 'VastData-0001'
+    swtype = VENDOR_MAP.get(setup.get('switch_os', ''), '')
+    uplink_speed = setup.get('uplink_speed', '') or rack_layout_config.get('NATIVE_SPEED', '')
+
+    # Get port split settings from the rack's data
+    port_splits = {
+        nt: (d.get('factor', 1) if d.get('split') else 1)
+        for nt, d in rack_data.get('nodes', {}).items()
+    }
+    uplink_splits = {
+        ut: (d.get('factor', 1) if d.get('split') else 1)
+        for ut, d in rack_data.get('uplinks', {}).items()
+    }
+
+    # Group ports by type and group from the calculated port_map
+    port_plan = {}
+    for port, label in port_map:
+        parsed = parse_port_label(label)
+        base_type = parsed.base_type
+        key = base_type
+        if base_type in ['ISL', 'MLAG/BGP', 'EXT']:
+            # EXT is the display name for MLAG/BGP, map it back
+            internal_type = 'MLAG/BGP' if base_type == 'EXT' else base_type
+            if parsed.group is not None:
+                key = f'{internal_type}-GROUP-{parsed.group}'
+            elif not label.startswith('RSVD-'):
+                # No group number in label (e.g., "EXT-1" or "ISL-1") - default to group 1
+                key = f'{internal_type}-GROUP-1'
+        port_plan.setdefault(key, []).append(port)
+
+    # Format port ranges
+    isl_ranges = [_format_port_ranges(ports, uplink_splits.get('ISL', 1)) for key, ports in sorted(port_plan.items()) if key.startswith('ISL-GROUP')]
+    ext_ranges = [_format_port_ranges(ports, uplink_splits.get('MLAG/BGP', 1)) for key, ports in sorted(port_plan.items()) if key.startswith('MLAG/BGP-GROUP')]
+
+    customer_vlans_raw = setup.get('customer_vlans', '').strip()
+    cleaned_vlans = re.sub(r',+', ',', customer_vlans_raw.replace(' ', ',')).strip(',')
+
+    bgp_asn_raw = setup.get('bgp_asn', '').strip()
+    cleaned_asns = re.sub(r',+', ',', bgp_asn_raw.replace(' ', ',')).strip(',')
+
+    # VXLAN is only enabled if BGP ASNs are defined and the overlay option is selected for this rack
+    has_bgp_asns = bool(cleaned_asns)
+    rack_use_vxlan = rack_data.get('use_vxlan_overlay', setup.get('use_vxlan_overlay', False))
+    should_use_vxlan = rack_use_vxlan and has_bgp_asns
+    vxlan_value = 'True' if should_use_vxlan else ''
+
+    env_vars = {
+        'mgmt_ips': mgmt_ips, 'mcidr': setup.get('network_cidr', ''), 'mgw': setup.get('mgmt_default_route', '').strip(),
+        'clustername': cluster_name, 'uplinkspeed': uplink_speed, 'rack_name': rack_name,
+        'ntp1': setup.get('ntp_server_ip', '').strip() or '0.0.0.123', 'hostnames': hostnames, 'swtype': swtype,
+        'lors': rack_data.get('lors', 'leaf'), 'vxlan': vxlan_value,
+        'external_vlans': cleaned_vlans, 'datavlan': setup.get('data_vlan', '').strip() or '69',
+        'autonomous_systems': cleaned_asns,
+        'cports': _format_port_ranges(port_plan.get('CN', []), port_splits.get('CN', 1)),
+        'dports': _format_port_ranges(port_plan.get('DN', []), port_splits.get('DN', 1)),
+        'eports': _format_port_ranges(port_plan.get('EB', []), port_splits.get('EB', 1)),
+        'ieports': _format_port_ranges(port_plan.get('IE', []), port_splits.get('IE', 1)),
+        'gports': _format_port_ranges(port_plan.get('GN', []), port_splits.get('GN', 1)),
+        'extports': ','.join(sorted(ext_ranges)),
+        'iplports': _format_port_ranges(port_plan.get('IPL', []), uplink_splits.get('IPL', 1)),
+        'islports': ','.join(sorted(isl_ranges)),
+        'nic2_nbports': _format_port_ranges(port_plan.get('NB', []), uplink_splits.get('NB', 1)),
+    }
+
+    if setup.get('use_2nd_nic') == 'Yes':
+        env_vars['2ND_NIC'] = 'Yes'
+    if setup.get('pfc'):
+        env_vars['pfc'] = 'True'
+
+    return {k: v for k, v in env_vars.items() if v}
+
+
+def build_switch_conf_params(config_dir: str, env_vars: dict, script_filename: str = 'switch_conf.py') -> dict:
+    """Builds the params dict consumed by run_switch_conf / SwitchConfigWorker."""
+    return {
+        'config_dir': config_dir,
+        'env_vars': env_vars,
+        'cmd_parts_for_file': build_command_parts(env_vars, use_shell_vars=True, script_filename=script_filename),
+        'cmd_parts_exec': build_command_parts(env_vars, use_shell_vars=False, script_filename=script_filename),
+        'script_filename': script_filename
+    }
+
+
+def default_cache_dir() -> str:
+    """Per-user cache directory for downloaded artifacts (override with PORTMAPPER_CACHE_DIR)."""
+    if override := os.environ.get('PORTMAPPER_CACHE_DIR'):
+        return override
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser(os.path.join('~', 'AppData', 'Local'))
+        return os.path.join(base, 'PortMapper', 'Cache')
+    if sys.platform == 'darwin':
+        return os.path.expanduser('~/Library/Caches/PortMapper')
+    return os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'portmapper')
+
+
+def _write_atomic(path: str, data: bytes):
+    """Writes data next to path and renames it into place, so readers never see a partial file."""
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _file_sha256(path: str) -> str:
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def fetch_switch_conf(url: str = SWITCH_CONF_URL, *, offline: bool = False, cache_dir: Optional[str] = None,
+                      max_age: float = SWITCH_CONF_MAX_AGE, timeout: float = 5) -> tuple[Optional[str], str]:
+    """
+    Returns (path, status) for the cached switch_conf.py, downloading it only when needed.
+
+    Scripts are stored content-addressed as <sha256>.py under cache_dir/switch_conf, and
+    index.json remembers the ETag/Last-Modified of the last good copy for each URL. A copy
+    checked less than max_age seconds ago is used as-is; older copies are revalidated with
+    If-None-Match/If-Modified-Since, so an unchanged script costs one 304 round-trip. When
+    offline, or when the server cannot be reached, the last good copy is used.
+
+    status is 'downloaded', 'not-modified', 'fresh', 'offline' (last good copy used without
+    revalidation) or 'unavailable' (no copy at all; path is None).
+    """
+    store_dir = os.path.join(cache_dir or default_cache_dir(), 'switch_conf')
+    index_path = os.path.join(store_dir, 'index.json')
+    with _SWITCH_CONF_LOCK:
+        try:
+            with open(index_path, encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        entry = index.get(url) or {}
+        cached_path = os.path.join(store_dir, f"{entry['sha256']}.py") if entry.get('sha256') else None
+        if cached_path and not os.path.exists(cached_path):
+            cached_path, entry = None, {}
+
+        if cached_path and (offline or time.time() - entry.get('checked_at', 0) < max_age):
+            return cached_path, 'offline' if offline else 'fresh'
+        if offline:
+            return None, 'unavailable'
+
+        import requests  # Deferred: only needed when the cache has to be revalidated
+
+        headers = {}
+        if cached_path and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if cached_path and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        try:
+            response = requests.get(url, headers=headers, timeout=timeout)
+            if response.status_code == 304 and cached_path:
+                status = 'not-modified'
+            else:
+                response.raise_for_status()
+                content = response.content
+                digest = hashlib.sha256(content).hexdigest()
+                os.makedirs(store_dir, exist_ok=True)
+                cached_path = os.path.join(store_dir, f'{digest}.py')
+                if not os.path.exists(cached_path):
+                    _write_atomic(cached_path, content)
+                entry = {'sha256': digest, 'etag': response.headers.get('ETag'),
+                         'last_modified': response.headers.get('Last-Modified')}
+                status = 'downloaded'
+        except requests.exceptions.RequestException:
+            # Network/VPN problems fall back to the last good copy
+            return (cached_path, 'offline') if cached_path else (None, 'unavailable')
+
+        entry['checked_at'] = time.time()
+        index[url] = entry
+        try:
+            _write_atomic(index_path, json.dumps(index, indent=2).encode('utf-8'))
+        except OSError:
+            pass  # A stale index only costs a re-download next time
+        return cached_path, status
+
+
+def install_switch_conf(cached_path: str, script_path: str) -> bool:
+    """
+    Places the cached script at script_path. The file is only rewritten when its content
+    differs from the cached copy (whose name is its sha256). Returns False on I/O errors.
+    """
+    digest = os.path.splitext(os.path.basename(cached_path))[0]
+    try:
+        if os.path.exists(script_path) and os.path.getsize(script_path) == os.path.getsize(cached_path) \
+                and _file_sha256(script_path) == digest:
+            return True
+        with open(cached_path, 'rb') as f:
+            _write_atomic(script_path, f.read())
+        return True
+    except OSError:
+        return False
+
+
+def prepare_switch_conf(config_dir: str, *, offline: bool = False,
+                        script_filename: str = 'switch_conf.py') -> tuple[bool, str]:
+    """
+    Makes switch_conf.py available in config_dir from the local cache (see fetch_switch_conf).
+    Returns (available, note); note is a one-line remark for the result message, or ''.
+    """
+    cached_path, status = fetch_switch_conf(offline=offline)
+    if cached_path is None:
+        return False, ''
+    os.makedirs(config_dir, exist_ok=True)
+    if not install_switch_conf(cached_path, os.path.join(config_dir, script_filename)):
+        return False, ''
+    if status == 'offline':
+        return True, 'ℹ️ Using the cached copy of switch_conf.py (offline or server unreachable).'
+    return True, ''
+
+
+# Source of a warm switch_conf.py interpreter. It reads one JSON request per line
+# ({"script", "args", "cwd", "env"}) and replies with one JSON line ({"returncode", "stdout",
+# "stderr"}, the captured bytes as latin-1 text). Each run gets what a cold
+# `python3 switch_conf.py` would: stdin on /dev/null, fds 1 and 2 on fresh capture files
+# (so child processes are captured too), new sys.std* streams, the caller's environment
+# and no modules imported by earlier runs. Only compiled code of the script itself and the
+# interpreter's own imports are reused.
+_WARM_WORKER_SOURCE = r"""
+import importlib, json, os, sys, tempfile, traceback
+
+# The protocol runs on private copies of the pipes, so fds 0-2 are free for the runs
+incoming = os.fdopen(os.dup(0), 'r', encoding='utf-8')
+protocol = os.fdopen(os.dup(1), 'w', encoding='utf-8')
+stray = os.dup(2)  # Output outside of a run goes to the parent's stderr
+null = os.open(os.devnull, os.O_RDONLY)
+os.dup2(null, 0)
+os.close(null)
+os.dup2(stray, 1)
+# Stream settings of a cold run (same interpreter, same pipes, same environment)
+stream_args = [dict(encoding=f.encoding, errors=f.errors, line_buffering=f.line_buffering)
+               for f in (sys.stdin, sys.stdout, sys.stderr)]
+code_cache = {}
+
+def run(request):
+    path = os.path.abspath(request['script'])
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    if key not in code_cache:
+        with open(path, 'rb') as f:
+            code_cache[key] = compile(f.read(), path, 'exec')
+    sys.argv = [request['script'], *request['args']]
+    sys.path.insert(0, os.path.dirname(path))
+    try:
+        exec(code_cache[key], {'__name__': '__main__', '__file__': path, '__builtins__': __builtins__})
+    except SystemExit as e:
+        if isinstance(e.code, int) or e.code is None:
+            return e.code or 0
+        print(e.code, file=sys.stderr)
+        return 1
+    except BaseException as e:
+        # Same traceback as a cold run: skip this function's own frame
+        traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+        return 1
+    return 0
+
+for line in incoming:
+    request = json.loads(line)
+    saved = (os.getcwd(), sys.argv, sys.path[:], dict(os.environ), set(sys.modules))
+    captures = [tempfile.TemporaryFile(), tempfile.TemporaryFile()]
+    os.dup2(captures[0].fileno(), 1)
+    os.dup2(captures[1].fileno(), 2)
+    sys.stdin, sys.stdout, sys.stderr = [open(fd, mode, closefd=False, **args)
+                                         for fd, mode, args in zip((0, 1, 2), 'rww', stream_args)]
+    returncode = 1
+    try:
+        os.environ.clear()
+        os.environ.update(request['env'])
+        os.chdir(request['cwd'])
+        importlib.invalidate_caches()
+        returncode = run(request)
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except Exception:
+                pass
+        os.dup2(stray, 1)
+        os.dup2(stray, 2)
+        os.chdir(saved[0])
+        sys.argv, sys.path[:] = saved[1], saved[2]
+        os.environ.clear()
+        os.environ.update(saved[3])
+        for name in set(sys.modules) - saved[4]:
+            del sys.modules[name]
+    output = []
+    for capture in captures:
+        capture.seek(0)
+        output.append(capture.read().decode('latin-1'))
+        capture.close()
+    reply = {'returncode': returncode, 'stdout': output[0], 'stderr': output[1]}
+    protocol.write(json.dumps(reply) + '\n')
+    protocol.flush()
+"""
+
+
+def _decode_output(data: str) -> str:
+    """Decodes captured bytes (sent as latin-1 text) exactly like subprocess.run(text=True)."""
+    text = data.encode('latin-1').decode(locale.getpreferredencoding(False))
+    return text.replace('\r\n', '\n').replace('\r', '\n')
+
+
+class SwitchConfCancelled(Exception):
+    """Raised by SwitchConfRunner.run when its cancel event is set while the script runs."""
+
+
+class _WarmInterpreter:
+    """One persistent interpreter process running _WARM_WORKER_SOURCE."""
+
+    def __init__(self, python: str):
+        self.python = python
+        self.runs = 0
+        self.process = subprocess.Popen([python, '-c', _WARM_WORKER_SOURCE], stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE, text=True, encoding='utf-8')
+        self._replies = queue.Queue()
+        threading.Thread(target=self._read_replies, daemon=True).start()
+
+    def _read_replies(self):
+        for line in self.process.stdout:
+            self._replies.put(line)
+        self._replies.put(None)  # EOF: the interpreter exited
+
+    def call(self, cmd: list[str], cwd: str, timeout: float,
+             cancel: Optional[threading.Event] = None) -> subprocess.CompletedProcess:
+        request = {'script': cmd[1], 'args': cmd[2:], 'cwd': cwd, 'env': dict(os.environ)}
+        self.process.stdin.write(json.dumps(request) + '\n')
+        self.process.stdin.flush()
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                line = self._replies.get(timeout=min(_CANCEL_POLL_SECONDS, max(0, deadline - time.monotonic())))
+                break
+            except queue.Empty:
+                if cancel is not None and cancel.is_set():
+                    raise SwitchConfCancelled()
+                if time.monotonic() >= deadline:
+                    raise subprocess.TimeoutExpired(cmd, timeout)
+        if line is None:
+            raise EOFError('switch_conf.py worker exited')
+        self.runs += 1
+        reply = json.loads(line)
+        return subprocess.CompletedProcess(cmd, reply['returncode'], _decode_output(reply['stdout']),
+                                           _decode_output(reply['stderr']))
+
+    def close(self):
+        try:
+            self.process.kill()
+            self.process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+
+
+class SwitchConfRunner:
+    """
+    Runs switch_conf.py command lines (['python3', 'switch_conf.py', ...]) for many racks.
+
+    The 'warm' backend keeps up to `workers` persistent interpreters (started on demand)
+    and sends each run to an idle one; the 'subprocess' backend starts a fresh interpreter
+    per run, as before. Both return a subprocess.CompletedProcess and raise
+    subprocess.TimeoutExpired on timeout (the timed-out interpreter is killed and replaced).
+    Frozen builds use 'subprocess'. The script's --version output is memoized per script hash.
+    """
+
+    BACKENDS = ('warm', 'subprocess')
+
+    def __init__(self, backend: Optional[str] = None, workers: int = 0, max_runs_per_worker: int = 200):
+        if backend is None:
+            backend = 'subprocess' if getattr(sys, 'frozen', False) else 'warm'
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown switch_conf backend: {backend}")
+        self.backend = backend
+        self.workers = workers if workers > 0 else min(8, os.cpu_count() or 1)
+        self.max_runs_per_worker = max_runs_per_worker
+        self._idle: list[_WarmInterpreter] = []
+        self._started = 0
+        self._slots = threading.Condition()
+        self._versions: dict[str, str] = {}
+        self._versions_lock = threading.Lock()
+
+    def _acquire(self, python: str) -> Optional[_WarmInterpreter]:
+        with self._slots:
+            while True:
+                for i, worker in enumerate(self._idle):
+                    if worker.python == python:
+                        return self._idle.pop(i)
+                if self._started < self.workers:
+                    self._started += 1
+                    break
+                if self._idle:
+                    # Idle worker for another interpreter: retire it to make room
+                    self._idle.pop(0).close()
+                    self._started -= 1
+                    continue
+                self._slots.wait()
+        try:
+            return _WarmInterpreter(python)
+        except OSError:
+            self._discard(None)
+            return None
+
+    def _release(self, worker: _WarmInterpreter):
+        if worker.runs >= self.max_runs_per_worker:
+            self._discard(worker)
+            return
+        with self._slots:
+            self._idle.append(worker)
+            self._slots.notify()
+
+    def _discard(self, worker: Optional[_WarmInterpreter]):
+        if worker is not None:
+            worker.close()
+        with self._slots:
+            self._started -= 1
+            self._slots.notify()
+
+    def run(self, cmd: list[str], cwd: str, timeout: float,
+            cancel: Optional[threading.Event] = None) -> subprocess.CompletedProcess:
+        """
+        Runs one command line. If `cancel` is set while it runs, the interpreter running it
+        is killed and SwitchConfCancelled is raised.
+        """
+        if cancel is not None and cancel.is_set():
+            raise SwitchConfCancelled()
+        if self.backend == 'warm' and len(cmd) >= 2:
+            worker = self._acquire(cmd[0])
+            if worker is not None:
+                try:
+                    result = worker.call(cmd, cwd, timeout, cancel)
+                except (subprocess.TimeoutExpired, SwitchConfCancelled):
+                    self._discard(worker)
+                    raise
+                except (OSError, EOFError, ValueError):
+                    # Broken worker: drop it and run this one cold
+                    self._discard(worker)
+                else:
+                    self._release(worker)
+                    return result
+        if cancel is None:
+            return subprocess.run(cmd, cwd=cwd, env=os.environ.copy(), stdin=subprocess.DEVNULL, capture_output=True,
+                                  text=True, timeout=timeout)
+        return self._run_cancellable(cmd, cwd, timeout, cancel)
+
+    @staticmethod
+    def _run_cancellable(cmd: list[str], cwd: str, timeout: float, cancel: threading.Event) -> subprocess.CompletedProcess:
+        """subprocess.run with capture and timeout that also kills the process when `cancel` is set."""
+        deadline = time.monotonic() + timeout
+        with subprocess.Popen(cmd, cwd=cwd, env=os.environ.copy(), stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                              stderr=subprocess.PIPE, text=True) as process:
+            while True:
+                try:
+                    stdout, stderr = process.communicate(
+                        timeout=min(_CANCEL_POLL_SECONDS, max(0, deadline - time.monotonic())))
+                    return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+                except subprocess.TimeoutExpired:
+                    if cancel.is_set() or time.monotonic() >= deadline:
+                        process.kill()
+                        process.communicate()
+                        if cancel.is_set():
+                            raise SwitchConfCancelled()
+                        raise subprocess.TimeoutExpired(cmd, timeout)
+
+    def version(self, script_path: str, python: str = 'python3') -> str:
+        """Returns `switch_conf.py --version` output ('' if unavailable), probed once per script hash."""
+        digest = _file_sha256(script_path)
+        with self._versions_lock:
+            if digest in self._versions:
+                return self._versions[digest]
+        version_info = ''
+        try:
+            result = self.run([python, os.path.basename(script_path), '--version'],
+                              cwd=os.path.dirname(script_path) or '.', timeout=10)
+            if result.returncode == 0 and result.stdout.strip():
+                version_info = result.stdout.strip()
+        except Exception:
+            pass
+        with self._versions_lock:
+            self._versions[digest] = version_info
+        return version_info
+
+    def close(self):
+        with self._slots:
+            idle, self._idle = self._idle, []
+            self._started -= len(idle)
+        for worker in idle:
+            worker.close()
+
+
+_DEFAULT_RUNNER: Optional[SwitchConfRunner] = None
+
+
+def get_switch_conf_runner() -> SwitchConfRunner:
+    """Process-wide runner shared by SwitchConfigWorker and the batch workers."""
+    global _DEFAULT_RUNNER
+    with _SWITCH_CONF_LOCK:
+        if _DEFAULT_RUNNER is None:
+            _DEFAULT_RUNNER = SwitchConfRunner()
+            atexit.register(_DEFAULT_RUNNER.close)
+        return _DEFAULT_RUNNER
+
+
+def format_output_for_display(text: str, max_rows: int = 25) -> str:
+    """Format output text to limit rows to max_rows and split into columns if needed."""
+    if not text:
+        return text
+
+    lines = text.strip().split('\n')
+    if len(lines) <= max_rows:
+        return text
+
+    # Split into columns if too many rows
+    num_columns = (len(lines) + max_rows - 1) // max_rows
+    lines_per_col = (len(lines) + num_columns - 1) // num_columns
+
+    # Pad lines list to make it evenly divisible
+    padded_lines = lines + [''] * (num_columns * lines_per_col - len(lines))
+
+    # Create column groups
+    cols = []
+    for i in range(num_columns):
+        start_idx = i * lines_per_col
+        end_idx = min(start_idx + lines_per_col, len(padded_lines))
+        cols.append(padded_lines[start_idx:end_idx])
+
+    # Find max length in each column for padding
+    max_lengths = [max(len(line) for line in col) for col in cols]
+
+    # Format as columns (find the longest column first)
+    formatted_lines = []
+    for i in range(lines_per_col):
+        row = []
+        for col_idx, col in enumerate(cols):
+            if i < len(col):
+                line = col[i]
+                padded_line = line.ljust(max_lengths[col_idx])
+                row.append(padded_line)
+        if row:
+            formatted_lines.append('   |   '.join(row))
+
+    return '\n'.join(formatted_lines)
+
+
+def run_switch_conf(params: dict, skip_download: bool = False, offline: bool = False,
+                    runner: Optional[SwitchConfRunner] = None, cancel: Optional[threading.Event] = None) -> str:
+    """
+    Places switch_conf.py in the config dir from the local cache (unless skip_download,
+    in which case the caller already did), writes the rack's .cfg file and runs the
+    script through `runner` (default: the shared warm runner). Returns a human-readable
+    result message. If `cancel` is set before the rack starts nothing is written; if it
+    is set while the script runs, the script is killed.
+    """
+    rack_label = params.get('env_vars', {}).get('rack_name', 'rack')
+    if cancel is not None and cancel.is_set():
+        return f'⏹️ Cancelled before {rack_label} was configured.'
+    try:
+        config_dir = params['config_dir']
+        os.makedirs(config_dir, exist_ok=True)
+        script_filename = params.get('script_filename', 'switch_conf.py')
+        script_note = ''
+        if skip_download:
+            # The caller prepared the script once for all racks
+            script_downloaded = os.path.exists(os.path.join(config_dir, script_filename))
+        else:
+            script_downloaded, script_note = prepare_switch_conf(config_dir, offline=offline,
+                                                                 script_filename=script_filename)
+
+        # Ensure command parts reference the actual script filename
+        if params.get('cmd_parts_for_file'):
+            cmd_parts_file = params['cmd_parts_for_file'][:]
+            if len(cmd_parts_file) >= 2:
+                cmd_parts_file[1] = script_filename
+            params['cmd_parts_for_file'] = cmd_parts_file
+        if params.get('cmd_parts_exec'):
+            cmd_parts_exec = params['cmd_parts_exec'][:]
+            if len(cmd_parts_exec) >= 2:
+                cmd_parts_exec[1] = script_filename
+            params['cmd_parts_exec'] = cmd_parts_exec
+
+        env_vars = params['env_vars']
+        # Build export statements with special handling for ASNS
+        export_lines = []
+        for key, value in env_vars.items():
+            if key == 'autonomous_systems':
+                export_lines.append(f'export ASNS={value}')
+            else:
+                export_lines.append(f'export {key.upper()}={value}')
+        output_content = '\n'.join(export_lines)
+        cmd_parts_for_file = params['cmd_parts_for_file']
+        command_line = ' '.join(cmd_parts_for_file)
+        output_content += f'\n\n{command_line}\n'
+
+        # Version for the CFG file header; probed once per script content, not per rack
+        runner = runner or get_switch_conf_runner()
+        version_info = runner.version(os.path.join(config_dir, script_filename)) if script_downloaded else ""
+
+        # Create descriptive filename with cluster, switch, leaf/spine names
+        cluster_name = env_vars.get('clustername', 'VastData-0001')
+        hostnames = env_vars.get('hostnames', 'FabricA,FabricB')
+        hostname_a, hostname_b = hostnames.split(',') if ',' in hostnames else (hostnames, hostnames)
+        switch_type = env_vars.get('lors', 'leaf')
+
+        rack_name = env_vars.get("rack_name", "Rack1")
+        cfg_filename_base = f"{cluster_name}_{rack_name}_{hostname_a}_{hostname_b}_{switch_type}"
+        cfg_filename = get_unique_filename(os.path.join(config_dir, f'{cfg_filename_base}_switch.cfg'))
+
+        with open(cfg_filename, 'w') as f:
+            # Write version info as first line if available
+            if version_info:
+                f.write(f'# Switch_conf.py Version: {version_info}\n')
+            f.write(output_content)
+
+        result_message = f"--- Results for {cfg_filename_base} ---\n"
+        result_message += f'Switch config saved to: {os.path.basename(cfg_filename)}\n\n'
+        if script_note:
+            result_message += f'{script_note}\n'
+
+        if script_downloaded:
+            try:
+                cmd_parts_exec = params['cmd_parts_exec']
+                result = runner.run(cmd_parts_exec, cwd=config_dir, timeout=30, cancel=cancel)
+                if result.returncode == 0:
+                    formatted_stdout = format_output_for_display(result.stdout)
+                    result_message += f'✅ Switch configuration executed successfully!\n\nOutput:\n{formatted_stdout}'
+                    if result.stderr:
+                        formatted_stderr = format_output_for_display(result.stderr)
+                        result_message += f'\n\nWarnings/Info:\n{formatted_stderr}'
+                else:
+                    formatted_stderr = format_output_for_display(result.stderr)
+                    result_message += f'❌ Switch configuration failed with return code {result.returncode}\n\nError:\n{formatted_stderr}'
+                    if result.stdout:
+                        formatted_stdout = format_output_for_display(result.stdout)
+                        result_message += f'\n\nOutput:\n{formatted_stdout}'
+            except subprocess.TimeoutExpired:
+                result_message += '❌ Switch configuration execution timed out (>30 seconds)'
+            except SwitchConfCancelled:
+                result_message += '⏹️ Switch configuration cancelled; only the local config file was created.'
+            except Exception as e:
+                result_message += f'❌ Error executing switch configuration: {e}'
+        elif offline:
+            result_message += ('⚠️ Working offline and no cached copy of switch_conf.py exists.\n'
+                               'Only the local config file was created.')
+        else:
+            result_message += '⚠️ Could not download switch_conf.py (VPN/Network Error).\nOnly the local config file was created.'
+
+        return result_message
+
+    except Exception as e:
+        return f'An unexpected error occurred: {e}'
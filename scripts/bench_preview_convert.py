@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the PIL -> Qt preview path.
+
+Compares the old canvas path (tobytes, QPixmap.fromImage, then a smooth rescale
+of the full-size pixmap on every paint) with the current one (pil_to_qimage
+wrapping one copy of the pixels, rescaled once per frame and label size).
+
+    python3 scripts/bench_preview_convert.py [--frames 50] [--paints 3] [--switch 3]
+"""
+
+import os
+import sys
+import time
+import argparse
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt6.QtWidgets import QApplication
+from PyQt6.QtGui import QImage, QPixmap
+from PyQt6.QtCore import Qt
+
+from portmapper_engine import SWITCH_LAYOUTS, RackSpec, NodeSpec, UplinkSpec, PortMap, plan_rack
+from portmapper_render import load_base_image, render_overlay
+from portmapper import ScalableLabel, pil_to_qimage
+
+
+def old_frame(img, label: ScalableLabel, paints: int):
+    """The previous path: two full-size copies per frame and a full-size rescale per paint."""
+    data = img.tobytes('raw', 'RGBA')
+    pixmap = QPixmap.fromImage(QImage(data, img.size[0], img.size[1], QImage.Format.Format_RGBA8888))
+    for _ in range(paints):
+        pixmap.scaled(label.size(), Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+
+
+def new_frame(img, label: ScalableLabel, paints: int):
+    """The current path: one copy per frame, rescaled once and reused by every paint."""
+    label.setImage(pil_to_qimage(img))
+    for _ in range(paints):
+        label._scaled_pixmap()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the PIL -> Qt canvas conversion')
+    parser.add_argument('--frames', type=int, default=50, help='Preview frames per path')
+    parser.add_argument('--paints', type=int, default=3, help='Paint events per frame (resizes, exposes)')
+    parser.add_argument('--switch', default='3', choices=sorted(SWITCH_LAYOUTS), help='Switch model')
+    parser.add_argument('--width', type=int, default=700, help='Canvas width in pixels')
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    layout = SWITCH_LAYOUTS[args.switch]
+    spec = RackSpec(switch_id=args.switch,
+                    nodes={'DN': NodeSpec(count=16), 'CN': NodeSpec(count=16), 'EB': NodeSpec(count=4)},
+                    uplinks={'IPL': UplinkSpec(groups=1, ports_per_group=2),
+                             'ISL': UplinkSpec(groups=2, ports_per_group=4)})
+    port_map, _ = plan_rack(spec)
+    base = load_base_image(args.switch)
+    img = render_overlay(PortMap.from_pairs(port_map, layout['PORT_COUNT']), 'A', base, layout)
+
+    label = ScalableLabel()
+    label.resize(args.width, max(1, args.width * img.height // img.width))
+
+    print(f"{layout['NAME']}: {img.width}x{img.height} frame, {label.width()}x{label.height()} canvas, "
+          f"{args.frames} frames x {args.paints} paints")
+    for name, frame in (('old (tobytes + fromImage + scale per paint)', old_frame),
+                        ('new (pil_to_qimage + scale once)', new_frame)):
+        frame(img, label, args.paints)  # Warm up
+        start = time.perf_counter()
+        for _ in range(args.frames):
+            frame(img, label, args.paints)
+        per_frame = (time.perf_counter() - start) / args.frames
+        print(f"  {name:<45} {per_frame * 1000:7.2f} ms/frame")
+    app.quit()
+
+
+if __name__ == '__main__':
+    main()
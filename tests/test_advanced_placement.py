@@ -0,0 +1,36 @@
+"""Advanced-mode racks: DBox DN split, starting node numbers and the centred uplink block."""
+import pytest
+
+from portmapper_engine import NodeSpec, RackSpec, UplinkSpec, plan_rack
+
+NODES = {'DN': NodeSpec(count=6, start=100), 'CN': NodeSpec(count=4, start=5)}
+
+
+def _spec(uplink_placement, ext_key='MLAG/BGP'):
+    uplinks = {'IPL': UplinkSpec(groups=1, ports_per_group=2), ext_key: UplinkSpec(groups=2, ports_per_group=2)}
+    return RackSpec(switch_id='3', nodes=NODES, uplinks=uplinks, mapping_mode='advanced', dbox_type='CeresV2',
+                    node_routing={'CN': 'LEFT'}, uplink_placement=uplink_placement)
+
+
+def test_nodes_are_numbered_from_their_starting_node():
+    port_map, _ = plan_rack(_spec('sequential'))
+    labels = dict(port_map)
+    # CeresV2: DN 1-2 right, 3-4 left, 5-6 right; CN routed left after the left DNs
+    assert [labels[p] for p in (64, 63, 62, 61)] == ['DN-100', 'DN-101', 'DN-104', 'DN-105']
+    assert [labels[p] for p in range(1, 7)] == ['DN-102', 'DN-103', 'CN-5', 'CN-6', 'CN-7', 'CN-8']
+
+
+@pytest.mark.parametrize('ext_key', ['MLAG/BGP', 'EXT'])
+def test_sequential_uplinks_follow_the_right_side_nodes(ext_key):
+    port_map, _ = plan_rack(_spec('sequential', ext_key))
+    assert [(p, label) for p, label in port_map if p in range(55, 61)] == [
+        (55, 'MLAG/BGP2-2'), (56, 'MLAG/BGP2-1'), (57, 'MLAG/BGP1-2'), (58, 'MLAG/BGP1-1'), (59, 'IPL1-2'), (60, 'IPL1-1')]
+
+
+@pytest.mark.parametrize('ext_key', ['MLAG/BGP', 'EXT'])
+def test_centered_uplinks_balance_the_free_ports(ext_key):
+    port_map, assigned = plan_rack(_spec('centered', ext_key))
+    uplinks = [(p, label) for p, label in port_map if label.startswith(('IPL', 'EXT'))]
+    # One block counting down from its top port, with 24 free ports on either side (7-30 and 37-60)
+    assert uplinks == [(31, 'EXT2-2'), (32, 'EXT2-1'), (33, 'EXT1-2'), (34, 'EXT1-1'), (35, 'IPL1-2'), (36, 'IPL1-1')]
+    assert len(assigned) == len(port_map) == 16
@@ -0,0 +1,46 @@
+"""bandwidth_report against a hand-computed two-rack cluster."""
+import pytest
+
+from portmapper_engine import SWITCH_LAYOUTS, PortMap, RackBandwidth, bandwidth_report
+
+pytest.importorskip('numpy')
+
+# Layout '1' runs at 200G, layout '8' at 400G
+RACK_A = [(1, 'CN-1'), (2, 'CN-2/4'), (3, 'EB-1'), (3, 'DN-1'), (4, 'DN-2'), (60, 'ISL-1'), (61, 'ISL2-1'),
+          (62, 'EXT1-1'), (63, 'RSVD-EXT'), (64, 'IPL-1'), (0, 'CN-9'), (1, 'EB-9')]
+RACK_B = [(1, 'CN-1'), (2, 'EB-1'), (5, 'RSVD-CN'), (60, 'ISL-1'), (63, 'CN-NB-1'), (64, 'EB-NB-2/4')]
+
+
+def _racks():
+    return {'A': (RACK_A, SWITCH_LAYOUTS['1']), 'B': (RACK_B, SWITCH_LAYOUTS['8'])}
+
+
+def test_two_rack_cluster():
+    report = bandwidth_report(_racks(), '100G')
+
+    # A: CN on ports 1-2 (port 1's later EB-9 and port 0 are ignored), EB on 3 (DN-1 on
+    # the same port loses), ISL on 60-61, EXT on 62-63 at the 100G uplink speed, no NB
+    assert report.racks['A'] == RackBandwidth(cn=400, eb=200, nb=0, isl=400, ext=200)
+    assert report.racks['A'].nb_per_switch == 600       # No NB ports: CN + EB
+    # B: CN on 1 and 5, EB on 2, ISL on 60, NB on 63-64
+    assert report.racks['B'] == RackBandwidth(cn=800, eb=400, nb=800, isl=400, ext=0)
+    assert report.racks['B'].nb_per_switch == 800       # NB ports take precedence over CN + EB
+
+    # The cluster NB is the sum of each rack's effective NB, not the raw NB column
+    assert report.total == RackBandwidth(cn=1200, eb=600, nb=1400, isl=800, ext=200)
+    assert report.total.nb_aggregate == 2800
+    assert report.total.ha_ext == 100
+
+
+def test_ext_defaults_to_native_speed():
+    report = bandwidth_report(_racks())
+    assert report.racks['A'].ext == 400
+    assert report.total.ext == 400
+
+
+def test_port_map_input_and_empty_racks():
+    racks = {'A': (PortMap.from_pairs(RACK_A, 64), SWITCH_LAYOUTS['1']), 'empty': ([], SWITCH_LAYOUTS['8'])}
+    report = bandwidth_report(racks, '100G')
+    assert report.racks['A'] == RackBandwidth(cn=400, eb=200, nb=0, isl=400, ext=200)
+    assert report.racks['empty'] == RackBandwidth()
+    assert bandwidth_report({}).total == RackBandwidth()
@@ -0,0 +1,91 @@
+"""FreePortIndex bitmask queries against brute-force scans of a plain set."""
+import random
+
+import pytest
+
+from portmapper_engine import FreePortIndex
+
+
+def _brute_first(taken, length, start):
+    s = max(start, 1)
+    while any(p in taken for p in range(s, s + length)):
+        s += 1
+    return s
+
+
+def _brute_last(taken, length, end):
+    for e in range(end, length - 1, -1):
+        if e - length + 1 >= 1 and not any(p in taken for p in range(e - length + 1, e + 1)):
+            return e
+    return None
+
+
+def _brute_runs(taken, length, end):
+    return [s for s in range(1, end - length + 2) if not any(p in taken for p in range(s, s + length))]
+
+
+def _brute_segments(taken, end):
+    lengths, run = [], 0
+    for p in range(1, end + 1):
+        if p in taken:
+            if run:
+                lengths.append(run)
+            run = 0
+        else:
+            run += 1
+    return lengths + [run] if run else lengths
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_queries_match_brute_force(seed):
+    rng = random.Random(seed)
+    for _ in range(300):
+        port_count = rng.choice([8, 32, 64, 128])
+        density = rng.random()
+        taken = {p for p in range(1, port_count + 1) if rng.random() < density}
+        index = FreePortIndex(taken)
+        for _ in range(5):
+            length = rng.randint(1, port_count + 4)       # Includes runs longer than any free space
+            start = rng.randint(-2, port_count + 2)
+            end = rng.randint(0, port_count)
+            assert index.first_free_run(length, start) == _brute_first(taken, length, start)
+            assert index.last_free_run(length, end) == _brute_last(taken, length, end)
+            assert list(index.free_runs(length, end)) == _brute_runs(taken, length, end)
+            assert list(index.free_runs(length, end, descending=True)) == _brute_runs(taken, length, end)[::-1]
+        assert index.free_segments(port_count) == _brute_segments(taken, port_count)
+        assert index.free_count(port_count) == port_count - len(taken)
+
+
+def test_runs_at_the_ends():
+    index = FreePortIndex(range(3, 63))   # Free: 1-2 and 63-64 of a 64-port switch
+    assert index.first_free_run(2) == 1
+    assert index.first_free_run(3) == 63  # Ports past the last one count as free
+    assert index.first_free_run(2, start=2) == 63
+    assert index.last_free_run(2, 64) == 64
+    assert index.last_free_run(2, 63) == 2
+    assert index.last_free_run(3, 64) is None
+    assert index.last_free_run(2, 1) is None    # A run cannot start below port 1
+    assert list(index.free_runs(2, 64)) == [1, 63]
+    assert index.free_segments(64) == [2, 2]
+
+
+def test_full_and_empty_index():
+    full = FreePortIndex(range(1, 65))
+    assert full.last_free_run(1, 64) is None
+    assert list(full.free_runs(1, 64)) == []
+    assert full.first_free_run(4) == 65
+    assert full.free_count(64) == 0
+
+    empty = FreePortIndex()
+    assert empty.first_free_run(64) == 1
+    assert empty.last_free_run(64, 64) == 64
+    assert empty.last_free_run(65, 64) is None
+    assert empty.free_segments(64) == [64]
+
+    # Non-positive lengths and bounds below port 1
+    assert empty.first_free_run(0, start=5) == 5
+    assert empty.last_free_run(0, 7) == 7
+    assert empty.first_free_run(3, start=-4) == 1
+    empty.add(0)
+    empty.add_run(-2, 4)                  # Only ports 1 and above are recorded
+    assert 0 not in empty and 1 in empty and 2 not in empty
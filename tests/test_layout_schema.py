@@ -0,0 +1,114 @@
+"""A 128-port model only needs a SWITCH_LAYOUTS entry; its breakout lanes are addressable (port, lane) slots."""
+from collections import Counter
+from dataclasses import replace
+
+import pytest
+
+from PIL import Image
+
+from portmapper_engine import (SWITCH_LAYOUTS, LaneMap, NodeSpec, PortMap, RackSpec, UplinkSpec,
+                               breakout_factor_choices, lane_labels, normalize_layout, parse_port_label, plan_rack,
+                               plan_rack_lanes, port_grid_position)
+from portmapper_render import PORT_SPRITES, PortDrawer, clear_overlay_cache, render_fabric_overlays
+
+
+def _synthetic_layout(base_id, **overrides):
+    layout = {k: v for k, v in SWITCH_LAYOUTS[base_id].items() if k != 'HALVES'}
+    layout.update(NAME='Synthetic 128x800G', PORT_COUNT=128, BREAKOUT_LANES=(2, 4, 8), **overrides)
+    return normalize_layout(layout)
+
+
+@pytest.mark.parametrize('base_id, overrides', [
+    ('3', {'GRID': (4, 32)}),                          # Mellanox numbering, down each column
+    ('8', {'GRID': (4, 32), 'SLICE_SIZE': 16}),        # Cisco banked numbering, balanced slices
+])
+def test_full_128_port_rack_with_4x_breakouts(monkeypatch, base_id, overrides):
+    monkeypatch.setitem(SWITCH_LAYOUTS, 'T128', _synthetic_layout(base_id, **overrides))
+    layout = SWITCH_LAYOUTS['T128']
+    assert breakout_factor_choices(layout) == ['2', '4', '8']
+    assert layout['HALVES'] == ((1, 64), (65, 128))
+    assert len({port_grid_position(layout, p) for p in range(1, 129)}) == 128
+
+    # 488 nodes on 122 broken-out ports plus 6 uplink ports fill the switch
+    nodes = {'DN': NodeSpec(count=256, split=True, factor=4), 'CN': NodeSpec(count=232, split=True, factor=4)}
+    uplinks = {'IPL': UplinkSpec(groups=1, ports_per_group=2), 'ISL': UplinkSpec(groups=1, ports_per_group=4)}
+    spec = RackSpec(switch_id='T128', nodes=nodes, uplinks=uplinks)
+    for placement in ('greedy', 'solver'):
+        port_map, assigned = plan_rack(replace(spec, placement=placement))
+        assert assigned == set(range(1, 129)) and len(port_map) == 128
+
+        covered = Counter()
+        for _, label in port_map:
+            record = parse_port_label(label)
+            if record.node_range:
+                first, last = record.node_range
+                covered[record.base_type] += last - first + 1
+        assert covered == {'DN': 256, 'CN': 232}
+
+
+def test_lane_labels():
+    assert lane_labels('CN-1/4') == ('CN-1', 'CN-2', 'CN-3', 'CN-4')
+    assert lane_labels('ISL2-3/4') == ('ISL2-3', 'ISL2-4')
+    assert lane_labels('CN-NB-1/1/2') == ('CN-NB-1/1', 'CN-NB-1/2')
+    assert lane_labels('DN-5') == ('DN-5',) and lane_labels('RSVD-CN') == ('RSVD-CN',)
+
+
+def test_lane_map_slots():
+    pairs = [(1, 'CN-1/4'), (2, 'CN-5/6'), (3, 'DN-1'), (2, 'DN-9'), (5, 'RSVD-CN'), (70, 'ISL-1/2')]
+    lane_map = LaneMap.from_pairs(pairs, 64, {'CN': 4, 'ISL': 2})
+    assert lane_map.max_lanes == 4 and len(lane_map) == 10
+    assert lane_map[(1, 3)] == 'CN-3' and lane_map.get(2, 2) == 'CN-6' and (2, 3) not in lane_map
+    assert (lane_map.width(1), lane_map.width(3), lane_map.width(5), lane_map.width(4)) == (4, 1, 1, 0)
+    assert lane_map.get(3) == 'DN-1' and lane_map.get(3, 2) is None
+    assert lane_map.breakouts() == [(1, 4), (2, 4), (70, 2)]
+    assert lane_map.free_lanes() == [(2, 3), (2, 4)]       # The last CN port is half used
+    assert lane_map.port_lanes(70) == [(1, 'ISL-1'), (2, 'ISL-2')]
+    assert list(lane_map)[:5] == [((1, 1), 'CN-1'), ((1, 2), 'CN-2'), ((1, 3), 'CN-3'), ((1, 4), 'CN-4'),
+                                  ((2, 1), 'CN-5')]
+
+    lane_map.set_port(1, ['EB-1'])
+    assert lane_map.width(1) == 1 and lane_map.port_lanes(1) == [(1, 'EB-1')] and len(lane_map) == 7
+    with pytest.raises(ValueError):
+        lane_map.set_port(4, ['DN-1'], width=8)
+
+
+@pytest.fixture
+def t128(monkeypatch):
+    monkeypatch.setitem(SWITCH_LAYOUTS, 'T128', _synthetic_layout('3', GRID=(4, 32)))
+    return SWITCH_LAYOUTS['T128']
+
+
+def test_512_lane_rack(t128):
+    # 4x breakouts on all 128 ports: 512 lanes, two of them left free by the last CN port
+    nodes = {'DN': NodeSpec(count=256, split=True, factor=4), 'CN': NodeSpec(count=246, split=True, factor=4)}
+    uplinks = {'IPL': UplinkSpec(groups=1, ports_per_group=4, split=True, factor=4),
+               'ISL': UplinkSpec(groups=1, ports_per_group=4, split=True, factor=4)}
+    for placement in ('greedy', 'solver'):
+        lane_map = plan_rack_lanes(RackSpec(switch_id='T128', nodes=nodes, uplinks=uplinks, placement=placement))
+        assert len(lane_map.breakouts()) == 128 and len(lane_map) == 510
+        assert len(lane_map.free_lanes()) == 2
+        assert Counter(parse_port_label(label).base_type for _, label in lane_map) == {
+            'DN': 256, 'CN': 246, 'IPL': 4, 'ISL': 4}
+
+
+def test_lanes_are_drawn_side_by_side(t128):
+    x, y = PortDrawer(None, t128, 1.0)._get_port_coordinates(128)
+    base = Image.new('RGBA', (x + t128['PORT_WIDTH'] + 20, y + t128['PORT_HEIGHT'] + 20), 'white')
+    lane_map = plan_rack_lanes(RackSpec(switch_id='T128', nodes={'CN': NodeSpec(count=512, split=True, factor=4)}))
+    assert len(lane_map) == 512
+
+    clear_overlay_cache()
+    PORT_SPRITES.clear()
+    overlays = render_fabric_overlays(lane_map, base, t128)
+    first = PORT_SPRITES.stats()
+    assert first['misses'] == 1024                  # One sprite per lane and fabric
+    render_fabric_overlays(lane_map, base, t128)
+    assert PORT_SPRITES.stats()['hits'] - first['hits'] == 1024
+    PORT_SPRITES.clear()
+
+    # Port 1's lanes are four boxes, not the one box the port map draws for 'CN-1/4'
+    whole = render_fabric_overlays(PortMap.from_pairs([(1, 'CN-1/4')], 128), base, t128)
+    x, y = PortDrawer(None, t128, 1.0)._get_port_coordinates(1)
+    box = (x - 1, y - 1, x + t128['PORT_WIDTH'] + 2, y + t128['PORT_HEIGHT'] + 2)
+    assert overlays['A'].crop(box).tobytes() != whole['A'].crop(box).tobytes()
+    PORT_SPRITES.clear()
@@ -0,0 +1,53 @@
+"""PortMap.from_pairs must de-duplicate like the DataFrame code it replaced."""
+import random
+
+import pytest
+
+from portmapper_engine import PortMap
+
+PAIRS = [(5, 'DN-1'), (3, 'CN-1'), (5, 'CN-9'), (64, 'ISL-1'), (3, 'EB-1'), (5, 'RSVD-DN')]
+
+
+def test_duplicate_ports_keep_the_first_label():
+    port_map = PortMap.from_pairs(PAIRS, 64)
+    assert port_map.to_pairs() == [(3, 'CN-1'), (5, 'DN-1'), (64, 'ISL-1')]
+    assert len(port_map) == 3
+    assert port_map[5] == 'DN-1' and port_map.get(4) is None and 4 not in port_map
+    with pytest.raises(KeyError):
+        port_map[4]
+
+
+def test_keep_last():
+    port_map = PortMap.from_pairs(PAIRS, 64, keep='last')
+    assert port_map.to_pairs() == [(3, 'EB-1'), (5, 'RSVD-DN'), (64, 'ISL-1')]
+
+
+def test_out_of_range_ports():
+    port_map = PortMap.from_pairs([(0, 'X-0'), (-3, 'X-1'), (70, 'ISL-9'), (1, 'DN-1'), (70, 'ISL-10')], 64)
+    # Ports below 1 do not exist on any switch and are dropped; ports past port_count are kept
+    assert port_map.to_pairs() == [(1, 'DN-1'), (70, 'ISL-9')]
+    assert 0 not in port_map and -3 not in port_map
+    assert port_map.get(1000, 'none') == 'none'
+
+
+def test_empty_input():
+    for port_map in (PortMap.from_pairs([], 64), PortMap.from_pairs([]), PortMap()):
+        assert len(port_map) == 0
+        assert port_map.to_pairs() == [] and port_map.ports() == [] and port_map.labels() == []
+        assert 1 not in port_map
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_matches_drop_duplicates_and_groupby(seed):
+    pd = pytest.importorskip('pandas')
+    rng = random.Random(seed)
+    pairs = [(rng.randint(1, 70), f'L{i}') for i in range(200)]
+    df_raw = pd.DataFrame(pairs, columns=['Port ID', 'Port Name'])
+
+    first = df_raw.drop_duplicates(subset=['Port ID'], keep='first').sort_values('Port ID')
+    last = df_raw.drop_duplicates(subset=['Port ID'], keep='last').sort_values('Port ID')
+    grouped = df_raw.groupby('Port ID')['Port Name'].apply(lambda s: s.iloc[0]).reset_index()
+
+    assert PortMap.from_pairs(pairs, 64).to_pairs() == list(first.itertuples(index=False, name=None))
+    assert PortMap.from_pairs(pairs, 64).to_pairs() == list(grouped.itertuples(index=False, name=None))
+    assert PortMap.from_pairs(pairs, 64, keep='last').to_pairs() == list(last.itertuples(index=False, name=None))
@@ -0,0 +1,21 @@
+"""Render caches stay bounded however many canvas sizes a session goes through."""
+from PIL import Image, ImageDraw
+
+import portmapper_render
+from portmapper_engine import SWITCH_LAYOUTS
+from portmapper_render import PortDrawer
+
+
+def test_fitted_font_sizes_are_bounded(monkeypatch):
+    monkeypatch.setattr(portmapper_render, 'FITTED_FONT_CACHE_SIZE', 8)
+    portmapper_render.clear_font_cache()
+    image = Image.new('RGBA', (200, 100))
+    drawer = PortDrawer(ImageDraw.Draw(image), SWITCH_LAYOUTS['3'], 1.0)
+    for width in range(40, 60):  # One preview resize step per width
+        drawer._get_adaptive_font('DN-1', width, 20)
+    assert list(portmapper_render._FITTED_FONT_SIZES) == [('DN-1', w, 20) for w in range(52, 60)]
+
+    # A hit moves the entry to the most recently used end
+    drawer._get_adaptive_font('DN-1', 52, 20)
+    assert next(reversed(portmapper_render._FITTED_FONT_SIZES)) == ('DN-1', 52, 20)
+    portmapper_render.clear_font_cache()
@@ -0,0 +1,154 @@
+"""placement='solver' must return valid port maps, match greedy where greedy fits, and fall back to greedy."""
+import random
+from collections import Counter
+from dataclasses import replace
+
+import pytest
+
+from portmapper_engine import (SWITCH_LAYOUTS, NodeSpec, RackSpec, UplinkSpec, get_port_base_type,
+                               plan_rack, solve_rack_placement)
+
+SWITCH_IDS = ['3', '7', '8']   # Mellanox, then the two slice-balanced Cisco layouts
+
+
+def _spec_type(label):
+    """The RackSpec key a port label belongs to (MLAG/BGP data ports read 'MLAG...', their reserved ports 'RSVD-EXT')."""
+    base = get_port_base_type(label)
+    return 'MLAG/BGP' if base in ('MLAG', 'EXT') else base
+
+
+def _random_spec(rng, switch_id, lock=None):
+    """A default-mode rack spec; lock names the one type given a fixed start port."""
+    nodes = {nt: NodeSpec(count=rng.randint(0, 16), split=rng.random() < 0.3, reserved=rng.randint(0, 2))
+             for nt in ('DN', 'CN', 'EB')}
+    uplinks = {'IPL': UplinkSpec(groups=1, ports_per_group=2),
+               'ISL': UplinkSpec(groups=rng.randint(0, 2), ports_per_group=rng.randint(1, 4),
+                                 reserved=rng.randint(0, 1)),
+               'MLAG/BGP': UplinkSpec(groups=rng.randint(0, 2), ports_per_group=rng.randint(1, 4),
+                                      reserved=rng.randint(0, 1))}
+    port_count = SWITCH_LAYOUTS[switch_id]['PORT_COUNT']
+    if lock in nodes:
+        nodes[lock] = replace(nodes[lock], count=max(nodes[lock].count, 1), start_port=rng.randint(1, port_count // 2))
+    elif lock in uplinks:
+        uplinks[lock] = replace(uplinks[lock], groups=max(uplinks[lock].groups, 1),
+                                start_port=rng.randint(port_count // 2, port_count))
+    return RackSpec(switch_id=switch_id, nodes=nodes, uplinks=uplinks, placement='solver')
+
+
+def _random_specs(seed, count):
+    rng = random.Random(seed)
+    for _ in range(count):
+        switch_id = rng.choice(SWITCH_IDS)
+        yield _random_spec(rng, switch_id, lock=rng.choice([None, None, 'DN', 'CN', 'ISL', 'MLAG/BGP']))
+
+
+def _ports_by_type(port_map):
+    by_type = {}
+    for port, label in port_map:
+        by_type.setdefault(_spec_type(label), []).append(port)
+    return by_type
+
+
+def _greedy_fits(spec, greedy_map, solved_map):
+    """Greedy fit the rack when it labelled every port the solver did, each on its own port."""
+    ports = [p for p, _ in greedy_map]
+    port_count = spec.layout['PORT_COUNT']
+    return (len(ports) == len(set(ports)) and all(1 <= p <= port_count for p in ports)
+            and Counter(label for _, label in greedy_map) == Counter(label for _, label in solved_map))
+
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_solver_port_maps_are_valid(seed):
+    solved_count = 0
+    for spec in _random_specs(seed, 60):
+        solved = solve_rack_placement(spec)
+        if solved is None:
+            continue
+        solved_count += 1
+        port_map, assigned = solved
+        ports = [p for p, _ in port_map]
+        layout = spec.layout
+        assert len(ports) == len(set(ports)), spec
+        assert assigned == set(ports)
+        assert all(1 <= p <= layout['PORT_COUNT'] for p in ports), spec
+
+        # Locked types sit exactly where the greedy planner puts them
+        greedy_by_type = _ports_by_type(plan_rack(replace(spec, placement='greedy'))[0])
+        solved_by_type = _ports_by_type(port_map)
+        locked = [nt for nt, n in spec.nodes.items() if n.locked] + [ut for ut, u in spec.uplinks.items() if u.locked]
+        for type_name in locked:
+            assert sorted(solved_by_type.get(type_name, [])) == sorted(greedy_by_type.get(type_name, [])), spec
+
+        # Balanced layouts spread each auto-assigned type evenly over the slices
+        if layout.get('BALANCED_NODE_ASSIGNMENT'):
+            slice_size = layout['SLICE_SIZE']
+            num_slices = layout['PORT_COUNT'] // slice_size
+            for type_name, type_ports in solved_by_type.items():
+                if type_name in locked:
+                    continue
+                per_slice = Counter((p - 1) // slice_size for p in type_ports)
+                counts = [per_slice[k] for k in range(num_slices)]
+                assert max(counts) - min(counts) <= 1, (spec, type_name, counts)
+    assert solved_count > 0
+
+
+@pytest.mark.parametrize('seed', [4, 5])
+def test_solver_matches_greedy_when_greedy_fits(seed):
+    compared = 0
+    for spec in _random_specs(seed, 60):
+        solved = solve_rack_placement(spec)
+        if solved is None:
+            continue
+        greedy_map, greedy_assigned = plan_rack(replace(spec, placement='greedy'))
+        if _greedy_fits(spec, greedy_map, solved[0]):
+            compared += 1
+            assert sorted(solved[0]) == sorted(greedy_map), spec
+            assert solved[1] == greedy_assigned
+    assert compared > 0
+
+
+@pytest.mark.parametrize('switch_id', SWITCH_IDS)
+def test_small_racks_plan_identically(switch_id):
+    nodes = {'DN': NodeSpec(count=8), 'CN': NodeSpec(count=6, split=True), 'EB': NodeSpec(count=2, reserved=1)}
+    uplinks = {'IPL': UplinkSpec(groups=1, ports_per_group=2), 'ISL': UplinkSpec(groups=2, ports_per_group=2)}
+    spec = RackSpec(switch_id=switch_id, nodes=nodes, uplinks=uplinks)
+    assert plan_rack(replace(spec, placement='solver')) == plan_rack(spec)
+
+
+def test_tiny_time_budget_falls_back_to_greedy():
+    # Greedy puts IPL on a port locked for ISL; the solver finds room for everything
+    nodes = {'DN': NodeSpec(count=8), 'CN': NodeSpec(count=12), 'EB': NodeSpec(count=4, start_port=20)}
+    uplinks = {'IPL': UplinkSpec(groups=1, ports_per_group=2), 'ISL': UplinkSpec(groups=1, ports_per_group=2, start_port=63)}
+    spec = RackSpec(switch_id='3', nodes=nodes, uplinks=uplinks, placement='solver')
+    greedy = plan_rack(replace(spec, placement='greedy'))
+    greedy_ports = [p for p, _ in greedy[0]]
+    assert len(greedy_ports) > len(set(greedy_ports))
+
+    solved = plan_rack(spec)
+    assert solved != greedy
+    assert len(solved[1]) == len(solved[0])
+
+    assert solve_rack_placement(spec, time_budget=0.0) is None
+    assert plan_rack(replace(spec, solver_time_budget=0.0)) == greedy
+
+
+@pytest.mark.parametrize('placement', ['greedy', 'solver'])
+def test_locked_node_ports_are_reserved_first(placement):
+    # CN is locked into the middle of where DN would go, and EB onto a port list; the rest works around both
+    nodes = {'DN': NodeSpec(count=16), 'CN': NodeSpec(count=8, start_port=3), 'EB': NodeSpec(count=3, ports=(40, 41, 50),
+                                                                                             start_port=40)}
+    uplinks = {'IPL': UplinkSpec(groups=1, ports_per_group=2)}
+    port_map, assigned = plan_rack(RackSpec(switch_id='3', nodes=nodes, uplinks=uplinks, placement=placement))
+    ports = [p for p, _ in port_map]
+    assert len(ports) == len(set(ports)) == len(assigned) == 29
+    labels = dict(port_map)
+    assert [labels[p] for p in range(3, 11)] == [f'CN-{i}' for i in range(1, 9)]
+    assert (labels[40], labels[41], labels[50]) == ('EB-1', 'EB-2', 'EB-3')
+
+
+def test_lock_fields_parse_start_ports_and_lists():
+    assert NodeSpec.from_dict({'start_port': '12'}) == NodeSpec(start_port=12)
+    assert NodeSpec.from_dict({'start_port': '40-41, 50'}) == NodeSpec(start_port=40, ports=(40, 41, 50))
+    assert not NodeSpec.from_dict({'start_port': ''}).locked
+    # Uplinks always number from one port, so a list locks its first port
+    assert UplinkSpec.from_dict({'start': '61-64'}).start_port == 61
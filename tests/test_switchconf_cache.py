@@ -0,0 +1,116 @@
+"""fetch_switch_conf against a local HTTP server: download, cache hits, revalidation and offline use."""
+import os
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from portmapper_switchconf import build_switch_conf_params, fetch_switch_conf, run_switch_conf
+
+
+class _ScriptServer(ThreadingHTTPServer):
+    """Serves one script with Last-Modified and answers If-Modified-Since with 304."""
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _ScriptHandler)
+        self.requests = []     # If-Modified-Since header of each GET (None when absent)
+        self.publish(b'print("v1")\n', 1_700_000_000)
+
+    def publish(self, body: bytes, mtime: int):
+        self.body, self.last_modified = body, formatdate(mtime, usegmt=True)
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}/switch_conf.py'
+
+
+class _ScriptHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        since = self.headers.get('If-Modified-Since')
+        self.server.requests.append(since)
+        if since and parsedate_to_datetime(since) >= parsedate_to_datetime(self.server.last_modified):
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Last-Modified', self.server.last_modified)
+        self.send_header('Content-Length', str(len(self.server.body)))
+        self.end_headers()
+        self.wfile.write(self.server.body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = _ScriptServer()
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield httpd
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_download_then_fresh(server, tmp_path):
+    path, status = fetch_switch_conf(server.url, cache_dir=str(tmp_path))
+    assert status == 'downloaded' and _read(path) == b'print("v1")\n'
+    assert server.requests == [None]
+
+    # Within max_age the cached copy is used without asking the server
+    assert fetch_switch_conf(server.url, cache_dir=str(tmp_path)) == (path, 'fresh')
+    assert len(server.requests) == 1
+
+
+def test_revalidation_and_change(server, tmp_path):
+    first, _ = fetch_switch_conf(server.url, cache_dir=str(tmp_path), max_age=0)
+
+    assert fetch_switch_conf(server.url, cache_dir=str(tmp_path), max_age=0) == (first, 'not-modified')
+    assert server.requests[-1] == server.last_modified
+
+    server.publish(b'print("v2")\n', 1_700_000_600)
+    second, status = fetch_switch_conf(server.url, cache_dir=str(tmp_path), max_age=0)
+    assert status == 'downloaded' and second != first
+    assert _read(second) == b'print("v2")\n'
+    assert len(server.requests) == 3
+
+
+def test_offline_uses_last_good_copy(server, tmp_path):
+    path, _ = fetch_switch_conf(server.url, cache_dir=str(tmp_path))
+    assert fetch_switch_conf(server.url, cache_dir=str(tmp_path), offline=True, max_age=0) == (path, 'offline')
+
+    # An unreachable server is treated the same way
+    url = server.url
+    server.shutdown()
+    server.server_close()
+    assert fetch_switch_conf(url, cache_dir=str(tmp_path), max_age=0, timeout=2) == (path, 'offline')
+    assert len(server.requests) == 1
+
+
+def test_unavailable_without_cache(server, tmp_path):
+    assert fetch_switch_conf(server.url, cache_dir=str(tmp_path), offline=True) == (None, 'unavailable')
+    assert server.requests == []
+
+    url = server.url
+    server.shutdown()
+    server.server_close()
+    assert fetch_switch_conf(url, cache_dir=str(tmp_path), timeout=2) == (None, 'unavailable')
+
+
+def test_offline_run_without_cache_says_so(tmp_path, monkeypatch):
+    monkeypatch.setenv('PORTMAPPER_CACHE_DIR', str(tmp_path / 'cache'))
+    config_dir = str(tmp_path / 'configs')
+    params = build_switch_conf_params(config_dir, {'rack_name': 'Rack1', 'clustername': 'c1'})
+
+    message = run_switch_conf(params, offline=True)
+    assert 'offline and no cached copy' in message
+    assert 'VPN/Network Error' not in message
+    assert any(name.endswith('_switch.cfg') for name in os.listdir(config_dir))
@@ -0,0 +1,64 @@
+"""The warm switch_conf.py backend must behave like a cold `python3 switch_conf.py` run."""
+import os
+import sys
+
+from portmapper_switchconf import SwitchConfRunner
+
+SCRIPT = '''
+import os, subprocess, sys
+import helper
+print('py line')
+print('env', os.environ.get('PM_TEST_VAR'))
+os.environ['PM_TEST_VAR'] = 'set-by-script'
+sys.stdout.flush()
+os.system('echo from-child')
+subprocess.run([sys.executable, '-c', 'print("from-subprocess")'])
+print('helper', helper.VALUE)
+print('err line', file=sys.stderr)
+try:
+    input()
+except EOFError:
+    print('eof')
+sys.exit(3 if len(sys.argv) > 1 else 0)
+'''
+
+
+def _run_twice(runner, tmp_path, args):
+    """Runs the script twice, changing the helper module it imports in between."""
+    results = []
+    for value in ('1', '22'):
+        (tmp_path / 'helper.py').write_text(f'VALUE = {value}\n')
+        results.append(runner.run([sys.executable, 'switch_conf.py', *args], cwd=str(tmp_path), timeout=30))
+    return results
+
+
+def test_warm_runs_match_cold_runs(tmp_path):
+    (tmp_path / 'switch_conf.py').write_text(SCRIPT)
+    warm, cold = SwitchConfRunner('warm', workers=1), SwitchConfRunner('subprocess')
+    try:
+        for args in ([], ['--fail']):
+            warm_results = _run_twice(warm, tmp_path, args)
+            cold_results = _run_twice(cold, tmp_path, args)
+            for w, c in zip(warm_results, cold_results):
+                assert (w.returncode, w.stdout, w.stderr) == (c.returncode, c.stdout, c.stderr)
+    finally:
+        warm.close()
+
+    first, second = cold_results
+    assert 'from-child\nfrom-subprocess\n' in first.stdout
+    assert 'env None\n' in second.stdout  # The script's os.environ change did not leak
+    assert 'helper 1\n' in first.stdout and 'helper 22\n' in second.stdout
+    assert 'eof\n' in first.stdout
+    assert first.stderr == 'err line\n' and first.returncode == 3
+
+
+def test_warm_run_sees_callers_environment(tmp_path, monkeypatch):
+    (tmp_path / 'switch_conf.py').write_text("import os\nprint(os.environ.get('PM_CALLER_VAR'))\n")
+    runner = SwitchConfRunner('warm', workers=1)
+    try:
+        runner.run([sys.executable, 'switch_conf.py'], cwd=str(tmp_path), timeout=30)  # Start the worker first
+        monkeypatch.setitem(os.environ, 'PM_CALLER_VAR', 'later')
+        result = runner.run([sys.executable, 'switch_conf.py'], cwd=str(tmp_path), timeout=30)
+    finally:
+        runner.close()
+    assert result.stdout == 'later\n'